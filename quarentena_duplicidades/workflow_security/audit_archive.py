@@ -0,0 +1,228 @@
+"""
+Arquivo Frio de Auditoria - TarefaMágica
+Formato compactado em blocos indexados para dias antigos de eventos
+"""
+
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Colunas codificadas por dicionário em cada bloco
+DICTIONARY_COLUMNS = ("category", "action", "level")
+
+ARCHIVE_SUFFIX = ".arc"
+ARCHIVE_INDEX_SUFFIX = ".arc.idx"
+
+_EPOCH = datetime(1970, 1, 1)
+
+def archive_paths(archives_path: str, day: str) -> Tuple[str, str]:
+    """Caminhos do arquivo de blocos e do seu índice para um dia"""
+    base = os.path.join(archives_path, day)
+    return base + ARCHIVE_SUFFIX, base + ARCHIVE_INDEX_SUFFIX
+
+def _record_epoch(record: Dict) -> float:
+    """Timestamp do evento em segundos desde a época"""
+    return (datetime.fromisoformat(record["timestamp"]) - _EPOCH).total_seconds()
+
+def write_archive(
+    archives_path: str,
+    day: str,
+    records: Iterable[Dict],
+    block_records: int = 4096,
+    compress: bool = True,
+    compression_level: int = 6
+) -> Dict:
+    """
+    Grava os eventos de um dia em um arquivo compactado por blocos
+
+    Os eventos são ordenados por timestamp e divididos em blocos. Cada
+    bloco guarda um cabeçalho com os timestamps e os códigos das colunas
+    de dicionário, seguido das linhas JSON. O índice (gravado por último,
+    marcando o arquivo como completo) registra para cada bloco o offset,
+    o intervalo de timestamps e o dicionário de valores de cada coluna.
+
+    Args:
+        archives_path: Diretório dos arquivos
+        day: Dia no formato YYYYMMDD
+        records: Eventos serializados do dia
+        block_records: Número de eventos por bloco
+        compress: Se os blocos são compactados com zlib
+        compression_level: Nível de compactação zlib
+
+    Returns:
+        Dict: Índice gravado
+    """
+    os.makedirs(archives_path, exist_ok=True)
+    data_path, index_path = archive_paths(archives_path, day)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    # Mantém apenas a linha serializada e as colunas de cada evento durante a ordenação
+    entries = []
+    for record in records:
+        entries.append((
+            _record_epoch(record),
+            tuple(record.get(column) for column in DICTIONARY_COLUMNS),
+            json.dumps(record, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        ))
+    entries.sort(key=lambda entry: entry[0])
+
+    index = {
+        "version": 1,
+        "day": day,
+        "codec": "zlib" if compress else "none",
+        "records": len(entries),
+        "raw_bytes": 0,
+        "blocks": []
+    }
+
+    with open(data_path + suffix, 'wb') as f:
+        offset = 0
+        for start in range(0, len(entries), block_records):
+            block = entries[start:start + block_records]
+            dictionaries: Dict[str, List[Any]] = {column: [] for column in DICTIONARY_COLUMNS}
+            positions: Dict[str, Dict[Any, int]] = {column: {} for column in DICTIONARY_COLUMNS}
+            codes: Dict[str, List[int]] = {column: [] for column in DICTIONARY_COLUMNS}
+            for _, values, _ in block:
+                for column, value in zip(DICTIONARY_COLUMNS, values):
+                    code = positions[column].get(value)
+                    if code is None:
+                        code = positions[column][value] = len(dictionaries[column])
+                        dictionaries[column].append(value)
+                    codes[column].append(code)
+
+            header = json.dumps({"ts": [ts for ts, _, _ in block], "codes": codes}, separators=(',', ':'))
+            payload = header.encode('utf-8') + b"\n" + b"\n".join(line for _, _, line in block) + b"\n"
+            index["raw_bytes"] += len(payload)
+            data = zlib.compress(payload, compression_level) if compress else payload
+            f.write(data)
+
+            index["blocks"].append({
+                "offset": offset,
+                "length": len(data),
+                "count": len(block),
+                "min_ts": block[0][0],
+                "max_ts": block[-1][0],
+                "columns": dictionaries
+            })
+            offset += len(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    with open(index_path + suffix, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(data_path + suffix, data_path)
+    os.replace(index_path + suffix, index_path)
+    return index
+
+class AuditArchive:
+    def __init__(self, archives_path: str, day: str):
+        """
+        Leitor de um dia arquivado
+
+        Args:
+            archives_path: Diretório dos arquivos
+            day: Dia no formato YYYYMMDD
+        """
+        self.day = day
+        self.data_path, self.index_path = archive_paths(archives_path, day)
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.blocks: List[Dict] = self.index["blocks"]
+
+    def select_blocks(
+        self,
+        filters: Dict[str, str],
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> List[int]:
+        """
+        Blocos que podem conter eventos do filtro
+
+        Descarta blocos fora do intervalo de tempo ou cujo dicionário não
+        contém o valor filtrado de alguma coluna.
+        """
+        selected = []
+        for number, block in enumerate(self.blocks):
+            if start_ts is not None and block["max_ts"] < start_ts:
+                continue
+            if end_ts is not None and block["min_ts"] > end_ts:
+                continue
+            if any(
+                column in filters and filters[column] not in block["columns"][column]
+                for column in DICTIONARY_COLUMNS
+            ):
+                continue
+            selected.append(number)
+        return selected
+
+    def read_block(self, number: int) -> Tuple[Dict, List[bytes]]:
+        """
+        Lê e descompacta um bloco
+
+        Returns:
+            Tuple[Dict, List[bytes]]: (cabeçalho com timestamps e códigos, linhas JSON)
+        """
+        block = self.blocks[number]
+        with open(self.data_path, 'rb') as f:
+            f.seek(block["offset"])
+            data = f.read(block["length"])
+        if self.index["codec"] == "zlib":
+            data = zlib.decompress(data)
+        header_line, _, body = data.partition(b"\n")
+        rows = body.split(b"\n")[:block["count"]]
+        return json.loads(header_line), rows
+
+    def iter_block_matches(
+        self,
+        number: int,
+        filters: Dict[str, str],
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> Iterator[Tuple[float, int, bytes]]:
+        """
+        Itera (timestamp, posição, linha) dos eventos de um bloco que passam
+        no intervalo e nos filtros das colunas de dicionário
+
+        As colunas de dicionário são comparadas pelos códigos, sem
+        decodificar o JSON das linhas descartadas.
+        """
+        header, rows = self.read_block(number)
+        dictionaries = self.blocks[number]["columns"]
+        wanted = {}
+        for column in DICTIONARY_COLUMNS:
+            if column in filters:
+                wanted[column] = dictionaries[column].index(filters[column])
+
+        timestamps = header["ts"]
+        codes = header["codes"]
+        for position, ts in enumerate(timestamps):
+            if start_ts is not None and ts < start_ts:
+                continue
+            if end_ts is not None and ts > end_ts:
+                continue
+            if any(codes[column][position] != code for column, code in wanted.items()):
+                continue
+            yield ts, position, rows[position]
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Itera todos os eventos do dia em ordem de timestamp"""
+        for number in range(len(self.blocks)):
+            _, rows = self.read_block(number)
+            for row in rows:
+                yield json.loads(row)
+
+    def stats(self) -> Dict:
+        """Tamanhos do arquivo (bruto e compactado)"""
+        return {
+            "day": self.day,
+            "records": self.index["records"],
+            "blocks": len(self.blocks),
+            "raw_bytes": self.index["raw_bytes"],
+            "stored_bytes": os.path.getsize(self.data_path)
+        }
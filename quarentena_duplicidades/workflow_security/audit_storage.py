@@ -0,0 +1,1404 @@
+"""
+Armazenamento Segmentado de Auditoria - TarefaMágica
+Log append-only de eventos em segmentos JSON por linha, com rotação por tamanho
+"""
+
+import base64
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .audit_archive import AuditArchive, archive_paths, write_archive
+
+class FsyncPolicy(Enum):
+    ALWAYS = "always"      # fsync a cada escrita (com group commit entre threads)
+    INTERVAL = "interval"  # fsync no máximo uma vez por intervalo
+    NEVER = "never"        # durabilidade delegada ao sistema operacional
+
+SEGMENT_PATTERN = re.compile(r'^(\d{8})-(\d{4})\.jsonl$')
+LEGACY_PATTERN = re.compile(r'^(\d{8})\.json$')
+
+# Campos com índice secundário por segmento
+INDEXED_FIELDS = ("user_id", "category", "action", "level", "success")
+
+# Limites superiores (ms) do histograma de duração das rollups
+DURATION_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Flags de abertura: criação exclusiva garante um único escritor por segmento,
+# inclusive entre processos (ex.: vários workers do gunicorn)
+_SEGMENT_OPEN_FLAGS = os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+def day_key(timestamp: str) -> str:
+    """Extrai a chave do dia (YYYYMMDD) de um timestamp ISO"""
+    return timestamp[0:4] + timestamp[5:7] + timestamp[8:10]
+
+def segment_name(day: str, sequence: int) -> str:
+    """Nome do arquivo de segmento de um dia"""
+    return f"{day}-{sequence:04d}.jsonl"
+
+def index_path(segment_path: str) -> str:
+    """Caminho do índice persistido de um segmento"""
+    return segment_path[:-len(".jsonl")] + ".idx"
+
+def rollup_name(day: str) -> str:
+    """Nome do arquivo de rollups de um dia"""
+    return f"{day}.rollup.json"
+
+def to_epoch(timestamp: datetime) -> float:
+    """Converte datetime UTC (naive) em segundos desde a época"""
+    return (timestamp - _EPOCH).total_seconds()
+
+def index_value(field: str, value: Any) -> Optional[str]:
+    """Normaliza o valor de um campo indexado para chave de posting"""
+    if value is None:
+        return None
+    if field == "success":
+        return "true" if value else "false"
+    return str(value)
+
+def encode_cursor(cursor: Dict) -> str:
+    """Codifica o cursor de exportação em token opaco (base64 url-safe)"""
+    raw = json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip("=")
+
+def decode_cursor(token: str) -> Dict:
+    """
+    Decodifica um token de cursor de exportação
+
+    Raises:
+        ValueError: Se o token for inválido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor = json.loads(raw)
+        day, position, ts = cursor["d"], cursor["p"], cursor["t"]
+    except Exception:
+        raise ValueError("Cursor de exportação inválido")
+    if (
+        not isinstance(day, str) or len(day) != 8 or not day.isdigit()
+        or not isinstance(position, list) or len(position) != 3
+        or not all(isinstance(value, int) for value in position)
+        or not isinstance(ts, (int, float))
+    ):
+        raise ValueError("Cursor de exportação inválido")
+    return cursor
+
+class SegmentIndex:
+    """
+    Índice secundário de um segmento
+
+    Guarda, para cada registro, o offset em bytes e o timestamp, além de
+    listas de postings (ordinais de registro) por valor de cada campo
+    indexado. `covered` indica até que byte do segmento o índice está
+    atualizado, permitindo atualização incremental. `in_order` indica se os
+    timestamps não decrescem na ordem de gravação (o caso comum); caso
+    contrário, a ordem por timestamp é calculada uma vez e reaproveitada.
+    """
+
+    def __init__(self):
+        self.covered = 0
+        self.offsets = array('q')
+        self.timestamps = array('d')
+        self.postings: Dict[str, Dict[str, array]] = {field: {} for field in INDEXED_FIELDS}
+        self.in_order = True
+        self._time_order: Optional[Tuple[int, array, array]] = None
+
+    def add(self, offset: int, record: Dict):
+        """Indexa um registro localizado em `offset`"""
+        try:
+            timestamp = to_epoch(datetime.fromisoformat(record["timestamp"]))
+        except (KeyError, TypeError, ValueError):
+            return
+        ordinal = len(self.offsets)
+        if ordinal and timestamp < self.timestamps[-1]:
+            self.in_order = False
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        for field in INDEXED_FIELDS:
+            value = index_value(field, record.get(field))
+            if value is not None:
+                postings = self.postings[field].get(value)
+                if postings is None:
+                    postings = self.postings[field][value] = array('I')
+                postings.append(ordinal)
+
+    def candidates(
+        self,
+        filters: Dict[str, str],
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> List[int]:
+        """
+        Ordinais dos registros que satisfazem os filtros indexados
+
+        Args:
+            filters: Campo indexado -> valor normalizado
+            start_ts: Timestamp mínimo (inclusive)
+            end_ts: Timestamp máximo (inclusive)
+
+        Returns:
+            List[int]: Ordinais em ordem de gravação
+        """
+        if filters:
+            lists = []
+            for field, value in filters.items():
+                postings = self.postings[field].get(value)
+                if not postings:
+                    return []
+                lists.append(postings)
+            lists.sort(key=len)
+            ordinals: Iterable[int] = lists[0]
+            for other in lists[1:]:
+                other_set = set(other)
+                ordinals = [ordinal for ordinal in ordinals if ordinal in other_set]
+        else:
+            ordinals = range(len(self.offsets))
+
+        if start_ts is None and end_ts is None:
+            return list(ordinals)
+
+        timestamps = self.timestamps
+        low = start_ts if start_ts is not None else float('-inf')
+        high = end_ts if end_ts is not None else float('inf')
+        return [ordinal for ordinal in ordinals if low <= timestamps[ordinal] <= high]
+
+    def newest(
+        self,
+        filters: Dict[str, str],
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> Iterator[int]:
+        """
+        Ordinais que satisfazem os filtros, do mais recente ao mais antigo
+
+        Os limites de tempo são localizados por busca binária e os ordinais
+        são produzidos sob demanda: parar após N resultados custa ~N passos
+        (mais a checagem dos filtros), não o tamanho do segmento.
+
+        Args:
+            filters: Campo indexado -> valor normalizado
+            start_ts: Timestamp mínimo (inclusive)
+            end_ts: Timestamp máximo (inclusive)
+
+        Yields:
+            int: Ordinal, em ordem decrescente de (timestamp, offset)
+        """
+        lists = []
+        for field, value in filters.items():
+            postings = self.postings[field].get(value)
+            if not postings:
+                return
+            lists.append(postings)
+        lists.sort(key=len)
+
+        count = len(self.offsets)
+        if self.in_order:
+            order, timestamps = None, self.timestamps
+        else:
+            order, timestamps = self._sorted_by_time(count)
+        low = bisect_left(timestamps, start_ts, 0, count) if start_ts is not None else 0
+        high = bisect_right(timestamps, end_ts, 0, count) if end_ts is not None else count
+
+        if order is None and lists:
+            # Posição == ordinal: percorre a menor lista de postings de trás para frente
+            shortest = lists[0]
+            first = bisect_left(shortest, low)
+            for position in range(bisect_left(shortest, high) - 1, first - 1, -1):
+                ordinal = shortest[position]
+                if all(_contains(other, ordinal) for other in lists[1:]):
+                    yield ordinal
+            return
+
+        for position in range(high - 1, low - 1, -1):
+            ordinal = position if order is None else order[position]
+            if all(_contains(postings, ordinal) for postings in lists):
+                yield ordinal
+
+    def _sorted_by_time(self, count: int) -> Tuple[array, array]:
+        """Ordinais ordenados por (timestamp, offset) e seus timestamps (em cache até o índice crescer)"""
+        cached = self._time_order
+        if cached is None or cached[0] != count:
+            timestamps = self.timestamps
+            order = array('I', sorted(range(count), key=lambda ordinal: (timestamps[ordinal], ordinal)))
+            cached = self._time_order = (count, order, array('d', (timestamps[ordinal] for ordinal in order)))
+        return cached[1], cached[2]
+
+    def to_dict(self) -> Dict:
+        """Serializa o índice para persistência"""
+        return {
+            "version": 1,
+            "covered": self.covered,
+            "offsets": self.offsets.tolist(),
+            "timestamps": self.timestamps.tolist(),
+            "postings": {
+                field: {value: postings.tolist() for value, postings in values.items()}
+                for field, values in self.postings.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SegmentIndex':
+        """Reconstrói o índice a partir da forma persistida"""
+        index = cls()
+        index.covered = data["covered"]
+        index.offsets = array('q', data["offsets"])
+        index.timestamps = array('d', data["timestamps"])
+        index.in_order = all(a <= b for a, b in zip(index.timestamps, index.timestamps[1:]))
+        for field in INDEXED_FIELDS:
+            index.postings[field] = {
+                value: array('I', postings)
+                for value, postings in data["postings"].get(field, {}).items()
+            }
+        return index
+
+def _contains(postings: array, ordinal: int) -> bool:
+    """Busca binária de um ordinal em uma lista de postings (crescente)"""
+    position = bisect_left(postings, ordinal)
+    return position < len(postings) and postings[position] == ordinal
+
+def new_rollup_bucket() -> Dict:
+    """Cria um bucket de contadores de rollup vazio"""
+    return {
+        "total": 0,
+        "successful": 0,
+        "failed": 0,
+        "categories": {},
+        "actions": {},
+        "levels": {},
+        "users": {},
+        "resources": {},
+        "duration_ms": {}
+    }
+
+def _duration_bucket(duration_ms: float) -> str:
+    """Rótulo do bucket do histograma de duração"""
+    for limit in DURATION_BUCKETS_MS:
+        if duration_ms <= limit:
+            return f"<={limit}"
+    return f">{DURATION_BUCKETS_MS[-1]}"
+
+def fold_record(bucket: Dict, record: Dict):
+    """
+    Acumula um evento serializado em um bucket de rollup
+
+    Args:
+        bucket: Bucket criado por new_rollup_bucket
+        record: Evento serializado
+    """
+    outcome = "successful" if record.get("success", True) else "failed"
+    category = record.get("category")
+    action = record.get("action")
+    level = record.get("level")
+    timestamp = record.get("timestamp")
+
+    bucket["total"] += 1
+    bucket[outcome] += 1
+
+    category_stats = bucket["categories"].get(category)
+    if category_stats is None:
+        category_stats = bucket["categories"][category] = {
+            "total": 0, "successful": 0, "failed": 0, "levels": {}, "actions": {}
+        }
+    category_stats["total"] += 1
+    category_stats[outcome] += 1
+    category_stats["levels"][level] = category_stats["levels"].get(level, 0) + 1
+    action_stats = category_stats["actions"].get(action)
+    if action_stats is None:
+        action_stats = category_stats["actions"][action] = {"total": 0, "successful": 0, "failed": 0}
+    action_stats["total"] += 1
+    action_stats[outcome] += 1
+
+    bucket["actions"][action] = bucket["actions"].get(action, 0) + 1
+    bucket["levels"][level] = bucket["levels"].get(level, 0) + 1
+
+    user_id = record.get("user_id")
+    if user_id:
+        user_stats = bucket["users"].get(user_id)
+        if user_stats is None:
+            user_stats = bucket["users"][user_id] = {
+                "total": 0, "activity": {}, "last_activity": None, "ip_addresses": [], "sessions": []
+            }
+        user_stats["total"] += 1
+        activity = user_stats["activity"].setdefault(category, {}).get(action)
+        if activity is None:
+            activity = user_stats["activity"][category][action] = {
+                "count": 0, "successful": 0, "failed": 0, "last_occurrence": None
+            }
+        activity["count"] += 1
+        activity[outcome] += 1
+        if not activity["last_occurrence"] or timestamp > activity["last_occurrence"]:
+            activity["last_occurrence"] = timestamp
+        if not user_stats["last_activity"] or timestamp > user_stats["last_activity"]:
+            user_stats["last_activity"] = timestamp
+        ip_address = record.get("ip_address")
+        if ip_address and ip_address not in user_stats["ip_addresses"]:
+            user_stats["ip_addresses"].append(ip_address)
+        session_id = record.get("session_id")
+        if session_id and session_id not in user_stats["sessions"]:
+            user_stats["sessions"].append(session_id)
+
+    resource = record.get("resource_id") or (record.get("details") or {}).get("resource")
+    if resource:
+        resource = str(resource)
+        bucket["resources"][resource] = bucket["resources"].get(resource, 0) + 1
+
+    duration_ms = record.get("duration_ms")
+    if duration_ms is not None:
+        label = _duration_bucket(duration_ms)
+        bucket["duration_ms"][label] = bucket["duration_ms"].get(label, 0) + 1
+
+def merge_rollup(target: Dict, source: Dict):
+    """
+    Soma um bucket de rollup em outro
+
+    Contadores são somados, listas unidas e timestamps ISO mantêm o maior.
+    """
+    for key, value in source.items():
+        if value is None:
+            continue
+        current = target.get(key)
+        if current is None:
+            target[key] = json.loads(json.dumps(value)) if isinstance(value, (dict, list)) else value
+        elif isinstance(value, dict):
+            merge_rollup(current, value)
+        elif isinstance(value, list):
+            current.extend(item for item in value if item not in current)
+        elif isinstance(value, str):
+            if value > current:
+                target[key] = value
+        else:
+            target[key] = current + value
+
+class DayRollup:
+    """
+    Contadores horários de um dia, derivados dos segmentos
+
+    `segments` registra até que byte cada segmento já foi acumulado, de
+    modo que a rollup pode ser atualizada incrementalmente por qualquer
+    instância e persistida de forma consistente.
+    """
+
+    def __init__(self, day: str):
+        self.day = day
+        self.segments: Dict[str, int] = {}
+        self.legacy_size: Optional[int] = None
+        self.sealed = False
+        self.hours: Dict[str, Dict] = {}
+        self.dirty = False
+
+    def add(self, record: Dict):
+        """Acumula um evento no bucket da sua hora"""
+        hour = record["timestamp"][11:13]
+        bucket = self.hours.get(hour)
+        if bucket is None:
+            bucket = self.hours[hour] = new_rollup_bucket()
+        fold_record(bucket, record)
+        self.dirty = True
+
+    def to_dict(self) -> Dict:
+        """Serializa a rollup para persistência"""
+        return {
+            "version": 1,
+            "day": self.day,
+            "segments": self.segments,
+            "legacy_size": self.legacy_size,
+            "sealed": self.sealed,
+            "hours": self.hours
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DayRollup':
+        """Reconstrói a rollup a partir da forma persistida"""
+        rollup = cls(data["day"])
+        rollup.segments = data.get("segments", {})
+        rollup.legacy_size = data.get("legacy_size")
+        rollup.sealed = data.get("sealed", False)
+        rollup.hours = data.get("hours", {})
+        return rollup
+
+class AuditSegmentStore:
+    def __init__(
+        self,
+        events_path: str,
+        max_segment_bytes: int = 100 * 1024 * 1024,
+        fsync_policy: FsyncPolicy = FsyncPolicy.INTERVAL,
+        fsync_interval_ms: int = 1000,
+        recovery_grace_seconds: int = 60,
+        max_cached_indexes: int = 256,
+        max_cached_rollups: int = 64,
+        archives_path: Optional[str] = None
+    ):
+        """
+        Inicializa o armazenamento segmentado de eventos
+
+        Cada instância escreve apenas em segmentos criados por ela mesma
+        (criação exclusiva), então várias instâncias e processos podem
+        compartilhar o mesmo diretório. Leitores consomem somente linhas
+        completas, ignorando uma eventual escrita em andamento.
+
+        Args:
+            events_path: Diretório dos segmentos
+            max_segment_bytes: Tamanho a partir do qual o segmento é rotacionado
+            fsync_policy: Política de durabilidade das escritas
+            fsync_interval_ms: Intervalo mínimo entre fsyncs (política INTERVAL)
+            recovery_grace_seconds: Idade mínima de um segmento para reparo da cauda
+            max_cached_indexes: Número máximo de índices de segmento em memória
+            max_cached_rollups: Número máximo de rollups diárias em memória
+            archives_path: Diretório do arquivo frio (padrão: <events_path>/../archives)
+        """
+        self.events_path = events_path
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.recovery_grace_seconds = recovery_grace_seconds
+        self.max_cached_indexes = max_cached_indexes
+        self.max_cached_rollups = max_cached_rollups
+        self.archives_path = archives_path or os.path.join(os.path.dirname(os.path.abspath(events_path)), "archives")
+
+        self._lock = threading.Lock()         # serializa escritas e rotação
+        self._sync_lock = threading.Lock()    # group commit de fsync
+        self._index_lock = threading.RLock()  # cache de índices
+        self._indexes: "OrderedDict[str, SegmentIndex]" = OrderedDict()
+        self._rollup_lock = threading.RLock()  # cache de rollups
+        self._rollups: "OrderedDict[str, DayRollup]" = OrderedDict()
+        self._fd: Optional[int] = None
+        self._day: Optional[str] = None
+        self._segment_path: Optional[str] = None
+        self._size = 0
+        self._write_seq = 0
+        self._durable_seq = 0
+        self._last_sync = time.monotonic()
+
+        self._archives: Dict[str, AuditArchive] = {}
+
+        os.makedirs(self.events_path, exist_ok=True)
+        os.makedirs(self.archives_path, exist_ok=True)
+        self.recover()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def append(self, records: List[Dict]) -> int:
+        """
+        Anexa registros ao segmento ativo do dia de cada registro
+
+        O lote é serializado uma vez e gravado com uma única escrita por
+        segmento, de modo que o custo independe do volume já armazenado.
+
+        Args:
+            records: Eventos serializados (dicionários com "timestamp" ISO)
+
+        Returns:
+            int: Número de registros gravados
+        """
+        if not records:
+            return 0
+
+        # Agrupa por dia preservando a ordem de chegada
+        groups: List[Tuple[str, List[Tuple[Dict, bytes]]]] = []
+        for record in records:
+            day = day_key(record["timestamp"])
+            line = json.dumps(record, default=str, ensure_ascii=False, separators=(',', ':')) + "\n"
+            if not groups or groups[-1][0] != day:
+                groups.append((day, []))
+            groups[-1][1].append((record, line.encode('utf-8')))
+
+        with self._lock:
+            for day, lines in groups:
+                self._write_lines(day, lines)
+            self._write_seq += 1
+            seq = self._write_seq
+
+        if self.fsync_policy == FsyncPolicy.ALWAYS:
+            self._sync_to(seq)
+        elif self.fsync_policy == FsyncPolicy.INTERVAL:
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_to(seq)
+
+        return len(records)
+
+    def _write_lines(self, day: str, lines: List[Tuple[Dict, bytes]]):
+        """Grava linhas de um dia, rotacionando o segmento quando necessário"""
+        if self._fd is None or self._day != day:
+            self._open_segment(day)
+
+        buffer: List[Tuple[Dict, bytes]] = []
+        buffer_size = 0
+        for record, line in lines:
+            if self._size + buffer_size + len(line) > self.max_segment_bytes and self._size + buffer_size > 0:
+                self._write_buffer(buffer)
+                buffer, buffer_size = [], 0
+                self._open_segment(day)
+            buffer.append((record, line))
+            buffer_size += len(line)
+        self._write_buffer(buffer)
+
+    def _write_buffer(self, buffer: List[Tuple[Dict, bytes]]):
+        """Escreve o buffer no segmento ativo e atualiza índice e rollups"""
+        if not buffer:
+            return
+        start = self._size
+        view = memoryview(b"".join(line for _, line in buffer))
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+            self._size += written
+
+        with self._index_lock:
+            index = self._indexes.get(self._segment_path)
+            # Só indexa diretamente se o índice estiver contíguo a esta escrita
+            if index is not None and index.covered == start:
+                offset = start
+                for record, line in buffer:
+                    index.add(offset, record)
+                    offset += len(line)
+                index.covered = offset
+
+        with self._rollup_lock:
+            rollup = self._rollups.get(self._day)
+            name = os.path.basename(self._segment_path)
+            if rollup is not None and not rollup.sealed and rollup.segments.get(name, 0) == start:
+                for record, _ in buffer:
+                    rollup.add(record)
+                rollup.segments[name] = self._size
+
+    def _open_segment(self, day: str):
+        """Sela o segmento ativo e cria o próximo segmento do dia"""
+        self._seal_active()
+
+        sequence = self._last_sequence(day) + 1
+        while True:
+            path = os.path.join(self.events_path, segment_name(day, sequence))
+            try:
+                self._fd = os.open(path, _SEGMENT_OPEN_FLAGS, 0o644)
+                break
+            except FileExistsError:
+                # Outro escritor criou este segmento primeiro
+                sequence += 1
+
+        self._day = day
+        self._segment_path = path
+        self._size = 0
+        with self._index_lock:
+            self._cache_index(path, SegmentIndex())
+        # Mantém a rollup do dia em memória para acumular as escritas
+        self._get_rollup(day)
+
+    def _seal_active(self):
+        """Garante durabilidade, fecha o segmento ativo e persiste seu índice"""
+        if self._fd is None:
+            return
+        path = self._segment_path
+        try:
+            if self.fsync_policy != FsyncPolicy.NEVER:
+                os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._day = None
+            self._segment_path = None
+            self._size = 0
+
+        with self._index_lock:
+            index = self._indexes.get(path)
+            if index is not None:
+                self._save_index(path, index)
+
+    def _sync_to(self, seq: int):
+        """
+        Faz fsync cobrindo a escrita `seq` (group commit)
+
+        Threads que aguardam o lock podem ter suas escritas cobertas pelo
+        fsync de outra thread e retornam sem novo fsync.
+        """
+        with self._sync_lock:
+            if self._durable_seq >= seq:
+                return
+            with self._lock:
+                target = self._write_seq
+                fd = os.dup(self._fd) if self._fd is not None else None
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._durable_seq = target
+            self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Força a durabilidade de todas as escritas já realizadas"""
+        if self.fsync_policy != FsyncPolicy.NEVER:
+            self._sync_to(self._write_seq)
+
+    def close(self):
+        """Sela o segmento ativo e persiste rollups; escritas posteriores abrem um novo segmento"""
+        with self._lock:
+            self._seal_active()
+        self.save_rollups()
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def list_days(self) -> List[str]:
+        """Lista os dias (YYYYMMDD) com eventos armazenados, inclusive arquivados"""
+        days = set()
+        for filename in os.listdir(self.events_path):
+            match = SEGMENT_PATTERN.match(filename) or LEGACY_PATTERN.match(filename)
+            if match:
+                days.add(match.group(1))
+        for filename in os.listdir(self.archives_path):
+            if filename.endswith(".arc.idx"):
+                days.add(filename[:8])
+        return sorted(days)
+
+    def is_archived(self, day: str) -> bool:
+        """Indica se o dia está no arquivo frio"""
+        return os.path.exists(archive_paths(self.archives_path, day)[1])
+
+    def get_archive(self, day: str) -> Optional[AuditArchive]:
+        """Obtém o leitor do arquivo frio de um dia, se arquivado"""
+        archive = self._archives.get(day)
+        if archive is None:
+            if not self.is_archived(day):
+                return None
+            archive = self._archives[day] = AuditArchive(self.archives_path, day)
+        return archive
+
+    def list_segments(self, day: str) -> List[str]:
+        """Lista os caminhos dos segmentos de um dia em ordem de criação"""
+        segments = []
+        prefix = f"{day}-"
+        for filename in os.listdir(self.events_path):
+            if filename.startswith(prefix):
+                match = SEGMENT_PATTERN.match(filename)
+                if match:
+                    segments.append((int(match.group(2)), filename))
+        return [os.path.join(self.events_path, filename) for _, filename in sorted(segments)]
+
+    def _last_sequence(self, day: str) -> int:
+        """Maior sequência de segmento existente para o dia"""
+        segments = self.list_segments(day)
+        if not segments:
+            return 0
+        return int(SEGMENT_PATTERN.match(os.path.basename(segments[-1])).group(2))
+
+    def iter_day(self, day: str) -> Iterator[Dict]:
+        """
+        Itera os eventos de um dia na ordem de gravação
+
+        Inclui o arquivo diário legado (YYYYMMDD.json), se existir. Dias
+        arquivados são lidos do arquivo frio, em ordem de timestamp.
+
+        Args:
+            day: Dia no formato YYYYMMDD
+
+        Yields:
+            Dict: Evento serializado
+        """
+        archive = self.get_archive(day)
+        if archive is not None:
+            yield from archive.iter_records()
+            return
+
+        legacy_path = os.path.join(self.events_path, f"{day}.json")
+        if os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    for record in json.load(f):
+                        yield record
+            except Exception as e:
+                logging.error(f"Erro ao ler arquivo legado {legacy_path}: {str(e)}")
+
+        for path in self.list_segments(day):
+            for _, record in self.iter_segment(path):
+                yield record
+
+    def iter_segment(self, path: str, start: int = 0) -> Iterator[Tuple[int, Dict]]:
+        """
+        Itera as linhas completas de um segmento
+
+        Uma linha final sem quebra de linha (escrita em andamento ou
+        interrompida) é ignorada.
+
+        Args:
+            path: Caminho do segmento
+            start: Offset inicial em bytes
+
+        Yields:
+            Tuple[int, Dict]: (offset da linha, evento)
+        """
+        try:
+            for offset, _, record in self._scan_lines(path, start):
+                if record is None:
+                    logging.error(f"Linha inválida em {path} (offset {offset})")
+                    continue
+                yield offset, record
+        except FileNotFoundError:
+            return
+
+    def iter_newest(
+        self,
+        days: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> Iterator[Dict]:
+        """
+        Itera eventos do mais recente ao mais antigo usando os índices
+
+        Apenas os registros que satisfazem os filtros indexados são lidos do
+        disco, e somente à medida que o consumidor avança: cada segmento é
+        percorrido de trás para frente sob demanda (`SegmentIndex.newest`) e
+        os segmentos são combinados por um merge em heap, então obter os N
+        mais recentes não exige materializar nem ordenar o período inteiro.
+        Dias arquivados são lidos bloco a bloco, do mais recente ao mais
+        antigo, descartando blocos pelo intervalo de tempo e pelos
+        dicionários de colunas.
+
+        Args:
+            days: Dias (YYYYMMDD) a consultar
+            filters: Campo indexado -> valor (ver INDEXED_FIELDS)
+            start_ts: Timestamp mínimo em segundos desde a época (inclusive)
+            end_ts: Timestamp máximo em segundos desde a época (inclusive)
+
+        Yields:
+            Dict: Evento serializado
+        """
+        normalized = {}
+        for field, value in (filters or {}).items():
+            normalized[field] = index_value(field, value)
+
+        # Itens dos streams: (timestamp, fonte, posição, evento já lido ou None)
+        sources: List[Any] = []
+        streams: List[Iterable[Tuple[float, int, Any, Optional[Dict]]]] = []
+        for day in days:
+            archive = self.get_archive(day)
+            if archive is not None:
+                sources.append(archive)
+                streams.append(self._archive_stream(archive, len(sources) - 1, normalized, start_ts, end_ts))
+                continue
+
+            legacy = self._legacy_candidates(day, normalized, start_ts, end_ts)
+            if legacy:
+                sources.append(legacy)
+                source_id = len(sources) - 1
+                streams.append([(ts, source_id, position, record) for position, (ts, record) in reversed(list(enumerate(legacy)))])
+
+            for path in self.list_segments(day):
+                sources.append(path)
+                streams.append(self._segment_stream(self.get_index(path), len(sources) - 1, normalized, start_ts, end_ts))
+
+        handles: Dict[int, Any] = {}
+        try:
+            for _, source_id, position, record in heapq.merge(*streams, key=lambda item: item[:3], reverse=True):
+                if record is not None:
+                    yield record
+                    continue
+                source = sources[source_id]
+                handle = handles.get(source_id)
+                if handle is None:
+                    handle = handles[source_id] = open(source, 'rb')
+                handle.seek(position)
+                try:
+                    yield json.loads(handle.readline())
+                except ValueError:
+                    logging.error(f"Linha inválida em {source} (offset {position})")
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def _segment_stream(
+        self,
+        index: SegmentIndex,
+        source_id: int,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float]
+    ) -> Iterator[Tuple[float, int, Any, Optional[Dict]]]:
+        """Candidatos de um segmento, do mais recente ao mais antigo (produzidos sob demanda)"""
+        timestamps, offsets = index.timestamps, index.offsets
+        for ordinal in index.newest(filters, start_ts, end_ts):
+            yield timestamps[ordinal], source_id, offsets[ordinal], None
+
+    def _archive_stream(
+        self,
+        archive: AuditArchive,
+        source_id: int,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float]
+    ) -> Iterator[Tuple[float, int, Any, Optional[Dict]]]:
+        """Candidatos de um dia arquivado, do mais recente ao mais antigo (blocos lidos sob demanda)"""
+        residual = {field: value for field, value in filters.items() if field in ("user_id", "success")}
+        for number in reversed(archive.select_blocks(filters, start_ts, end_ts)):
+            matches = list(archive.iter_block_matches(number, filters, start_ts, end_ts))
+            for ts, position, row in reversed(matches):
+                record = json.loads(row)
+                if any(index_value(field, record.get(field)) != value for field, value in residual.items()):
+                    continue
+                yield ts, source_id, (number, position), record
+
+    def _legacy_candidates(
+        self,
+        day: str,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float]
+    ) -> List[Tuple[float, Dict]]:
+        """Filtra o arquivo diário legado (sem índice) em memória"""
+        candidates = [(ts, record) for _, ts, record in self._legacy_matches(day, filters, start_ts, end_ts)]
+        candidates.sort(key=lambda item: item[0])
+        return candidates
+
+    def _legacy_matches(
+        self,
+        day: str,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float]
+    ) -> List[Tuple[int, float, Dict]]:
+        """(posição no arquivo, timestamp, evento) dos eventos legados que passam no filtro"""
+        legacy_path = os.path.join(self.events_path, f"{day}.json")
+        if not os.path.exists(legacy_path):
+            return []
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao ler arquivo legado {legacy_path}: {str(e)}")
+            return []
+
+        matches = []
+        for position, record in enumerate(records):
+            if any(index_value(field, record.get(field)) != value for field, value in filters.items()):
+                continue
+            try:
+                ts = to_epoch(datetime.fromisoformat(record["timestamp"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if (start_ts is not None and ts < start_ts) or (end_ts is not None and ts > end_ts):
+                continue
+            matches.append((position, ts, record))
+        return matches
+
+    # ------------------------------------------------------------------
+    # Exportação
+    # ------------------------------------------------------------------
+
+    def iter_export(
+        self,
+        days: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None,
+        after: Optional[Dict] = None
+    ) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        Itera eventos na ordem de armazenamento, com cursor retomável
+
+        Diferente de `iter_newest`, não há merge entre fontes: cada dia é
+        percorrido em sequência (arquivo legado, depois os segmentos por
+        offset; ou os blocos do arquivo frio), lendo um registro por vez.
+        A memória usada independe do tamanho do período exportado.
+
+        O cursor de cada evento identifica sua posição física: dia e chave
+        `p` = [fonte, a, b], onde fonte 0 é o arquivo legado (a = posição),
+        1 um segmento (a = sequência, b = offset) e 2 o arquivo frio
+        (a = bloco, b = posição no bloco). A chave cresce na ordem de
+        exportação, então retomar é descartar tudo até ela.
+
+        Args:
+            days: Dias (YYYYMMDD) a exportar, em ordem crescente
+            filters: Campo indexado -> valor (ver INDEXED_FIELDS)
+            start_ts: Timestamp mínimo em segundos desde a época (inclusive)
+            end_ts: Timestamp máximo em segundos desde a época (inclusive)
+            after: Cursor do último evento já recebido
+
+        Yields:
+            Tuple[Dict, Dict]: (cursor do evento, evento serializado)
+        """
+        normalized = {}
+        for field, value in (filters or {}).items():
+            normalized[field] = index_value(field, value)
+
+        for day in days:
+            resume = None
+            if after is not None:
+                if day < after["d"]:
+                    continue
+                if day == after["d"]:
+                    resume = after
+
+            archive = self.get_archive(day)
+            if archive is not None:
+                yield from self._export_archive(archive, normalized, start_ts, end_ts, resume)
+                continue
+
+            resume_key = tuple(resume["p"]) if resume is not None else None
+            for position, ts, record in self._legacy_matches(day, normalized, start_ts, end_ts):
+                if resume_key is not None and (0, position, 0) <= resume_key:
+                    continue
+                yield {"d": day, "p": [0, position, 0], "t": ts}, record
+
+            for path in self.list_segments(day):
+                yield from self._export_segment(day, path, normalized, start_ts, end_ts, resume_key)
+
+    def _export_segment(
+        self,
+        day: str,
+        path: str,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float],
+        resume_key: Optional[Tuple]
+    ) -> Iterator[Tuple[Dict, Dict]]:
+        """Candidatos de um segmento em ordem de offset"""
+        sequence = int(SEGMENT_PATTERN.match(os.path.basename(path)).group(2))
+        resume_offset = -1
+        if resume_key is not None:
+            if (1, sequence) < resume_key[:2]:
+                return
+            if (1, sequence) == resume_key[:2]:
+                resume_offset = resume_key[2]
+
+        index = self.get_index(path)
+        ordinals = index.candidates(filters, start_ts, end_ts)
+        if not ordinals:
+            return
+        timestamps, offsets = index.timestamps, index.offsets
+        try:
+            with open(path, 'rb') as handle:
+                for ordinal in ordinals:
+                    offset = offsets[ordinal]
+                    if offset <= resume_offset:
+                        continue
+                    # Candidatos consecutivos são lidos sem reposicionar o buffer
+                    if handle.tell() != offset:
+                        handle.seek(offset)
+                    line = handle.readline()
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.error(f"Linha inválida em {path} (offset {offset})")
+                        continue
+                    yield {"d": day, "p": [1, sequence, offset], "t": timestamps[ordinal]}, record
+        except FileNotFoundError:
+            return
+
+    def _export_archive(
+        self,
+        archive: AuditArchive,
+        filters: Dict[str, str],
+        start_ts: Optional[float],
+        end_ts: Optional[float],
+        resume: Optional[Dict]
+    ) -> Iterator[Tuple[Dict, Dict]]:
+        """Candidatos de um dia arquivado, bloco a bloco"""
+        resume_key = None
+        resume_ts = None
+        if resume is not None:
+            if resume["p"][0] == 2:
+                resume_key = tuple(resume["p"])
+            else:
+                # Cursor emitido antes do arquivamento: a ordem física mudou
+                # (o arquivo é ordenado por timestamp), retoma pelo timestamp
+                resume_ts = resume["t"]
+
+        residual = {field: value for field, value in filters.items() if field in ("user_id", "success")}
+        for number in archive.select_blocks(filters, start_ts, end_ts):
+            if resume_key is not None and number < resume_key[1]:
+                continue
+            if resume_ts is not None and archive.blocks[number]["max_ts"] <= resume_ts:
+                continue
+            for ts, position, row in archive.iter_block_matches(number, filters, start_ts, end_ts):
+                if resume_key is not None and (2, number, position) <= resume_key:
+                    continue
+                if resume_ts is not None and ts <= resume_ts:
+                    continue
+                record = json.loads(row)
+                if any(index_value(field, record.get(field)) != value for field, value in residual.items()):
+                    continue
+                yield {"d": archive.day, "p": [2, number, position], "t": ts}, record
+
+    # ------------------------------------------------------------------
+    # Índices
+    # ------------------------------------------------------------------
+
+    def get_index(self, path: str) -> SegmentIndex:
+        """
+        Obtém o índice atualizado de um segmento
+
+        Carrega o índice persistido (ou o mantido em memória) e indexa apenas
+        os bytes gravados além do trecho já coberto.
+
+        Args:
+            path: Caminho do segmento
+
+        Returns:
+            SegmentIndex: Índice do segmento
+        """
+        with self._index_lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = self._load_index(path)
+                self._cache_index(path, index)
+            else:
+                self._indexes.move_to_end(path)
+
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                return index
+            if size <= index.covered:
+                return index
+
+            covered = index.covered
+            for offset, length, record in self._scan_lines(path, covered):
+                if record is not None:
+                    index.add(offset, record)
+                covered = offset + length
+            index.covered = covered
+
+            # Segmentos inativos (selados ou de escritores encerrados) têm o índice persistido
+            if path != self._segment_path and time.time() - os.path.getmtime(path) >= self.recovery_grace_seconds:
+                self._save_index(path, index)
+            return index
+
+    def _scan_lines(self, path: str, start: int) -> Iterator[Tuple[int, int, Optional[Dict]]]:
+        """Itera (offset, tamanho, registro) das linhas completas a partir de `start`"""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield offset, len(line), record
+                offset += len(line)
+
+    def _cache_index(self, path: str, index: SegmentIndex):
+        """Insere índice no cache LRU"""
+        self._indexes[path] = index
+        self._indexes.move_to_end(path)
+        while len(self._indexes) > self.max_cached_indexes:
+            self._indexes.popitem(last=False)
+
+    def _load_index(self, path: str) -> SegmentIndex:
+        """Carrega índice persistido, ou um índice vazio se ausente/corrompido"""
+        try:
+            with open(index_path(path), 'r', encoding='utf-8') as f:
+                return SegmentIndex.from_dict(json.load(f))
+        except FileNotFoundError:
+            return SegmentIndex()
+        except Exception as e:
+            logging.error(f"Índice inválido para {path}, reconstruindo: {str(e)}")
+            return SegmentIndex()
+
+    def _save_index(self, path: str, index: SegmentIndex):
+        """Persiste índice de forma atômica"""
+        target = index_path(path)
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index.to_dict(), f, separators=(',', ':'))
+            os.replace(temp_path, target)
+        except Exception as e:
+            logging.error(f"Erro ao salvar índice de {path}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Rollups
+    # ------------------------------------------------------------------
+
+    def rollup_buckets(self, day: str, first_hour: int = 0, last_hour: int = 23) -> Dict:
+        """
+        Soma os buckets horários de um dia em um intervalo de horas
+
+        Args:
+            day: Dia no formato YYYYMMDD
+            first_hour: Primeira hora incluída
+            last_hour: Última hora incluída
+
+        Returns:
+            Dict: Bucket de rollup agregado (cópia independente)
+        """
+        result = new_rollup_bucket()
+        with self._rollup_lock:
+            rollup = self._get_rollup(day)
+            for hour, bucket in rollup.hours.items():
+                if first_hour <= int(hour) <= last_hour:
+                    merge_rollup(result, bucket)
+        return result
+
+    def _get_rollup(self, day: str) -> DayRollup:
+        """Obtém a rollup do dia, acumulando apenas os bytes ainda não cobertos"""
+        with self._rollup_lock:
+            rollup = self._rollups.get(day)
+            if rollup is None:
+                rollup = self._load_rollup(day)
+                self._rollups[day] = rollup
+                while len(self._rollups) > self.max_cached_rollups:
+                    _, evicted = self._rollups.popitem(last=False)
+                    if evicted.dirty:
+                        self._save_rollup(evicted)
+            self._rollups.move_to_end(day)
+            if rollup.sealed:
+                return rollup
+
+            # Rollup ausente de um dia já arquivado: reconstrói a partir do arquivo frio
+            if not rollup.segments and rollup.legacy_size is None and self.is_archived(day):
+                for record in self.get_archive(day).iter_records():
+                    rollup.add(record)
+                rollup.sealed = True
+                rollup.dirty = True
+                return rollup
+
+            legacy_path = os.path.join(self.events_path, f"{day}.json")
+            if rollup.legacy_size is None and os.path.exists(legacy_path):
+                try:
+                    with open(legacy_path, 'r', encoding='utf-8') as f:
+                        for record in json.load(f):
+                            rollup.add(record)
+                    rollup.legacy_size = os.path.getsize(legacy_path)
+                except Exception as e:
+                    logging.error(f"Erro ao acumular arquivo legado {legacy_path}: {str(e)}")
+
+            for path in self.list_segments(day):
+                name = os.path.basename(path)
+                covered = rollup.segments.get(name, 0)
+                try:
+                    if os.path.getsize(path) <= covered:
+                        continue
+                    for offset, length, record in self._scan_lines(path, covered):
+                        if record is not None:
+                            rollup.add(record)
+                        covered = offset + length
+                except FileNotFoundError:
+                    continue
+                rollup.segments[name] = covered
+                rollup.dirty = True
+            return rollup
+
+    def _load_rollup(self, day: str) -> DayRollup:
+        """Carrega rollup persistida, ou uma rollup vazia se ausente/corrompida"""
+        try:
+            with open(os.path.join(self.events_path, rollup_name(day)), 'r', encoding='utf-8') as f:
+                return DayRollup.from_dict(json.load(f))
+        except FileNotFoundError:
+            return DayRollup(day)
+        except Exception as e:
+            logging.error(f"Rollup inválida para {day}, reconstruindo: {str(e)}")
+            return DayRollup(day)
+
+    def _save_rollup(self, rollup: DayRollup):
+        """Persiste rollup de forma atômica"""
+        target = os.path.join(self.events_path, rollup_name(rollup.day))
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(rollup.to_dict(), f, separators=(',', ':'), ensure_ascii=False)
+            os.replace(temp_path, target)
+            rollup.dirty = False
+        except Exception as e:
+            logging.error(f"Erro ao salvar rollup de {rollup.day}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def save_rollups(self) -> int:
+        """
+        Persiste as rollups alteradas desde o último salvamento
+
+        Returns:
+            int: Número de rollups salvas
+        """
+        saved = 0
+        with self._rollup_lock:
+            for rollup in list(self._rollups.values()):
+                if rollup.dirty:
+                    self._save_rollup(rollup)
+                    saved += 1
+        return saved
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+
+    def recover(self) -> int:
+        """
+        Repara segmentos com cauda incompleta (escrita interrompida por crash)
+
+        Somente segmentos sem escrita recente são truncados na última linha
+        completa, para não interferir em escritores ativos de outros processos.
+
+        Returns:
+            int: Número de segmentos reparados
+        """
+        repaired = 0
+        now = time.time()
+        for filename in os.listdir(self.events_path):
+            if not SEGMENT_PATTERN.match(filename):
+                continue
+            path = os.path.join(self.events_path, filename)
+            try:
+                if path == self._segment_path or now - os.path.getmtime(path) < self.recovery_grace_seconds:
+                    continue
+                if self._truncate_torn_tail(path):
+                    repaired += 1
+            except OSError as e:
+                logging.error(f"Erro ao recuperar segmento {filename}: {str(e)}")
+
+        if repaired:
+            logging.warning(f"Segmentos de auditoria reparados: {repaired}")
+        return repaired
+
+    def _truncate_torn_tail(self, path: str) -> bool:
+        """Trunca o segmento após a última quebra de linha, se necessário"""
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return False
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return False
+
+            # Procura a última quebra de linha em blocos, do fim para o início
+            position = size
+            valid_size = 0
+            while position > 0:
+                chunk_start = max(0, position - 65536)
+                f.seek(chunk_start)
+                chunk = f.read(position - chunk_start)
+                index = chunk.rfind(b"\n")
+                if index >= 0:
+                    valid_size = chunk_start + index + 1
+                    break
+                position = chunk_start
+
+            f.truncate(valid_size)
+            logging.warning(f"Cauda incompleta removida de {path}: {size - valid_size} bytes")
+            return True
+
+    def archive_day(self, day: str, block_records: int = 4096, compress: bool = True) -> Dict:
+        """
+        Move um dia para o arquivo frio compactado
+
+        Os segmentos (e o arquivo legado) do dia são convertidos em um
+        arquivo por blocos e removidos. A rollup do dia é finalizada antes,
+        continuando disponível para os relatórios.
+
+        Args:
+            day: Dia no formato YYYYMMDD (não deve mais receber escritas)
+            block_records: Número de eventos por bloco
+            compress: Se os blocos são compactados
+
+        Returns:
+            Dict: Eventos arquivados e bytes antes/depois
+        """
+        with self._lock:
+            if self._day == day:
+                self._seal_active()
+
+        segments = self.list_segments(day)
+        legacy_path = os.path.join(self.events_path, f"{day}.json")
+        data_paths = segments + ([legacy_path] if os.path.exists(legacy_path) else [])
+        bytes_before = sum(os.path.getsize(path) for path in data_paths)
+
+        result = {"day": day, "events": 0, "bytes_before": bytes_before, "bytes_after": 0}
+        if not self.is_archived(day):
+            if not data_paths:
+                return result
+            # Garante a rollup completa enquanto os segmentos ainda existem
+            self._get_rollup(day)
+            index = write_archive(self.archives_path, day, self.iter_day(day), block_records, compress)
+            result["events"] = index["records"]
+
+        # Rollup finalizada: não depende mais dos segmentos
+        with self._rollup_lock:
+            rollup = self._get_rollup(day)
+            rollup.sealed = True
+            rollup.segments = {}
+            rollup.legacy_size = None
+            self._save_rollup(rollup)
+
+        with self._index_lock:
+            for path in segments:
+                self._indexes.pop(path, None)
+        self._archives.pop(day, None)
+        for path in data_paths + [index_path(path) for path in segments]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        result["bytes_after"] = os.path.getsize(archive_paths(self.archives_path, day)[0])
+        return result
+
+    def remove_day(self, day: str) -> int:
+        """
+        Remove todos os arquivos de eventos de um dia
+
+        Args:
+            day: Dia no formato YYYYMMDD
+
+        Returns:
+            int: Número de arquivos removidos
+        """
+        removed = 0
+        with self._lock:
+            if self._day == day:
+                self._seal_active()
+
+            segments = self.list_segments(day)
+            with self._index_lock:
+                for path in segments:
+                    self._indexes.pop(path, None)
+            with self._rollup_lock:
+                self._rollups.pop(day, None)
+
+            data_paths = list(segments)
+            legacy_path = os.path.join(self.events_path, f"{day}.json")
+            if os.path.exists(legacy_path):
+                data_paths.append(legacy_path)
+            for path in data_paths:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+
+            # Dia arquivado conta como um arquivo de eventos
+            archive_data, archive_index = archive_paths(self.archives_path, day)
+            self._archives.pop(day, None)
+            if os.path.exists(archive_data):
+                os.remove(archive_data)
+                removed += 1
+
+            # Artefatos derivados (índices e rollup) não contam como eventos removidos
+            for path in [index_path(path) for path in segments] + [archive_index, os.path.join(self.events_path, rollup_name(day))]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return removed
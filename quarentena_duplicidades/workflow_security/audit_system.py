@@ -8,7 +8,8 @@ import logging
 import os
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, Iterator, List, Optional, Any, Tuple
+from collections import deque
 from dataclasses import dataclass, asdict
 from enum import Enum
 import threading
@@ -16,6 +17,11 @@ import hashlib
 import uuid
 
 from .log_sanitization import log_sanitizer
+from .log_pipeline import configure_logging
+from .audit_storage import (
+    AuditSegmentStore, FsyncPolicy, decode_cursor, encode_cursor, fold_record, merge_rollup,
+    new_rollup_bucket, to_epoch
+)
 
 class AuditLevel(Enum):
     DEBUG = "debug"
@@ -123,6 +129,172 @@ class AuditQuery:
     limit: int = 1000
     offset: int = 0
 
+class OverflowPolicy(Enum):
+    BLOCK = "block"                          # aguarda espaço (até o timeout)
+    DROP_LOWEST_LEVEL = "drop_lowest_level"  # descarta o evento de menor nível
+    SPILL_TO_DISK = "spill_to_disk"          # grava excedente em arquivo de transbordo
+
+# Ordem de importância dos níveis (para descarte sob pressão)
+_LEVEL_RANK = {
+    AuditLevel.DEBUG: 0,
+    AuditLevel.INFO: 1,
+    AuditLevel.WARNING: 2,
+    AuditLevel.ERROR: 3,
+    AuditLevel.CRITICAL: 4
+}
+
+class AuditEventQueue:
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        block_timeout_ms: int = 100
+    ):
+        """
+        Fila limitada de eventos de auditoria, com uma fila FIFO por nível
+        
+        Produtores nunca crescem a fila além da capacidade; o consumidor é
+        acordado por variável de condição quando um lote completo está
+        disponível ou quando o evento mais antigo atinge a latência máxima.
+        Eventos saem na ordem de chegada (pelo número de sequência, entre as
+        cabeças das filas de cada nível), e o descarte por nível retira a
+        cabeça da fila de menor nível, sem percorrer a fila inteira.
+        
+        Args:
+            capacity: Número máximo de eventos em memória
+            batch_size: Tamanho do lote que acorda o consumidor
+            overflow_policy: Comportamento quando a fila está cheia
+            block_timeout_ms: Espera máxima do produtor na política BLOCK
+        """
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000.0
+        
+        # (sequência, evento, instante de entrada) por nível, em _LEVEL_RANK
+        self._levels: List[Deque[Tuple[int, AuditEvent, float]]] = [deque() for _ in _LEVEL_RANK]
+        self._sequence = 0
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        
+        self.enqueued = 0
+        self.dropped = 0
+        self.blocked_puts = 0
+        self.high_watermark = 0
+        
+    def __len__(self) -> int:
+        return self._size
+        
+    def put(self, event: AuditEvent) -> bool:
+        """
+        Enfileira um evento
+        
+        Args:
+            event: Evento de auditoria
+            
+        Returns:
+            bool: False se o evento não coube na fila (fila fechada, política
+            SPILL_TO_DISK, timeout do BLOCK ou evento de menor nível descartado)
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            if self._size >= self.capacity:
+                if self.overflow_policy == OverflowPolicy.BLOCK:
+                    self.blocked_puts += 1
+                    deadline = time.monotonic() + self.block_timeout
+                    while self._size >= self.capacity and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+                    if self._size >= self.capacity:
+                        self.dropped += 1
+                        return False
+                elif self.overflow_policy == OverflowPolicy.DROP_LOWEST_LEVEL:
+                    if not self._evict_lower_than(event.level):
+                        self.dropped += 1
+                        return False
+                else:
+                    return False
+                    
+            self._levels[_LEVEL_RANK[event.level]].append((self._sequence, event, time.monotonic()))
+            self._sequence += 1
+            self._size += 1
+            self.enqueued += 1
+            self.high_watermark = max(self.high_watermark, self._size)
+            
+            # Acorda o consumidor no primeiro evento (para contar a latência) ou com lote completo
+            if self._size == 1 or self._size >= self.batch_size:
+                self._not_empty.notify()
+            return True
+            
+    def _evict_lower_than(self, level: AuditLevel) -> bool:
+        """Remove o evento mais antigo de menor nível, se for menos importante que `level`"""
+        for rank in range(_LEVEL_RANK[level]):
+            if self._levels[rank]:
+                self._levels[rank].popleft()
+                self._size -= 1
+                self.dropped += 1
+                return True
+        return False
+        
+    def get_batch(self, max_latency: float, timeout: float) -> List[AuditEvent]:
+        """
+        Aguarda e retira um lote de eventos
+        
+        Retorna quando há `batch_size` eventos, quando o evento mais antigo
+        espera há `max_latency` segundos, quando a fila é fechada ou ao fim
+        do `timeout`.
+        
+        Args:
+            max_latency: Latência máxima de um evento na fila (segundos)
+            timeout: Espera máxima desta chamada (segundos)
+            
+        Returns:
+            List[AuditEvent]: Lote (possivelmente vazio)
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._size < self.batch_size and not self._closed:
+                now = time.monotonic()
+                wait = deadline - now
+                if self._size:
+                    oldest = min(entries[0][2] for entries in self._levels if entries)
+                    wait = min(wait, oldest + max_latency - now)
+                if wait <= 0:
+                    break
+                self._not_empty.wait(wait)
+                
+            return self._take(self.batch_size)
+            
+    def drain(self) -> List[AuditEvent]:
+        """Retira todos os eventos restantes"""
+        with self._lock:
+            return self._take(self._size)
+            
+    def _take(self, count: int) -> List[AuditEvent]:
+        """Retira até `count` eventos do início da fila (lock já adquirido)"""
+        batch = []
+        for _ in range(min(count, self._size)):
+            entries = min((entries for entries in self._levels if entries), key=lambda entries: entries[0][0])
+            batch.append(entries.popleft()[1])
+            self._size -= 1
+        if batch:
+            self._not_full.notify_all()
+        return batch
+        
+    def close(self):
+        """Fecha a fila, acordando consumidor e produtores bloqueados"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
 class AuditSystem:
     def __init__(self, storage_path: str = "data/audit"):
         """
@@ -135,6 +307,7 @@ class AuditSystem:
         self._setup_storage()
         self._setup_logging()
         self._load_configuration()
+        self._setup_event_store()
         self._start_audit_processor()
         
         # Configura logger com sanitização automática
@@ -150,7 +323,7 @@ class AuditSystem:
     def _setup_logging(self):
         """Configura logging para auditoria"""
         log_path = os.path.join(self.storage_path, "audit_system.log")
-        logging.basicConfig(
+        configure_logging(
             filename=log_path,
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
@@ -165,7 +338,16 @@ class AuditSystem:
             "real_time_processing": True,
             "batch_size": 100,
             "archive_after_days": 30,
-            "sanitization_enabled": True  # Habilita sanitização por padrão
+            "sanitization_enabled": True,  # Habilita sanitização por padrão
+            "fsync_policy": "interval",  # always, interval ou never
+            "fsync_interval_ms": 1000,
+            "rollup_flush_seconds": 30,  # Intervalo de persistência das rollups
+            "queue_capacity": 10000,
+            "max_batch_latency_ms": 1000,  # Latência máxima de um evento na fila
+            "overflow_policy": "block",  # block, drop_lowest_level ou spill_to_disk
+            "queue_block_timeout_ms": 100,
+            "archive_block_records": 4096,  # Eventos por bloco do arquivo frio
+            "archive_interval_seconds": 3600  # Intervalo entre compactações automáticas
         }
         
         # Carrega configuração de arquivo se existir
@@ -177,37 +359,88 @@ class AuditSystem:
             except Exception as e:
                 logging.error(f"Erro ao carregar configuração: {str(e)}")
                 
+    def _setup_event_store(self):
+        """Configura o armazenamento segmentado de eventos"""
+        try:
+            fsync_policy = FsyncPolicy(self.config["fsync_policy"])
+        except ValueError:
+            logging.error(f"Política de fsync inválida: {self.config['fsync_policy']}")
+            fsync_policy = FsyncPolicy.INTERVAL
+            
+        self.event_store = AuditSegmentStore(
+            os.path.join(self.storage_path, "events"),
+            max_segment_bytes=int(self.config["max_file_size_mb"] * 1024 * 1024),
+            fsync_policy=fsync_policy,
+            fsync_interval_ms=self.config["fsync_interval_ms"],
+            archives_path=os.path.join(self.storage_path, "archives")
+        )
+        
     def _start_audit_processor(self):
         """Inicia processador de auditoria"""
+        try:
+            overflow_policy = OverflowPolicy(self.config["overflow_policy"])
+        except ValueError:
+            logging.error(f"Política de transbordo inválida: {self.config['overflow_policy']}")
+            overflow_policy = OverflowPolicy.BLOCK
+            
+        self.event_queue = AuditEventQueue(
+            capacity=self.config["queue_capacity"],
+            batch_size=self.config["batch_size"],
+            overflow_policy=overflow_policy,
+            block_timeout_ms=self.config["queue_block_timeout_ms"]
+        )
+        self.spill_path = os.path.join(self.storage_path, "spill", f"spill-{os.getpid()}.jsonl")
+        self._spill_lock = threading.Lock()
+        self.spilled_events = 0
+        self.flush_stats = {
+            "batches": 0,
+            "events": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0
+        }
+        
         self.processor_active = True
-        self.event_queue = []
         self.processor_thread = threading.Thread(target=self._processor_loop)
         self.processor_thread.daemon = True
         self.processor_thread.start()
         
     def _processor_loop(self):
         """Loop do processador de auditoria"""
+        last_rollup_save = time.monotonic()
+        last_archive = time.monotonic()
+        max_latency = self.config["max_batch_latency_ms"] / 1000.0
         while self.processor_active:
             try:
-                # Processa eventos em lote
-                if len(self.event_queue) >= self.config["batch_size"]:
-                    self._process_batch()
+                # Aguarda lote completo ou latência máxima do evento mais antigo
+                batch = self.event_queue.get_batch(max_latency, timeout=1.0)
+                if batch:
+                    self._process_batch(batch)
+                elif os.path.exists(self.spill_path) or os.path.exists(f"{self.spill_path}.draining"):
+                    # Fila ociosa: reincorpora eventos transbordados
+                    self._drain_spill()
+                    
+                # Persiste rollups acumuladas nas escritas
+                if time.monotonic() - last_rollup_save >= self.config["rollup_flush_seconds"]:
+                    self.event_store.save_rollups()
+                    last_rollup_save = time.monotonic()
+                    
+                # Compacta dias antigos no arquivo frio
+                if time.monotonic() - last_archive >= self.config["archive_interval_seconds"]:
+                    self.archive_old_events()
+                    last_archive = time.monotonic()
                     
-                time.sleep(1)  # Verifica a cada segundo
-                
             except Exception as e:
                 logging.error(f"Erro no processador de auditoria: {str(e)}")
                 time.sleep(10)
                 
-    def _process_batch(self):
+    def _process_batch(self, batch: List[AuditEvent]):
         """Processa lote de eventos"""
         try:
-            if not self.event_queue:
+            if not batch:
                 return
                 
-            # Remove eventos do início da fila
-            batch = self.event_queue[:self.config["batch_size"]]
-            self.event_queue = self.event_queue[self.config["batch_size"]:]
+            started = time.monotonic()
             
             # Sanitiza eventos antes de salvar
             if self.config.get("sanitization_enabled", True):
@@ -220,9 +453,85 @@ class AuditSystem:
             # Salva lote sanitizado
             self._save_events_batch(batch)
             
+            latency_ms = (time.monotonic() - started) * 1000
+            self.flush_stats["batches"] += 1
+            self.flush_stats["events"] += len(batch)
+            self.flush_stats["last_latency_ms"] = latency_ms
+            self.flush_stats["max_latency_ms"] = max(self.flush_stats["max_latency_ms"], latency_ms)
+            self.flush_stats["total_latency_ms"] += latency_ms
+            
         except Exception as e:
             logging.error(f"Erro ao processar lote de auditoria: {str(e)}")
             
+    def _spill_event(self, event: AuditEvent):
+        """Grava evento excedente (já sanitizado) no arquivo de transbordo"""
+        try:
+            line = json.dumps(self._event_to_dict(event), default=str, ensure_ascii=False) + "\n"
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                self.spilled_events += 1
+                
+        except Exception as e:
+            logging.error(f"Erro ao transbordar evento: {str(e)}")
+            
+    def _drain_spill(self):
+        """Move os eventos do arquivo de transbordo para o armazenamento"""
+        try:
+            # Um arquivo .draining remanescente (falha anterior) é processado primeiro
+            draining_path = f"{self.spill_path}.draining"
+            with self._spill_lock:
+                if not os.path.exists(draining_path):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, draining_path)
+                
+            batch = []
+            with open(draining_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        continue
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        logging.error("Linha inválida no arquivo de transbordo")
+                        continue
+                    if len(batch) >= self.config["batch_size"]:
+                        self.event_store.append(batch)
+                        batch = []
+            self.event_store.append(batch)
+            os.remove(draining_path)
+            
+        except Exception as e:
+            logging.error(f"Erro ao reincorporar eventos transbordados: {str(e)}")
+            
+    def get_ingest_stats(self) -> Dict:
+        """
+        Obtém métricas da fila de ingestão
+        
+        Returns:
+            Dict: Profundidade da fila, descartes, transbordos e latência de flush
+        """
+        batches = self.flush_stats["batches"]
+        return {
+            "queue_depth": len(self.event_queue),
+            "queue_capacity": self.event_queue.capacity,
+            "queue_high_watermark": self.event_queue.high_watermark,
+            "overflow_policy": self.event_queue.overflow_policy.value,
+            "enqueued_events": self.event_queue.enqueued,
+            "dropped_events": self.event_queue.dropped,
+            "blocked_puts": self.event_queue.blocked_puts,
+            "spilled_events": self.spilled_events,
+            "flushed_batches": batches,
+            "flushed_events": self.flush_stats["events"],
+            "flush_latency_ms": {
+                "last": round(self.flush_stats["last_latency_ms"], 3),
+                "max": round(self.flush_stats["max_latency_ms"], 3),
+                "avg": round(self.flush_stats["total_latency_ms"] / batches, 3) if batches else 0.0
+            }
+        }
+            
     def _sanitize_audit_event(self, event: AuditEvent) -> AuditEvent:
         """
         Sanitiza um evento de auditoria removendo dados sensíveis
@@ -340,65 +649,27 @@ class AuditSystem:
             )
             
             # Adiciona à fila de processamento
-            if self.config["real_time_processing"]:
+            if self.config["real_time_processing"] or not self.processor_active:
                 self._save_event_immediate(event)
-            else:
-                self.event_queue.append(event)
+            elif not self.event_queue.put(event):
+                if self.event_queue.overflow_policy == OverflowPolicy.SPILL_TO_DISK:
+                    self._spill_event(event)
                 
         except Exception as e:
             logging.error(f"Erro ao registrar evento: {str(e)}")
             
     def _save_event_immediate(self, event: AuditEvent):
-        """Salva evento imediatamente"""
+        """Salva evento imediatamente (append no segmento ativo)"""
         try:
-            filename = f"{event.timestamp.strftime('%Y%m%d')}.json"
-            filepath = os.path.join(self.storage_path, "events", filename)
-            
-            # Carrega eventos existentes
-            events = []
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    events = json.load(f)
-                    
-            # Adiciona novo evento
-            events.append(self._event_to_dict(event))
-            
-            # Salva arquivo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(events, f, indent=2, default=str)
+            self.event_store.append([self._event_to_dict(event)])
                 
         except Exception as e:
             logging.error(f"Erro ao salvar evento imediato: {str(e)}")
             
     def _save_events_batch(self, events: List[AuditEvent]):
-        """Salva lote de eventos"""
+        """Salva lote de eventos com uma única escrita por segmento"""
         try:
-            # Agrupa eventos por data
-            events_by_date = {}
-            for event in events:
-                date_key = event.timestamp.strftime('%Y%m%d')
-                if date_key not in events_by_date:
-                    events_by_date[date_key] = []
-                events_by_date[date_key].append(event)
-                
-            # Salva eventos por data
-            for date_key, date_events in events_by_date.items():
-                filename = f"{date_key}.json"
-                filepath = os.path.join(self.storage_path, "events", filename)
-                
-                # Carrega eventos existentes
-                existing_events = []
-                if os.path.exists(filepath):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        existing_events = json.load(f)
-                        
-                # Adiciona novos eventos
-                for event in date_events:
-                    existing_events.append(self._event_to_dict(event))
-                    
-                # Salva arquivo
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(existing_events, f, indent=2, default=str)
+            self.event_store.append([self._event_to_dict(event) for event in events])
                     
         except Exception as e:
             logging.error(f"Erro ao salvar lote de eventos: {str(e)}")
@@ -420,37 +691,132 @@ class AuditSystem:
             start_date = query.start_date or (datetime.utcnow() - timedelta(days=30))
             end_date = query.end_date or datetime.utcnow()
             
-            # Itera sobre arquivos de eventos no período
-            current_date = start_date
-            while current_date <= end_date:
-                filename = f"{current_date.strftime('%Y%m%d')}.json"
-                filepath = os.path.join(self.storage_path, "events", filename)
-                
-                if os.path.exists(filepath):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        file_events = json.load(f)
-                        
-                    for event_data in file_events:
-                        event = self._dict_to_event(event_data)
-                        
-                        # Aplica filtros
-                        if self._matches_query(event, query):
-                            events.append(event)
-                            
+            days = []
+            current_date = start_date.date()
+            while current_date <= end_date.date():
+                days.append(current_date.strftime('%Y%m%d'))
                 current_date += timedelta(days=1)
                 
-            # Ordena por timestamp
-            events.sort(key=lambda x: x.timestamp, reverse=True)
-            
-            # Aplica paginação
-            events = events[query.offset:query.offset + query.limit]
-            
+            # Filtros resolvidos pelos índices dos segmentos
+            index_filters = self._index_filters(query)
+                
+            # Percorre candidatos do mais recente ao mais antigo e para ao
+            # completar a página, sem materializar o período inteiro
+            skipped = 0
+            for event_data in self.event_store.iter_newest(
+                days,
+                index_filters,
+                start_ts=to_epoch(query.start_date) if query.start_date else None,
+                end_ts=to_epoch(query.end_date) if query.end_date else None
+            ):
+                event = self._dict_to_event(event_data)
+                
+                # Aplica filtros não indexados (recurso, IP)
+                if not self._matches_query(event, query):
+                    continue
+                if skipped < query.offset:
+                    skipped += 1
+                    continue
+                    
+                events.append(event)
+                if len(events) >= query.limit:
+                    break
+                    
             return events
             
         except Exception as e:
             logging.error(f"Erro ao consultar eventos: {str(e)}")
             return []
             
+    def _index_filters(self, query: AuditQuery) -> Dict[str, Any]:
+        """Filtros da consulta resolvidos pelos índices do armazenamento"""
+        index_filters = {}
+        if query.user_id:
+            index_filters["user_id"] = query.user_id
+        if query.category:
+            index_filters["category"] = query.category.value
+        if query.action:
+            index_filters["action"] = query.action.value
+        if query.level:
+            index_filters["level"] = query.level.value
+        if query.success is not None:
+            index_filters["success"] = query.success
+        return index_filters
+        
+    def export_events(
+        self,
+        query: AuditQuery,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Tuple[str, Dict]]:
+        """
+        Exporta eventos em streaming, na ordem de armazenamento
+        
+        Os eventos são lidos um a um dos segmentos e arquivos, sem
+        carregar o período em memória. Cada evento acompanha o cursor que
+        permite retomar a exportação logo após ele. Sem data inicial, a
+        exportação cobre todos os dias armazenados; `query.limit` e
+        `query.offset` não se aplicam (a paginação é feita pelo cursor).
+        Um erro de leitura no meio da exportação é propagado pelo
+        iterador (nunca termina em silêncio como se estivesse completa);
+        o cursor do último evento recebido permite retomá-la.
+        
+        Args:
+            query: Filtros da exportação
+            cursor: Cursor do último evento já recebido
+            limit: Número máximo de eventos (None = sem limite)
+            
+        Returns:
+            Iterator[Tuple[str, Dict]]: (cursor, evento serializado)
+            
+        Raises:
+            ValueError: Se o cursor for inválido (ao chamar)
+            Exception: Erro de leitura dos eventos (durante a iteração)
+        """
+        after = decode_cursor(cursor) if cursor else None
+        
+        days = self.event_store.list_days()
+        if query.start_date:
+            first_day = query.start_date.strftime('%Y%m%d')
+            days = [day for day in days if day >= first_day]
+        if query.end_date:
+            last_day = query.end_date.strftime('%Y%m%d')
+            days = [day for day in days if day <= last_day]
+            
+        return self._export_stream(query, days, after, limit)
+        
+    def _export_stream(
+        self,
+        query: AuditQuery,
+        days: List[str],
+        after: Optional[Dict],
+        limit: Optional[int]
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Gerador da exportação (ver export_events)"""
+        try:
+            exported = 0
+            for position, event_data in self.event_store.iter_export(
+                days,
+                self._index_filters(query),
+                start_ts=to_epoch(query.start_date) if query.start_date else None,
+                end_ts=to_epoch(query.end_date) if query.end_date else None,
+                after=after
+            ):
+                # Filtros não indexados (recurso, IP)
+                if query.resource_id and event_data.get("resource_id") != query.resource_id:
+                    continue
+                if query.ip_address and event_data.get("ip_address") != query.ip_address:
+                    continue
+                    
+                yield encode_cursor(position), event_data
+                exported += 1
+                if limit is not None and exported >= limit:
+                    break
+                    
+        except Exception as e:
+            logging.error(f"Erro ao exportar eventos: {str(e)}")
+            raise
+            
     def _matches_query(self, event: AuditEvent, query: AuditQuery) -> bool:
         """Verifica se evento corresponde à consulta"""
         try:
@@ -501,7 +867,7 @@ class AuditSystem:
         report_type: str = "summary"
     ) -> Dict:
         """
-        Gera relatório de auditoria
+        Gera relatório de auditoria a partir das rollups
         
         Args:
             start_date: Data de início
@@ -512,69 +878,103 @@ class AuditSystem:
             Dict: Relatório gerado
         """
         try:
-            query = AuditQuery(
-                start_date=start_date,
-                end_date=end_date,
-                limit=10000  # Busca mais eventos para relatório
-            )
-            
-            events = self.query_events(query)
+            statistics = self.get_rollup_statistics(start_date, end_date)
             
             if report_type == "summary":
-                return self._generate_summary_report(events, start_date, end_date)
+                return self._generate_summary_report(statistics, start_date, end_date)
             elif report_type == "user_activity":
-                return self._generate_user_activity_report(events)
+                return self._generate_user_activity_report(statistics)
             elif report_type == "security_events":
-                return self._generate_security_events_report(events)
+                return self._generate_security_events_report(statistics, start_date, end_date)
             elif report_type == "financial_audit":
-                return self._generate_financial_audit_report(events)
+                return self._generate_financial_audit_report(statistics)
             else:
-                return self._generate_summary_report(events, start_date, end_date)
+                return self._generate_summary_report(statistics, start_date, end_date)
                 
         except Exception as e:
             logging.error(f"Erro ao gerar relatório: {str(e)}")
             return {}
             
-    def _generate_summary_report(self, events: List[AuditEvent], start_date: datetime, end_date: datetime) -> Dict:
+    def get_rollup_statistics(self, start_date: datetime, end_date: datetime) -> Dict:
+        """
+        Agrega os contadores de auditoria do período
+        
+        Horas completas são somadas das rollups horárias (custo proporcional
+        ao número de dias); apenas as frações de hora nas bordas do período
+        são acumuladas a partir dos eventos brutos.
+        
+        Args:
+            start_date: Data de início
+            end_date: Data de fim
+            
+        Returns:
+            Dict: Bucket de rollup agregado (ver audit_storage.new_rollup_bucket)
+        """
+        statistics = new_rollup_bucket()
+        
+        # Horas completas: [first_full, end_full)
+        first_full = start_date.replace(minute=0, second=0, microsecond=0)
+        if first_full < start_date:
+            first_full += timedelta(hours=1)
+        end_full = end_date.replace(minute=0, second=0, microsecond=0)
+        
+        if first_full >= end_full:
+            self._fold_raw_events(statistics, start_date, end_date)
+            return statistics
+            
+        if start_date < first_full:
+            self._fold_raw_events(statistics, start_date, first_full - timedelta(microseconds=1))
+        self._fold_raw_events(statistics, end_full, end_date)
+        
+        last_full = end_full - timedelta(hours=1)
+        current_date = first_full.date()
+        while current_date <= last_full.date():
+            first_hour = first_full.hour if current_date == first_full.date() else 0
+            last_hour = last_full.hour if current_date == last_full.date() else 23
+            merge_rollup(
+                statistics,
+                self.event_store.rollup_buckets(current_date.strftime('%Y%m%d'), first_hour, last_hour)
+            )
+            current_date += timedelta(days=1)
+            
+        return statistics
+        
+    def _fold_raw_events(self, statistics: Dict, start_date: datetime, end_date: datetime):
+        """Acumula eventos brutos de um intervalo curto em um bucket de rollup"""
+        if end_date < start_date:
+            return
+        days = []
+        current_date = start_date.date()
+        while current_date <= end_date.date():
+            days.append(current_date.strftime('%Y%m%d'))
+            current_date += timedelta(days=1)
+            
+        for event_data in self.event_store.iter_newest(days, start_ts=to_epoch(start_date), end_ts=to_epoch(end_date)):
+            fold_record(statistics, event_data)
+            
+    def _generate_summary_report(self, statistics: Dict, start_date: datetime, end_date: datetime) -> Dict:
         """Gera relatório resumido"""
         try:
-            total_events = len(events)
-            successful_events = len([e for e in events if e.success])
-            failed_events = total_events - successful_events
+            total_events = statistics["total"]
+            successful_events = statistics["successful"]
+            failed_events = statistics["failed"]
             
             # Estatísticas por categoria
-            category_stats = {}
-            for event in events:
-                category = event.category.value
-                if category not in category_stats:
-                    category_stats[category] = {
-                        "total": 0,
-                        "successful": 0,
-                        "failed": 0
-                    }
-                category_stats[category]["total"] += 1
-                if event.success:
-                    category_stats[category]["successful"] += 1
-                else:
-                    category_stats[category]["failed"] += 1
-                    
-            # Estatísticas por nível
-            level_stats = {}
-            for event in events:
-                level = event.level.value
-                if level not in level_stats:
-                    level_stats[level] = 0
-                level_stats[level] += 1
-                
+            category_stats = {
+                category: {
+                    "total": stats["total"],
+                    "successful": stats["successful"],
+                    "failed": stats["failed"]
+                }
+                for category, stats in statistics["categories"].items()
+            }
+            
             # Usuários mais ativos
-            user_activity = {}
-            for event in events:
-                if event.user_id:
-                    if event.user_id not in user_activity:
-                        user_activity[event.user_id] = 0
-                    user_activity[event.user_id] += 1
-                    
-            top_users = sorted(user_activity.items(), key=lambda x: x[1], reverse=True)[:10]
+            top_users = sorted(
+                ((user_id, stats["total"]) for user_id, stats in statistics["users"].items()),
+                key=lambda x: x[1],
+                reverse=True
+            )[:10]
             
             return {
                 "report_type": "summary",
@@ -589,7 +989,7 @@ class AuditSystem:
                     "success_rate": (successful_events / total_events * 100) if total_events > 0 else 0
                 },
                 "category_statistics": category_stats,
-                "level_statistics": level_stats,
+                "level_statistics": statistics["levels"],
                 "top_users": top_users,
                 "generated_at": datetime.utcnow().isoformat()
             }
@@ -598,54 +998,27 @@ class AuditSystem:
             logging.error(f"Erro ao gerar relatório resumido: {str(e)}")
             return {}
             
-    def _generate_user_activity_report(self, events: List[AuditEvent]) -> Dict:
+    def _generate_user_activity_report(self, statistics: Dict) -> Dict:
         """Gera relatório de atividade de usuários"""
         try:
             user_activity = {}
             
-            for event in events:
-                if event.user_id:
-                    if event.user_id not in user_activity:
-                        user_activity[event.user_id] = {
-                            "total_events": 0,
-                            "categories": {},
-                            "actions": {},
-                            "last_activity": None,
-                            "ip_addresses": set(),
-                            "sessions": set()
-                        }
-                        
-                    user_activity[event.user_id]["total_events"] += 1
-                    
-                    # Categorias
-                    category = event.category.value
-                    if category not in user_activity[event.user_id]["categories"]:
-                        user_activity[event.user_id]["categories"][category] = 0
-                    user_activity[event.user_id]["categories"][category] += 1
-                    
-                    # Ações
-                    action = event.action.value
-                    if action not in user_activity[event.user_id]["actions"]:
-                        user_activity[event.user_id]["actions"][action] = 0
-                    user_activity[event.user_id]["actions"][action] += 1
-                    
-                    # Última atividade
-                    if not user_activity[event.user_id]["last_activity"] or event.timestamp > user_activity[event.user_id]["last_activity"]:
-                        user_activity[event.user_id]["last_activity"] = event.timestamp
-                        
-                    # IPs
-                    if event.ip_address:
-                        user_activity[event.user_id]["ip_addresses"].add(event.ip_address)
+            for user_id, stats in statistics["users"].items():
+                categories = {}
+                actions = {}
+                for category, category_actions in stats["activity"].items():
+                    for action, activity in category_actions.items():
+                        categories[category] = categories.get(category, 0) + activity["count"]
+                        actions[action] = actions.get(action, 0) + activity["count"]
                         
-                    # Sessões
-                    if event.session_id:
-                        user_activity[event.user_id]["sessions"].add(event.session_id)
-                        
-            # Converte sets para listas para serialização JSON
-            for user_id, activity in user_activity.items():
-                activity["ip_addresses"] = list(activity["ip_addresses"])
-                activity["sessions"] = list(activity["sessions"])
-                activity["last_activity"] = activity["last_activity"].isoformat() if activity["last_activity"] else None
+                user_activity[user_id] = {
+                    "total_events": stats["total"],
+                    "categories": categories,
+                    "actions": actions,
+                    "last_activity": stats["last_activity"],
+                    "ip_addresses": stats["ip_addresses"],
+                    "sessions": stats["sessions"]
+                }
                 
             return {
                 "report_type": "user_activity",
@@ -657,26 +1030,30 @@ class AuditSystem:
             logging.error(f"Erro ao gerar relatório de atividade: {str(e)}")
             return {}
             
-    def _generate_security_events_report(self, events: List[AuditEvent]) -> Dict:
+    def _generate_security_events_report(self, statistics: Dict, start_date: datetime, end_date: datetime) -> Dict:
         """Gera relatório de eventos de segurança"""
         try:
-            security_events = [e for e in events if e.category == AuditCategory.SECURITY]
+            security = statistics["categories"].get(AuditCategory.SECURITY.value, {})
+            levels = security.get("levels", {})
             
-            # Agrupa por tipo de evento
+            # Drill-down: apenas eventos de segurança são lidos (via índice de categoria)
+            query = AuditQuery(
+                start_date=start_date,
+                end_date=end_date,
+                category=AuditCategory.SECURITY,
+                limit=10000
+            )
             event_types = {}
-            for event in security_events:
-                action = event.action.value
-                if action not in event_types:
-                    event_types[action] = []
-                event_types[action].append(self._event_to_dict(event))
+            for event in self.query_events(query):
+                event_types.setdefault(event.action.value, []).append(self._event_to_dict(event))
                 
             # Estatísticas de segurança
             security_stats = {
-                "total_security_events": len(security_events),
-                "critical_events": len([e for e in security_events if e.level == AuditLevel.CRITICAL]),
-                "high_events": len([e for e in security_events if e.level == AuditLevel.ERROR]),
-                "warning_events": len([e for e in security_events if e.level == AuditLevel.WARNING]),
-                "failed_events": len([e for e in security_events if not e.success])
+                "total_security_events": security.get("total", 0),
+                "critical_events": levels.get(AuditLevel.CRITICAL.value, 0),
+                "high_events": levels.get(AuditLevel.ERROR.value, 0),
+                "warning_events": levels.get(AuditLevel.WARNING.value, 0),
+                "failed_events": security.get("failed", 0)
             }
             
             return {
@@ -690,31 +1067,21 @@ class AuditSystem:
             logging.error(f"Erro ao gerar relatório de segurança: {str(e)}")
             return {}
             
-    def _generate_financial_audit_report(self, events: List[AuditEvent]) -> Dict:
+    def _generate_financial_audit_report(self, statistics: Dict) -> Dict:
         """Gera relatório de auditoria financeira"""
         try:
-            financial_events = [e for e in events if e.category == AuditCategory.FINANCIAL]
+            financial = statistics["categories"].get(AuditCategory.FINANCIAL.value, {})
             
             # Estatísticas financeiras
-            total_transactions = len(financial_events)
-            successful_transactions = len([e for e in financial_events if e.success])
-            failed_transactions = total_transactions - successful_transactions
+            total_transactions = financial.get("total", 0)
+            successful_transactions = financial.get("successful", 0)
+            failed_transactions = financial.get("failed", 0)
             
             # Análise por tipo de transação
-            transaction_types = {}
-            for event in financial_events:
-                action = event.action.value
-                if action not in transaction_types:
-                    transaction_types[action] = {
-                        "total": 0,
-                        "successful": 0,
-                        "failed": 0
-                    }
-                transaction_types[action]["total"] += 1
-                if event.success:
-                    transaction_types[action]["successful"] += 1
-                else:
-                    transaction_types[action]["failed"] += 1
+            transaction_types = {
+                action: dict(stats)
+                for action, stats in financial.get("actions", {}).items()
+            }
                     
             return {
                 "report_type": "financial_audit",
@@ -732,6 +1099,44 @@ class AuditSystem:
             logging.error(f"Erro ao gerar relatório financeiro: {str(e)}")
             return {}
             
+    def archive_old_events(self) -> Dict:
+        """
+        Compacta no arquivo frio os dias mais antigos que archive_after_days
+        
+        Os dias arquivados continuam disponíveis para consultas e relatórios.
+        
+        Returns:
+            Dict: Dias e eventos arquivados, bytes antes e depois
+        """
+        summary = {"archived_days": 0, "archived_events": 0, "bytes_before": 0, "bytes_after": 0}
+        try:
+            archive_date = (datetime.utcnow() - timedelta(days=self.config["archive_after_days"])).strftime('%Y%m%d')
+            
+            for day in self.event_store.list_days():
+                if day >= archive_date or (self.event_store.is_archived(day) and not self.event_store.list_segments(day)):
+                    continue
+                try:
+                    result = self.event_store.archive_day(
+                        day,
+                        block_records=self.config["archive_block_records"],
+                        compress=self.config["compression_enabled"]
+                    )
+                    summary["archived_days"] += 1
+                    summary["archived_events"] += result["events"]
+                    summary["bytes_before"] += result["bytes_before"]
+                    summary["bytes_after"] += result["bytes_after"]
+                    
+                except Exception as e:
+                    logging.error(f"Erro ao arquivar eventos do dia {day}: {str(e)}")
+                    
+            if summary["archived_days"]:
+                logging.info(f"Dias de auditoria arquivados: {summary['archived_days']}")
+            return summary
+            
+        except Exception as e:
+            logging.error(f"Erro ao arquivar eventos antigos: {str(e)}")
+            return summary
+            
     def cleanup_old_events(self) -> int:
         """
         Remove eventos antigos
@@ -743,21 +1148,13 @@ class AuditSystem:
             removed_count = 0
             retention_date = datetime.utcnow() - timedelta(days=self.config["retention_days"])
             
-            events_dir = os.path.join(self.storage_path, "events")
-            if os.path.exists(events_dir):
-                for filename in os.listdir(events_dir):
-                    if filename.endswith(".json"):
-                        try:
-                            file_date_str = filename.replace(".json", "")
-                            file_date = datetime.strptime(file_date_str, "%Y%m%d")
-                            
-                            if file_date < retention_date:
-                                filepath = os.path.join(events_dir, filename)
-                                os.remove(filepath)
-                                removed_count += 1
-                                
-                        except Exception as e:
-                            logging.error(f"Erro ao processar arquivo {filename}: {str(e)}")
+            for day in self.event_store.list_days():
+                try:
+                    if datetime.strptime(day, "%Y%m%d") < retention_date:
+                        removed_count += self.event_store.remove_day(day)
+                        
+                except Exception as e:
+                    logging.error(f"Erro ao remover eventos do dia {day}: {str(e)}")
                             
             logging.info(f"Eventos antigos removidos: {removed_count}")
             return removed_count
@@ -823,10 +1220,19 @@ class AuditSystem:
         )
         
     def stop_processor(self):
-        """Para o processador"""
+        """Para o processador, gravando todos os eventos pendentes"""
         self.processor_active = False
+        self.event_queue.close()
         if hasattr(self, 'processor_thread'):
             self.processor_thread.join(timeout=5)
+            
+        # Drena o que restou na fila e no transbordo antes de selar os segmentos
+        remaining = self.event_queue.drain()
+        while remaining:
+            self._process_batch(remaining[:self.config["batch_size"]])
+            remaining = remaining[self.config["batch_size"]:]
+        self._drain_spill()
+        self.event_store.close()
 
     def log_api_call(
         self,
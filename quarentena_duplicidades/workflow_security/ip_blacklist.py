@@ -0,0 +1,351 @@
+"""
+Blacklist de IPs - TarefaMágica
+Trie radix de prefixos IPv4/IPv6 (endereços e faixas CIDR) com recarga a quente
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+class _TrieNode:
+    """Nó da trie: prefixo (rede e comprimento) e dois filhos"""
+    __slots__ = ("network", "length", "terminal", "children")
+
+    def __init__(self, network: int, length: int, terminal: bool):
+        self.network = network
+        self.length = length
+        self.terminal = terminal
+        self.children: List[Optional['_TrieNode']] = [None, None]
+
+class PrefixTrie:
+    def __init__(self, width: int):
+        """
+        Trie radix binária com compressão de caminho (Patricia)
+
+        Cada nó guarda um prefixo completo, então cadeias de nós com um só
+        filho não existem: a trie tem no máximo 2n nós para n prefixos e a
+        busca percorre apenas os pontos de bifurcação.
+
+        Args:
+            width: Número de bits dos endereços (32 para IPv4, 128 para IPv6)
+        """
+        self.width = width
+        self.root = _TrieNode(0, 0, False)
+        self.size = 0
+
+    def insert(self, network: int, length: int):
+        """
+        Insere um prefixo
+
+        A nova estrutura é montada antes de ser ligada à árvore, então uma
+        busca concorrente vê a trie antes ou depois da inserção, nunca um
+        estado intermediário.
+        """
+        width = self.width
+        node = self.root
+        while True:
+            if node.length == length:
+                if not node.terminal:
+                    node.terminal = True
+                    self.size += 1
+                return
+
+            bit = (network >> (width - node.length - 1)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _TrieNode(network, length, True)
+                self.size += 1
+                return
+
+            difference = child.network ^ network
+            common = min(child.length, length, width - difference.bit_length())
+            if common == child.length:
+                node = child
+                continue
+
+            # Divide a aresta no ponto em que os prefixos divergem
+            mid = _TrieNode(network & ~((1 << (width - common)) - 1), common, common == length)
+            mid.children[(child.network >> (width - common - 1)) & 1] = child
+            if common != length:
+                mid.children[(network >> (width - common - 1)) & 1] = _TrieNode(network, length, True)
+            node.children[bit] = mid
+            self.size += 1
+            return
+
+    def match(self, address: int) -> Optional[Tuple[int, int]]:
+        """
+        Prefixo mais curto que contém o endereço
+
+        Returns:
+            Optional[Tuple[int, int]]: (rede, comprimento) ou None
+        """
+        width = self.width
+        node = self.root
+        if node.terminal:
+            return node.network, node.length
+        while node.length < width:
+            child = node.children[(address >> (width - node.length - 1)) & 1]
+            if child is None:
+                return None
+            shift = width - child.length
+            if (address >> shift) != (child.network >> shift):
+                return None
+            if child.terminal:
+                return child.network, child.length
+            node = child
+        return None
+
+def parse_entry(entry: str) -> Union[ipaddress.IPv4Network, ipaddress.IPv6Network]:
+    """
+    Converte endereço ou faixa CIDR em rede
+
+    Raises:
+        ValueError: Se a entrada for inválida
+    """
+    return ipaddress.ip_network(entry.strip(), strict=False)
+
+def format_entry(network: Union[ipaddress.IPv4Network, ipaddress.IPv6Network]) -> str:
+    """Forma canônica da entrada: endereço simples sem sufixo, faixas em CIDR"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+class IPBlacklist:
+    def __init__(self, blacklist_file: str, check_interval: float = 1.0):
+        """
+        Blacklist de IPs mantida em memória
+
+        O arquivo (lista JSON de endereços e faixas CIDR) continua sendo a
+        fonte de verdade, compartilhada entre processos. As buscas usam a
+        trie em memória; o arquivo só é relido quando seu mtime/tamanho
+        muda, verificado no máximo a cada `check_interval` segundos.
+        Inclusões e remoções regravam o arquivo de forma atômica.
+
+        Args:
+            blacklist_file: Caminho do arquivo da blacklist
+            check_interval: Intervalo mínimo entre verificações do arquivo
+        """
+        self.blacklist_file = blacklist_file
+        self.check_interval = check_interval
+
+        self._entries: Dict[str, Union[ipaddress.IPv4Network, ipaddress.IPv6Network]] = {}
+        self._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.RLock()
+        self.reloads = 0
+
+        self._reload_if_changed()
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def contains(self, ip_address: str) -> bool:
+        """Verifica se o IP está em alguma entrada da blacklist"""
+        return self._find(ip_address) is not None
+
+    def match(self, ip_address: str) -> Optional[str]:
+        """
+        Entrada da blacklist que contém o IP
+
+        Args:
+            ip_address: Endereço IPv4 ou IPv6
+
+        Returns:
+            Optional[str]: Entrada correspondente, ou None
+        """
+        found = self._find(ip_address)
+        if found is None:
+            return None
+        version, network, length = found
+        return format_entry(ipaddress.ip_network((network, length)) if version == 4
+                            else ipaddress.IPv6Network((network, length)))
+
+    def _find(self, ip_address: str) -> Optional[Tuple[int, int, int]]:
+        """(versão, rede, comprimento) do prefixo que contém o IP, ou None"""
+        if time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        found = self._tries[address.version].match(int(address))
+        if found is None:
+            return None
+        return (address.version,) + found
+
+    def list_entries(self) -> List[str]:
+        """Lista as entradas da blacklist"""
+        self._reload_if_changed()
+        return sorted(self._entries)
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+
+    def add(self, entries: Iterable[str]) -> Dict:
+        """
+        Adiciona endereços ou faixas CIDR
+
+        Args:
+            entries: Entradas a adicionar
+
+        Returns:
+            Dict: Contagem de adicionadas, já existentes e inválidas
+        """
+        result = {"added": 0, "existing": 0, "invalid": 0}
+        with self._lock:
+            self._reload_if_changed()
+            # Cópia: leitores continuam vendo o conjunto anterior até a troca
+            updated = dict(self._entries)
+            new_networks = []
+            for entry in entries:
+                try:
+                    network = parse_entry(entry)
+                except ValueError:
+                    result["invalid"] += 1
+                    continue
+                key = format_entry(network)
+                if key in updated:
+                    result["existing"] += 1
+                    continue
+                updated[key] = network
+                new_networks.append(network)
+
+            if new_networks:
+                self._write_file(updated)
+                if len(new_networks) > len(updated) // 2:
+                    # Importação grande: monta tries novas e troca de uma vez
+                    self._tries = self._build_tries(updated.values())
+                else:
+                    for network in new_networks:
+                        self._tries[network.version].insert(int(network.network_address), network.prefixlen)
+                self._entries = updated
+            result["added"] = len(new_networks)
+        return result
+
+    def remove(self, entry: str) -> bool:
+        """
+        Remove uma entrada (exatamente como cadastrada, em forma canônica)
+
+        Returns:
+            bool: True se a entrada existia
+        """
+        try:
+            key = format_entry(parse_entry(entry))
+        except ValueError:
+            return False
+        with self._lock:
+            self._reload_if_changed()
+            if key not in self._entries:
+                return False
+            updated = dict(self._entries)
+            del updated[key]
+            self._write_file(updated)
+            self._tries = self._build_tries(updated.values())
+            self._entries = updated
+            return True
+
+    def import_lines(self, lines: Iterable[str]) -> Dict:
+        """
+        Importa lista de bloqueio externa
+
+        Aceita uma entrada por linha; linhas vazias e comentários ('#' ou
+        ';') são ignorados, assim como o texto após a primeira coluna
+        (ex.: "192.0.2.0/24 ; SBL000").
+
+        Args:
+            lines: Linhas da lista
+
+        Returns:
+            Dict: Contagem de adicionadas, já existentes e inválidas
+        """
+        def entries():
+            for line in lines:
+                line = line.split('#', 1)[0].split(';', 1)[0].strip()
+                if line:
+                    yield line.split()[0]
+        return self.add(entries())
+
+    def import_file(self, path: str) -> Dict:
+        """Importa lista de bloqueio externa a partir de arquivo texto"""
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return self.import_lines(f)
+
+    def stats(self) -> Dict:
+        """Estatísticas da blacklist"""
+        return {
+            "entries": len(self._entries),
+            "ipv4_prefixes": self._tries[4].size,
+            "ipv6_prefixes": self._tries[6].size,
+            "reloads": self.reloads
+        }
+
+    # ------------------------------------------------------------------
+    # Arquivo
+    # ------------------------------------------------------------------
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """mtime (ns) e tamanho do arquivo, ou None se ausente"""
+        try:
+            stat = os.stat(self.blacklist_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload_if_changed(self):
+        """Relê o arquivo se ele mudou desde a última leitura"""
+        self._next_check = time.monotonic() + self.check_interval
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature != self._signature:
+                self._load(signature)
+
+    def _load(self, signature: Optional[Tuple[int, int]]):
+        """Carrega o arquivo e troca as tries de uma vez"""
+        entries = {}
+        if signature is not None:
+            try:
+                with open(self.blacklist_file, 'r', encoding='utf-8') as f:
+                    raw_entries = json.load(f)
+            except Exception as e:
+                logging.error(f"Erro ao carregar blacklist: {str(e)}")
+                return
+            for entry in raw_entries:
+                try:
+                    network = parse_entry(entry)
+                except (ValueError, AttributeError):
+                    logging.error(f"Entrada inválida na blacklist: {entry}")
+                    continue
+                entries[format_entry(network)] = network
+
+        self._tries = self._build_tries(entries.values())
+        self._entries = entries
+        self._signature = signature
+        self.reloads += 1
+
+    def _build_tries(self, networks: Iterable) -> Dict[int, PrefixTrie]:
+        """Monta tries novas a partir das redes"""
+        tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        for network in networks:
+            tries[network.version].insert(int(network.network_address), network.prefixlen)
+        return tries
+
+    def _write_file(self, entries: Dict):
+        """Grava a blacklist de forma atômica (chamado com o lock)"""
+        os.makedirs(os.path.dirname(self.blacklist_file), exist_ok=True)
+        temp_path = f"{self.blacklist_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(sorted(entries), f, indent=2)
+        os.replace(temp_path, self.blacklist_file)
+        self._signature = self._file_signature()
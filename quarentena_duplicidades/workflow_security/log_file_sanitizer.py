@@ -0,0 +1,359 @@
+"""
+Sanitização de Arquivos de Log - TarefaMágica
+Redige arquivos de log grandes em paralelo (mmap + pool de processos), preservando a ordem das linhas
+"""
+
+import argparse
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .log_pipeline import running_pipelines
+from .log_sanitization import CompiledPatterns, LogSanitizer, SensitivePattern, log_sanitizer
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Padrões compilados do processo trabalhador (criados pelo initializer do pool)
+_worker_patterns: Optional[CompiledPatterns] = None
+
+def _init_worker(patterns: List[SensitivePattern]):
+    global _worker_patterns
+    _worker_patterns = CompiledPatterns(patterns)
+
+def _sanitize_file_chunk(path: str, offset: int, length: int) -> Tuple[bytes, int, int, List[int]]:
+    """Lê e sanitiza um trecho do arquivo no processo trabalhador"""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[offset:offset + length]
+    return sanitize_chunk(_worker_patterns, data)
+
+def sanitize_chunk(compiled: CompiledPatterns, data: bytes) -> Tuple[bytes, int, int, List[int]]:
+    """
+    Sanitiza um trecho de log linha a linha
+
+    Cada linha é sanitizada isoladamente, como uma mensagem de log, então o
+    resultado não depende de onde o arquivo foi dividido. Bytes que não são
+    UTF-8 válido passam intactos (surrogateescape).
+
+    Args:
+        compiled: Padrões compilados
+        data: Trecho terminado em fim de linha (ou fim do arquivo)
+
+    Returns:
+        Tuple[bytes, int, int, List[int]]: Trecho sanitizado, linhas, linhas
+        alteradas e ocorrências por padrão
+    """
+    before = list(compiled.pattern_matches)
+    lines = data.decode('utf-8', 'surrogateescape').split('\n')
+    changed = 0
+    for index, line in enumerate(lines):
+        if line:
+            sanitized = compiled.sanitize(line)
+            if sanitized != line:
+                changed += 1
+                lines[index] = sanitized
+    hits = [after - previous for after, previous in zip(compiled.pattern_matches, before)]
+    line_count = len(lines) - 1 if data.endswith(b'\n') else len(lines)
+    return '\n'.join(lines).encode('utf-8', 'surrogateescape'), line_count, changed, hits
+
+def chunk_boundaries(mm: mmap.mmap, size: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Divide o arquivo em trechos de ~chunk_size bytes terminados em fim de linha"""
+    offset = 0
+    while offset < size:
+        end = offset + chunk_size
+        if end >= size:
+            end = size
+        else:
+            newline = mm.find(b'\n', end - 1)
+            end = size if newline == -1 else newline + 1
+        yield offset, end - offset
+        offset = end
+
+def sanitize_log_file(
+    input_path: str,
+    output_path: str,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sanitizer: LogSanitizer = log_sanitizer,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Sanitiza um arquivo de log inteiro
+
+    O arquivo é mapeado em memória e dividido em trechos terminados em fim
+    de linha; cada trecho é sanitizado num processo do pool com os padrões
+    do `sanitizer`. Os resultados são gravados na ordem original e no
+    máximo 2 × workers trechos ficam em voo, então a memória usada não
+    depende do tamanho do arquivo. A saída é gravada num temporário e
+    renomeada ao final.
+
+    Args:
+        input_path: Arquivo de log original
+        output_path: Arquivo sanitizado (não pode ser o original)
+        workers: Processos do pool (padrão: número de CPUs; 1 sanitiza no próprio processo)
+        chunk_size: Tamanho aproximado de cada trecho em bytes
+        sanitizer: Sanitizador cujos padrões são aplicados
+        progress: Chamado com (bytes processados, bytes totais) a cada trecho gravado
+
+    Returns:
+        Dict: Relatório (bytes, linhas, MB/s, ocorrências por padrão) ou erro
+    """
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        if os.path.abspath(input_path) == os.path.abspath(output_path):
+            raise ValueError("O arquivo de saída deve ser diferente do original")
+        if chunk_size < 1:
+            raise ValueError("chunk_size deve ser positivo")
+
+        patterns = list(sanitizer.sensitive_patterns)
+        workers = max(1, workers or os.cpu_count() or 1)
+        size = os.path.getsize(input_path)
+        started = time.monotonic()
+        totals = {"lines": 0, "lines_changed": 0, "chunks": 0, "bytes_done": 0}
+        hits = [0] * len(patterns)
+
+        def write(out, result, length: int):
+            data, lines, changed, chunk_hits = result
+            out.write(data)
+            totals["lines"] += lines
+            totals["lines_changed"] += changed
+            totals["chunks"] += 1
+            totals["bytes_done"] += length
+            for index, count in enumerate(chunk_hits):
+                hits[index] += count
+            if progress is not None:
+                progress(totals["bytes_done"], size)
+
+        with open(input_path, 'rb') as f, open(temp_path, 'wb') as out:
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    chunks = chunk_boundaries(mm, size, chunk_size)
+                    if workers == 1 or size <= chunk_size:
+                        workers = 1
+                        compiled = CompiledPatterns(patterns)
+                        for offset, length in chunks:
+                            write(out, sanitize_chunk(compiled, mm[offset:offset + length]), length)
+                    else:
+                        # spawn: o processo da aplicação tem threads (fork poderia herdar locks presos)
+                        with ProcessPoolExecutor(
+                            max_workers=workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_init_worker,
+                            initargs=(patterns,)
+                        ) as pool:
+                            in_flight = deque()
+                            for offset, length in chunks:
+                                in_flight.append((pool.submit(_sanitize_file_chunk, input_path, offset, length), length))
+                                if len(in_flight) >= 2 * workers:
+                                    future, done_length = in_flight.popleft()
+                                    write(out, future.result(), done_length)
+                            while in_flight:
+                                future, done_length = in_flight.popleft()
+                                write(out, future.result(), done_length)
+        os.replace(temp_path, output_path)
+
+        elapsed = time.monotonic() - started
+        return {
+            "success": True,
+            "input_path": input_path,
+            "output_path": output_path,
+            "bytes": size,
+            "lines": totals["lines"],
+            "lines_changed": totals["lines_changed"],
+            "chunks": totals["chunks"],
+            "workers": workers,
+            "elapsed_seconds": round(elapsed, 3),
+            "mb_per_second": round(size / (1024 * 1024) / elapsed, 2) if elapsed > 0 else 0.0,
+            "pattern_hits": {pattern.name: count for pattern, count in zip(patterns, hits)}
+        }
+
+    except Exception as e:
+        logging.error(f"Erro ao sanitizar arquivo de log {input_path}: {str(e)}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return {"success": False, "input_path": input_path, "error": str(e)}
+
+def active_log_files() -> Set[str]:
+    """Arquivos (caminho real) em que algum FileHandler deste processo está gravando"""
+    handlers = list(logging.getLogger().handlers)
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        handlers.extend(getattr(logger, "handlers", ()))
+    for pipeline in list(running_pipelines):
+        handlers.extend(pipeline.handlers)
+    return {
+        os.path.realpath(handler.baseFilename)
+        for handler in handlers
+        if isinstance(handler, logging.FileHandler)
+    }
+
+class LogFileSanitizationJobs:
+    def __init__(self, allowed_root: str = "logs", max_history: int = 100):
+        """
+        Jobs de sanitização de arquivos de log disparados pela API
+
+        Os jobs rodam um de cada vez numa thread de fundo (cada um já ocupa
+        todas as CPUs com seu pool de processos). Só arquivos dentro de
+        `allowed_root` podem ser lidos ou escritos, e a saída nunca é um
+        arquivo de log ativo, a entrada ou saída de outro job pendente,
+        nem (sem `overwrite`) um arquivo existente.
+
+        Args:
+            allowed_root: Diretório que contém os arquivos de log
+            max_history: Máximo de jobs concluídos mantidos para consulta
+        """
+        self.allowed_root = allowed_root
+        self.max_history = max_history
+        self._jobs: Dict[str, Dict] = {}
+        self._pending: Dict[str, Tuple[str, str]] = {}  # job_id -> (entrada, saída) dos jobs não finalizados
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _resolve(self, path: str) -> str:
+        """Caminho real dentro do diretório permitido"""
+        root = os.path.realpath(self.allowed_root)
+        resolved = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, resolved]) != root:
+            raise ValueError(f"Caminho fora de {self.allowed_root}: {path}")
+        return resolved
+
+    def submit(
+        self,
+        input_path: str,
+        output_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        overwrite: bool = False
+    ) -> Dict:
+        """
+        Agenda a sanitização de um arquivo
+
+        Args:
+            input_path: Arquivo relativo a `allowed_root`
+            output_path: Saída relativa a `allowed_root` (padrão: <nome>.sanitized<ext>)
+            workers: Processos do pool (limitado a 1..número de CPUs; padrão: número de CPUs)
+            overwrite: Se uma saída já existente pode ser substituída
+
+        Returns:
+            Dict: Job criado
+
+        Raises:
+            ValueError: Caminho inválido, arquivo inexistente ou saída recusada
+        """
+        source = self._resolve(input_path)
+        if not os.path.isfile(source):
+            raise ValueError(f"Arquivo não encontrado: {input_path}")
+        if output_path is None:
+            base, extension = os.path.splitext(source)
+            target = f"{base}.sanitized{extension}"
+        else:
+            target = self._resolve(output_path)
+        relative_target = os.path.relpath(target, os.path.realpath(self.allowed_root))
+        if workers is not None:
+            workers = max(1, min(int(workers), os.cpu_count() or 1))
+
+        if target == source:
+            raise ValueError("A saída não pode ser o próprio arquivo de entrada")
+        if os.path.isdir(target):
+            raise ValueError(f"Saída é um diretório: {relative_target}")
+        if target in active_log_files():
+            raise ValueError(f"Saída é um arquivo de log ativo: {relative_target}")
+        if os.path.exists(target) and not overwrite:
+            raise ValueError(f"Arquivo de saída já existe (use overwrite para substituir): {relative_target}")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "input_path": input_path,
+            "output_path": relative_target,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "bytes_done": 0,
+            "bytes_total": os.path.getsize(source),
+            "report": None
+        }
+        with self._lock:
+            for job_id, paths in self._pending.items():
+                if target in paths:
+                    raise ValueError(f"Arquivo em uso por outro job ({job_id}): {relative_target}")
+            self._pending[job["job_id"]] = (source, target)
+            self._jobs[job["job_id"]] = job
+            self._trim_history()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-file-sanitizer")
+            self._executor.submit(self._run, job, source, target, workers)
+        return dict(job)
+
+    def _run(self, job: Dict, source: str, target: str, workers: Optional[int]):
+        """Executa um job"""
+        job["status"] = "running"
+
+        def progress(done: int, total: int):
+            job["bytes_done"] = done
+
+        report = None
+        try:
+            report = sanitize_log_file(source, target, workers=workers, progress=progress)
+        finally:
+            with self._lock:
+                self._pending.pop(job["job_id"], None)
+                job["report"] = report
+                job["status"] = "completed" if report is not None and report["success"] else "failed"
+                job["finished_at"] = datetime.utcnow().isoformat()
+
+    def _trim_history(self):
+        """Descarta os jobs finalizados mais antigos além do limite (lock já adquirido)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Situação de um job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> List[Dict]:
+        """Todos os jobs conhecidos, mais recentes primeiro"""
+        with self._lock:
+            return [dict(job) for job in reversed(list(self._jobs.values()))]
+
+# Jobs disparados pela API
+log_file_jobs = LogFileSanitizationJobs(os.environ.get("LOG_SANITIZATION_ROOT", "logs"))
+
+def main():
+    """Sanitiza um arquivo de log pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Sanitiza arquivos de log removendo dados sensíveis")
+    parser.add_argument("input", help="Arquivo de log original")
+    parser.add_argument("output", help="Arquivo sanitizado")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: CPUs)")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_SIZE / (1024 * 1024), help="Tamanho de cada trecho em MB")
+    args = parser.parse_args()
+
+    print(f"🧹 Sanitizando {args.input} -> {args.output}")
+    result = sanitize_log_file(
+        args.input,
+        args.output,
+        workers=args.workers,
+        chunk_size=max(1, int(args.chunk_mb * 1024 * 1024))
+    )
+    if not result["success"]:
+        print(f"❌ Erro: {result['error']}")
+        raise SystemExit(1)
+
+    print(f"✅ {result['lines']} linhas ({result['lines_changed']} alteradas) em {result['elapsed_seconds']}s")
+    print(f"   Vazão: {result['mb_per_second']} MB/s com {result['workers']} processo(s)")
+    for name, count in result["pattern_hits"].items():
+        if count:
+            print(f"   {name}: {count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Pipeline Assíncrono de Logs - TarefaMágica
+Produtores só enfileiram registros; uma thread sanitiza, formata e grava em lote
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, List, Optional, Set
+
+from .log_sanitization import LogSanitizer, log_sanitizer
+
+# Pipelines iniciados e ainda não parados (seus handlers gravam nos arquivos de log ativos)
+running_pipelines: Set["LogPipeline"] = set()
+
+class LogOverflowPolicy(Enum):
+    BLOCK = "block"                # aguarda espaço (até o timeout), depois descarta
+    DROP_NEWEST = "drop_newest"    # descarta o registro que está chegando
+    DROP_OLDEST = "drop_oldest"    # descarta o registro mais antigo da fila
+
+class LogRecordQueue:
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        overflow_policy: LogOverflowPolicy = LogOverflowPolicy.BLOCK,
+        block_timeout_ms: int = 50
+    ):
+        """
+        Fila limitada de registros de log
+
+        Args:
+            capacity: Número máximo de registros em memória
+            batch_size: Tamanho do lote que acorda o consumidor
+            overflow_policy: Comportamento quando a fila está cheia
+            block_timeout_ms: Espera máxima do produtor na política BLOCK
+        """
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000.0
+
+        self._records: deque = deque()
+        self._unfinished = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.blocked_puts = 0
+        self.high_watermark = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, record: logging.LogRecord) -> bool:
+        """
+        Enfileira um registro
+
+        Returns:
+            bool: False se o registro foi descartado (fila fechada ou cheia)
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            if len(self._records) >= self.capacity:
+                if self.overflow_policy == LogOverflowPolicy.BLOCK:
+                    self.blocked_puts += 1
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._records) >= self.capacity and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+                    if len(self._records) >= self.capacity or self._closed:
+                        self.dropped += 1
+                        return False
+                elif self.overflow_policy == LogOverflowPolicy.DROP_OLDEST:
+                    self._records.popleft()
+                    self._unfinished -= 1
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return False
+
+            self._records.append(record)
+            self._unfinished += 1
+            self.enqueued += 1
+            size = len(self._records)
+            if size > self.high_watermark:
+                self.high_watermark = size
+            if size == 1 or size >= self.batch_size:
+                self._not_empty.notify()
+            return True
+
+    def get_batch(self, timeout: float) -> List[logging.LogRecord]:
+        """
+        Aguarda e retira um lote de registros
+
+        Retorna quando há `batch_size` registros, quando a fila é fechada
+        ou ao fim do `timeout` (com o que houver, possivelmente nada).
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while len(self._records) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+            return self._take(self.batch_size)
+
+    def drain(self) -> List[logging.LogRecord]:
+        """Retira todos os registros restantes"""
+        with self._lock:
+            return self._take(len(self._records))
+
+    def _take(self, count: int) -> List[logging.LogRecord]:
+        """Retira até `count` registros do início da fila (lock já adquirido)"""
+        records = self._records
+        batch = [records.popleft() for _ in range(min(count, len(records)))]
+        if batch:
+            self._not_full.notify_all()
+        return batch
+
+    def task_done(self, count: int):
+        """Marca `count` registros retirados como gravados"""
+        with self._lock:
+            self._unfinished -= count
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+
+    def join(self, timeout: float) -> bool:
+        """Aguarda até todos os registros enfileirados serem gravados"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._unfinished > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._all_done.wait(remaining)
+            return True
+
+    def close(self):
+        """Fecha a fila, acordando consumidor e produtores bloqueados"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+class QueueingHandler(logging.Handler):
+    def __init__(self, queue: LogRecordQueue):
+        """
+        Handler que apenas enfileira o registro cru
+
+        Diferente de `logging.handlers.QueueHandler`, não formata a mensagem
+        na thread que loga: `msg`, `args` e `exc_info` seguem intactos para
+        a thread de escrita, que sanitiza e formata. Objetos mutáveis
+        passados em `args` não devem ser alterados depois do log.
+        """
+        super().__init__()
+        self.queue = queue
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Sem o lock do handler: a fila já é thread-safe
+        if not self.filter(record):
+            return False
+        self.queue.put(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        self.queue.put(record)
+
+class LogPipeline:
+    def __init__(
+        self,
+        handlers: List[logging.Handler],
+        sanitizer: Optional[LogSanitizer] = log_sanitizer,
+        capacity: int = 10000,
+        batch_size: int = 256,
+        overflow_policy: LogOverflowPolicy = LogOverflowPolicy.BLOCK,
+        block_timeout_ms: int = 50,
+        max_latency_ms: int = 200
+    ):
+        """
+        Pipeline de logs fora da thread da requisição
+
+        Produtores chamam o `handler` (um QueueingHandler), que só coloca o
+        registro numa fila limitada. Uma thread retira lotes, sanitiza cada
+        registro com o `sanitizer`, formata e grava nos `handlers`;
+        StreamHandler/FileHandler recebem o lote numa única escrita e um
+        único flush. `stop` (registrado no atexit) grava tudo o que restou
+        na fila antes de o processo terminar.
+
+        Args:
+            handlers: Handlers de destino (arquivo, console, ...)
+            sanitizer: Sanitizador aplicado na thread de escrita (None desativa)
+            capacity: Número máximo de registros em memória
+            batch_size: Registros por lote
+            overflow_policy: Comportamento quando a fila está cheia
+            block_timeout_ms: Espera máxima do produtor na política BLOCK
+            max_latency_ms: Espera máxima de um registro até ser gravado
+        """
+        self.handlers = list(handlers)
+        self.sanitizer = sanitizer
+        self.max_latency = max_latency_ms / 1000.0
+        self.queue = LogRecordQueue(capacity, batch_size, overflow_policy, block_timeout_ms)
+        self.handler = QueueingHandler(self.queue)
+
+        self.batches = 0
+        self.written = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self):
+        """Inicia a thread de escrita"""
+        if self._thread is not None:
+            return
+        if self.sanitizer is not None:
+            self.sanitizer.deferred_handlers.add(self.handler)
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+        running_pipelines.add(self)
+        atexit.register(self.stop)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Aguarda a gravação de tudo o que já foi enfileirado
+
+        Returns:
+            bool: False se o timeout esgotou antes
+        """
+        return self.queue.join(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Para a thread de escrita, gravando todos os registros pendentes"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+        # Grava o que restou na fila (thread encerrada ou presa além do timeout)
+        remaining = self.queue.drain()
+        if remaining:
+            self._write(remaining)
+        if self.sanitizer is not None:
+            self.sanitizer.deferred_handlers.discard(self.handler)
+        running_pipelines.discard(self)
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def _run(self):
+        """Loop da thread de escrita"""
+        while True:
+            batch = self.queue.get_batch(self.max_latency)
+            if batch:
+                self._write(batch)
+            elif self.queue.closed:
+                break
+
+    def _write(self, batch: List[logging.LogRecord]):
+        """Sanitiza e grava um lote em todos os handlers"""
+        try:
+            if self.sanitizer is not None:
+                for record in batch:
+                    try:
+                        self.sanitizer.sanitize_log_record(record)
+                    except Exception as e:
+                        self.errors += 1
+                        logging.error(f"Erro ao sanitizar registro de log: {str(e)}")
+            for handler in self.handlers:
+                self._emit_batch(handler, batch)
+            self.batches += 1
+            self.written += len(batch)
+        finally:
+            self.queue.task_done(len(batch))
+
+    def _emit_batch(self, handler: logging.Handler, batch: List[logging.LogRecord]):
+        """Grava o lote num handler; arquivo/console numa única escrita"""
+        if type(handler) not in (logging.StreamHandler, logging.FileHandler):
+            # Handlers com lógica própria por registro (rotação, rede, ...)
+            for record in batch:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+
+        lines = []
+        for record in batch:
+            if record.levelno < handler.level or not handler.filter(record):
+                continue
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                self.errors += 1
+                handler.handleError(record)
+        if not lines:
+            return
+
+        handler.acquire()
+        try:
+            if handler.stream is None:
+                # FileHandler com delay=True ainda não abriu o arquivo
+                handler.stream = handler._open()
+            handler.stream.write("".join(lines))
+            handler.flush()
+        except Exception:
+            self.errors += 1
+            handler.handleError(batch[-1])
+        finally:
+            handler.release()
+
+    def stats(self) -> Dict:
+        """Estatísticas do pipeline"""
+        return {
+            "queued": len(self.queue),
+            "capacity": self.queue.capacity,
+            "overflow_policy": self.queue.overflow_policy.value,
+            "enqueued": self.queue.enqueued,
+            "written": self.written,
+            "dropped": self.queue.dropped,
+            "blocked_puts": self.queue.blocked_puts,
+            "high_watermark": self.queue.high_watermark,
+            "batches": self.batches,
+            "errors": self.errors,
+            "running": self._thread is not None and self._thread.is_alive()
+        }
+
+# Pipeline instalado no logger raiz por configure_logging
+_active_pipeline: Optional[LogPipeline] = None
+_config_lock = threading.Lock()
+
+def configure_logging(
+    filename: Optional[str] = None,
+    level: int = logging.INFO,
+    format: str = logging.BASIC_FORMAT,
+    handlers: Optional[List[logging.Handler]] = None,
+    sanitizer: Optional[LogSanitizer] = log_sanitizer,
+    overflow_policy: Optional[LogOverflowPolicy] = None
+) -> Optional[LogPipeline]:
+    """
+    Substituto de `logging.basicConfig` que grava fora da thread que loga
+
+    Como o basicConfig, não faz nada se o logger raiz já tem handlers. Se
+    não tem, cria os handlers de destino (`handlers`, ou um FileHandler
+    para `filename`, ou o console), liga-os a um LogPipeline e instala no
+    raiz apenas o QueueingHandler. Com ASYNC_LOGGING=false no ambiente,
+    delega ao basicConfig síncrono. A política de transbordo vem de
+    `overflow_policy` ou de LOG_OVERFLOW_POLICY (padrão: block).
+
+    Args:
+        filename: Arquivo de log
+        level: Nível do logger raiz
+        format: Formato das mensagens
+        handlers: Handlers de destino (exclusivo com `filename`)
+        sanitizer: Sanitizador aplicado na thread de escrita
+        overflow_policy: Comportamento quando a fila está cheia
+
+    Returns:
+        Optional[LogPipeline]: Pipeline ativo, ou None se o logging é síncrono
+    """
+    global _active_pipeline
+    root = logging.getLogger()
+    with _config_lock:
+        if root.handlers:
+            return _active_pipeline
+
+        if os.environ.get("ASYNC_LOGGING", "true").lower() in ("0", "false", "no"):
+            if handlers is not None:
+                logging.basicConfig(level=level, format=format, handlers=handlers)
+            else:
+                logging.basicConfig(filename=filename, level=level, format=format)
+            return None
+
+        if overflow_policy is None:
+            try:
+                overflow_policy = LogOverflowPolicy(os.environ.get("LOG_OVERFLOW_POLICY", LogOverflowPolicy.BLOCK.value))
+            except ValueError:
+                logging.error(f"Política de transbordo de logs inválida: {os.environ.get('LOG_OVERFLOW_POLICY')}")
+                overflow_policy = LogOverflowPolicy.BLOCK
+
+        if handlers is None:
+            handlers = [logging.FileHandler(filename) if filename else logging.StreamHandler()]
+        formatter = logging.Formatter(format)
+        for handler in handlers:
+            if handler.formatter is None:
+                handler.setFormatter(formatter)
+
+        pipeline = LogPipeline(handlers, sanitizer=sanitizer, overflow_policy=overflow_policy)
+        pipeline.start()
+        root.addHandler(pipeline.handler)
+        root.setLevel(level)
+        _active_pipeline = pipeline
+        return pipeline
+
+def get_log_pipeline() -> Optional[LogPipeline]:
+    """Pipeline instalado por configure_logging, se houver"""
+    return _active_pipeline
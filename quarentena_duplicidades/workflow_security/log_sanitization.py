@@ -6,8 +6,10 @@ Remove dados sensíveis dos logs antes do armazenamento
 import re
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
-from dataclasses import dataclass
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Iterable, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime
 import hashlib
 
@@ -18,6 +20,183 @@ class SensitivePattern:
     replacement: str
     description: str
     risk_level: str
+    # Pré-filtro: o padrão só é aplicado se algum literal aparecer no texto, se
+    # houver uma sequência de `digit_run` dígitos ou se `trigger_pattern` (regex
+    # barata) casar; sem nenhum gatilho o padrão é sempre aplicado
+    triggers: Tuple[str, ...] = ()
+    digit_run: int = 0
+    trigger_pattern: Optional[str] = None
+
+# Sequências de dígitos (gatilho `digit_run` dos padrões)
+_DIGIT_RUNS = re.compile(r'\d+')
+
+class CompiledPatterns:
+    def __init__(self, patterns: List[SensitivePattern]):
+        """
+        Conjunto de padrões sensíveis compilado
+
+        Cada padrão é compilado uma única vez. Antes de qualquer regex
+        completa, o pré-filtro de gatilhos (literais obrigatórios, sequências
+        mínimas de dígitos e regex baratas de cada padrão) diz se algum
+        padrão pode casar; se nenhum pode, o texto sai intacto (o caso
+        comum). Senão os padrões são aplicados em ordem, como antes, pulando
+        aqueles cujo gatilho não aparece. Os gatilhos são conferidos no
+        texto corrente, já com as substituições anteriores, pois uma
+        substituição pode fazer um padrão posterior casar.
+
+        Args:
+            patterns: Padrões na ordem de aplicação
+        """
+        self.patterns = tuple(patterns)
+        self.regexes = tuple(re.compile(p.pattern) for p in self.patterns)
+        self.triggers = tuple(
+            (p.triggers, p.digit_run, re.compile(p.trigger_pattern) if p.trigger_pattern else None)
+            for p in self.patterns
+        )
+        self.untriggered = tuple(not (t[0] or t[1] or t[2]) for t in self.triggers)
+
+        # União dos gatilhos, para descartar de uma vez textos que nenhum padrão casa
+        self._literals = tuple(dict.fromkeys(literal for t in self.triggers for literal in t[0]))
+        digit_runs = [t[1] for t in self.triggers if t[1]]
+        self._digit_probe = re.compile(rf'\d{{{min(digit_runs)}}}') if digit_runs else None
+        self._probes = tuple(t[2] for t in self.triggers if t[2] is not None)
+        self._always = any(self.untriggered)
+
+        # Estatísticas do pré-filtro (aproximadas sob concorrência)
+        self.strings_checked = 0
+        self.strings_skipped = 0
+        self.trigger_hits = [0] * len(self.patterns)
+        self.trigger_misses = [0] * len(self.patterns)
+        self.pattern_matches = [0] * len(self.patterns)
+
+    def may_match(self, text: str) -> bool:
+        """False se nenhum padrão pode casar no texto (gatilhos ausentes)"""
+        if self._always:
+            return True
+        for literal in self._literals:
+            if literal in text:
+                return True
+        if self._digit_probe is not None and self._digit_probe.search(text):
+            return True
+        for probe in self._probes:
+            if probe.search(text):
+                return True
+        return False
+
+    def _triggered(self, index: int, text: str, digit_run: int) -> bool:
+        """True se o gatilho do padrão aparece no texto (ou se ele não tem gatilho)"""
+        if self.untriggered[index]:
+            return True
+        literals, min_run, probe = self.triggers[index]
+        for literal in literals:
+            if literal in text:
+                return True
+        if min_run and digit_run >= min_run:
+            return True
+        return probe is not None and probe.search(text) is not None
+
+    def sanitize(self, text: str) -> str:
+        """Aplica os padrões ao texto com o mesmo resultado da substituição sequencial"""
+        self.strings_checked += 1
+        if not self.may_match(text):
+            self.strings_skipped += 1
+            return text
+        digit_run = None
+        for index, (pattern, regex) in enumerate(zip(self.patterns, self.regexes)):
+            if digit_run is None:
+                digit_run = max(map(len, _DIGIT_RUNS.findall(text)), default=0)
+            if not self._triggered(index, text, digit_run):
+                self.trigger_misses[index] += 1
+                continue
+            self.trigger_hits[index] += 1
+            text, count = regex.subn(pattern.replacement, text)
+            if count:
+                self.pattern_matches[index] += count
+                digit_run = None
+        return text
+
+    def stats(self) -> Dict:
+        """Razões de acerto do pré-filtro, no total e por padrão"""
+        checked = self.strings_checked
+        patterns = {}
+        for index, pattern in enumerate(self.patterns):
+            evaluated = self.trigger_hits[index] + self.trigger_misses[index]
+            patterns[pattern.name] = {
+                "has_trigger": not self.untriggered[index],
+                "trigger_hits": self.trigger_hits[index],
+                "trigger_misses": self.trigger_misses[index],
+                "trigger_hit_ratio": self.trigger_hits[index] / evaluated if evaluated else 0.0,
+                "matches": self.pattern_matches[index]
+            }
+        return {
+            "strings_checked": checked,
+            "strings_skipped": self.strings_skipped,
+            "skip_ratio": self.strings_skipped / checked if checked else 0.0,
+            "scan_ratio": (checked - self.strings_skipped) / checked if checked else 0.0,
+            "patterns": patterns
+        }
+
+class FieldMatcher:
+    def __init__(self, words: Iterable[str]):
+        """
+        Autômato de Aho–Corasick sobre o vocabulário de campos sensíveis
+
+        Responde numa única passada pelo nome se algum termo aparece nele
+        como substring, o mesmo que `any(termo in nome for termo in words)`.
+        As transições já incluem os links de falha, então cada caractere
+        custa um lookup em dicionário.
+
+        Args:
+            words: Termos do vocabulário
+        """
+        goto: List[Dict[str, int]] = [{}]
+        output = [False]
+        for word in words:
+            state = 0
+            for char in word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    goto.append({})
+                    output.append(False)
+                    next_state = len(goto) - 1
+                    goto[state][char] = next_state
+                state = next_state
+            output[state] = True
+
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [{} for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for char, next_state in goto[state].items():
+                fail[next_state] = delta[fail[state]].get(char, 0)
+                output[next_state] = output[next_state] or output[fail[next_state]]
+                queue.append(next_state)
+
+        self._delta = delta
+        self._output = output
+
+    def search(self, text: str) -> bool:
+        """True se algum termo aparece no texto"""
+        output = self._output
+        if output[0]:
+            return True
+        delta = self._delta
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
+
+@dataclass
+class RedactionPlan:
+    # chave do esquema -> (chave sanitizada, campo sensível, plano do valor)
+    fields: Dict[str, Tuple[str, bool, Optional["RedactionPlan"]]] = field(default_factory=dict)
+    # plano dos elementos, quando o valor é uma lista
+    items: Optional["RedactionPlan"] = None
 
 class LogSanitizer:
     def __init__(self):
@@ -32,7 +211,8 @@ class LogSanitizer:
                 pattern=r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b',
                 replacement="[CPF_REDACTED]",
                 description="Número de CPF",
-                risk_level="HIGH"
+                risk_level="HIGH",
+                digit_run=3
             ),
             
             # CNPJ (formato: 00.000.000/0000-00 ou 00000000000000)
@@ -41,7 +221,8 @@ class LogSanitizer:
                 pattern=r'\b\d{2}\.?\d{3}\.?\d{3}/?0001-?\d{2}\b',
                 replacement="[CNPJ_REDACTED]",
                 description="Número de CNPJ",
-                risk_level="HIGH"
+                risk_level="HIGH",
+                triggers=('0001',)
             ),
             
             # Email
@@ -50,7 +231,8 @@ class LogSanitizer:
                 pattern=r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
                 replacement="[EMAIL_REDACTED]",
                 description="Endereço de email",
-                risk_level="MEDIUM"
+                risk_level="MEDIUM",
+                triggers=('@',)
             ),
             
             # Telefone (formato: (00) 00000-0000 ou 00000000000)
@@ -59,7 +241,8 @@ class LogSanitizer:
                 pattern=r'\b\(?\d{2}\)?\s?\d{4,5}-?\d{4}\b',
                 replacement="[PHONE_REDACTED]",
                 description="Número de telefone",
-                risk_level="MEDIUM"
+                risk_level="MEDIUM",
+                digit_run=4
             ),
             
             # Chave PIX (formato: email, CPF, CNPJ, telefone, chave aleatória)
@@ -68,7 +251,10 @@ class LogSanitizer:
                 pattern=r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b|\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b|\b\d{2}\.?\d{3}\.?\d{3}/?0001-?\d{2}\b|\b\(?\d{2}\)?\s?\d{4,5}-?\d{4}\b|\b[A-Fa-f0-9]{8}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{12}\b',
                 replacement="[PIX_KEY_REDACTED]",
                 description="Chave PIX",
-                risk_level="HIGH"
+                risk_level="HIGH",
+                triggers=('@',),
+                digit_run=3,
+                trigger_pattern=r'-[A-Fa-f0-9]{4}-'
             ),
             
             # Senha (padrões comuns)
@@ -77,7 +263,8 @@ class LogSanitizer:
                 pattern=r'("password"\s*:\s*"[^"]*"|"senha"\s*:\s*"[^"]*"|"pass"\s*:\s*"[^"]*"|password\s*=\s*[^\s&]+|senha\s*=\s*[^\s&]+)',
                 replacement="[PASSWORD_REDACTED]",
                 description="Senha em texto plano",
-                risk_level="CRITICAL"
+                risk_level="CRITICAL",
+                triggers=('password', 'senha', '"pass"')
             ),
             
             # Token de autenticação
@@ -86,7 +273,8 @@ class LogSanitizer:
                 pattern=r'("token"\s*:\s*"[^"]*"|"access_token"\s*:\s*"[^"]*"|"refresh_token"\s*:\s*"[^"]*"|"api_key"\s*:\s*"[^"]*"|Bearer\s+[A-Za-z0-9._-]+)',
                 replacement="[TOKEN_REDACTED]",
                 description="Token de autenticação",
-                risk_level="HIGH"
+                risk_level="HIGH",
+                triggers=('token"', 'api_key"', 'Bearer')
             ),
             
             # Chave de API
@@ -95,7 +283,8 @@ class LogSanitizer:
                 pattern=r'("api_key"\s*:\s*"[^"]*"|"apikey"\s*:\s*"[^"]*"|"key"\s*:\s*"[^"]*"|api_key\s*=\s*[^\s&]+)',
                 replacement="[API_KEY_REDACTED]",
                 description="Chave de API",
-                risk_level="HIGH"
+                risk_level="HIGH",
+                triggers=('api_key', '"apikey"', '"key"')
             ),
             
             # Número de cartão de crédito (formato: 0000 0000 0000 0000)
@@ -104,7 +293,8 @@ class LogSanitizer:
                 pattern=r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b',
                 replacement="[CARD_REDACTED]",
                 description="Número de cartão de crédito",
-                risk_level="CRITICAL"
+                risk_level="CRITICAL",
+                digit_run=4
             ),
             
             # Endereço IP privado
@@ -113,7 +303,8 @@ class LogSanitizer:
                 pattern=r'\b(10\.\d{1,3}\.\d{1,3}\.\d{1,3}|172\.(1[6-9]|2[0-9]|3[0-1])\.\d{1,3}\.\d{1,3}|192\.168\.\d{1,3}\.\d{1,3})\b',
                 replacement="[PRIVATE_IP_REDACTED]",
                 description="Endereço IP privado",
-                risk_level="LOW"
+                risk_level="LOW",
+                triggers=('10.', '172.', '192.168.')
             ),
             
             # Nome completo (padrão: Nome Sobrenome)
@@ -122,7 +313,8 @@ class LogSanitizer:
                 pattern=r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\s+[A-Z][a-z]+\b',
                 replacement="[NAME_REDACTED]",
                 description="Nome completo",
-                risk_level="MEDIUM"
+                risk_level="MEDIUM",
+                trigger_pattern=r'[A-Z][a-z]+\s+[A-Z][a-z]+\s+[A-Z]'
             ),
             
             # Data de nascimento (formato: DD/MM/YYYY)
@@ -131,7 +323,8 @@ class LogSanitizer:
                 pattern=r'\b\d{2}/\d{2}/\d{4}\b',
                 replacement="[BIRTH_DATE_REDACTED]",
                 description="Data de nascimento",
-                risk_level="MEDIUM"
+                risk_level="MEDIUM",
+                trigger_pattern=r'/\d{2}/\d{4}'
             ),
             
             # Endereço (padrões comuns)
@@ -140,7 +333,8 @@ class LogSanitizer:
                 pattern=r'\b(Rua|Avenida|Av\.|Travessa|Trav\.|Alameda|Al\.|Praça|Pça\.)\s+[^,]+,\s*\d+',
                 replacement="[ADDRESS_REDACTED]",
                 description="Endereço residencial",
-                risk_level="MEDIUM"
+                risk_level="MEDIUM",
+                triggers=('Rua', 'Avenida', 'Av.', 'Travessa', 'Trav.', 'Alameda', 'Al.', 'Praça', 'Pça.')
             )
         ]
         
@@ -153,6 +347,25 @@ class LogSanitizer:
             'credit_card', 'cartao', 'card_number', 'pix_key'
         ]
         
+        # Padrões compilados (reconstruídos ao adicionar/remover padrões)
+        self._compiled = CompiledPatterns(self.sensitive_patterns)
+        self.strings_sanitized = 0
+        
+        # Decisões por nome de campo (chave sanitizada, sensível), em LRU limitado
+        self._field_matcher = FieldMatcher(self.sensitive_json_fields)
+        self._field_cache: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+        self._field_cache_size = 4096
+        self._field_lock = threading.Lock()
+        self.field_cache_hits = 0
+        self.field_cache_misses = 0
+        
+        # Esquemas registrados e seus planos de redação compilados
+        self._schemas: Dict[str, Any] = {}
+        self._plans: Dict[str, RedactionPlan] = {}
+        
+        # Handlers de LogPipeline ativos, que sanitizam na thread de escrita
+        self.deferred_handlers: set = set()
+        
         # Configuração de logging
         self.sanitization_logger = logging.getLogger('log_sanitization')
         self.sanitization_logger.setLevel(logging.INFO)
@@ -170,41 +383,42 @@ class LogSanitizer:
         if not text:
             return text
             
-        sanitized_text = text
-        
         # Aplica todos os padrões sensíveis
-        for pattern in self.sensitive_patterns:
-            sanitized_text = re.sub(pattern.pattern, pattern.replacement, sanitized_text)
+        sanitized_text = self._compiled.sanitize(text)
             
-        # Log de sanitização se houve mudanças
+        # Conta a sanitização; o log por string fica em DEBUG (era um INFO por linha de log)
         if sanitized_text != text:
-            self.sanitization_logger.info(f"Sanitização aplicada: {len(text)} -> {len(sanitized_text)} caracteres")
+            self.strings_sanitized += 1
+            if self.sanitization_logger.isEnabledFor(logging.DEBUG):
+                self.sanitization_logger.debug(f"Sanitização aplicada: {len(text)} -> {len(sanitized_text)} caracteres")
             
         return sanitized_text
         
-    def sanitize_json(self, data: Union[Dict, List, str]) -> Union[Dict, List, str]:
+    def sanitize_json(self, data: Union[Dict, List, str], schema: Optional[str] = None) -> Union[Dict, List, str]:
         """
         Sanitiza dados JSON removendo campos sensíveis
         
         Args:
             data: Dados JSON a serem sanitizados
+            schema: Nome de um esquema registrado com `register_schema` (opcional)
             
         Returns:
             Union[Dict, List, str]: Dados sanitizados
         """
+        plan = self._plan_for(schema) if schema is not None else None
         if isinstance(data, str):
             try:
                 # Tenta fazer parse do JSON
                 parsed_data = json.loads(data)
-                sanitized_data = self._sanitize_json_object(parsed_data)
+                sanitized_data = self._apply_plan(parsed_data, plan)
                 return json.dumps(sanitized_data, ensure_ascii=False)
             except json.JSONDecodeError:
                 # Se não for JSON válido, sanitiza como string
                 return self.sanitize_string(data)
         elif isinstance(data, dict):
-            return self._sanitize_json_object(data)
+            return self._apply_plan(data, plan)
         elif isinstance(data, list):
-            return [self.sanitize_json(item) for item in data]
+            return [self.sanitize_json(item, schema) for item in data]
         else:
             return data
             
@@ -221,11 +435,10 @@ class LogSanitizer:
         if isinstance(obj, dict):
             sanitized_obj = {}
             for key, value in obj.items():
-                # Sanitiza a chave
-                sanitized_key = self.sanitize_string(str(key))
+                # Sanitiza a chave e verifica se é um campo sensível
+                sanitized_key, sensitive = self._field_decision(key)
                 
-                # Verifica se é um campo sensível
-                if self._is_sensitive_field(sanitized_key):
+                if sensitive:
                     sanitized_obj[sanitized_key] = "[SENSITIVE_DATA_REDACTED]"
                 else:
                     # Sanitiza o valor recursivamente
@@ -239,6 +452,33 @@ class LogSanitizer:
         else:
             return obj
             
+    def _field_decision(self, key: Any) -> Tuple[str, bool]:
+        """
+        Chave sanitizada e sensibilidade de um campo, via cache LRU
+        
+        Args:
+            key: Nome do campo como veio no payload
+            
+        Returns:
+            Tuple[str, bool]: Chave sanitizada e se o campo é sensível
+        """
+        field_name = key if key.__class__ is str else str(key)
+        with self._field_lock:
+            decision = self._field_cache.get(field_name)
+            if decision is not None:
+                self._field_cache.move_to_end(field_name)
+                self.field_cache_hits += 1
+                return decision
+            self.field_cache_misses += 1
+            
+        sanitized_key = self.sanitize_string(field_name)
+        decision = (sanitized_key, self._is_sensitive_field(sanitized_key))
+        with self._field_lock:
+            self._field_cache[field_name] = decision
+            while len(self._field_cache) > self._field_cache_size:
+                self._field_cache.popitem(last=False)
+        return decision
+        
     def _is_sensitive_field(self, field_name: str) -> bool:
         """
         Verifica se um campo é sensível
@@ -249,8 +489,93 @@ class LogSanitizer:
         Returns:
             bool: True se for sensível
         """
-        field_lower = field_name.lower()
-        return any(sensitive_field in field_lower for sensitive_field in self.sensitive_json_fields)
+        return self._field_matcher.search(field_name.lower())
+        
+    def set_sensitive_fields(self, fields: List[str]):
+        """
+        Substitui o vocabulário de campos sensíveis
+        
+        Args:
+            fields: Termos que, presentes no nome do campo, o tornam sensível
+        """
+        self.sensitive_json_fields = list(fields)
+        self._field_matcher = FieldMatcher(self.sensitive_json_fields)
+        self._invalidate_field_decisions()
+        
+    def _invalidate_field_decisions(self):
+        """Descarta decisões por campo e planos compilados (padrões ou vocabulário mudaram)"""
+        with self._field_lock:
+            self._field_cache.clear()
+        self._plans = {}
+        
+    def register_schema(self, name: str, shape: Any) -> RedactionPlan:
+        """
+        Registra o formato de um payload e compila seu plano de redação
+        
+        O formato é um exemplo do payload (os valores só indicam o tipo:
+        dict aninhado, lista com um elemento de exemplo ou escalar). O plano
+        guarda, por caminho, a chave já sanitizada e se o campo é sensível,
+        então `sanitize_json(data, schema=name)` percorre o payload sem
+        decidir nada por chave. Campos fora do esquema e valores de outro
+        tipo seguem o caminho genérico, com o mesmo resultado.
+        
+        Args:
+            name: Nome do esquema
+            shape: Exemplo do payload
+            
+        Returns:
+            RedactionPlan: Plano compilado
+        """
+        self._schemas[name] = shape
+        plan = self._compile_plan(shape) or RedactionPlan()
+        self._plans[name] = plan
+        return plan
+        
+    def _plan_for(self, schema: str) -> Optional[RedactionPlan]:
+        """Plano do esquema, recompilado se os padrões mudaram; None se não registrado"""
+        plan = self._plans.get(schema)
+        if plan is None and schema in self._schemas:
+            plan = self.register_schema(schema, self._schemas[schema])
+        return plan
+        
+    def _compile_plan(self, shape: Any) -> Optional[RedactionPlan]:
+        """Compila o plano de um formato; None para escalares"""
+        if isinstance(shape, dict):
+            fields = {}
+            for key, value in shape.items():
+                sanitized_key, sensitive = self._field_decision(key)
+                fields[str(key)] = (sanitized_key, sensitive, None if sensitive else self._compile_plan(value))
+            return RedactionPlan(fields=fields)
+        if isinstance(shape, list) and shape:
+            return RedactionPlan(items=self._compile_plan(shape[0]))
+        return None
+        
+    def _apply_plan(self, obj: Any, plan: Optional[RedactionPlan]) -> Any:
+        """Sanitiza um objeto seguindo o plano (sem plano, caminho genérico)"""
+        if plan is None:
+            return self._sanitize_json_object(obj)
+        if isinstance(obj, dict):
+            fields = plan.fields
+            sanitized_obj = {}
+            for key, value in obj.items():
+                entry = fields.get(key) if key.__class__ is str else None
+                if entry is None:
+                    sanitized_key, sensitive = self._field_decision(key)
+                    child = None
+                else:
+                    sanitized_key, sensitive, child = entry
+                if sensitive:
+                    sanitized_obj[sanitized_key] = "[SENSITIVE_DATA_REDACTED]"
+                elif isinstance(value, str):
+                    sanitized_obj[sanitized_key] = self.sanitize_string(value)
+                elif isinstance(value, (dict, list)):
+                    sanitized_obj[sanitized_key] = self._apply_plan(value, child)
+                else:
+                    sanitized_obj[sanitized_key] = value
+            return sanitized_obj
+        if isinstance(obj, list):
+            return [self._apply_plan(item, plan.items) for item in obj]
+        return self._sanitize_json_object(obj)
         
     def sanitize_log_message(self, message: str, level: str = "INFO") -> str:
         """
@@ -290,6 +615,10 @@ class LogSanitizer:
         Returns:
             logging.LogRecord: Registro sanitizado
         """
+        # Registro já sanitizado (filtro síncrono e pipeline assíncrono no mesmo caminho)
+        if getattr(record, '_sanitized', False):
+            return record
+            
         # Sanitiza a mensagem
         record.msg = self.sanitize_log_message(str(record.msg), record.levelname)
         
@@ -300,8 +629,37 @@ class LogSanitizer:
             else:
                 record.args = self.sanitize_json(record.args)
                 
+        record._sanitized = True
         return record
         
+    def is_deferred_for(self, logger: logging.Logger) -> bool:
+        """
+        Verifica se a sanitização dos registros do logger pode ficar para o pipeline
+        
+        Só é o caso se todos os handlers alcançados pelo logger (ele e os
+        ancestrais, enquanto `propagate`) forem handlers de um LogPipeline
+        ativo; qualquer outro handler receberia o registro cru.
+        
+        Args:
+            logger: Logger de origem dos registros
+            
+        Returns:
+            bool: True se nenhum handler grava o registro sem sanitizá-lo
+        """
+        if not self.deferred_handlers:
+            return False
+        found = False
+        current = logger
+        while current is not None:
+            for handler in current.handlers:
+                if handler not in self.deferred_handlers:
+                    return False
+                found = True
+            if not current.propagate:
+                break
+            current = current.parent
+        return found
+        
     def create_sanitized_logger(self, name: str, level: int = logging.INFO) -> logging.Logger:
         """
         Cria um logger com sanitização automática
@@ -318,16 +676,20 @@ class LogSanitizer:
         
         # Adiciona filtro de sanitização
         class SanitizationFilter(logging.Filter):
-            def __init__(self, sanitizer):
+            def __init__(self, sanitizer, logger):
                 super().__init__()
                 self.sanitizer = sanitizer
+                self.logger = logger
                 
             def filter(self, record):
-                # Sanitiza o registro antes de ser processado
-                self.sanitizer.sanitize_log_record(record)
+                # Sanitiza o registro antes de ser processado; só quando todos
+                # os handlers são do pipeline assíncrono a sanitização fica
+                # para a thread de escrita
+                if not self.sanitizer.is_deferred_for(self.logger):
+                    self.sanitizer.sanitize_log_record(record)
                 return True
                 
-        logger.addFilter(SanitizationFilter(self))
+        logger.addFilter(SanitizationFilter(self, logger))
         
         return logger
         
@@ -355,10 +717,21 @@ class LogSanitizer:
                     "replacement": p.replacement
                 }
                 for p in self.sensitive_patterns
-            ]
+            ],
+            "strings_sanitized": self.strings_sanitized,
+            "prefilter": self._compiled.stats(),
+            "field_cache": {
+                "entries": len(self._field_cache),
+                "max_entries": self._field_cache_size,
+                "hits": self.field_cache_hits,
+                "misses": self.field_cache_misses
+            },
+            "schemas": sorted(self._schemas)
         }
         
-    def add_custom_pattern(self, name: str, pattern: str, replacement: str, description: str, risk_level: str = "MEDIUM"):
+    def add_custom_pattern(self, name: str, pattern: str, replacement: str, description: str, risk_level: str = "MEDIUM",
+                           triggers: Optional[List[str]] = None, digit_run: int = 0,
+                           trigger_pattern: Optional[str] = None):
         """
         Adiciona um padrão personalizado de sanitização
         
@@ -368,20 +741,31 @@ class LogSanitizer:
             replacement: Texto de substituição
             description: Descrição do padrão
             risk_level: Nível de risco (CRITICAL, HIGH, MEDIUM, LOW)
+            triggers: Literais dos quais ao menos um aparece em todo texto que casa
+            digit_run: Menor sequência de dígitos presente em todo texto que casa
+            trigger_pattern: Regex barata que casa em todo texto que casa com o padrão
+                (sem gatilhos o padrão é sempre aplicado e o pré-filtro deixa de descartar textos)
         """
         try:
             # Valida a expressão regular
             re.compile(pattern)
+            if trigger_pattern:
+                re.compile(trigger_pattern)
             
             custom_pattern = SensitivePattern(
                 name=name,
                 pattern=pattern,
                 replacement=replacement,
                 description=description,
-                risk_level=risk_level
+                risk_level=risk_level,
+                triggers=tuple(triggers or ()),
+                digit_run=digit_run,
+                trigger_pattern=trigger_pattern
             )
             
             self.sensitive_patterns.append(custom_pattern)
+            self._compiled = CompiledPatterns(self.sensitive_patterns)
+            self._invalidate_field_decisions()
             self.sanitization_logger.info(f"Padrão personalizado adicionado: {name}")
             
         except re.error as e:
@@ -400,6 +784,8 @@ class LogSanitizer:
         for i, pattern in enumerate(self.sensitive_patterns):
             if pattern.name == name:
                 removed_pattern = self.sensitive_patterns.pop(i)
+                self._compiled = CompiledPatterns(self.sensitive_patterns)
+                self._invalidate_field_decisions()
                 self.sanitization_logger.info(f"Padrão removido: {removed_pattern.name}")
                 return True
         return False
@@ -423,8 +809,8 @@ class LogSanitizer:
         
         # Identifica padrões aplicados
         test_str = json.dumps(test_data)
-        for pattern in self.sensitive_patterns:
-            if re.search(pattern.pattern, test_str):
+        for pattern, regex in zip(self._compiled.patterns, self._compiled.regexes):
+            if regex.search(test_str):
                 results["patterns_applied"].append({
                     "name": pattern.name,
                     "description": pattern.description,
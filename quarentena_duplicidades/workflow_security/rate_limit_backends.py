@@ -0,0 +1,1216 @@
+"""
+Backends de Estado do Rate Limiting - TarefaMágica
+Estado compartilhado entre processos: memória mapeada (mesmo host) e Redis (scripts atômicos)
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from lupa import lua51
+except ImportError:  # dependência de desenvolvimento (LocalRedisStandIn)
+    lua51 = None
+
+# Códigos de decisão devolvidos pelos backends (a mensagem é montada pelo RateLimiter)
+DECISION_OK = "ok"
+DECISION_RESET = "reset"  # janela expirou e o contador recomeçou
+DECISION_WARNING = "warning"  # valor: tentativas restantes
+DECISION_BLOCKED = "blocked"  # valor: segundos restantes de bloqueio
+DECISION_EXCEEDED = "exceeded"  # bloqueio iniciado agora
+DECISION_RETRY = "retry"  # GCRA; valor: segundos até a próxima requisição aceita
+
+# Tolerância do GCRA a erros de arredondamento ao somar intervalos
+GCRA_EPSILON = 1e-6
+
+# Tipos que recusam (falham fechados) uma chave nova quando a tabela
+# compartilhada não tem mais slot que possa ser despejado
+FAIL_CLOSED_TYPES = frozenset(("login_attempts", "password_reset", "two_factor_attempts", "financial_transactions"))
+
+# Estado de janela fixa: (tentativas, primeira, última, bloqueado_até ou 0.0)
+FixedWindowState = Tuple[int, float, float, float]
+
+# ----------------------------------------------------------------------
+# Transições de estado
+#
+# Mesma semântica do RateLimiter em memória. São usadas pelo backend de
+# memória mapeada; os scripts Lua abaixo são a tradução direta destas
+# funções (tests/test_rate_limit_backends.py compara os três backends).
+# ----------------------------------------------------------------------
+
+def is_gcra(config) -> bool:
+    """Verifica se a configuração usa o GCRA"""
+    return config.algorithm.value == "gcra"
+
+def warning_at(config) -> int:
+    """Número de tentativas a partir do qual a decisão vem com aviso"""
+    return int(config.max_attempts * config.warning_threshold)
+
+def fixed_window_check(state: Optional[FixedWindowState], now: float, config, cost: int = 1) -> Tuple[Optional[FixedWindowState], bool, str, float]:
+    """
+    Verificação na janela fixa
+
+    Args:
+        cost: Tentativas consumidas pela requisição
+
+    Returns:
+        Tuple: (novo estado ou None se inalterado, permitido, código, valor)
+    """
+    if state is None:
+        return (cost, now, now, 0.0), True, DECISION_OK, 0
+    attempts, first, last, blocked = state
+    if now - first > config.window_seconds:
+        return (cost, now, now, 0.0), True, DECISION_RESET, 0
+    if blocked and now < blocked:
+        return None, False, DECISION_BLOCKED, blocked - now
+    if attempts + cost > config.max_attempts:
+        return (attempts, first, last, now + config.block_duration_seconds), False, DECISION_EXCEEDED, config.block_duration_seconds
+    attempts += cost
+    if attempts >= warning_at(config):
+        return (attempts, first, now, blocked), True, DECISION_WARNING, config.max_attempts - attempts
+    return (attempts, first, now, blocked), True, DECISION_OK, 0
+
+def fixed_window_record(state: Optional[FixedWindowState], now: float, config, success: bool, cost: int = 1) -> FixedWindowState:
+    """Registro de tentativa na janela fixa (janela expirada recomeça, como na verificação)"""
+    if state is None or now - state[1] > config.window_seconds:
+        return (cost, now, now, 0.0)
+    attempts, first, _, blocked = state
+    attempts += cost
+    if success and attempts > 1:
+        attempts = max(1, attempts - 1)
+    return (attempts, first, now, blocked)
+
+def gcra_check(tat: Optional[float], now: float, config, cost: int = 1) -> Tuple[Optional[float], bool, str, float]:
+    """
+    Verificação pelo GCRA
+
+    Args:
+        cost: Intervalos consumidos pela requisição
+
+    Returns:
+        Tuple: (novo TAT ou None se inalterado, permitido, código, valor)
+    """
+    interval = config.window_seconds / config.max_attempts
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + interval * cost
+    if new_tat - now > config.window_seconds + GCRA_EPSILON:
+        return None, False, DECISION_RETRY, new_tat - config.window_seconds - now
+    remaining = int((now + config.window_seconds - new_tat) / interval + GCRA_EPSILON)
+    if config.max_attempts - remaining >= warning_at(config):
+        return new_tat, True, DECISION_WARNING, remaining
+    return new_tat, True, DECISION_OK, 0
+
+def gcra_record(tat: Optional[float], now: float, config, cost: int = 1) -> float:
+    """
+    Tentativa não bem-sucedida no GCRA: ocupa um intervalo (por unidade de custo)
+
+    O TAT nunca passa de agora + window_seconds: falhas seguidas esgotam a
+    rajada, mas a próxima requisição volta a ser aceita após um intervalo.
+    """
+    if tat is None or tat < now:
+        tat = now
+    return min(tat + config.window_seconds / config.max_attempts * cost, now + config.window_seconds)
+
+def decision_summary(state: Any, now: float, config, allowed: bool, cost: int = 1) -> Tuple[int, float, float]:
+    """
+    Resumo do estado após a decisão
+
+    Args:
+        cost: Peso da requisição (no GCRA, a espera é até caberem `cost` intervalos)
+
+    Returns:
+        Tuple[int, float, float]: (tentativas restantes, segundos até a
+        janela/rajada completa, segundos até a próxima aceita)
+    """
+    if state.__class__ is float:
+        interval = config.window_seconds / config.max_attempts
+        tat = max(state, now)
+        remaining = max(0, int((now + config.window_seconds - tat) / interval + GCRA_EPSILON))
+        retry_after = 0.0 if allowed else max(0.0, tat + interval * cost - config.window_seconds - now)
+        return remaining, tat - now, retry_after
+    attempts, first, _, blocked = state
+    window_end = first + config.window_seconds
+    # O fim da janela também encerra o bloqueio (o contador recomeça)
+    retry_after = 0.0 if allowed else max(0.0, min(blocked or window_end, window_end) - now)
+    return max(0, config.max_attempts - attempts), max(0.0, window_end - now), retry_after
+
+def check_transition(previous: Any, now: float, config, penalize: bool, cost: int = 1) -> Tuple[Any, tuple]:
+    """
+    Verificação completa de uma chave
+
+    Com `penalize`, a tentativa recusada na janela fixa também é
+    registrada, como record_attempt(success=False) logo após a verificação.
+    No GCRA a recusa não altera o TAT: um cliente acima do limite continua
+    sendo atendido na vazão configurada, em vez de empurrar o TAT
+    indefinidamente. `cost` é o peso da requisição (tentativas/intervalos
+    consumidos).
+
+    Returns:
+        Tuple: (novo estado ou None se inalterado, (permitido, código, valor,
+        restantes, segundos até o reset, segundos até a próxima aceita))
+    """
+    gcra = is_gcra(config)
+    state, allowed, code, value = (gcra_check if gcra else fixed_window_check)(previous, now, config, cost)
+    if penalize and not allowed and not gcra:
+        state = fixed_window_record(state if state is not None else previous, now, config, False, cost)
+    remaining, reset_after, retry_after = decision_summary(state if state is not None else previous, now, config, allowed, cost)
+    return state, (allowed, code, value, remaining, reset_after, retry_after)
+
+def state_expiry(state: Any, config) -> float:
+    """
+    Instante após o qual o estado equivale a uma chave nova
+
+    Na janela fixa, em `now == expiração` a janela ainda vale (a
+    verificação só recomeça com `now - first > window`): o estado só pode
+    ser descartado com a expiração estritamente no passado.
+    """
+    if state.__class__ is float:
+        return state
+    return state[1] + config.window_seconds
+
+class RateLimitBackend(ABC):
+    """
+    Interface dos backends de estado
+
+    `check_many` aplica as verificações de forma atômica e devolve, para
+    cada uma, (permitido, código, valor, restantes, segundos até o reset,
+    segundos até a próxima aceita); com `penalize`, recusas na janela fixa
+    também são registradas como tentativas (ver `check_transition`).
+    `record` pode ser adiado e enviado junto com a próxima operação (ver
+    `flush`).
+    Estados devolvidos por `get` e `items` são `FixedWindowState` ou um
+    float (TAT do GCRA), com instantes no relógio de `clock`.
+    """
+    name = "base"
+
+    def clock(self) -> float:
+        """Relógio usado nos instantes do estado"""
+        return time.time()
+
+    def bind(self, type_values: Sequence[str]):
+        """Recebe os tipos de limite conhecidos (em ordem estável)"""
+
+    def check(self, type_value: str, identifier: str, config) -> Tuple[bool, str, float]:
+        return self.check_many([(type_value, identifier, config)])[0][:3]
+
+    @abstractmethod
+    def check_many(self, requests: Sequence[Tuple[str, str, Any]], penalize: bool = False, cost: int = 1) -> List[tuple]:
+        """Verifica as chaves de forma atômica (uma tupla de decisão por requisição)"""
+
+    @abstractmethod
+    def record(self, type_value: str, identifier: str, config, success: bool):
+        """Registra uma tentativa (pode ser adiado até o próximo `flush`)"""
+
+    @abstractmethod
+    def get(self, type_value: str, identifier: str, config) -> Any:
+        """Estado atual da chave, ou None"""
+
+    @abstractmethod
+    def delete(self, type_value: str, identifier: str):
+        """Remove o estado da chave"""
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[Tuple[str, Optional[str]], Any]]:
+        """Estados não expirados, com (tipo, identificador ou None)"""
+
+    def cleanup(self) -> int:
+        """Descarta estados expirados; retorna quantos foram removidos"""
+        return 0
+
+    def flush(self):
+        """Envia operações adiadas"""
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+    def close(self):
+        self.flush()
+
+# ----------------------------------------------------------------------
+# Memória mapeada (processos do mesmo host)
+# ----------------------------------------------------------------------
+
+_SHM_MAGIC = b"TMRL"
+_SHM_VERSION = 1
+_SHM_HEADER = struct.Struct("<4sIII")  # magic, versão, slots, partes
+_SHM_HEADER_SIZE = 64
+# digest, tipo de estado, índice do tipo de limite, tentativas, primeira, última, bloqueio, expiração
+_SHM_SLOT = struct.Struct("<16sBBxxidddd")
+_SHM_SLOT_SIZE = 64
+
+_SLOT_EMPTY = 0
+_SLOT_FIXED = 1
+_SLOT_GCRA = 2
+_SLOT_DELETED = 3
+
+class SharedMemoryBackend(RateLimitBackend):
+    name = "shared_memory"
+
+    def __init__(self, path: str, slots: int = 65536, stripes: int = 64):
+        """
+        Estado em arquivo mapeado em memória, compartilhado pelos workers
+
+        O arquivo é uma tabela hash de endereçamento aberto com slots de
+        tamanho fixo (digest de 16 bytes da chave e o estado). A tabela é
+        dividida em `stripes` partes contíguas; cada chave fica sempre na
+        mesma parte, protegida por um lock de região (fcntl) entre processos
+        e por um lock de thread dentro do processo. Os instantes são
+        `time.time()`, válidos entre processos e reinícios.
+
+        Args:
+            path: Arquivo da tabela (de preferência em tmpfs, ex.: /dev/shm)
+            slots: Número de slots, usado apenas na criação do arquivo
+            stripes: Número de partes, usado apenas na criação do arquivo
+        """
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryBackend requer fcntl (POSIX)")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        # Criação/validação do cabeçalho sob lock da região do cabeçalho
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _SHM_HEADER_SIZE, 0)
+        try:
+            header = os.pread(self._fd, _SHM_HEADER.size, 0)
+            if len(header) == _SHM_HEADER.size and header[:4] == _SHM_MAGIC:
+                _, version, slots, stripes = _SHM_HEADER.unpack(header)
+                if version != _SHM_VERSION:
+                    raise RuntimeError(f"Versão de tabela de rate limit não suportada: {version}")
+            else:
+                stripes = max(1, stripes)
+                slots = max(stripes, slots - slots % stripes)
+                os.ftruncate(self._fd, _SHM_HEADER_SIZE + slots * _SHM_SLOT_SIZE)
+                os.pwrite(self._fd, _SHM_HEADER.pack(_SHM_MAGIC, _SHM_VERSION, slots, stripes), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _SHM_HEADER_SIZE, 0)
+
+        self.slots = slots
+        self.stripes = stripes
+        self._stripe_slots = slots // stripes
+        self._map = mmap.mmap(self._fd, _SHM_HEADER_SIZE + slots * _SHM_SLOT_SIZE)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._type_index: Dict[str, int] = {}
+        self._type_values: List[str] = []
+        self.evictions = 0
+        self.rejected = 0
+
+    def bind(self, type_values: Sequence[str]):
+        self._type_values = list(type_values)
+        self._type_index = {value: index for index, value in enumerate(self._type_values)}
+
+    # ------------------------------------------------------------------
+    # Tabela
+    # ------------------------------------------------------------------
+
+    def _locate(self, type_value: str, identifier: str) -> Tuple[bytes, int, int]:
+        """(digest, parte, slot inicial na parte) da chave"""
+        digest = hashlib.blake2b(f"{type_value}\0{identifier}".encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        stripe = int.from_bytes(digest[:4], 'little') % self.stripes
+        start = int.from_bytes(digest[4:8], 'little') % self._stripe_slots
+        return digest, stripe, start
+
+    def _lock(self, stripe: int):
+        """Trava a parte (thread e processo)"""
+        self._locks[stripe].acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._stripe_slots * _SHM_SLOT_SIZE,
+                        _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE)
+        except Exception:
+            self._locks[stripe].release()
+            raise
+
+    def _unlock(self, stripe: int):
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self._stripe_slots * _SHM_SLOT_SIZE,
+                        _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE)
+        finally:
+            self._locks[stripe].release()
+
+    def _find(self, digest: bytes, stripe: int, start: int, now: float, fail_closed: bool = False) -> Tuple[int, Optional[tuple]]:
+        """
+        Procura a chave na parte (chamado com o lock)
+
+        Com a parte cheia de chaves vivas, o slot para inserção é o da
+        chave não bloqueada que expira primeiro (despejada na gravação).
+        Chaves bloqueadas só são despejadas por chaves novas de tipos fora
+        de FAIL_CLOSED_TYPES, e nunca as desses tipos: girar
+        identificadores não desbloqueia um login, 2FA ou transação.
+
+        Args:
+            fail_closed: Se a chave é de um tipo de FAIL_CLOSED_TYPES
+
+        Returns:
+            Tuple[int, Optional[tuple]]: (offset do slot, campos do slot) se
+            encontrada; senão (offset para inserção ou -1 se não há slot
+            despejável, None)
+        """
+        base = _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE
+        stripe_slots = self._stripe_slots
+        free = -1
+        victim = blocked_victim = -1
+        victim_expiry = blocked_expiry = 0.0
+        for probe in range(stripe_slots):
+            offset = base + ((start + probe) % stripe_slots) * _SHM_SLOT_SIZE
+            fields = _SHM_SLOT.unpack_from(self._map, offset)
+            kind = fields[1]
+            if kind == _SLOT_EMPTY:
+                return (free if free >= 0 else offset), None
+            if fields[0] == digest and kind != _SLOT_DELETED:
+                return offset, fields
+            if free >= 0:
+                continue
+            if kind == _SLOT_DELETED or fields[7] < now:
+                free = offset
+            elif kind == _SLOT_FIXED and fields[6] > now:
+                if fail_closed or self._fails_closed(fields[2]):
+                    continue
+                if blocked_victim < 0 or fields[7] < blocked_expiry:
+                    blocked_victim, blocked_expiry = offset, fields[7]
+            elif victim < 0 or fields[7] < victim_expiry:
+                victim, victim_expiry = offset, fields[7]
+        if free >= 0:
+            return free, None
+        return (victim if victim >= 0 else blocked_victim), None
+
+    def _fails_closed(self, type_index: int) -> bool:
+        """Se o slot é de um tipo de FAIL_CLOSED_TYPES"""
+        return type_index < len(self._type_values) and self._type_values[type_index] in FAIL_CLOSED_TYPES
+
+    def _next_expiry(self, stripe: int, now: float) -> float:
+        """Segundos até o primeiro slot da parte expirar (chamado com o lock)"""
+        base = _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE
+        expiries = [_SHM_SLOT.unpack_from(self._map, base + slot * _SHM_SLOT_SIZE)[7] for slot in range(self._stripe_slots)]
+        return max(0.0, min(expiries) - now)
+
+    def _state(self, fields: Optional[tuple], gcra: bool) -> Any:
+        """Estado do slot para o algoritmo (slot de outro algoritmo equivale a ausente)"""
+        if fields is None:
+            return None
+        if gcra:
+            return fields[4] if fields[1] == _SLOT_GCRA else None
+        if fields[1] != _SLOT_FIXED:
+            return None
+        return (fields[3], fields[4], fields[5], fields[6])
+
+    def _write(self, offset: int, digest: bytes, type_value: str, state: Any, config):
+        """Grava o estado no slot (chamado com o lock)"""
+        kind = self._map[offset + 16]
+        if kind in (_SLOT_FIXED, _SLOT_GCRA) and self._map[offset:offset + 16] != digest:
+            if _SHM_SLOT.unpack_from(self._map, offset)[7] >= time.time():
+                self.evictions += 1
+        type_index = self._type_index.get(type_value, 255)
+        if state.__class__ is float:
+            _SHM_SLOT.pack_into(self._map, offset, digest, _SLOT_GCRA, type_index, 0, state, 0.0, 0.0, state)
+        else:
+            _SHM_SLOT.pack_into(self._map, offset, digest, _SLOT_FIXED, type_index, state[0], state[1], state[2],
+                                state[3], state_expiry(state, config))
+
+    # ------------------------------------------------------------------
+    # Operações
+    # ------------------------------------------------------------------
+
+    def check_many(self, requests: Sequence[Tuple[str, str, Any]], penalize: bool = False, cost: int = 1) -> List[tuple]:
+        """Verifica várias chaves, travando cada parte uma única vez"""
+        located = [self._locate(type_value, identifier) for type_value, identifier, _ in requests]
+        order = sorted(range(len(requests)), key=lambda index: located[index][1])
+        results: List[Optional[tuple]] = [None] * len(requests)
+
+        position = 0
+        while position < len(order):
+            stripe = located[order[position]][1]
+            self._lock(stripe)
+            try:
+                now = time.time()
+                while position < len(order) and located[order[position]][1] == stripe:
+                    index = order[position]
+                    type_value, _, config = requests[index]
+                    digest, _, start = located[index]
+                    offset, fields = self._find(digest, stripe, start, now, type_value in FAIL_CLOSED_TYPES)
+                    state, results[index] = check_transition(self._state(fields, is_gcra(config)), now, config, penalize, cost)
+                    if state is not None:
+                        if offset < 0:
+                            # Nenhum slot despejável: a chave nova é recusada (falha fechada)
+                            self.rejected += 1
+                            wait = self._next_expiry(stripe, now)
+                            results[index] = (False, DECISION_RETRY, wait, 0, wait, wait)
+                        else:
+                            self._write(offset, digest, type_value, state, config)
+                    position += 1
+            finally:
+                self._unlock(stripe)
+        return results
+
+    def record(self, type_value: str, identifier: str, config, success: bool):
+        gcra = is_gcra(config)
+        if gcra and success:
+            return
+        digest, stripe, start = self._locate(type_value, identifier)
+        self._lock(stripe)
+        try:
+            now = time.time()
+            offset, fields = self._find(digest, stripe, start, now, type_value in FAIL_CLOSED_TYPES)
+            if offset < 0:
+                self.rejected += 1
+                return
+            state = self._state(fields, gcra)
+            state = gcra_record(state, now, config) if gcra else fixed_window_record(state, now, config, success)
+            self._write(offset, digest, type_value, state, config)
+        finally:
+            self._unlock(stripe)
+
+    def get(self, type_value: str, identifier: str, config) -> Any:
+        digest, stripe, start = self._locate(type_value, identifier)
+        self._lock(stripe)
+        try:
+            _, fields = self._find(digest, stripe, start, time.time())
+        finally:
+            self._unlock(stripe)
+        return self._state(fields, is_gcra(config))
+
+    def delete(self, type_value: str, identifier: str):
+        digest, stripe, start = self._locate(type_value, identifier)
+        self._lock(stripe)
+        try:
+            offset, fields = self._find(digest, stripe, start, time.time())
+            if fields is not None:
+                self._map[offset + 16] = _SLOT_DELETED
+        finally:
+            self._unlock(stripe)
+
+    def items(self) -> Iterator[Tuple[Tuple[str, Optional[str]], Any]]:
+        """Estados não expirados (o identificador não é recuperável do digest)"""
+        for stripe in range(self.stripes):
+            base = _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE
+            found = []
+            self._lock(stripe)
+            try:
+                now = time.time()
+                for slot in range(self._stripe_slots):
+                    fields = _SHM_SLOT.unpack_from(self._map, base + slot * _SHM_SLOT_SIZE)
+                    if fields[1] in (_SLOT_FIXED, _SLOT_GCRA) and fields[7] >= now and fields[2] < len(self._type_values):
+                        found.append(fields)
+            finally:
+                self._unlock(stripe)
+            for fields in found:
+                yield (self._type_values[fields[2]], None), self._state(fields, fields[1] == _SLOT_GCRA)
+
+    def cleanup(self) -> int:
+        """
+        Compacta cada parte: remove expirados e marcas de remoção
+
+        As chaves vivas são reinseridas, o que mantém curtas as sequências
+        de sondagem das buscas.
+        """
+        removed = 0
+        for stripe in range(self.stripes):
+            base = _SHM_HEADER_SIZE + stripe * self._stripe_slots * _SHM_SLOT_SIZE
+            size = self._stripe_slots * _SHM_SLOT_SIZE
+            self._lock(stripe)
+            try:
+                now = time.time()
+                live = []
+                dirty = False
+                for slot in range(self._stripe_slots):
+                    raw = self._map[base + slot * _SHM_SLOT_SIZE:base + (slot + 1) * _SHM_SLOT_SIZE]
+                    kind = raw[16]
+                    if kind == _SLOT_EMPTY:
+                        continue
+                    if kind == _SLOT_DELETED or _SHM_SLOT.unpack_from(raw)[7] < now:
+                        dirty = True
+                        if kind != _SLOT_DELETED:
+                            removed += 1
+                        continue
+                    live.append(raw)
+                if dirty:
+                    self._map[base:base + size] = bytes(size)
+                    for raw in live:
+                        start = int.from_bytes(raw[4:8], 'little') % self._stripe_slots
+                        for probe in range(self._stripe_slots):
+                            offset = base + ((start + probe) % self._stripe_slots) * _SHM_SLOT_SIZE
+                            if self._map[offset + 16] == _SLOT_EMPTY:
+                                self._map[offset:offset + _SHM_SLOT_SIZE] = raw
+                                break
+            finally:
+                self._unlock(stripe)
+        return removed
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "path": self.path, "slots": self.slots, "stripes": self.stripes,
+                "evictions": self.evictions, "rejected": self.rejected}
+
+    def close(self):
+        try:
+            self._map.close()
+        finally:
+            os.close(self._fd)
+
+# ----------------------------------------------------------------------
+# Redis (protocolo RESP)
+# ----------------------------------------------------------------------
+
+class RespError(Exception):
+    """Resposta de erro do servidor"""
+
+def _encode_command(args: Sequence[Any]) -> bytes:
+    """Codifica um comando RESP (array de bulk strings)"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+def _read_reply(stream) -> Any:
+    """Lê uma resposta RESP; erros são devolvidos como RespError (não lançados)"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Conexão encerrada pelo servidor")
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b"+":
+        return payload.decode('utf-8')
+    if prefix == b"-":
+        return RespError(payload.decode('utf-8'))
+    if prefix == b":":
+        return int(payload)
+    if prefix == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [_read_reply(stream) for _ in range(length)]
+    raise ConnectionError(f"Resposta RESP inválida: {line!r}")
+
+class RespConnection:
+    def __init__(self, host: str, port: int, timeout: float):
+        """Conexão RESP com envio em pipeline"""
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._stream = self._socket.makefile('rb')
+
+    def execute_many(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Envia todos os comandos de uma vez e lê as respostas (uma ida e volta)"""
+        self._socket.sendall(b"".join(_encode_command(command) for command in commands))
+        return [_read_reply(self._stream) for _ in commands]
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._socket.close()
+
+# Scripts atômicos (tradução de fixed_window_check/record e gcra_check/record).
+# O instante vem do relógio do servidor, comum a todos os workers e hosts.
+_LUA_NOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local function fmt(x) return string.format('%.6f', x) end
+"""
+
+_LUA_FIXED_CHECK = _LUA_NOW + """
+local max_attempts, window = tonumber(ARGV[1]), tonumber(ARGV[2])
+local block, warn_at = tonumber(ARGV[3]), tonumber(ARGV[4])
+local cost = tonumber(ARGV[6])
+local s = redis.call('HMGET', KEYS[1], 'a', 'f', 'b')
+local attempts, first, blocked = tonumber(s[1]), tonumber(s[2]), tonumber(s[3]) or 0
+local allowed, code, value = 1, 'ok', 0
+if attempts == nil or now - first > window then
+  if attempts ~= nil then code = 'reset' end
+  attempts, first, blocked = cost, now, 0
+  redis.call('HSET', KEYS[1], 'a', cost, 'f', fmt(now), 'l', fmt(now), 'b', '0')
+  redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000) + 1000)
+elseif blocked > 0 and now < blocked then
+  allowed, code, value = 0, 'blocked', blocked - now
+elseif attempts + cost > max_attempts then
+  blocked = now + block
+  allowed, code, value = 0, 'exceeded', block
+  redis.call('HSET', KEYS[1], 'b', fmt(blocked))
+else
+  attempts = attempts + cost
+  redis.call('HSET', KEYS[1], 'a', attempts, 'l', fmt(now))
+  if attempts >= warn_at then code, value = 'warning', max_attempts - attempts end
+end
+if allowed == 0 and ARGV[5] == '1' then
+  attempts = attempts + cost
+  redis.call('HSET', KEYS[1], 'a', attempts, 'l', fmt(now))
+end
+local window_end = first + window
+local retry_after = 0
+if allowed == 0 then retry_after = math.max(0, math.min(blocked, window_end) - now) end
+return {allowed, code, fmt(value), math.max(0, max_attempts - attempts), fmt(math.max(0, window_end - now)), fmt(retry_after)}
+"""
+
+_LUA_FIXED_RECORD = _LUA_NOW + """
+local s = redis.call('HMGET', KEYS[1], 'a', 'f')
+local attempts, first = tonumber(s[1]), tonumber(s[2])
+if attempts == nil or now - first > tonumber(ARGV[2]) then
+  redis.call('HSET', KEYS[1], 'a', 1, 'f', fmt(now), 'l', fmt(now), 'b', '0')
+  redis.call('PEXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) * 1000) + 1000)
+  return 1
+end
+attempts = attempts + 1
+if ARGV[1] == '1' and attempts > 1 then
+  attempts = math.max(1, attempts - 1)
+end
+redis.call('HSET', KEYS[1], 'a', attempts, 'l', fmt(now))
+return attempts
+"""
+
+_LUA_GCRA_CHECK = _LUA_NOW + """
+local interval, window = tonumber(ARGV[1]), tonumber(ARGV[2])
+local max_attempts, warn_at = tonumber(ARGV[3]), tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then tat = now end
+local new_tat = tat + interval * tonumber(ARGV[5])
+local allowed, code, value = 1, 'ok', 0
+if new_tat - now > window + 1e-6 then
+  allowed, code, value = 0, 'retry', new_tat - window - now
+else
+  tat = new_tat
+  redis.call('SET', KEYS[1], fmt(tat), 'PX', math.ceil((tat - now) * 1000) + 1000)
+end
+local remaining = math.max(0, math.floor((now + window - tat) / interval + 1e-6))
+if allowed == 1 and max_attempts - remaining >= warn_at then code, value = 'warning', remaining end
+local retry_after = 0
+if allowed == 0 then retry_after = math.max(0, tat + interval * tonumber(ARGV[5]) - window - now) end
+return {allowed, code, fmt(value), remaining, fmt(tat - now), fmt(retry_after)}
+"""
+
+_LUA_GCRA_RECORD = _LUA_NOW + """
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then tat = now end
+tat = math.min(tat + tonumber(ARGV[1]), now + tonumber(ARGV[2]))
+redis.call('SET', KEYS[1], fmt(tat), 'PX', math.ceil((tat - now) * 1000) + 1000)
+return 1
+"""
+
+_SCRIPTS = {
+    "fixed_check": _LUA_FIXED_CHECK,
+    "fixed_record": _LUA_FIXED_RECORD,
+    "gcra_check": _LUA_GCRA_CHECK,
+    "gcra_record": _LUA_GCRA_RECORD,
+}
+_SCRIPT_SHAS = {name: hashlib.sha1(source.encode('utf-8')).hexdigest() for name, source in _SCRIPTS.items()}
+
+class RedisBackend(RateLimitBackend):
+    name = "redis"
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        password: Optional[str] = None,
+        db: int = 0,
+        key_prefix: str = "tarefamagica:ratelimit:",
+        timeout: float = 0.5,
+        flush_interval: float = 0.05,
+        max_pending: int = 1000
+    ):
+        """
+        Estado no Redis, atualizado por scripts Lua atômicos
+
+        Cada verificação é um EVALSHA. Registros (`record`) não bloqueiam a
+        requisição: entram numa fila e seguem no mesmo pipeline da próxima
+        verificação deste processo, ou são enviados por uma thread a cada
+        `flush_interval` segundos. Assim cada requisição custa no máximo uma
+        ida e volta ao servidor. Em falha de conexão a ação é permitida,
+        como nos demais erros do rate limiting.
+
+        Args:
+            host: Servidor Redis (serviço tarefamagica-redis no compose)
+            port: Porta
+            password: Senha (requirepass)
+            db: Banco lógico
+            key_prefix: Prefixo das chaves
+            timeout: Timeout de conexão e leitura, em segundos
+            flush_interval: Intervalo máximo de envio dos registros adiados
+            max_pending: Registros adiados a partir dos quais o envio é imediato
+        """
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pool: List[RespConnection] = []
+        self._pool_lock = threading.Lock()
+        self._pending: Deque[Tuple] = deque()
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flusher = None
+        self._closed = False
+        self.round_trips = 0
+        self.errors = 0
+
+    # ------------------------------------------------------------------
+    # Conexões
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> RespConnection:
+        """Abre conexão, autentica e carrega os scripts (uma ida e volta)"""
+        connection = RespConnection(self.host, self.port, self.timeout)
+        commands = []
+        if self.password:
+            commands.append(("AUTH", self.password))
+        if self.db:
+            commands.append(("SELECT", self.db))
+        commands.extend(("SCRIPT", "LOAD", source) for source in _SCRIPTS.values())
+        for reply in connection.execute_many(commands):
+            if isinstance(reply, RespError):
+                connection.close()
+                raise reply
+        return connection
+
+    def _execute(self, commands: List[Tuple]) -> List[Any]:
+        """Executa comandos em pipeline numa conexão do pool"""
+        with self._pool_lock:
+            connection = self._pool.pop() if self._pool else None
+        try:
+            if connection is None:
+                connection = self._connect()
+            replies = connection.execute_many(commands)
+            self.round_trips += 1
+            missing = [index for index, reply in enumerate(replies)
+                       if isinstance(reply, RespError) and str(reply).startswith("NOSCRIPT")]
+            if missing:
+                # Scripts descartados (reinício do servidor, SCRIPT FLUSH): recarrega e repete
+                reload = [("SCRIPT", "LOAD", source) for source in _SCRIPTS.values()]
+                retried = connection.execute_many(reload + [commands[index] for index in missing])
+                self.round_trips += 1
+                for index, reply in zip(missing, retried[len(reload):]):
+                    replies[index] = reply
+        except Exception:
+            if connection is not None:
+                connection.close()
+            raise
+        with self._pool_lock:
+            self._pool.append(connection)
+        return replies
+
+    def _key(self, type_value: str, identifier: str, gcra: bool) -> str:
+        return f"{self.key_prefix}{'gcra' if gcra else 'fw'}:{type_value}:{identifier}"
+
+    def _check_command(self, type_value: str, identifier: str, config, penalize: bool, cost: int) -> Tuple:
+        if is_gcra(config):
+            # Recusas no GCRA não alteram o estado: `penalize` não se aplica
+            return ("EVALSHA", _SCRIPT_SHAS["gcra_check"], 1, self._key(type_value, identifier, True),
+                    repr(config.window_seconds / config.max_attempts), config.window_seconds,
+                    config.max_attempts, warning_at(config), cost)
+        return ("EVALSHA", _SCRIPT_SHAS["fixed_check"], 1, self._key(type_value, identifier, False),
+                config.max_attempts, config.window_seconds, config.block_duration_seconds, warning_at(config),
+                1 if penalize else 0, cost)
+
+    # ------------------------------------------------------------------
+    # Operações
+    # ------------------------------------------------------------------
+
+    def check_many(self, requests: Sequence[Tuple[str, str, Any]], penalize: bool = False, cost: int = 1) -> List[tuple]:
+        """Verifica as chaves num único pipeline, precedido dos registros adiados"""
+        pending = self._take_pending()
+        commands = pending + [self._check_command(*request, penalize, cost) for request in requests]
+        try:
+            replies = self._execute(commands)
+        except Exception:
+            self.errors += 1
+            self._restore_pending(pending)
+            raise
+
+        results = []
+        for reply in replies[len(pending):]:
+            if isinstance(reply, RespError):
+                self.errors += 1
+                raise reply
+            allowed, code, value, remaining, reset_after, retry_after = reply
+            results.append((allowed == 1, code.decode('utf-8'), float(value), remaining, float(reset_after),
+                            float(retry_after)))
+        return results
+
+    def record(self, type_value: str, identifier: str, config, success: bool):
+        """Enfileira o registro; ele segue com a próxima verificação ou com o envio periódico"""
+        if is_gcra(config):
+            if success:
+                return
+            command = ("EVALSHA", _SCRIPT_SHAS["gcra_record"], 1, self._key(type_value, identifier, True),
+                       repr(config.window_seconds / config.max_attempts), config.window_seconds)
+        else:
+            command = ("EVALSHA", _SCRIPT_SHAS["fixed_record"], 1, self._key(type_value, identifier, False),
+                       1 if success else 0, config.window_seconds)
+        with self._pending_lock:
+            self._pending.append(command)
+            size = len(self._pending)
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        if size >= self.max_pending:
+            self._flush_event.set()
+
+    def _take_pending(self) -> List[Tuple]:
+        with self._pending_lock:
+            if not self._pending:
+                return []
+            pending = list(self._pending)
+            self._pending.clear()
+        return pending
+
+    def _restore_pending(self, pending: List[Tuple]):
+        """Devolve registros não enviados à fila (descartando o excesso)"""
+        if not pending:
+            return
+        with self._pending_lock:
+            self._pending.extendleft(reversed(pending))
+            while len(self._pending) > self.max_pending * 10:
+                self._pending.popleft()
+
+    def _flush_loop(self):
+        """Envia os registros adiados periodicamente"""
+        while not self._closed:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Erro ao enviar registros de rate limit: {str(e)}")
+                time.sleep(min(5.0, self.flush_interval * 20))
+
+    def flush(self):
+        pending = self._take_pending()
+        if not pending:
+            return
+        try:
+            replies = self._execute(pending)
+        except Exception:
+            self.errors += 1
+            self._restore_pending(pending)
+            raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                self.errors += 1
+                logging.error(f"Erro em registro de rate limit: {reply}")
+
+    def get(self, type_value: str, identifier: str, config) -> Any:
+        self.flush()
+        gcra = is_gcra(config)
+        key = self._key(type_value, identifier, gcra)
+        command = ("GET", key) if gcra else ("HMGET", key, "a", "f", "l", "b")
+        reply = self._execute([command])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return self._parse_state(reply, gcra)
+
+    def _parse_state(self, reply: Any, gcra: bool) -> Any:
+        if gcra:
+            return float(reply) if reply is not None else None
+        if reply is None or reply[0] is None:
+            return None
+        return (int(reply[0]), float(reply[1]), float(reply[2]), float(reply[3]))
+
+    def delete(self, type_value: str, identifier: str):
+        self.flush()
+        self._execute([("DEL", self._key(type_value, identifier, False), self._key(type_value, identifier, True))])
+
+    def items(self) -> Iterator[Tuple[Tuple[str, Optional[str]], Any]]:
+        """Percorre as chaves com SCAN (uso administrativo)"""
+        self.flush()
+        cursor = b"0"
+        while True:
+            reply = self._execute([("SCAN", cursor, "MATCH", f"{self.key_prefix}*", "COUNT", 1000)])[0]
+            if isinstance(reply, RespError):
+                raise reply
+            cursor, keys = reply
+            parsed = []
+            commands = []
+            for raw_key in keys:
+                kind, type_value, identifier = raw_key.decode('utf-8')[len(self.key_prefix):].split(":", 2)
+                gcra = kind == "gcra"
+                parsed.append((type_value, identifier, gcra))
+                commands.append(("GET", raw_key) if gcra else ("HMGET", raw_key, "a", "f", "l", "b"))
+            if commands:
+                for (type_value, identifier, gcra), state in zip(parsed, self._execute(commands)):
+                    if isinstance(state, RespError):
+                        continue
+                    state = self._parse_state(state, gcra)
+                    if state is not None:
+                        yield (type_value, identifier), state
+            if cursor == b"0":
+                return
+
+    def stats(self) -> Dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"backend": self.name, "host": self.host, "port": self.port, "round_trips": self.round_trips,
+                "errors": self.errors, "pending_records": pending}
+
+    def close(self):
+        self._closed = True
+        self._flush_event.set()
+        try:
+            self.flush()
+        finally:
+            with self._pool_lock:
+                pool, self._pool = self._pool, []
+            for connection in pool:
+                connection.close()
+
+# ----------------------------------------------------------------------
+# Substituto local do Redis (desenvolvimento e testes)
+# ----------------------------------------------------------------------
+
+class LocalRedisStandIn:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, password: Optional[str] = None):
+        """
+        Servidor RESP em processo que emula o subconjunto usado pelo RedisBackend
+
+        Os scripts recebidos por SCRIPT LOAD são executados de fato, num
+        interpretador Lua 5.1 (a versão do Redis, via lupa), com
+        `redis.call` sobre o armazenamento local e as conversões de tipo do
+        Redis (nil vira false; números na resposta viram inteiros). Tudo
+        roda sob um único lock, com expiração das chaves. Permite exercitar
+        o backend (scripts, pipeline, NOSCRIPT, AUTH) sem um Redis.
+
+        Args:
+            host: Endereço de escuta
+            port: Porta (0 escolhe uma livre; ver `port`)
+            password: Senha exigida via AUTH
+
+        Raises:
+            RuntimeError: Sem o pacote lupa
+        """
+        if lua51 is None:
+            raise RuntimeError("LocalRedisStandIn requer o pacote lupa")
+        self.password = password
+        self._data: Dict[bytes, Tuple[Any, Optional[float]]] = {}
+        self._scripts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._now = 0.0
+        self.commands = 0
+
+        self._lua = lua51.LuaRuntime(encoding=None)
+        self._lua.globals().redis = self._lua.table_from({b"call": self._redis_call})
+
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                authenticated = standin.password is None
+                while True:
+                    try:
+                        command = _read_reply(self.rfile)
+                    except (ConnectionError, OSError):
+                        return
+                    name = command[0].decode('utf-8').upper()
+                    if name == "AUTH":
+                        authenticated = command[-1].decode('utf-8') == standin.password
+                        reply = "OK" if authenticated else RespError("WRONGPASS invalid password")
+                    elif not authenticated:
+                        reply = RespError("NOAUTH Authentication required.")
+                    else:
+                        reply = standin._dispatch(name, command[1:])
+                    self.wfile.write(standin._encode_reply(reply))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def flush_scripts(self):
+        """Equivalente a SCRIPT FLUSH"""
+        with self._lock:
+            self._scripts.clear()
+
+    def _encode_reply(self, reply: Any) -> bytes:
+        if isinstance(reply, RespError):
+            return b"-%s\r\n" % str(reply).encode('utf-8')
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int) and not isinstance(reply, bool):
+            return b":%d\r\n" % reply
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(self._encode_reply(item) for item in reply)
+        if isinstance(reply, str) and reply == "OK":
+            return b"+OK\r\n"
+        data = reply if isinstance(reply, bytes) else str(reply).encode('utf-8')
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def _get(self, key: bytes, now: float) -> Any:
+        """Valor da chave (expirada equivale a ausente; chamado com o lock)"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item[0]
+
+    def _dispatch(self, name: str, args: List[bytes]) -> Any:
+        self.commands += 1
+        now = time.time()
+        with self._lock:
+            if name == "PING":
+                return "PONG"
+            if name == "SELECT":
+                return "OK"
+            if name == "SCRIPT" and args[0].upper() == b"LOAD":
+                try:
+                    script = self._lua.execute(b"return function(KEYS, ARGV)\n" + args[1] + b"\nend")
+                except lua51.LuaError as e:
+                    return RespError(f"ERR Error compiling script: {e}")
+                sha = hashlib.sha1(args[1]).hexdigest()
+                self._scripts[sha] = script
+                return sha
+            if name == "EVALSHA":
+                script = self._scripts.get(args[0].decode('utf-8'))
+                if script is None:
+                    return RespError("NOSCRIPT No matching script. Please use EVAL.")
+                key_count = int(args[1])
+                self._now = now
+                try:
+                    result = script(self._lua.table(*args[2:2 + key_count]), self._lua.table(*args[2 + key_count:]))
+                except lua51.LuaError as e:
+                    return RespError(f"ERR Error running script: {e}")
+                return self._from_lua(result)
+            if name == "GET":
+                value = self._get(args[0], now)
+                return value if value is None or isinstance(value, bytes) else RespError("WRONGTYPE")
+            if name == "HMGET":
+                value = self._get(args[0], now) or {}
+                return [value.get(field) for field in args[1:]]
+            if name == "DEL":
+                removed = 0
+                for key in args:
+                    if self._get(key, now) is not None:
+                        del self._data[key]
+                        removed += 1
+                return removed
+            if name == "SCAN":
+                prefix = args[args.index(b"MATCH") + 1].rstrip(b"*") if b"MATCH" in args else b""
+                keys = [key for key in list(self._data) if key.startswith(prefix) and self._get(key, now) is not None]
+                return [b"0", keys]
+            return RespError(f"ERR comando não suportado: {name}")
+
+    # Comandos disponíveis aos scripts (redis.call)
+
+    def _redis_call(self, name: bytes, *args) -> Any:
+        """redis.call: executa o comando no armazenamento (chamado com o lock)"""
+        name = name.upper()
+        args = [self._to_bytes(arg) for arg in args]
+        now = self._now
+        if name == b"TIME":
+            seconds = int(now)
+            return self._lua.table(b"%d" % seconds, b"%d" % int((now - seconds) * 1000000))
+        if name in (b"GET", b"HGET", b"HMGET"):
+            value = self._get(args[0], now)
+            if name == b"GET":
+                if isinstance(value, dict):
+                    raise RuntimeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+                return value if value is not None else False
+            value = value or {}
+            if name == b"HGET":
+                return value.get(args[1], False)
+            return self._lua.table(*[value.get(field, False) for field in args[1:]])
+        if name == b"HSET":
+            value = self._get(args[0], now)
+            fields = dict(value) if isinstance(value, dict) else {}
+            added = sum(1 for field in args[1::2] if field not in fields)
+            fields.update(zip(args[1::2], args[2::2]))
+            previous = self._data.get(args[0])
+            self._data[args[0]] = (fields, previous[1] if previous and value is not None else None)
+            return added
+        if name == b"SET":
+            expires = None
+            if len(args) > 3 and args[2].upper() == b"PX":
+                expires = now + int(args[3]) / 1000
+            self._data[args[0]] = (args[1], expires)
+            return self._lua.table_from({b"ok": b"OK"})
+        if name == b"PEXPIRE":
+            value = self._get(args[0], now)
+            if value is None:
+                return 0
+            self._data[args[0]] = (value, now + int(args[1]) / 1000)
+            return 1
+        raise RuntimeError(f"ERR comando não suportado em scripts: {name.decode('utf-8')}")
+
+    def _to_bytes(self, value: Any) -> bytes:
+        """Argumento de redis.call como o Redis o recebe (números no formato do Lua 5.1)"""
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, (int, float)):
+            return b"%.14g" % value
+        raise RuntimeError("ERR Lua redis() command arguments must be strings or integers")
+
+    def _from_lua(self, value: Any) -> Any:
+        """Resposta do script convertida como no Redis"""
+        if value is None or value is False:
+            return None
+        if value is True:
+            return 1
+        if isinstance(value, (int, float)):
+            return int(value)
+        if lua51.lua_type(value) == "table":
+            items = []
+            index = 1
+            while value[index] is not None:
+                items.append(self._from_lua(value[index]))
+                index += 1
+            return items
+        return value
+
+def backend_from_environment() -> Optional[RateLimitBackend]:
+    """
+    Backend conforme as variáveis de ambiente
+
+    RATE_LIMIT_BACKEND: "memory" (padrão; estado local do processo),
+    "shared_memory" (RATE_LIMIT_SHM_PATH) ou "redis" (REDIS_HOST,
+    REDIS_PORT, REDIS_PASSWORD, REDIS_DB).
+
+    Returns:
+        Optional[RateLimitBackend]: None para o estado em memória do processo
+    """
+    kind = os.environ.get("RATE_LIMIT_BACKEND", "memory").strip().lower()
+    try:
+        if kind == "shared_memory":
+            return SharedMemoryBackend(os.environ.get("RATE_LIMIT_SHM_PATH", "/dev/shm/tarefamagica_rate_limits"))
+        if kind == "redis":
+            return RedisBackend(
+                host=os.environ.get("REDIS_HOST", "localhost"),
+                port=int(os.environ.get("REDIS_PORT", "6379")),
+                password=os.environ.get("REDIS_PASSWORD") or None,
+                db=int(os.environ.get("REDIS_DB", "0"))
+            )
+    except Exception as e:
+        logging.error(f"Erro ao iniciar backend de rate limit '{kind}', usando memória local: {str(e)}")
+        return None
+    if kind != "memory":
+        logging.error(f"Backend de rate limit desconhecido '{kind}', usando memória local")
+    return None
@@ -0,0 +1,275 @@
+"""
+Políticas de Rate Limiting por Rota - TarefaMágica
+Tabela declarativa (método + caminho/blueprint → limite, identificador, custo) compilada e recarregada a quente
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional, Pattern, Tuple
+
+from .rate_limiting import RateLimitAlgorithm, RateLimitConfig, RateLimiter, RateLimitType, rate_limiter
+
+# Estratégias de identificação do cliente (ver rate_limiting_middleware.resolve_identifier)
+IDENTIFIER_STRATEGIES = ("client", "ip", "user")
+
+# Métodos com tabela própria; os demais usam só as políticas sem restrição de método
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    limit_type: Optional[RateLimitType]  # None: rota isenta de rate limiting
+    methods: Optional[FrozenSet[str]] = None  # None: qualquer método
+    path_prefix: Optional[str] = None
+    pattern: Optional[str] = None  # regex aplicada a partir do início do caminho
+    blueprint: Optional[str] = None
+    identifier: str = "client"
+    cost: int = 1
+
+# Políticas usadas quando não há arquivo de configuração (equivalentes à cadeia original)
+DEFAULT_POLICIES = (
+    RateLimitPolicy("login", RateLimitType.LOGIN_ATTEMPTS, frozenset(("POST",)), "/api/auth/login"),
+    RateLimitPolicy("password_reset", RateLimitType.PASSWORD_RESET, frozenset(("POST",)), "/api/auth/password-reset"),
+    RateLimitPolicy("two_factor", RateLimitType.TWO_FACTOR_ATTEMPTS, frozenset(("POST",)), "/api/auth/2fa"),
+    RateLimitPolicy("financial", RateLimitType.FINANCIAL_TRANSACTIONS, frozenset(("POST",)), "/api/financial"),
+    RateLimitPolicy("consent", RateLimitType.CONSENT_REQUESTS, frozenset(("POST",)), "/api/consent"),
+    RateLimitPolicy("api", RateLimitType.API_REQUESTS, None, "/api/"),
+)
+
+def parse_policy(data: Dict, index: int) -> RateLimitPolicy:
+    """
+    Converte uma política do arquivo de configuração
+
+    Raises:
+        ValueError: Se a política for inválida
+    """
+    name = str(data.get("name") or f"policy_{index}")
+    limit_type = data.get("limit_type")
+    methods = data.get("methods")
+    path_prefix = data.get("path")
+    pattern = data.get("pattern")
+    identifier = data.get("identifier", "client")
+    cost = data.get("cost", 1)
+
+    if (path_prefix is None) == (pattern is None):
+        raise ValueError(f"Política '{name}': informe 'path' (prefixo) ou 'pattern' (regex)")
+    if pattern is not None:
+        try:
+            # Como alternativa da tabela compilada (flags globais só valem no início da regex inteira)
+            re.compile(f"(?P<p{index}>(?:{pattern}))")
+        except re.error as e:
+            raise ValueError(f"Política '{name}': regex inválida: {e}")
+    if identifier not in IDENTIFIER_STRATEGIES:
+        raise ValueError(f"Política '{name}': identificador desconhecido '{identifier}'")
+    if not isinstance(cost, int) or cost < 1:
+        raise ValueError(f"Política '{name}': custo deve ser inteiro positivo")
+
+    return RateLimitPolicy(
+        name=name,
+        limit_type=RateLimitType(limit_type) if limit_type is not None else None,
+        methods=frozenset(method.upper() for method in methods) if methods else None,
+        path_prefix=path_prefix,
+        pattern=pattern,
+        blueprint=data.get("blueprint"),
+        identifier=identifier,
+        cost=cost
+    )
+
+def parse_limit(data: Dict) -> RateLimitConfig:
+    """
+    Converte a configuração de um tipo de limite
+
+    Raises:
+        ValueError: Se a configuração for inválida
+    """
+    try:
+        return RateLimitConfig(
+            max_attempts=int(data["max_attempts"]),
+            window_seconds=data["window_seconds"],
+            block_duration_seconds=data["block_duration_seconds"],
+            warning_threshold=float(data.get("warning_threshold", 0.8)),
+            algorithm=RateLimitAlgorithm(data.get("algorithm", RateLimitAlgorithm.FIXED_WINDOW.value))
+        )
+    except KeyError as e:
+        raise ValueError(f"Campo obrigatório ausente: {e}")
+
+class CompiledPolicies:
+    def __init__(self, policies: Iterable[RateLimitPolicy]):
+        """
+        Tabela de despacho compilada
+
+        Para cada par (método, blueprint) as políticas aplicáveis são
+        reunidas, em ordem de prioridade, numa única regex de alternativas
+        nomeadas; a primeira alternativa que casa com o caminho decide.
+        Todas as regex são montadas aqui, então uma requisição custa um
+        lookup em dicionário e um `match`, e uma combinação inválida
+        (grupo nomeado repetido em duas políticas, flags globais no meio
+        da alternância) é detectada na carga, não a cada requisição.
+
+        Args:
+            policies: Políticas em ordem de prioridade (a primeira que casa vence)
+
+        Raises:
+            ValueError: Se as regex das políticas não puderem ser combinadas
+        """
+        self.policies = tuple(policies)
+        self._tables: Dict[Tuple[str, Optional[str]], Tuple[Optional[Pattern], Dict[str, RateLimitPolicy]]] = {}
+        blueprints = {None} | {policy.blueprint for policy in self.policies if policy.blueprint is not None}
+        for method in HTTP_METHODS | {"*"}:
+            for blueprint in blueprints:
+                self._tables[(method, blueprint)] = self._compile(method, blueprint)
+
+    def match(self, method: str, path: str, blueprint: Optional[str] = None) -> Optional[RateLimitPolicy]:
+        """Política aplicável à requisição, ou None"""
+        if method not in HTTP_METHODS:
+            method = "*"
+        table = self._tables.get((method, blueprint))
+        if table is None:
+            # Blueprint sem políticas próprias
+            table = self._tables[(method, None)]
+        regex, by_group = table
+        if regex is None:
+            return None
+        found = regex.match(path)
+        if found is None:
+            return None
+        return by_group[found.lastgroup]
+
+    def _compile(self, method: str, blueprint: Optional[str]) -> Tuple[Optional[Pattern], Dict[str, RateLimitPolicy]]:
+        """Monta a regex do par (método, blueprint)"""
+        branches = []
+        by_group = {}
+        for index, policy in enumerate(self.policies):
+            if policy.methods is not None and method not in policy.methods:
+                continue
+            if policy.blueprint is not None and policy.blueprint != blueprint:
+                continue
+            group = f"p{index}"
+            body = re.escape(policy.path_prefix) if policy.path_prefix is not None else f"(?:{policy.pattern})"
+            branches.append(f"(?P<{group}>{body})")
+            by_group[group] = policy
+        try:
+            return re.compile("|".join(branches)) if branches else None, by_group
+        except re.error as e:
+            raise ValueError(f"Políticas não combinam numa única regex ({method}, {blueprint}): {e}")
+
+    def table_count(self) -> int:
+        return len(self._tables)
+
+class RateLimitPolicies:
+    def __init__(self, config_file: str, limiter: RateLimiter, check_interval: float = 1.0):
+        """
+        Políticas de rate limiting carregadas de arquivo, com recarga a quente
+
+        O arquivo JSON tem "policies" (lista em ordem de prioridade) e,
+        opcionalmente, "limits" (configuração por tipo de limite, aplicada
+        ao `limiter`). Ele é relido quando seu mtime/tamanho muda,
+        verificado no máximo a cada `check_interval` segundos; a nova
+        tabela compilada substitui a anterior de uma vez. Um arquivo
+        inválido é ignorado (mantém-se a tabela atual); sem arquivo valem
+        `DEFAULT_POLICIES`.
+
+        Args:
+            config_file: Caminho do arquivo de políticas
+            limiter: Rate limiter que recebe as configurações de limite
+            check_interval: Intervalo mínimo entre verificações do arquivo
+        """
+        self.config_file = config_file
+        self.limiter = limiter
+        self.check_interval = check_interval
+
+        self._compiled = CompiledPolicies(DEFAULT_POLICIES)
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.errors = 0
+
+        self._reload_if_changed()
+
+    def resolve(self, method: str, path: str, blueprint: Optional[str] = None) -> Optional[RateLimitPolicy]:
+        """
+        Política aplicável à requisição
+
+        Args:
+            method: Método HTTP
+            path: Caminho da requisição
+            blueprint: Blueprint Flask da rota, se houver
+
+        Returns:
+            Optional[RateLimitPolicy]: Política (limit_type None indica rota isenta), ou None
+        """
+        if time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+        return self._compiled.match(method, path, blueprint)
+
+    @property
+    def policies(self) -> Tuple[RateLimitPolicy, ...]:
+        return self._compiled.policies
+
+    def stats(self) -> Dict:
+        """Estatísticas das políticas"""
+        return {
+            "config_file": self.config_file,
+            "policies": len(self._compiled.policies),
+            "compiled_tables": self._compiled.table_count(),
+            "reloads": self.reloads,
+            "errors": self.errors
+        }
+
+    # ------------------------------------------------------------------
+    # Arquivo
+    # ------------------------------------------------------------------
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """mtime (ns) e tamanho do arquivo, ou None se ausente"""
+        try:
+            stat = os.stat(self.config_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload_if_changed(self):
+        """Relê o arquivo se ele mudou desde a última leitura"""
+        self._next_check = time.monotonic() + self.check_interval
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature != self._signature:
+                self._load(signature)
+
+    def _load(self, signature: Optional[Tuple[int, int]]):
+        """Carrega e compila o arquivo; em erro mantém a tabela atual"""
+        self._signature = signature
+        if signature is None:
+            self._compiled = CompiledPolicies(DEFAULT_POLICIES)
+            return
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            policies = [parse_policy(policy, index) for index, policy in enumerate(data.get("policies", []))]
+            limits = {RateLimitType(name): parse_limit(config) for name, config in data.get("limits", {}).items()}
+            compiled = CompiledPolicies(policies)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Erro ao carregar políticas de rate limit, mantendo as atuais: {str(e)}")
+            return
+
+        for limit_type, config in limits.items():
+            if self.limiter.limits.get(limit_type) != config:
+                self.limiter.set_limit(limit_type, config)
+        self._compiled = compiled
+        self.reloads += 1
+        logging.info(f"Políticas de rate limit carregadas: {len(policies)}")
+
+# Instância global das políticas de rate limiting
+rate_limit_policies = RateLimitPolicies(
+    os.environ.get("RATE_LIMIT_POLICIES_FILE", "data/rate_limit_policies.json"),
+    rate_limiter
+)
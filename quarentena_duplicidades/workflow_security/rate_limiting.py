@@ -3,14 +3,21 @@ Sistema de Rate Limiting - TarefaMágica (P2-2)
 Implementa limitação de tentativas de acesso para prevenir ataques
 """
 
+import heapq
+import math
 import time
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from .rate_limit_backends import (
+    DECISION_BLOCKED, DECISION_EXCEEDED, DECISION_RESET, DECISION_RETRY, DECISION_WARNING,
+    RateLimitBackend, backend_from_environment, decision_summary
+)
+
 class RateLimitType(Enum):
     LOGIN_ATTEMPTS = "login_attempts"
     API_REQUESTS = "api_requests"
@@ -19,26 +26,100 @@ class RateLimitType(Enum):
     FINANCIAL_TRANSACTIONS = "financial_transactions"
     CONSENT_REQUESTS = "consent_requests"
 
+class RateLimitAlgorithm(Enum):
+    FIXED_WINDOW = "fixed_window"  # janela fixa a partir da primeira tentativa, com bloqueio
+    GCRA = "gcra"  # generic cell rate algorithm: vazão suave, sem bloqueio adicional
+
 @dataclass
 class RateLimitConfig:
     max_attempts: int
     window_seconds: int
     block_duration_seconds: int
     warning_threshold: float = 0.8
+    algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FIXED_WINDOW
 
-@dataclass
 class RateLimitEntry:
-    identifier: str
-    attempts: int
-    first_attempt: datetime
-    last_attempt: datetime
-    blocked_until: Optional[datetime] = None
-    warnings_sent: int = 0
+    """
+    Estado de um identificador para um tipo de limite
+    
+    Os instantes são `time.monotonic()` em segundos (float), não datetime,
+    para não alocar objetos a cada verificação.
+    """
+    __slots__ = ("identifier", "attempts", "first_attempt", "last_attempt", "blocked_until", "warnings_sent")
+    
+    def __init__(
+        self,
+        identifier: str,
+        attempts: int,
+        first_attempt: float,
+        last_attempt: float,
+        blocked_until: Optional[float] = None,
+        warnings_sent: int = 0
+    ):
+        self.identifier = identifier
+        self.attempts = attempts
+        self.first_attempt = first_attempt
+        self.last_attempt = last_attempt
+        self.blocked_until = blocked_until
+        self.warnings_sent = warnings_sent
 
-class RateLimiter:
+class RateLimitDecision(NamedTuple):
+    """
+    Decisão de `RateLimiter.consume` (imutável)
+    
+    `reset_after` é o tempo (segundos) até o limite voltar ao máximo e
+    `retry_after` o tempo até a próxima requisição ser aceita (0 se
+    permitida).
+    """
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+    message: Optional[str] = None
+
+# Tolerância do GCRA a erros de arredondamento ao somar intervalos
+_GCRA_EPSILON = 1e-6
+
+# Máximo de itens da fila de expiração processados por aquisição do lock
+_EXPIRY_BATCH = 1000
+
+class _Stripe:
+    """Parte das entradas protegida por um lock próprio"""
+    __slots__ = ("lock", "entries", "expiry")
+    
     def __init__(self):
+        self.lock = threading.Lock()
+        # Valor: RateLimitEntry (janela fixa) ou float com o TAT (GCRA)
+        self.entries: Dict[Tuple[str, str], object] = {}
+        # Heap (prazo, chave) com remoção preguiçosa; ver _cleanup_expired_entries
+        self.expiry: List[Tuple[float, Tuple[str, str]]] = []
+
+class RateLimiter:
+    def __init__(self, stripes: int = 16, backend: Optional[RateLimitBackend] = None):
         """
         Inicializa o sistema de rate limiting
+        
+        As entradas ficam distribuídas em `stripes` partes, escolhidas pelo
+        hash da chave (tipo, identificador), cada uma com seu lock: threads
+        que verificam identificadores diferentes raramente disputam o mesmo
+        lock. As chaves usam o valor (str) do tipo, cujo hash é calculado
+        em C, em vez do membro do Enum.
+        
+        Cada tipo usa a janela fixa (padrão) ou o GCRA, conforme
+        `RateLimitConfig.algorithm`. No GCRA, `max_attempts` por
+        `window_seconds` define o intervalo entre requisições
+        (window_seconds / max_attempts) e a rajada máxima (max_attempts), e
+        o estado de cada chave é um único float: o instante teórico de
+        chegada (TAT) da próxima requisição.
+        
+        Com um `backend` (memória mapeada ou Redis), o estado fica fora do
+        processo e é compartilhado pelos workers: cada verificação é uma
+        operação atômica no backend e as partes locais não são usadas.
+        
+        Args:
+            stripes: Número de partes (arredondado para potência de 2)
+            backend: Backend de estado compartilhado (None: memória do processo)
         """
         self.limits: Dict[RateLimitType, RateLimitConfig] = {
             RateLimitType.LOGIN_ATTEMPTS: RateLimitConfig(
@@ -49,7 +130,8 @@ class RateLimiter:
             RateLimitType.API_REQUESTS: RateLimitConfig(
                 max_attempts=100,
                 window_seconds=60,  # 1 minuto
-                block_duration_seconds=300  # 5 minutos
+                block_duration_seconds=300,  # 5 minutos (não usado no GCRA)
+                algorithm=RateLimitAlgorithm.GCRA
             ),
             RateLimitType.PASSWORD_RESET: RateLimitConfig(
                 max_attempts=3,
@@ -73,12 +155,36 @@ class RateLimiter:
             )
         }
         
-        self.entries: Dict[str, RateLimitEntry] = {}
-        self.lock = threading.Lock()
+        stripe_count = 1
+        while stripe_count < stripes:
+            stripe_count *= 2
+        self._stripes = [_Stripe() for _ in range(stripe_count)]
+        self._stripe_mask = stripe_count - 1
+        self.backend = backend
+        self._clock = backend.clock if backend is not None else time.monotonic
+        if backend is not None:
+            backend.bind([limit_type._value_ for limit_type in RateLimitType])
+        self._configs: Dict[str, RateLimitConfig] = {}
+        self._compile_limits()
         self._cleanup_thread = None
         self._cleanup_active = True
         self._start_cleanup_thread()
         
+    def _compile_limits(self):
+        """Indexa as configurações pelo valor do tipo (usado nas verificações)"""
+        self._configs = {limit_type._value_: config for limit_type, config in self.limits.items()}
+        
+    def set_limit(self, limit_type: RateLimitType, config: RateLimitConfig):
+        """
+        Altera a configuração de um tipo de limite
+        
+        Args:
+            limit_type: Tipo de limite
+            config: Nova configuração
+        """
+        self.limits[limit_type] = config
+        self._compile_limits()
+        
     def _start_cleanup_thread(self):
         """Inicia thread de limpeza de entradas expiradas"""
         self._cleanup_thread = threading.Thread(target=self._cleanup_loop)
@@ -96,30 +202,98 @@ class RateLimiter:
                 time.sleep(300)  # Espera 5 minutos em caso de erro
                 
     def _cleanup_expired_entries(self):
-        """Remove entradas expiradas"""
-        current_time = datetime.utcnow()
-        expired_keys = []
-        
-        with self.lock:
-            for key, entry in self.entries.items():
-                # Verifica se a janela de tempo expirou
-                config = self._get_config(key)
-                if current_time - entry.first_attempt > timedelta(seconds=config.window_seconds):
-                    expired_keys.append(key)
+        """
+        Remove entradas expiradas (uma parte por vez)
+        
+        Cada chave entra no heap de expiração da sua parte apenas quando é
+        criada, com o prazo daquele momento. A limpeza retira só os itens
+        vencidos: se a entrada não existe mais, o item é descartado; se o
+        prazo dela avançou (nova janela, TAT maior), o item é reinserido com
+        o prazo atual; senão a entrada é removida. O custo é proporcional
+        às chaves vencidas, não ao total, e o lock é liberado a cada
+        `_EXPIRY_BATCH` itens.
+        """
+        if self.backend is not None:
+            removed = self.backend.cleanup()
+            self.backend.flush()
+            if removed:
+                logging.info(f"Entradas expiradas removidas do backend: {removed}")
+            return
+            
+        current_time = self._clock()
+        
+        for stripe in self._stripes:
+            while True:
+                expired_keys = []
+                with stripe.lock:
+                    heap = stripe.expiry
+                    entries = stripe.entries
+                    for _ in range(_EXPIRY_BATCH):
+                        if not heap or heap[0][0] >= current_time:
+                            break
+                        key = heapq.heappop(heap)[1]
+                        entry = entries.get(key)
+                        if entry is None:
+                            continue
+                        deadline = self._expiry(entry, self._configs[key[0]])
+                        if deadline < current_time:
+                            del entries[key]
+                            expired_keys.append(key)
+                        else:
+                            heapq.heappush(heap, (deadline, key))
+                    done = not heap or heap[0][0] >= current_time
+                    
+                for type_value, identifier in expired_keys:
+                    logging.info(f"Entrada expirada removida: {type_value}:{identifier}")
+                if done:
+                    break
                     
-        # Remove entradas expiradas
-        for key in expired_keys:
-            del self.entries[key]
-            logging.info(f"Entrada expirada removida: {key}")
+    def _expiry(self, entry, config: RateLimitConfig) -> float:
+        """Instante a partir do qual a entrada pode ser descartada sem alterar decisões futuras"""
+        if entry.__class__ is float:
+            # TAT no passado: a chave está com a rajada completa, como uma chave nova
+            return entry
+        return entry.first_attempt + config.window_seconds
+        
+    def _stripe(self, key: Tuple[str, str]) -> _Stripe:
+        """Parte responsável pela chave"""
+        return self._stripes[hash(key) & self._stripe_mask]
+        
+    def _iter_entries(self):
+        """Percorre todas as entradas, travando uma parte por vez"""
+        if self.backend is not None:
+            for (type_value, identifier), state in self.backend.items():
+                yield (type_value, identifier), self._entry_from_state(identifier, state)
+            return
+        for stripe in self._stripes:
+            with stripe.lock:
+                items = list(stripe.entries.items())
+            yield from items
             
-    def _get_config(self, key: str) -> RateLimitConfig:
-        """Obtém configuração baseada na chave"""
-        # Extrai tipo do rate limit da chave
-        for limit_type in RateLimitType:
-            if limit_type.value in key:
-                return self.limits[limit_type]
-        # Configuração padrão
-        return RateLimitConfig(max_attempts=10, window_seconds=60, block_duration_seconds=300)
+    def _entry_from_state(self, identifier: Optional[str], state):
+        """Converte estado do backend em RateLimitEntry (janela fixa) ou TAT"""
+        if state is None or state.__class__ is float:
+            return state
+        attempts, first_attempt, last_attempt, blocked_until = state
+        return RateLimitEntry(identifier, attempts, first_attempt, last_attempt, blocked_until or None)
+        
+    def _decision_message(self, type_value: str, identifier: str, config: RateLimitConfig, code: str, value: float) -> Optional[str]:
+        """Mensagem da decisão devolvida por um backend (mesmos textos do modo em memória)"""
+        if code == DECISION_WARNING:
+            return f"Atenção: {int(value)} tentativas restantes"
+        if code == DECISION_BLOCKED:
+            return f"Bloqueado por {int(value)} segundos"
+        if code == DECISION_EXCEEDED:
+            return f"Limite excedido. Bloqueado por {config.block_duration_seconds} segundos"
+        if code == DECISION_RETRY:
+            return f"Limite excedido. Tente novamente em {math.ceil(value)} segundos"
+        if code == DECISION_RESET:
+            logging.info(f"Rate limit reset para: {type_value}:{identifier}")
+        return None
+        
+    def _to_datetime(self, timestamp: float, current_time: float, now: datetime) -> datetime:
+        """Converte instante monotônico em datetime UTC"""
+        return now - timedelta(seconds=current_time - timestamp)
         
     def check_rate_limit(self, identifier: str, limit_type: RateLimitType) -> Tuple[bool, Optional[str]]:
         """
@@ -133,61 +307,227 @@ class RateLimiter:
             Tuple[bool, Optional[str]]: (permitido, mensagem de erro)
         """
         try:
-            key = f"{limit_type.value}:{identifier}"
-            config = self.limits[limit_type]
-            current_time = datetime.utcnow()
+            type_value = limit_type._value_
+            key = (type_value, identifier)
+            config = self._configs[type_value]
+            
+            if self.backend is not None:
+                allowed, code, value = self.backend.check(type_value, identifier, config)
+                return allowed, self._decision_message(type_value, identifier, config, code, value)
+                
+            stripe = self._stripes[hash(key) & self._stripe_mask]
+            current_time = self._clock()
             
-            with self.lock:
-                # Verifica se existe entrada
-                if key not in self.entries:
-                    # Cria nova entrada
-                    self.entries[key] = RateLimitEntry(
-                        identifier=identifier,
-                        attempts=1,
-                        first_attempt=current_time,
-                        last_attempt=current_time
-                    )
-                    return True, None
+            if config.algorithm is RateLimitAlgorithm.GCRA:
+                return self._check_gcra(stripe, key, config, current_time)[:2]
                 
-                entry = self.entries[key]
+            return self._check_fixed_window(stripe, key, identifier, config, current_time)[:2]
                 
-                # Verifica se a janela de tempo expirou - CORREÇÃO AQUI
-                if current_time - entry.first_attempt > timedelta(seconds=config.window_seconds):
-                    # Reseta contador completamente
-                    entry.attempts = 1
-                    entry.first_attempt = current_time
-                    entry.last_attempt = current_time
-                    entry.blocked_until = None
-                    entry.warnings_sent = 0
-                    logging.info(f"Rate limit reset para: {key}")
-                    return True, None
+        except Exception as e:
+            logging.error(f"Erro ao verificar rate limit: {str(e)}")
+            return True, None  # Em caso de erro, permite a ação
+            
+    def consume(self, identifier: str, limit_type: RateLimitType, cost: int = 1) -> RateLimitDecision:
+        """
+        Verifica e registra uma requisição numa única operação
+        
+        Equivale a check_rate_limit seguido de record_attempt (sucesso se
+        permitida, falha se recusada), mas trava a chave uma só vez (uma
+        ida e volta no Redis) e já devolve os valores dos headers de rate
+        limit, sem consultar get_status.
+        
+        Args:
+            identifier: Identificador único (IP, user_id, etc.)
+            limit_type: Tipo de limite
+            cost: Peso da requisição (tentativas consumidas; no GCRA, intervalos)
+            
+        Returns:
+            RateLimitDecision: Decisão e estado resultante
+        """
+        try:
+            type_value = limit_type._value_
+            config = self._configs[type_value]
+            
+            if self.backend is not None:
+                allowed, code, value, remaining, reset_after, retry_after = self.backend.check_many(
+                    [(type_value, identifier, config)], penalize=True, cost=cost)[0]
+                message = self._decision_message(type_value, identifier, config, code, value)
+                return RateLimitDecision(allowed, config.max_attempts, remaining, reset_after, retry_after, message)
                 
-                # Verifica se está bloqueado
-                if entry.blocked_until and current_time < entry.blocked_until:
-                    remaining_time = entry.blocked_until - current_time
-                    return False, f"Bloqueado por {int(remaining_time.total_seconds())} segundos"
+            key = (type_value, identifier)
+            stripe = self._stripes[hash(key) & self._stripe_mask]
+            current_time = self._clock()
+            
+            if config.algorithm is RateLimitAlgorithm.GCRA:
+                allowed, message, state = self._check_gcra(stripe, key, config, current_time, True, cost)
+            else:
+                allowed, message, attempts, first_attempt, blocked_until = self._check_fixed_window(
+                    stripe, key, identifier, config, current_time, True, cost)
+                state = (attempts, first_attempt, current_time, blocked_until or 0.0)
+            remaining, reset_after, retry_after = decision_summary(state, current_time, config, allowed, cost)
+            return RateLimitDecision(allowed, config.max_attempts, remaining, reset_after, retry_after, message)
+            
+        except Exception as e:
+            logging.error(f"Erro ao verificar rate limit: {str(e)}")
+            # Em caso de erro, permite a ação
+            config = self.limits.get(limit_type)
+            limit = config.max_attempts if config is not None else 0
+            return RateLimitDecision(True, limit, limit, 0.0, 0.0)
+            
+    def check_rate_limits(self, requests: List[Tuple[str, RateLimitType]]) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Verifica vários limites de uma vez
+        
+        Com backend, todas as verificações seguem numa única operação (um
+        pipeline, no Redis).
+        
+        Args:
+            requests: Pares (identificador, tipo de limite)
+            
+        Returns:
+            List[Tuple[bool, Optional[str]]]: (permitido, mensagem) de cada par
+        """
+        if self.backend is None:
+            return [self.check_rate_limit(identifier, limit_type) for identifier, limit_type in requests]
+        try:
+            batch = [(limit_type._value_, identifier, self._configs[limit_type._value_]) for identifier, limit_type in requests]
+            decisions = self.backend.check_many(batch)
+            return [
+                (allowed, self._decision_message(type_value, identifier, config, code, value))
+                for (type_value, identifier, config), (allowed, code, value, *_) in zip(batch, decisions)
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao verificar rate limit: {str(e)}")
+            return [(True, None) for _ in requests]  # Em caso de erro, permite a ação
+            
+    def _check_fixed_window(
+        self,
+        stripe: _Stripe,
+        key: Tuple[str, str],
+        identifier: str,
+        config: RateLimitConfig,
+        current_time: float,
+        penalize: bool = False,
+        cost: int = 1
+    ) -> Tuple[bool, Optional[str], int, float, Optional[float]]:
+        """
+        Verificação pela janela fixa
+        
+        Args:
+            penalize: Se a tentativa recusada também é registrada
+                (como record_attempt(success=False))
+            cost: Tentativas consumidas pela requisição
+            
+        Returns:
+            Tuple: (permitido, mensagem, tentativas, primeira tentativa,
+            bloqueado até), com o estado lido sob o lock
+        """
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            
+            # Verifica se existe entrada (um TAT indica que o tipo usava GCRA)
+            if entry is None or entry.__class__ is float:
+                stripe.entries[key] = RateLimitEntry(identifier, cost, current_time, current_time)
+                if entry is None:
+                    heapq.heappush(stripe.expiry, (current_time + config.window_seconds, key))
+                return True, None, cost, current_time, None
+            
+            # Verifica se a janela de tempo expirou
+            if current_time - entry.first_attempt > config.window_seconds:
+                # Reseta contador completamente
+                entry.attempts = cost
+                entry.first_attempt = current_time
+                entry.last_attempt = current_time
+                entry.blocked_until = None
+                entry.warnings_sent = 0
+                logging.info(f"Rate limit reset para: {key[0]}:{identifier}")
+                return True, None, cost, current_time, None
+            
+            # Verifica se está bloqueado
+            if entry.blocked_until is not None and current_time < entry.blocked_until:
+                allowed = False
+                message = f"Bloqueado por {int(entry.blocked_until - current_time)} segundos"
                 
-                # Verifica se excedeu o limite
-                if entry.attempts >= config.max_attempts:
-                    # Bloqueia
-                    entry.blocked_until = current_time + timedelta(seconds=config.block_duration_seconds)
-                    return False, f"Limite excedido. Bloqueado por {config.block_duration_seconds} segundos"
+            # Verifica se excedeu o limite
+            elif entry.attempts + cost > config.max_attempts:
+                # Bloqueia
+                entry.blocked_until = current_time + config.block_duration_seconds
+                allowed = False
+                message = f"Limite excedido. Bloqueado por {config.block_duration_seconds} segundos"
                 
+            else:
                 # Incrementa tentativas
-                entry.attempts += 1
+                entry.attempts += cost
                 entry.last_attempt = current_time
+                allowed = True
+                message = None
                 
                 # Verifica se está próximo do limite
                 if entry.attempts >= int(config.max_attempts * config.warning_threshold):
                     remaining_attempts = config.max_attempts - entry.attempts
-                    return True, f"Atenção: {remaining_attempts} tentativas restantes"
-                
-                return True, None
-                
-        except Exception as e:
-            logging.error(f"Erro ao verificar rate limit: {str(e)}")
-            return True, None  # Em caso de erro, permite a ação
+                    message = f"Atenção: {remaining_attempts} tentativas restantes"
+                    
+            if penalize and not allowed:
+                entry.attempts += cost
+                entry.last_attempt = current_time
+            return allowed, message, entry.attempts, entry.first_attempt, entry.blocked_until
+            
+    def _check_gcra(
+        self,
+        stripe: _Stripe,
+        key: Tuple[str, str],
+        config: RateLimitConfig,
+        current_time: float,
+        penalize: bool = False,
+        cost: int = 1
+    ) -> Tuple[bool, Optional[str], float]:
+        """
+        Verificação pelo GCRA
+        
+        A requisição é aceita se o novo TAT (max(TAT, agora) + intervalo)
+        não passar de agora + window_seconds; caso contrário é recusada sem
+        alterar o estado, mesmo com `penalize` (recusas não empurram o TAT,
+        então um cliente acima do limite segue atendido na vazão
+        configurada). Uma requisição de custo `cost` ocupa `cost` intervalos.
+        
+        Returns:
+            Tuple[bool, Optional[str], float]: (permitido, mensagem, TAT resultante)
+        """
+        interval = config.window_seconds / config.max_attempts
+        with stripe.lock:
+            tat = previous = stripe.entries.get(key)
+            if tat is None or tat.__class__ is not float or tat < current_time:
+                tat = current_time
+            new_tat = tat + interval * cost
+            if new_tat - current_time > config.window_seconds + _GCRA_EPSILON:
+                retry_after = new_tat - config.window_seconds - current_time
+                message = f"Limite excedido. Tente novamente em {math.ceil(retry_after)} segundos"
+                return False, message, tat
+            stripe.entries[key] = new_tat
+            if previous is None:
+                heapq.heappush(stripe.expiry, (new_tat, key))
             
+        # Verifica se está próximo do limite
+        remaining = int((current_time + config.window_seconds - new_tat) / interval + _GCRA_EPSILON)
+        if config.max_attempts - remaining >= int(config.max_attempts * config.warning_threshold):
+            return True, f"Atenção: {remaining} tentativas restantes", new_tat
+        return True, None, new_tat
+        
+    def _gcra_state(self, tat: float, config: RateLimitConfig, current_time: float) -> Tuple[int, float, float]:
+        """
+        Estado de uma chave GCRA
+        
+        Returns:
+            Tuple[int, float, float]: (requisições restantes, segundos até a
+            próxima ser aceita, segundos até a rajada completa)
+        """
+        interval = config.window_seconds / config.max_attempts
+        tat = max(tat, current_time)
+        remaining = max(0, int((current_time + config.window_seconds - tat) / interval + _GCRA_EPSILON))
+        retry_after = max(0.0, tat + interval - config.window_seconds - current_time)
+        return remaining, retry_after, tat - current_time
+        
+
     def record_attempt(self, identifier: str, limit_type: RateLimitType, success: bool = False):
         """
         Registra tentativa (para casos onde check_rate_limit não é chamado)
@@ -198,19 +538,41 @@ class RateLimiter:
             success: Se a tentativa foi bem-sucedida
         """
         try:
-            key = f"{limit_type.value}:{identifier}"
-            current_time = datetime.utcnow()
+            type_value = limit_type._value_
+            key = (type_value, identifier)
+            config = self._configs[type_value]
             
-            with self.lock:
-                if key not in self.entries:
-                    self.entries[key] = RateLimitEntry(
-                        identifier=identifier,
-                        attempts=1,
-                        first_attempt=current_time,
-                        last_attempt=current_time
-                    )
+            if self.backend is not None:
+                self.backend.record(type_value, identifier, config, success)
+                return
+                
+            stripe = self._stripes[hash(key) & self._stripe_mask]
+            current_time = self._clock()
+            
+            if config.algorithm is RateLimitAlgorithm.GCRA:
+                # Tentativas bem-sucedidas não consomem; as demais ocupam um
+                # intervalo, sem passar de agora + window_seconds
+                if not success:
+                    with stripe.lock:
+                        tat = previous = stripe.entries.get(key)
+                        if tat is None or tat.__class__ is not float or tat < current_time:
+                            tat = current_time
+                        tat = min(tat + config.window_seconds / config.max_attempts, current_time + config.window_seconds)
+                        stripe.entries[key] = tat
+                        if previous is None:
+                            heapq.heappush(stripe.expiry, (tat, key))
+                return
+                
+            with stripe.lock:
+                entry = stripe.entries.get(key)
+                if (entry is None or entry.__class__ is float
+                        or current_time - entry.first_attempt > config.window_seconds):
+                    # Janela expirada recomeça aqui, como em check_rate_limit
+                    # (não depende de a limpeza já ter removido a entrada)
+                    stripe.entries[key] = RateLimitEntry(identifier, 1, current_time, current_time)
+                    if entry is None:
+                        heapq.heappush(stripe.expiry, (current_time + config.window_seconds, key))
                 else:
-                    entry = self.entries[key]
                     entry.attempts += 1
                     entry.last_attempt = current_time
                     
@@ -230,16 +592,23 @@ class RateLimiter:
             limit_type: Tipo específico (se None, reseta todos)
         """
         try:
-            with self.lock:
-                if limit_type:
-                    key = f"{limit_type.value}:{identifier}"
-                    if key in self.entries:
-                        del self.entries[key]
-                else:
-                    # Remove todas as entradas para este identificador
-                    keys_to_remove = [k for k in self.entries.keys() if identifier in k]
-                    for key in keys_to_remove:
-                        del self.entries[key]
+            if self.backend is not None:
+                for type_value in ([limit_type._value_] if limit_type else self._configs):
+                    self.backend.delete(type_value, identifier)
+                return
+                
+            if limit_type:
+                key = (limit_type._value_, identifier)
+                stripe = self._stripe(key)
+                with stripe.lock:
+                    stripe.entries.pop(key, None)
+            else:
+                # Remove as entradas deste identificador em todos os tipos
+                for type_value in self._configs:
+                    key = (type_value, identifier)
+                    stripe = self._stripe(key)
+                    with stripe.lock:
+                        stripe.entries.pop(key, None)
                         
         except Exception as e:
             logging.error(f"Erro ao resetar limites: {str(e)}")
@@ -256,45 +625,81 @@ class RateLimiter:
             Dict: Status dos limites
         """
         try:
-            key = f"{limit_type.value}:{identifier}"
+            key = (limit_type._value_, identifier)
             config = self.limits[limit_type]
-            current_time = datetime.utcnow()
             
-            with self.lock:
-                if key not in self.entries:
-                    return {
-                        "identifier": identifier,
-                        "limit_type": limit_type.value,
-                        "attempts": 0,
-                        "max_attempts": config.max_attempts,
-                        "remaining_attempts": config.max_attempts,
-                        "window_seconds": config.window_seconds,
-                        "blocked": False,
-                        "blocked_until": None,
-                        "remaining_block_time": 0
-                    }
-                
-                entry = self.entries[key]
-                blocked = entry.blocked_until and current_time < entry.blocked_until
-                remaining_block_time = 0
+            if self.backend is not None:
+                entry = self._entry_from_state(identifier, self.backend.get(key[0], identifier, config))
+            else:
+                stripe = self._stripe(key)
+                with stripe.lock:
+                    entry = stripe.entries.get(key)
+                    if entry is not None and entry.__class__ is not float:
+                        # Cópia: a entrada pode mudar depois de liberado o lock
+                        entry = RateLimitEntry(identifier, entry.attempts, entry.first_attempt,
+                                               entry.last_attempt, entry.blocked_until)
+                        
+            if entry is not None and entry.__class__ is not float:
+                attempts = entry.attempts
+                first_attempt = entry.first_attempt
+                last_attempt = entry.last_attempt
+                blocked_until = entry.blocked_until
                 
-                if blocked:
-                    remaining_block_time = int((entry.blocked_until - current_time).total_seconds())
+            if entry is None:
+                return {
+                    "identifier": identifier,
+                    "limit_type": limit_type.value,
+                    "algorithm": config.algorithm.value,
+                    "attempts": 0,
+                    "max_attempts": config.max_attempts,
+                    "remaining_attempts": config.max_attempts,
+                    "window_seconds": config.window_seconds,
+                    "blocked": False,
+                    "blocked_until": None,
+                    "remaining_block_time": 0,
+                    "retry_after": 0
+                }
                 
+            current_time = self._clock()
+            now = datetime.utcnow()
+            
+            if entry.__class__ is float:
+                remaining, retry_after, reset_after = self._gcra_state(entry, config, current_time)
+                blocked = retry_after > 0
                 return {
                     "identifier": identifier,
                     "limit_type": limit_type.value,
-                    "attempts": entry.attempts,
+                    "algorithm": config.algorithm.value,
+                    "attempts": config.max_attempts - remaining,
                     "max_attempts": config.max_attempts,
-                    "remaining_attempts": max(0, config.max_attempts - entry.attempts),
+                    "remaining_attempts": remaining,
                     "window_seconds": config.window_seconds,
                     "blocked": blocked,
-                    "blocked_until": entry.blocked_until.isoformat() if entry.blocked_until else None,
-                    "remaining_block_time": remaining_block_time,
-                    "first_attempt": entry.first_attempt.isoformat(),
-                    "last_attempt": entry.last_attempt.isoformat()
+                    "blocked_until": (now + timedelta(seconds=retry_after)).isoformat() if blocked else None,
+                    "remaining_block_time": math.ceil(retry_after),
+                    "retry_after": retry_after,
+                    "reset_time": (now + timedelta(seconds=reset_after)).isoformat()
                 }
                 
+            blocked = blocked_until is not None and current_time < blocked_until
+            remaining_block_time = int(blocked_until - current_time) if blocked else 0
+            
+            return {
+                "identifier": identifier,
+                "limit_type": limit_type.value,
+                "algorithm": config.algorithm.value,
+                "attempts": attempts,
+                "max_attempts": config.max_attempts,
+                "remaining_attempts": max(0, config.max_attempts - attempts),
+                "window_seconds": config.window_seconds,
+                "blocked": blocked,
+                "blocked_until": self._to_datetime(blocked_until, current_time, now).isoformat() if blocked_until is not None else None,
+                "remaining_block_time": remaining_block_time,
+                "retry_after": max(0.0, blocked_until - current_time) if blocked else 0,
+                "first_attempt": self._to_datetime(first_attempt, current_time, now).isoformat(),
+                "last_attempt": self._to_datetime(last_attempt, current_time, now).isoformat()
+            }
+            
         except Exception as e:
             logging.error(f"Erro ao obter status: {str(e)}")
             return {}
@@ -307,37 +712,54 @@ class RateLimiter:
             Dict: Estatísticas
         """
         try:
-            with self.lock:
-                total_entries = len(self.entries)
-                blocked_entries = sum(1 for entry in self.entries.values() 
-                                    if entry.blocked_until and datetime.utcnow() < entry.blocked_until)
-                
-                # Estatísticas por tipo
-                limits_by_type = {}
-                for limit_type in RateLimitType:
-                    type_entries = [entry for key, entry in self.entries.items() 
-                                   if limit_type.value in key]
-                    limits_by_type[limit_type.value] = {
-                        "total_entries": len(type_entries),
-                        "blocked_entries": sum(1 for entry in type_entries 
-                                             if entry.blocked_until and datetime.utcnow() < entry.blocked_until),
-                        "average_attempts": sum(entry.attempts for entry in type_entries) / len(type_entries) if type_entries else 0,
-                        "config": {
-                            "max_attempts": self.limits[limit_type].max_attempts,
-                            "window_seconds": self.limits[limit_type].window_seconds,
-                            "block_duration_seconds": self.limits[limit_type].block_duration_seconds
-                        }
+            current_time = self._clock()
+            counters = {
+                limit_type: {"total_entries": 0, "blocked_entries": 0, "attempts": 0}
+                for limit_type in RateLimitType
+            }
+            for (type_value, _), entry in self._iter_entries():
+                limit_type = RateLimitType(type_value)
+                counter = counters[limit_type]
+                counter["total_entries"] += 1
+                if entry.__class__ is float:
+                    remaining, retry_after, _ = self._gcra_state(entry, self.limits[limit_type], current_time)
+                    counter["attempts"] += self.limits[limit_type].max_attempts - remaining
+                    blocked = retry_after > 0
+                else:
+                    counter["attempts"] += entry.attempts
+                    blocked = entry.blocked_until is not None and current_time < entry.blocked_until
+                if blocked:
+                    counter["blocked_entries"] += 1
+                    
+            # Estatísticas por tipo
+            limits_by_type = {}
+            for limit_type, counter in counters.items():
+                limits_by_type[limit_type.value] = {
+                    "total_entries": counter["total_entries"],
+                    "blocked_entries": counter["blocked_entries"],
+                    "average_attempts": counter["attempts"] / counter["total_entries"] if counter["total_entries"] else 0,
+                    "config": {
+                        "algorithm": self.limits[limit_type].algorithm.value,
+                        "max_attempts": self.limits[limit_type].max_attempts,
+                        "window_seconds": self.limits[limit_type].window_seconds,
+                        "block_duration_seconds": self.limits[limit_type].block_duration_seconds
                     }
-                
-                return {
-                    "total_entries": total_entries,
-                    "blocked_entries": blocked_entries,
-                    "active_entries": total_entries - blocked_entries,
-                    "limits_by_type": limits_by_type,
-                    "cleanup_active": self._cleanup_active,
-                    "last_cleanup": datetime.utcnow().isoformat()
                 }
                 
+            total_entries = sum(counter["total_entries"] for counter in counters.values())
+            blocked_entries = sum(counter["blocked_entries"] for counter in counters.values())
+            return {
+                "total_entries": total_entries,
+                "blocked_entries": blocked_entries,
+                "active_entries": total_entries - blocked_entries,
+                "limits_by_type": limits_by_type,
+                "lock_stripes": len(self._stripes),
+                "expiry_queue": sum(len(stripe.expiry) for stripe in self._stripes),
+                "backend": self.backend.stats() if self.backend is not None else {"backend": "memory"},
+                "cleanup_active": self._cleanup_active,
+                "last_cleanup": datetime.utcnow().isoformat()
+            }
+            
         except Exception as e:
             logging.error(f"Erro ao obter estatísticas: {str(e)}")
             return {
@@ -353,6 +775,11 @@ class RateLimiter:
         self._cleanup_active = False
         if self._cleanup_thread:
             self._cleanup_thread.join(timeout=5)
+        if self.backend is not None:
+            try:
+                self.backend.flush()
+            except Exception as e:
+                logging.error(f"Erro ao enviar registros pendentes de rate limit: {str(e)}")
 
 # Instância global do rate limiter
-rate_limiter = RateLimiter() 
\ No newline at end of file
+rate_limiter = RateLimiter(backend=backend_from_environment()) 
\ No newline at end of file
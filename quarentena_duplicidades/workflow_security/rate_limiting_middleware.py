@@ -5,11 +5,16 @@
 Aplica rate limiting automaticamente em todas as rotas da API
 """
 
-from flask import request, jsonify, g
-from functools import wraps
+from flask import request, jsonify, g, make_response
+from functools import lru_cache, wraps
+import hashlib
 import logging
+import math
+import time
 from typing import Optional, Callable
-from .rate_limiting import rate_limiter, RateLimitType
+from .rate_limiting import rate_limiter, RateLimitDecision, RateLimitType
+from .rate_limit_policies import rate_limit_policies, RateLimitPolicies
+from .security_headers import security_headers
 
 def apply_rate_limiting(limit_type: RateLimitType, identifier_func: Optional[Callable] = None):
     """
@@ -29,56 +34,44 @@ def apply_rate_limiting(limit_type: RateLimitType, identifier_func: Optional[Cal
                 else:
                     identifier = get_client_identifier(request)
                 
-                # Verifica rate limit
-                allowed, message = rate_limiter.check_rate_limit(identifier, limit_type)
-                
-                if not allowed:
-                    # Registra tentativa bloqueada
-                    rate_limiter.record_attempt(identifier, limit_type, success=False)
-                    
-                    return jsonify({
-                        'success': False,
-                        'error': 'Rate limit exceeded',
-                        'message': message,
-                        'retry_after': get_retry_after(identifier, limit_type)
-                    }), 429  # Too Many Requests
-                
-                # Registra tentativa permitida
-                rate_limiter.record_attempt(identifier, limit_type, success=True)
-                
-                # Adiciona headers de rate limit
-                response = f(*args, **kwargs)
-                
-                # Se response é uma tupla (data, status_code)
-                if isinstance(response, tuple):
-                    data, status_code = response
-                    if isinstance(data, dict):
-                        data['rate_limit_info'] = {
-                            'remaining': get_remaining_attempts(identifier, limit_type),
-                            'reset_time': get_reset_time(identifier, limit_type)
-                        }
-                    response = (data, status_code)
-                else:
-                    # Se response é apenas data
-                    if hasattr(response, 'json'):
-                        data = response.get_json()
-                        if data and isinstance(data, dict):
-                            data['rate_limit_info'] = {
-                                'remaining': get_remaining_attempts(identifier, limit_type),
-                                'reset_time': get_reset_time(identifier, limit_type)
-                            }
-                            response = jsonify(data)
-                
-                return response
+                # Verifica e registra a tentativa numa única operação
+                decision = rate_limiter.consume(identifier, limit_type)
                 
             except Exception as e:
                 logging.error(f"Erro no rate limiting: {str(e)}")
                 # Em caso de erro, permite a ação
                 return f(*args, **kwargs)
                 
+            if not decision.allowed:
+                return rate_limit_exceeded_response(decision)
+            
+            # Headers de rate limit, sem alterar o corpo da resposta
+            return apply_rate_limit_headers(make_response(f(*args, **kwargs)), decision)
+                
         return decorated_function
     return decorator
 
+def apply_rate_limit_headers(response, decision: RateLimitDecision):
+    """Adiciona os headers X-RateLimit-* (e Retry-After, se recusada) da decisão"""
+    return security_headers.add_rate_limit_headers(
+        response,
+        decision.remaining,
+        math.ceil(time.time() + decision.reset_after),
+        limit=decision.limit,
+        retry_after=None if decision.allowed else decision.retry_after
+    )
+
+def rate_limit_exceeded_response(decision: RateLimitDecision):
+    """Resposta 429 para uma decisão recusada"""
+    response = jsonify({
+        'success': False,
+        'error': 'Rate limit exceeded',
+        'message': decision.message,
+        'retry_after': math.ceil(decision.retry_after)
+    })
+    response.status_code = 429  # Too Many Requests
+    return apply_rate_limit_headers(response, decision)
+
 def get_client_identifier(request) -> str:
     """
     Obtém identificador único do cliente
@@ -89,21 +82,43 @@ def get_client_identifier(request) -> str:
     Returns:
         str: Identificador único
     """
-    # Prioriza IP real (atrás de proxy)
-    if request.headers.get('X-Forwarded-For'):
-        ip = request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    elif request.headers.get('X-Real-IP'):
-        ip = request.headers.get('X-Real-IP')
-    else:
-        ip = request.remote_addr
-    
     # Adiciona user agent para maior especificidade
     user_agent = request.headers.get('User-Agent', 'unknown')
     
-    # Combina IP + User Agent (hash para privacidade)
-    import hashlib
-    combined = f"{ip}:{user_agent}"
-    return hashlib.md5(combined.encode()).hexdigest()
+    return _client_hash(get_client_ip(request), user_agent)
+
+def get_client_ip(request) -> str:
+    """IP do cliente, priorizando o IP real (atrás de proxy)"""
+    if request.headers.get('X-Forwarded-For'):
+        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
+    if request.headers.get('X-Real-IP'):
+        return request.headers.get('X-Real-IP')
+    return request.remote_addr
+
+def resolve_identifier(strategy: str, request) -> str:
+    """
+    Identificador do cliente conforme a estratégia da política
+    
+    Args:
+        strategy: "client" (hash de IP + User Agent), "ip" ou "user"
+            (usuário autenticado em g.user_id; sem ele, "client")
+        request: Objeto request do Flask
+        
+    Returns:
+        str: Identificador
+    """
+    if strategy == "ip":
+        return f"ip:{get_client_ip(request)}"
+    if strategy == "user":
+        user_id = g.get('user_id')
+        if user_id is not None:
+            return f"user:{user_id}"
+    return get_client_identifier(request)
+
+@lru_cache(maxsize=65536)
+def _client_hash(ip: str, user_agent: str) -> str:
+    """Hash (para privacidade) de IP + User Agent, calculado uma vez por cliente"""
+    return hashlib.md5(f"{ip}:{user_agent}".encode()).hexdigest()
 
 def get_remaining_attempts(identifier: str, limit_type: RateLimitType) -> int:
     """Obtém tentativas restantes"""
@@ -161,75 +176,37 @@ def consent_rate_limit(f):
     return apply_rate_limiting(RateLimitType.CONSENT_REQUESTS)(f)
 
 # Middleware global para aplicar rate limiting em todas as rotas
-def setup_rate_limiting_middleware(app):
+def setup_rate_limiting_middleware(app, policies: Optional[RateLimitPolicies] = None):
     """
     Configura middleware de rate limiting global
     
     Args:
         app: Aplicação Flask
+        policies: Políticas por rota (padrão: rate_limit_policies, carregadas
+            de data/rate_limit_policies.json)
     """
+    policies = policies or rate_limit_policies
     
     @app.before_request
     def apply_global_rate_limiting():
         """Aplica rate limiting global antes de cada requisição"""
         try:
-            # Identifica tipo de rota
-            path = request.path
-            method = request.method
-            
-            # Define rate limit baseado na rota
-            if '/api/auth/login' in path and method == 'POST':
-                limit_type = RateLimitType.LOGIN_ATTEMPTS
-            elif '/api/auth/password-reset' in path and method == 'POST':
-                limit_type = RateLimitType.PASSWORD_RESET
-            elif '/api/auth/2fa' in path and method == 'POST':
-                limit_type = RateLimitType.TWO_FACTOR_ATTEMPTS
-            elif '/api/financial' in path and method == 'POST':
-                limit_type = RateLimitType.FINANCIAL_TRANSACTIONS
-            elif '/api/consent' in path and method == 'POST':
-                limit_type = RateLimitType.CONSENT_REQUESTS
-            elif path.startswith('/api/'):
-                limit_type = RateLimitType.API_REQUESTS
-            else:
-                # Rotas não-API não têm rate limiting
+            # Política da rota (rotas sem política ou isentas não têm rate limiting)
+            policy = policies.resolve(request.method, request.path, request.blueprint)
+            if policy is None or policy.limit_type is None:
                 return
             
             # Obtém identificador
-            identifier = get_client_identifier(request)
+            identifier = resolve_identifier(policy.identifier, request)
             
-            # Verifica rate limit
-            allowed, message = rate_limiter.check_rate_limit(identifier, limit_type)
+            # Verifica e registra a tentativa numa única operação
+            decision = rate_limiter.consume(identifier, policy.limit_type, policy.cost)
             
-            if not allowed:
-                # Registra tentativa bloqueada
-                rate_limiter.record_attempt(identifier, limit_type, success=False)
-                
-                # Retorna erro 429
-                response = jsonify({
-                    'success': False,
-                    'error': 'Rate limit exceeded',
-                    'message': message,
-                    'retry_after': get_retry_after(identifier, limit_type)
-                })
-                response.status_code = 429
-                
-                # Adiciona headers de rate limit
-                response.headers['X-RateLimit-Limit'] = str(rate_limiter.limits[limit_type].max_attempts)
-                response.headers['X-RateLimit-Remaining'] = str(get_remaining_attempts(identifier, limit_type))
-                response.headers['X-RateLimit-Reset'] = str(get_reset_time(identifier, limit_type) or '')
-                response.headers['Retry-After'] = str(get_retry_after(identifier, limit_type))
-                
-                return response
-            
-            # Registra tentativa permitida
-            rate_limiter.record_attempt(identifier, limit_type, success=True)
+            if not decision.allowed:
+                return rate_limit_exceeded_response(decision)
             
-            # Adiciona informações de rate limit ao contexto
-            g.rate_limit_info = {
-                'type': limit_type.value,
-                'remaining': get_remaining_attempts(identifier, limit_type),
-                'reset_time': get_reset_time(identifier, limit_type)
-            }
+            # Guarda a decisão para os headers da resposta
+            g.rate_limit_decision = decision
             
         except Exception as e:
             logging.error(f"Erro no middleware de rate limiting: {str(e)}")
@@ -239,12 +216,12 @@ def setup_rate_limiting_middleware(app):
     def add_rate_limit_headers(response):
         """Adiciona headers de rate limit à resposta"""
         try:
-            if hasattr(g, 'rate_limit_info'):
-                response.headers['X-RateLimit-Limit'] = str(rate_limiter.limits[RateLimitType.API_REQUESTS].max_attempts)
-                response.headers['X-RateLimit-Remaining'] = str(g.rate_limit_info.get('remaining', 0))
-                response.headers['X-RateLimit-Reset'] = str(g.rate_limit_info.get('reset_time', ''))
-        except:
-            pass
+            decision = g.get('rate_limit_decision')
+            # Headers de um decorator (limite mais específico) têm precedência
+            if decision is not None and 'X-RateLimit-Limit' not in response.headers:
+                apply_rate_limit_headers(response, decision)
+        except Exception as e:
+            logging.error(f"Erro ao adicionar headers de rate limit: {str(e)}")
         return response
 
 # Função para testar rate limiting
@@ -0,0 +1,536 @@
+"""
+Baselines de Atividade - TarefaMágica
+Perfis estatísticos por usuário (EWMA, sketch de quantis, perfil por hora) atualizados em streaming
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # backfill vetorizado é opcional
+    np = None
+
+# Sketch de quantis: buckets logarítmicos de R$ 0,01 até ~R$ 590 mil (erro relativo ~7%)
+SKETCH_MIN_VALUE = 0.01
+SKETCH_GAMMA = 1.15
+SKETCH_BUCKETS = 128
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+# Perfil por hora do dia: contagens são reduzidas à metade ao passar do limite
+HOUR_PROFILE_CAP = 2000.0
+
+# Desvios mínimos (evitam escores infinitos em históricos constantes)
+MIN_LOG_AMOUNT_STD = 0.1
+MIN_HOURLY_COUNT_STD = 1.0
+
+# Horas sem atividade aplicadas de uma vez ao baseline de acessos (uma semana)
+MAX_IDLE_HOURS = 168
+
+def sketch_bucket(value: float) -> int:
+    """Bucket do sketch para o valor"""
+    if value <= SKETCH_MIN_VALUE:
+        return 0
+    return min(SKETCH_BUCKETS - 1, int(math.ceil(math.log(value / SKETCH_MIN_VALUE) / _LOG_GAMMA)))
+
+def ewma_update(mean: float, var: float, samples: int, value: float, alpha: float) -> Tuple[float, float]:
+    """
+    Atualiza média e variância exponenciais com um novo valor
+
+    Returns:
+        Tuple[float, float]: (média, variância)
+    """
+    if samples == 0:
+        return value, 0.0
+    diff = value - mean
+    increment = alpha * diff
+    return mean + increment, (1.0 - alpha) * (var + diff * increment)
+
+def ewma_weight(position: int, count: int, alpha: float) -> float:
+    """
+    Peso da observação na posição `position` (0 = mais antiga) de `count`
+    na média e variância obtidas por `ewma_update` (os pesos somam 1)
+    """
+    if position == 0:
+        return (1.0 - alpha) ** (count - 1)
+    return alpha * (1.0 - alpha) ** (count - 1 - position)
+
+class QuantileSketch:
+    """
+    Sketch de quantis com buckets logarítmicos fixos
+
+    Ocupa SKETCH_BUCKETS contadores (float32) independentemente do volume;
+    sketches de usuários, processos ou períodos diferentes são combinados
+    somando os contadores (`merge`).
+    """
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = array('f', bytes(4 * SKETCH_BUCKETS))
+        self.total = 0.0
+
+    def add(self, value: float, weight: float = 1.0):
+        """Registra valor"""
+        self.counts[sketch_bucket(value)] += weight
+        self.total += weight
+
+    def merge(self, other: 'QuantileSketch'):
+        """Soma outro sketch a este"""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+
+    def quantile(self, q: float) -> float:
+        """Valor aproximado do quantil q (0 a 1)"""
+        if self.total <= 0:
+            return 0.0
+        target = q * self.total
+        accumulated = 0.0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= target and count:
+                # Ponto médio (relativo) do bucket
+                return SKETCH_MIN_VALUE * 2 * SKETCH_GAMMA ** index / (SKETCH_GAMMA + 1)
+        return SKETCH_MIN_VALUE * SKETCH_GAMMA ** (SKETCH_BUCKETS - 1)
+
+    def rank(self, value: float) -> float:
+        """Fração dos valores registrados abaixo do valor (0 a 1)"""
+        if self.total <= 0:
+            return 0.0
+        index = sketch_bucket(value)
+        return (sum(self.counts[:index]) + self.counts[index] / 2) / self.total
+
+class HourProfile:
+    """Distribuição da atividade pelas 24 horas do dia (UTC)"""
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = array('f', bytes(4 * 24))
+        self.total = 0.0
+
+    def add(self, hour: int, weight: float = 1.0):
+        """Registra atividade na hora; o histórico decai pela metade ao atingir o limite"""
+        self.counts[hour] += weight
+        self.total += weight
+        if self.total > HOUR_PROFILE_CAP:
+            for index in range(24):
+                self.counts[index] /= 2
+            self.total /= 2
+
+    def load(self, counts: Iterable[float]):
+        """Substitui as contagens (reduzidas proporcionalmente se passarem do limite)"""
+        counts = list(counts)
+        total = sum(counts)
+        scale = min(1.0, HOUR_PROFILE_CAP / total) if total else 1.0
+        self.counts = array('f', [count * scale for count in counts])
+        self.total = total * scale
+
+    def share(self, hour: int) -> float:
+        """Fração da atividade na hora"""
+        return self.counts[hour] / self.total if self.total else 0.0
+
+class UserBaseline:
+    """Estado fixo de um usuário: valores de transações e taxa horária de acessos"""
+    __slots__ = (
+        "amount_mean", "amount_var", "amount_samples", "amount_sketch", "payment_hours",
+        "access_slot", "access_current", "access_mean", "access_var", "access_hours_observed",
+        "access_hours"
+    )
+
+    def __init__(self):
+        self.amount_mean = 0.0
+        self.amount_var = 0.0
+        self.amount_samples = 0
+        self.amount_sketch: Optional[QuantileSketch] = None
+        self.payment_hours: Optional[HourProfile] = None
+        self.access_slot: Optional[int] = None
+        self.access_current = 0
+        self.access_mean = 0.0
+        self.access_var = 0.0
+        self.access_hours_observed = 0
+        self.access_hours: Optional[HourProfile] = None
+
+class ActivityBaselines:
+    def __init__(self, alpha: float = 0.05, max_users: int = 20000):
+        """
+        Baselines de atividade por usuário
+
+        Cada evento atualiza o estado do usuário em tempo constante e é
+        pontuado contra o histórico anterior a ele:
+        - valores de transações: média/variância exponenciais (EWMA) do
+          log do valor, sketch de quantis e perfil por hora do dia;
+        - acessos a dados: EWMA da contagem por hora (horas sem acesso
+          contam como zero) e perfil por hora do dia.
+        Usuários além de `max_users` são descartados por LRU.
+
+        Args:
+            alpha: Peso de cada nova observação nas médias exponenciais
+            max_users: Máximo de usuários mantidos em memória
+        """
+        self.alpha = alpha
+        self.max_users = max_users
+        self.evictions = 0
+
+        self._users: "OrderedDict[Hashable, UserBaseline]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable) -> UserBaseline:
+        """Obtém (ou cria) o baseline do usuário (chamado com o lock)"""
+        baseline = self._users.get(key)
+        if baseline is None:
+            baseline = self._users[key] = UserBaseline()
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._users.move_to_end(key)
+        return baseline
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+
+    def observe_amount(self, key: Hashable, amount: float, timestamp: Optional[float] = None) -> Dict:
+        """
+        Pontua valor de transação e o incorpora ao baseline
+
+        Args:
+            key: Usuário
+            amount: Valor da transação
+            timestamp: Segundos desde a época (padrão: agora)
+
+        Returns:
+            Dict: samples (histórico anterior), zscore (do log do valor),
+            quantile_rank (fração do histórico abaixo do valor) e hour_share
+            (fração das transações do usuário na mesma hora do dia)
+        """
+        now = time.time() if timestamp is None else timestamp
+        hour = int(now // 3600) % 24
+        value = math.log1p(max(amount, 0.0))
+        with self._lock:
+            baseline = self._get(key)
+            if baseline.amount_sketch is None:
+                baseline.amount_sketch = QuantileSketch()
+                baseline.payment_hours = HourProfile()
+
+            std = max(math.sqrt(baseline.amount_var), MIN_LOG_AMOUNT_STD)
+            score = {
+                "samples": baseline.amount_samples,
+                "zscore": (value - baseline.amount_mean) / std if baseline.amount_samples else 0.0,
+                "quantile_rank": baseline.amount_sketch.rank(amount),
+                "hour_share": baseline.payment_hours.share(hour)
+            }
+
+            baseline.amount_mean, baseline.amount_var = ewma_update(
+                baseline.amount_mean, baseline.amount_var, baseline.amount_samples, value, self.alpha
+            )
+            baseline.amount_samples += 1
+            baseline.amount_sketch.add(amount)
+            baseline.payment_hours.add(hour)
+        return score
+
+    def observe_access(self, key: Hashable, timestamp: Optional[float] = None, weight: float = 1.0) -> Dict:
+        """
+        Pontua acesso a dados pela taxa horária do usuário
+
+        Args:
+            key: Usuário
+            timestamp: Segundos desde a época (padrão: agora)
+            weight: Acessos representados (inverso da taxa de amostragem)
+
+        Returns:
+            Dict: hours_observed (horas completas no histórico),
+            current_count (acessos na hora atual, incluindo este), expected
+            (média horária), zscore e hour_share
+        """
+        now = time.time() if timestamp is None else timestamp
+        slot = int(now // 3600)
+        with self._lock:
+            baseline = self._get(key)
+            if baseline.access_hours is None:
+                baseline.access_hours = HourProfile()
+            self._roll_access(baseline, slot)
+
+            hour_share = baseline.access_hours.share(slot % 24)
+            baseline.access_current += weight
+            baseline.access_hours.add(slot % 24, weight)
+
+            std = max(math.sqrt(baseline.access_var), MIN_HOURLY_COUNT_STD)
+            return {
+                "hours_observed": baseline.access_hours_observed,
+                "current_count": baseline.access_current,
+                "expected": baseline.access_mean,
+                "zscore": (baseline.access_current - baseline.access_mean) / std,
+                "hour_share": hour_share
+            }
+
+    def _roll_access(self, baseline: UserBaseline, slot: int):
+        """Fecha a hora corrente no baseline de acessos ao mudar de hora"""
+        if baseline.access_slot is None:
+            baseline.access_slot = slot
+            return
+        if slot <= baseline.access_slot:
+            # Evento atrasado: conta na hora corrente
+            return
+
+        completed = [baseline.access_current] + [0] * min(slot - baseline.access_slot - 1, MAX_IDLE_HOURS)
+        for count in completed:
+            baseline.access_mean, baseline.access_var = ewma_update(
+                baseline.access_mean, baseline.access_var, baseline.access_hours_observed, count, self.alpha
+            )
+            baseline.access_hours_observed += 1
+        baseline.access_slot = slot
+        baseline.access_current = 0
+
+    # ------------------------------------------------------------------
+    # Reconstrução a partir do histórico
+    # ------------------------------------------------------------------
+
+    def backfill(self, events: Iterable[Tuple[Hashable, float, Optional[float]]], use_numpy: Optional[bool] = None) -> Dict:
+        """
+        Reconstrói os baselines a partir de eventos armazenados
+
+        Os usuários presentes nos eventos têm o baseline substituído. As
+        médias exponenciais são calculadas na forma fechada (média e
+        variância ponderadas por `ewma_weight`), igual à obtida pelos mesmos
+        eventos em streaming e em ordem; como em `_roll_access`, lacunas de
+        acesso contam no máximo MAX_IDLE_HOURS horas vazias. Sketches e
+        perfis por hora são contagens exatas. Com NumPy disponível, cada
+        estatística é calculada em uma única passada vetorizada sobre todos
+        os eventos.
+
+        Args:
+            events: (usuário, timestamp, valor); valor None indica acesso a dados
+            use_numpy: Força (True) ou desativa (False) o modo vetorizado
+
+        Returns:
+            Dict: Número de usuários, transações e acessos processados
+        """
+        amount_events = ([], [], [])
+        access_events = ([], [])
+        for key, timestamp, amount in events:
+            if amount is None:
+                access_events[0].append(key)
+                access_events[1].append(timestamp)
+            else:
+                amount_events[0].append(key)
+                amount_events[1].append(timestamp)
+                amount_events[2].append(amount)
+
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise RuntimeError("NumPy não está instalado")
+
+        if use_numpy:
+            amounts = self._amount_backfill_numpy(*amount_events)
+            accesses = self._access_backfill_numpy(*access_events)
+        else:
+            amounts = self._amount_backfill_python(*amount_events)
+            accesses = self._access_backfill_python(*access_events)
+
+        with self._lock:
+            for key in set(amounts) | set(accesses):
+                baseline = UserBaseline()
+                if key in amounts:
+                    mean, var, samples, sketch_counts, hour_counts = amounts[key]
+                    baseline.amount_mean, baseline.amount_var, baseline.amount_samples = mean, var, samples
+                    baseline.amount_sketch = QuantileSketch()
+                    baseline.amount_sketch.counts = array('f', sketch_counts)
+                    baseline.amount_sketch.total = float(samples)
+                    baseline.payment_hours = HourProfile()
+                    baseline.payment_hours.load(hour_counts)
+                if key in accesses:
+                    (baseline.access_slot, baseline.access_current, baseline.access_mean,
+                     baseline.access_var, baseline.access_hours_observed, hour_counts) = accesses[key]
+                    baseline.access_hours = HourProfile()
+                    baseline.access_hours.load(hour_counts)
+                self._users[key] = baseline
+                self._users.move_to_end(key)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+
+        return {
+            "users": len(set(amounts) | set(accesses)),
+            "transactions": len(amount_events[0]),
+            "accesses": len(access_events[0]),
+            "vectorized": bool(use_numpy)
+        }
+
+    def _amount_backfill_python(self, keys, timestamps, amounts) -> Dict:
+        """Estatísticas de valores por usuário (implementação pura)"""
+        grouped: Dict[Hashable, list] = {}
+        for key, timestamp, amount in zip(keys, timestamps, amounts):
+            grouped.setdefault(key, []).append((timestamp, amount))
+
+        results = {}
+        for key, items in grouped.items():
+            items.sort(key=lambda item: item[0])
+            n = len(items)
+            values = [math.log1p(max(amount, 0.0)) for _, amount in items]
+            weights = [ewma_weight(position, n, self.alpha) for position in range(n)]
+            mean = sum(w * v for w, v in zip(weights, values))
+            var = sum(w * (v - mean) ** 2 for w, v in zip(weights, values))
+
+            sketch_counts = [0.0] * SKETCH_BUCKETS
+            hour_counts = [0.0] * 24
+            for timestamp, amount in items:
+                sketch_counts[sketch_bucket(amount)] += 1
+                hour_counts[int(timestamp // 3600) % 24] += 1
+            results[key] = (mean, var, n, sketch_counts, hour_counts)
+        return results
+
+    def _access_backfill_python(self, keys, timestamps) -> Dict:
+        """Estatísticas de acessos por usuário (implementação pura)"""
+        grouped: Dict[Hashable, Dict[int, int]] = {}
+        for key, timestamp in zip(keys, timestamps):
+            slots = grouped.setdefault(key, {})
+            slot = int(timestamp // 3600)
+            slots[slot] = slots.get(slot, 0) + 1
+
+        results = {}
+        for key, slots in grouped.items():
+            ordered = sorted(slots)
+            # Posição de cada hora com acesso entre as horas completas (lacunas limitadas)
+            positions = [0]
+            for previous, slot in zip(ordered, ordered[1:]):
+                positions.append(positions[-1] + 1 + min(slot - previous - 1, MAX_IDLE_HOURS))
+            hours = positions[-1]
+            hour_counts = [0.0] * 24
+            weighted = weighted_squares = 0.0
+            for slot, position in zip(ordered, positions):
+                count = slots[slot]
+                hour_counts[slot % 24] += count
+                if position < hours:
+                    weight = ewma_weight(position, hours, self.alpha)
+                    weighted += weight * count
+                    weighted_squares += weight * count * count
+            mean, var = self._hourly_moments(weighted, weighted_squares, hours)
+            last = ordered[-1]
+            results[key] = (last, slots[last], mean, var, hours, hour_counts)
+        return results
+
+    def _hourly_moments(self, weighted: float, weighted_squares: float, hours: int) -> Tuple[float, float]:
+        """Média e variância ponderadas das horas completas (horas sem acesso valem zero)"""
+        if hours <= 0:
+            return 0.0, 0.0
+        return weighted, max(weighted_squares - weighted * weighted, 0.0)
+
+    def _amount_backfill_numpy(self, keys, timestamps, amounts) -> Dict:
+        """Estatísticas de valores por usuário (vetorizado)"""
+        if not keys:
+            return {}
+        users, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        amounts = np.maximum(np.asarray(amounts, dtype=np.float64), 0.0)
+
+        order = np.lexsort((timestamps, inverse))
+        inverse, timestamps, amounts = inverse[order], timestamps[order], amounts[order]
+        sizes = np.bincount(inverse, minlength=len(users))
+        starts = np.cumsum(sizes) - sizes
+        positions = np.arange(len(inverse)) - starts[inverse]
+
+        values = np.log1p(amounts)
+        weights = self._ewma_weights_numpy(positions, sizes[inverse])
+        means = np.bincount(inverse, weights * values, minlength=len(users))
+        variances = np.bincount(inverse, weights * (values - means[inverse]) ** 2, minlength=len(users))
+
+        with np.errstate(divide='ignore'):
+            buckets = np.ceil(np.log(amounts / SKETCH_MIN_VALUE) / _LOG_GAMMA)
+        buckets = np.where(amounts <= SKETCH_MIN_VALUE, 0, np.minimum(buckets, SKETCH_BUCKETS - 1)).astype(np.int64)
+        sketches = np.bincount(inverse * SKETCH_BUCKETS + buckets, minlength=len(users) * SKETCH_BUCKETS)
+        sketches = sketches.reshape(len(users), SKETCH_BUCKETS)
+        hours = (np.floor_divide(timestamps, 3600).astype(np.int64) % 24)
+        profiles = np.bincount(inverse * 24 + hours, minlength=len(users) * 24).reshape(len(users), 24)
+
+        key_by_name = {str(key): key for key in keys}
+        return {
+            key_by_name[name]: (
+                float(means[index]), float(variances[index]), int(sizes[index]),
+                sketches[index].tolist(), profiles[index].tolist()
+            )
+            for index, name in enumerate(users)
+        }
+
+    def _access_backfill_numpy(self, keys, timestamps) -> Dict:
+        """Estatísticas de acessos por usuário (vetorizado)"""
+        if not keys:
+            return {}
+        users, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        slots = np.floor_divide(np.asarray(timestamps, dtype=np.float64), 3600).astype(np.int64)
+
+        last = np.full(len(users), np.iinfo(np.int64).min)
+        np.maximum.at(last, inverse, slots)
+
+        # Contagem por (usuário, hora)
+        offsets = slots - slots.min()
+        pairs, counts = np.unique(inverse.astype(np.int64) * (int(offsets.max()) + 1) + offsets, return_counts=True)
+        pair_users = pairs // (int(offsets.max()) + 1)
+        pair_slots = pairs % (int(offsets.max()) + 1) + slots.min()
+
+        # Posição de cada hora com acesso entre as horas completas (lacunas limitadas)
+        starts = np.ones(len(pairs), dtype=bool)
+        starts[1:] = pair_users[1:] != pair_users[:-1]
+        steps = np.zeros(len(pairs), dtype=np.int64)
+        steps[1:] = 1 + np.minimum(np.diff(pair_slots) - 1, MAX_IDLE_HOURS)
+        steps[starts] = 0
+        cumulative = np.cumsum(steps)
+        positions = cumulative - cumulative[np.flatnonzero(starts)][np.cumsum(starts) - 1]
+        hours = np.zeros(len(users), dtype=np.int64)
+        np.maximum.at(hours, pair_users, positions)
+
+        is_current = pair_slots == last[pair_users]
+        completed = ~is_current
+        weights = np.where(completed, self._ewma_weights_numpy(positions, np.maximum(hours[pair_users], 1)), 0.0)
+        weighted = np.bincount(pair_users, weights * counts, minlength=len(users))
+        weighted_squares = np.bincount(pair_users, weights * counts * counts, minlength=len(users))
+        current = np.bincount(pair_users, np.where(is_current, counts, 0), minlength=len(users))
+        profiles = np.bincount(pair_users * 24 + pair_slots % 24, counts, minlength=len(users) * 24).reshape(len(users), 24)
+
+        key_by_name = {str(key): key for key in keys}
+        results = {}
+        for index, name in enumerate(users):
+            mean, var = self._hourly_moments(float(weighted[index]), float(weighted_squares[index]), int(hours[index]))
+            results[key_by_name[name]] = (
+                int(last[index]), int(current[index]), mean, var, int(hours[index]), profiles[index].tolist()
+            )
+        return results
+
+    def _ewma_weights_numpy(self, positions, counts):
+        """`ewma_weight` vetorizado"""
+        decay = 1.0 - self.alpha
+        exponents = np.maximum(counts - 1 - positions, 0)
+        return np.where(positions == 0, decay ** (counts - 1), self.alpha * decay ** exponents)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def describe(self, key: Hashable) -> Optional[Dict]:
+        """Resumo do baseline do usuário (para detalhes de alertas e diagnóstico)"""
+        with self._lock:
+            baseline = self._users.get(key)
+            if baseline is None:
+                return None
+            summary = {
+                "amount_samples": baseline.amount_samples,
+                "access_hours_observed": baseline.access_hours_observed,
+                "expected_hourly_accesses": baseline.access_mean
+            }
+            if baseline.amount_sketch is not None and baseline.amount_samples:
+                summary["typical_amount"] = math.expm1(baseline.amount_mean)
+                summary["amount_p50"] = baseline.amount_sketch.quantile(0.5)
+                summary["amount_p99"] = baseline.amount_sketch.quantile(0.99)
+            return summary
+
+    def stats(self) -> Dict:
+        """Estatísticas dos baselines"""
+        with self._lock:
+            users = len(self._users)
+        return {"users": users, "max_users": self.max_users, "evictions": self.evictions, "alpha": self.alpha}
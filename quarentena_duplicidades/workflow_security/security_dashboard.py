@@ -0,0 +1,392 @@
+"""
+Snapshots do Dashboard de Segurança - TarefaMágica
+Alertas materializados por dia, atualizados incrementalmente, e cache TTL/LRU
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Níveis contados em cada snapshot (ver AlertLevel)
+ALERT_LEVELS = ("critical", "high", "medium", "low")
+
+def new_alert_counts() -> Dict:
+    """Cria contadores de alertas vazios"""
+    counts = {"total": 0, "resolved": 0}
+    for level in ALERT_LEVELS:
+        counts[level] = 0
+    return counts
+
+def _apply_alert(counts: Dict, alert: Dict, sign: int):
+    """Soma (sign=1) ou remove (sign=-1) a contribuição de um alerta"""
+    counts["total"] += sign
+    if alert.get("level") in counts:
+        counts[alert["level"]] += sign
+    if alert.get("resolved"):
+        counts["resolved"] += sign
+
+class DaySnapshot:
+    """Alertas de um dia, seus contadores e o mtime do arquivo de cada alerta"""
+
+    def __init__(self, day: str):
+        self.day = day
+        self.alerts: Dict[str, Dict] = {}
+        self.mtimes: Dict[str, Optional[int]] = {}
+        self.counts = new_alert_counts()
+
+    def upsert(self, alert: Dict, mtime_ns: Optional[int] = None):
+        """Insere ou substitui um alerta, ajustando os contadores"""
+        previous = self.alerts.get(alert["alert_id"])
+        if previous is not None:
+            _apply_alert(self.counts, previous, -1)
+        self.alerts[alert["alert_id"]] = alert
+        self.mtimes[alert["alert_id"]] = mtime_ns
+        _apply_alert(self.counts, alert, 1)
+
+    def remove(self, alert_id: str) -> bool:
+        """Remove um alerta, ajustando os contadores"""
+        previous = self.alerts.pop(alert_id, None)
+        self.mtimes.pop(alert_id, None)
+        if previous is None:
+            return False
+        _apply_alert(self.counts, previous, -1)
+        return True
+
+    def to_dict(self) -> Dict:
+        """Serializa o snapshot"""
+        return {"version": 2, "day": self.day, "alerts": list(self.alerts.values()), "mtimes": self.mtimes}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DaySnapshot':
+        """Reconstrói o snapshot (contadores são recalculados)"""
+        snapshot = cls(data["day"])
+        mtimes = data["mtimes"]
+        for alert in data["alerts"]:
+            snapshot.upsert(alert, mtimes[alert["alert_id"]])
+        return snapshot
+
+class AlertSnapshotStore:
+    def __init__(self, alerts_path: str, snapshots_path: str, rescan_interval: float = 5.0):
+        """
+        Alertas materializados por dia
+
+        Os arquivos de alerta continuam sendo a fonte de verdade. Os
+        snapshots diários (alertas do dia e contadores por nível) são
+        atualizados a cada alerta gravado por este processo (`upsert`) e
+        persistidos em `snapshots_path` com o mtime do arquivo de cada
+        alerta. Se o diretório mudar (outro processo), apenas os arquivos
+        novos ou com mtime diferente do conhecido são lidos e os removidos
+        saem dos snapshots; a verificação acontece no máximo a cada
+        `rescan_interval` segundos. A varredura completa só ocorre quando
+        não há snapshots persistidos válidos.
+
+        Os arquivos de alerta são nomeados `<alert_id>.json`.
+
+        Args:
+            alerts_path: Diretório dos arquivos de alerta
+            snapshots_path: Diretório dos snapshots persistidos
+            rescan_interval: Intervalo mínimo entre verificações do diretório
+        """
+        self.alerts_path = alerts_path
+        self.snapshots_path = snapshots_path
+        self.rescan_interval = rescan_interval
+        os.makedirs(self.snapshots_path, exist_ok=True)
+
+        self._days: Dict[str, DaySnapshot] = {}
+        self._files: Dict[str, Tuple[Optional[int], str]] = {}
+        self._dirty = set()
+        self._loaded = False
+        self._known_mtime = None
+        self._next_check = 0.0
+        self.rescans = 0
+        self.files_loaded = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+
+    def upsert(self, alert: Dict):
+        """
+        Registra alerta gravado por este processo
+
+        Deve ser chamado logo após a gravação do arquivo do alerta: o mtime
+        do arquivo é registrado para que a próxima verificação não o releia.
+        """
+        filename = f"{alert['alert_id']}.json"
+        try:
+            mtime = os.stat(os.path.join(self.alerts_path, filename)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._loaded:
+                self._apply(filename, alert, mtime)
+
+    def flush(self) -> int:
+        """
+        Persiste snapshots alterados e a lista de dias
+
+        Returns:
+            int: Número de snapshots gravados
+        """
+        with self._lock:
+            if not self._loaded:
+                return 0
+            pending = [(day, self._days[day].to_dict()) for day in sorted(self._dirty) if day in self._days]
+            self._dirty.clear()
+            state = {"days": sorted(self._days)}
+
+        try:
+            for day, data in pending:
+                self._write_json(os.path.join(self.snapshots_path, f"{day}.json"), data)
+            self._write_json(os.path.join(self.snapshots_path, "state.json"), state)
+        except Exception as e:
+            logging.error(f"Erro ao gravar snapshots do dashboard: {str(e)}")
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def alerts_between(self, start: datetime, end: datetime) -> List[Dict]:
+        """Alertas com timestamp no período"""
+        self._ensure_fresh()
+        start_iso, end_iso = start.isoformat(), end.isoformat()
+        alerts = []
+        with self._lock:
+            for day in self._days_between(start, end):
+                snapshot = self._days.get(day)
+                if snapshot is None:
+                    continue
+                for alert in snapshot.alerts.values():
+                    if start_iso <= alert["timestamp"] <= end_iso:
+                        alerts.append(alert)
+        return alerts
+
+    def counts_between(self, start: datetime, end: datetime) -> Dict:
+        """
+        Contadores de alertas do período
+
+        Dias inteiros usam os contadores materializados; apenas os dias das
+        bordas têm os alertas percorridos.
+        """
+        self._ensure_fresh()
+        start_iso, end_iso = start.isoformat(), end.isoformat()
+        counts = new_alert_counts()
+        with self._lock:
+            for day in self._days_between(start, end):
+                snapshot = self._days.get(day)
+                if snapshot is None:
+                    continue
+                day_start = datetime.strptime(day, '%Y%m%d')
+                if start <= day_start and day_start + timedelta(days=1) <= end:
+                    for key, value in snapshot.counts.items():
+                        counts[key] += value
+                    continue
+                for alert in snapshot.alerts.values():
+                    if start_iso <= alert["timestamp"] <= end_iso:
+                        _apply_alert(counts, alert, 1)
+        return counts
+
+    def _days_between(self, start: datetime, end: datetime) -> List[str]:
+        """Dias (YYYYMMDD) tocados pelo período"""
+        days = []
+        current = start.date()
+        while current <= end.date():
+            days.append(current.strftime('%Y%m%d'))
+            current += timedelta(days=1)
+        return days
+
+    # ------------------------------------------------------------------
+    # Sincronização com os arquivos de alerta
+    # ------------------------------------------------------------------
+
+    def _ensure_fresh(self):
+        """Carrega os snapshots na primeira leitura e aplica mudanças externas"""
+        if self._loaded and time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            self._next_check = time.monotonic() + self.rescan_interval
+            mtime = self._directory_mtime()
+            if not self._loaded:
+                if self._load_persisted():
+                    self._sync(mtime)
+                else:
+                    self._rescan(mtime)
+                self._loaded = True
+            elif mtime != self._known_mtime:
+                self._sync(mtime)
+
+    def _load_persisted(self) -> bool:
+        """Carrega snapshots persistidos (alertas e mtime de cada arquivo)"""
+        try:
+            with open(os.path.join(self.snapshots_path, "state.json"), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            days = {}
+            for day in state["days"]:
+                with open(os.path.join(self.snapshots_path, f"{day}.json"), 'r', encoding='utf-8') as f:
+                    days[day] = DaySnapshot.from_dict(json.load(f))
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.error(f"Snapshots do dashboard inválidos, reconstruindo: {str(e)}")
+            return False
+        self._days = days
+        self._files = {
+            f"{alert_id}.json": (mtime, day)
+            for day, snapshot in days.items()
+            for alert_id, mtime in snapshot.mtimes.items()
+        }
+        return True
+
+    def _sync(self, mtime: Optional[int]):
+        """
+        Aplica as mudanças do diretório de alertas aos snapshots
+
+        Só os arquivos novos ou com mtime diferente do registrado são lidos;
+        alertas cujos arquivos sumiram são removidos.
+
+        Args:
+            mtime: mtime do diretório lido antes da listagem
+        """
+        present = self._list_alert_files()
+        for filename in [name for name in self._files if name not in present]:
+            _, day = self._files.pop(filename)
+            snapshot = self._days.get(day)
+            if snapshot is not None and snapshot.remove(filename[:-len(".json")]):
+                self._dirty.add(day)
+        for filename, file_mtime in present.items():
+            known = self._files.get(filename)
+            if known is None or known[0] != file_mtime:
+                alert = self._read_alert(filename)
+                if alert is not None:
+                    self._apply(filename, alert, file_mtime)
+        self._known_mtime = mtime
+
+    def _rescan(self, mtime: Optional[int]):
+        """Reconstrói todos os snapshots a partir dos arquivos de alerta"""
+        self._days = {}
+        self._files = {}
+        for filename, file_mtime in self._list_alert_files().items():
+            alert = self._read_alert(filename)
+            if alert is not None:
+                self._apply(filename, alert, file_mtime)
+        self._dirty = set(self._days)
+        self._known_mtime = mtime
+        self.rescans += 1
+
+    def _apply(self, filename: str, alert: Dict, mtime: Optional[int]):
+        """Insere o alerta no snapshot do seu dia (saindo do dia anterior, se mudou)"""
+        day = alert["timestamp"][:10].replace("-", "")
+        known = self._files.get(filename)
+        if known is not None and known[1] != day:
+            previous = self._days.get(known[1])
+            if previous is not None and previous.remove(alert["alert_id"]):
+                self._dirty.add(known[1])
+        snapshot = self._days.get(day)
+        if snapshot is None:
+            snapshot = self._days[day] = DaySnapshot(day)
+        snapshot.upsert(alert, mtime)
+        self._files[filename] = (mtime, day)
+        self._dirty.add(day)
+
+    def _list_alert_files(self) -> Dict[str, int]:
+        """Arquivos de alerta e seus mtimes (ns)"""
+        files = {}
+        try:
+            with os.scandir(self.alerts_path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        files[entry.name] = entry.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return files
+
+    def _read_alert(self, filename: str) -> Optional[Dict]:
+        """Lê um arquivo de alerta"""
+        try:
+            with open(os.path.join(self.alerts_path, filename), 'r', encoding='utf-8') as f:
+                alert = json.load(f)
+            if "alert_id" not in alert or "timestamp" not in alert:
+                raise ValueError("alerta sem alert_id ou timestamp")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Erro ao carregar alerta {filename}: {str(e)}")
+            return None
+        self.files_loaded += 1
+        return alert
+
+    def _directory_mtime(self) -> Optional[int]:
+        """mtime (ns) do diretório de alertas"""
+        try:
+            return os.stat(self.alerts_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _write_json(self, path: str, data: Any):
+        """Grava JSON de forma atômica"""
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'), default=str)
+        os.replace(temp_path, path)
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 32):
+        """
+        Cache em memória com expiração por tempo e descarte LRU
+
+        Args:
+            ttl_seconds: Validade de cada entrada
+            max_entries: Máximo de entradas
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Obtém valor do cache ou o calcula e armazena
+
+        O cálculo ocorre fora do lock; chamadas simultâneas para a mesma
+        chave expirada podem calcular o valor mais de uma vez.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Descarta todas as entradas"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Estatísticas do cache"""
+        with self._lock:
+            entries = len(self._entries)
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl_seconds}
@@ -6,6 +6,7 @@ Implementa middleware para headers de segurança
 from flask import request, make_response
 from typing import Dict, List, Optional
 import logging
+import math
 
 class SecurityHeaders:
     def __init__(self):
@@ -58,8 +59,10 @@ class SecurityHeaders:
                 'X-Client-Version'
             ],
             'expose_headers': [
-                'X-Rate-Limit-Remaining',
-                'X-Rate-Limit-Reset',
+                'X-RateLimit-Limit',
+                'X-RateLimit-Remaining',
+                'X-RateLimit-Reset',
+                'Retry-After',
                 'X-Total-Count'
             ],
             'max_age': 86400,  # 24 horas
@@ -238,21 +241,34 @@ class SecurityHeaders:
             logging.error(f"Erro ao manipular requisição preflight: {str(e)}")
             return make_response('', 500)
             
-    def add_rate_limit_headers(self, response, remaining: int, reset_time: int):
+    def add_rate_limit_headers(
+        self,
+        response,
+        remaining: int,
+        reset_time: int,
+        limit: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
         """
         Adiciona headers de rate limiting
         
         Args:
             response: Resposta Flask
             remaining: Tentativas restantes
-            reset_time: Timestamp de reset
+            reset_time: Timestamp (epoch, segundos) em que o limite volta ao máximo
+            limit: Máximo de tentativas do limite aplicado
+            retry_after: Segundos até a próxima tentativa aceita (respostas 429)
             
         Returns:
             Response: Resposta com headers de rate limiting
         """
         try:
-            response.headers['X-Rate-Limit-Remaining'] = str(remaining)
-            response.headers['X-Rate-Limit-Reset'] = str(reset_time)
+            if limit is not None:
+                response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = str(remaining)
+            response.headers['X-RateLimit-Reset'] = str(reset_time)
+            if retry_after is not None:
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
             return response
             
         except Exception as e:
@@ -0,0 +1,452 @@
+"""
+Agregador de Métricas de Segurança - TarefaMágica
+Contadores por minuto, hora e dia em memória, persistidos em rollups compactos
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+class MetricResolution(Enum):
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+# Limites superiores do histograma de valores de cada bucket
+METRIC_HISTOGRAM_BOUNDS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# Arquivo de rollup: um por dia e por escritor (processo)
+ROLLUP_PATTERN = re.compile(r'^(\d{8})\.([A-Za-z0-9-]+)\.json$')
+
+# Escritor usado ao consolidar os arquivos de um dia na compactação
+MERGED_WRITER = "merged"
+
+_EPOCH = datetime(1970, 1, 1)
+
+def new_metric_bucket() -> Dict:
+    """Cria um bucket de métrica vazio"""
+    return {
+        "count": 0,
+        "sum": 0.0,
+        "min": None,
+        "max": None,
+        "hist": [0] * (len(METRIC_HISTOGRAM_BOUNDS) + 1)
+    }
+
+def add_to_bucket(bucket: Dict, value: float):
+    """Acumula uma amostra no bucket"""
+    bucket["count"] += 1
+    bucket["sum"] += value
+    if bucket["min"] is None or value < bucket["min"]:
+        bucket["min"] = value
+    if bucket["max"] is None or value > bucket["max"]:
+        bucket["max"] = value
+    bucket["hist"][bisect_left(METRIC_HISTOGRAM_BOUNDS, value)] += 1
+
+def merge_bucket(target: Dict, source: Dict):
+    """Soma o bucket `source` em `target`"""
+    if not source["count"]:
+        return
+    target["count"] += source["count"]
+    target["sum"] += source["sum"]
+    if target["min"] is None or source["min"] < target["min"]:
+        target["min"] = source["min"]
+    if target["max"] is None or source["max"] > target["max"]:
+        target["max"] = source["max"]
+    for position, count in enumerate(source["hist"]):
+        target["hist"][position] += count
+
+def new_day_rollup(day: str) -> Dict:
+    """Cria as camadas (minuto, hora, dia) vazias de um dia"""
+    return {"version": 1, "day": day, "minutes": {}, "hours": {}, "total": {}}
+
+def _day_start(day: str) -> datetime:
+    """Início (UTC) de um dia YYYYMMDD"""
+    return datetime.strptime(day, '%Y%m%d')
+
+class MetricAggregator:
+    def __init__(
+        self,
+        rollups_path: str,
+        minute_retention_days: int = 2,
+        hour_retention_days: int = 30,
+        day_retention_days: int = 365
+    ):
+        """
+        Agregador de métricas em buckets de tempo
+
+        Cada amostra é somada em três camadas do seu dia: minuto, hora e o
+        total do dia. Os dias tocados ficam em memória e são gravados
+        periodicamente (`flush`) em um único arquivo por dia e por escritor,
+        reescrito de forma atômica, então processos distintos nunca
+        disputam o mesmo arquivo. A compactação consolida os arquivos de
+        dias antigos e descarta as camadas mais finas conforme a retenção.
+
+        Args:
+            rollups_path: Diretório dos arquivos de rollup
+            minute_retention_days: Dias mantidos com resolução de minuto
+            hour_retention_days: Dias mantidos com resolução de hora
+            day_retention_days: Dias mantidos com o total diário
+        """
+        self.rollups_path = rollups_path
+        self.minute_retention_days = minute_retention_days
+        self.hour_retention_days = hour_retention_days
+        self.day_retention_days = day_retention_days
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        os.makedirs(self.rollups_path, exist_ok=True)
+        self._days: Dict[str, Dict] = {}
+        self._dirty: Set[str] = set()
+        self._day_keys: Dict[int, str] = {}
+        self._latest_day = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def record(self, metric_name: str, value: float = 1.0, timestamp: Optional[float] = None):
+        """
+        Registra uma amostra
+
+        Args:
+            metric_name: Nome da métrica
+            value: Valor da amostra
+            timestamp: Segundos desde a época (padrão: agora)
+        """
+        self.record_many([(metric_name, value, time.time() if timestamp is None else timestamp)])
+
+    def record_many(self, samples: Iterable[Tuple[str, float, float]]):
+        """
+        Registra várias amostras com uma única aquisição do lock
+
+        Args:
+            samples: Tuplas (nome da métrica, valor, segundos desde a época)
+        """
+        with self._lock:
+            for metric_name, value, timestamp in samples:
+                minute = int(timestamp // 60)
+                epoch_day, minute_of_day = divmod(minute, 1440)
+                day = self._day_keys.get(epoch_day)
+                if day is None:
+                    day = self._day_keys[epoch_day] = (_EPOCH + timedelta(days=epoch_day)).strftime('%Y%m%d')
+                rollup = self._days.get(day)
+                if rollup is None:
+                    rollup = self._days[day] = self._load_own_day(day)
+                if self._latest_day is None or day > self._latest_day:
+                    self._latest_day = day
+
+                hour_key = f"{minute_of_day // 60:02d}"
+                minute_key = f"{hour_key}{minute_of_day % 60:02d}"
+                for layer, key in (("minutes", minute_key), ("hours", hour_key)):
+                    buckets = rollup[layer].get(metric_name)
+                    if buckets is None:
+                        buckets = rollup[layer][metric_name] = {}
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        bucket = buckets[key] = new_metric_bucket()
+                    add_to_bucket(bucket, value)
+                total = rollup["total"].get(metric_name)
+                if total is None:
+                    total = rollup["total"][metric_name] = new_metric_bucket()
+                add_to_bucket(total, value)
+                self._dirty.add(day)
+
+    def flush(self) -> int:
+        """
+        Grava os dias alterados e libera da memória os dias anteriores ao
+        último dia com amostras
+
+        Returns:
+            int: Número de arquivos gravados
+        """
+        with self._lock:
+            pending = [(day, json.dumps(self._days[day], separators=(',', ':'))) for day in sorted(self._dirty)]
+            self._dirty.clear()
+
+        written = 0
+        for day, payload in pending:
+            target = self._rollup_path(day, self.writer_id)
+            temp_path = f"{target}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(temp_path, target)
+                written += 1
+            except Exception as e:
+                logging.error(f"Erro ao gravar rollup de métricas {target}: {str(e)}")
+                with self._lock:
+                    self._dirty.add(day)
+
+        # Dias anteriores já gravados não recebem mais amostras em regime normal
+        with self._lock:
+            for day in list(self._days):
+                if day not in self._dirty and day < self._latest_day:
+                    del self._days[day]
+        return written
+
+    def _rollup_path(self, day: str, writer: str) -> str:
+        """Caminho do arquivo de rollup de um dia e escritor"""
+        return os.path.join(self.rollups_path, f"{day}.{writer}.json")
+
+    def _load_own_day(self, day: str) -> Dict:
+        """Retoma o rollup já gravado por este escritor (dia liberado da memória)"""
+        data = self._read_rollup(self._rollup_path(day, self.writer_id))
+        return data if data is not None else new_day_rollup(day)
+
+    def _read_rollup(self, path: str) -> Optional[Dict]:
+        """Lê um arquivo de rollup; None se ausente ou inválido"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Rollup de métricas inválido {path}: {str(e)}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _list_files(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Arquivos de rollup agrupados por dia: dia -> [(escritor, caminho)]"""
+        files: Dict[str, List[Tuple[str, str]]] = {}
+        for filename in os.listdir(self.rollups_path):
+            match = ROLLUP_PATTERN.match(filename)
+            if match:
+                files.setdefault(match.group(1), []).append(
+                    (match.group(2), os.path.join(self.rollups_path, filename))
+                )
+        return files
+
+    def _day_views(self, day: str, files: List[Tuple[str, str]]) -> List[Dict]:
+        """Rollups de todos os escritores de um dia (o próprio vem da memória, se presente)"""
+        views = []
+        with self._lock:
+            own = self._days.get(day)
+            if own is not None:
+                views.append(json.loads(json.dumps(own)))
+        for writer, path in files:
+            if own is not None and writer == self.writer_id:
+                continue
+            data = self._read_rollup(path)
+            if data is not None:
+                views.append(data)
+        return views
+
+    def _select_buckets(
+        self,
+        view: Dict,
+        start: datetime,
+        end: datetime,
+        metric_names: Optional[Set[str]]
+    ) -> Iterator[Tuple[str, datetime, MetricResolution, Dict]]:
+        """
+        Buckets de um rollup que cobrem [start, end], usando a camada mais
+        grossa possível: total do dia se o dia inteiro está no intervalo,
+        horas inteiras, e minutos apenas nas bordas (se ainda retidos; caso
+        contrário a hora da borda entra se começar dentro do intervalo)
+        """
+        day_start = _day_start(view["day"])
+        day_end = day_start + timedelta(days=1)
+        for metric_name, total in view["total"].items():
+            if metric_names is not None and metric_name not in metric_names:
+                continue
+            if start <= day_start and day_end - timedelta(minutes=1) <= end and total["count"]:
+                yield metric_name, day_start, MetricResolution.DAY, total
+                continue
+
+            hours = view["hours"].get(metric_name)
+            if not hours:
+                # Camada de horas já descartada: o total entra se o dia começa no intervalo
+                if start <= day_start <= end:
+                    yield metric_name, day_start, MetricResolution.DAY, total
+                continue
+
+            minutes = view["minutes"].get(metric_name, {})
+            for hour_key, bucket in hours.items():
+                hour_start = day_start + timedelta(hours=int(hour_key))
+                if start <= hour_start and hour_start + timedelta(minutes=59) <= end:
+                    yield metric_name, hour_start, MetricResolution.HOUR, bucket
+                    continue
+                if hour_start + timedelta(minutes=59) < start or hour_start > end:
+                    continue
+                if minutes:
+                    for minute in range(60):
+                        minute_bucket = minutes.get(f"{hour_key}{minute:02d}")
+                        minute_start = hour_start + timedelta(minutes=minute)
+                        if minute_bucket is not None and start <= minute_start <= end:
+                            yield metric_name, minute_start, MetricResolution.MINUTE, minute_bucket
+                elif start <= hour_start <= end:
+                    yield metric_name, hour_start, MetricResolution.HOUR, bucket
+
+    def totals(
+        self,
+        start: datetime,
+        end: datetime,
+        metric_names: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Totais por métrica no período
+
+        Args:
+            start: Início do período (UTC)
+            end: Fim do período (UTC)
+            metric_names: Métricas desejadas (padrão: todas)
+
+        Returns:
+            Dict[str, Dict]: Nome da métrica -> bucket agregado
+        """
+        names = set(metric_names) if metric_names is not None else None
+        files = self._list_files()
+        totals: Dict[str, Dict] = {}
+        for day in self._days_between(start, end):
+            for view in self._day_views(day, files.get(day, [])):
+                for metric_name, _, _, bucket in self._select_buckets(view, start, end, names):
+                    target = totals.get(metric_name)
+                    if target is None:
+                        target = totals[metric_name] = new_metric_bucket()
+                    merge_bucket(target, bucket)
+        return totals
+
+    def series(
+        self,
+        start: datetime,
+        end: datetime,
+        resolution: MetricResolution,
+        metric_names: Optional[Iterable[str]] = None
+    ) -> List[Dict]:
+        """
+        Série temporal por métrica na resolução pedida
+
+        Dias cuja camada pedida já foi descartada pela retenção não geram
+        pontos nessa resolução.
+
+        Args:
+            start: Início do período (UTC)
+            end: Fim do período (UTC)
+            resolution: Resolução dos pontos
+            metric_names: Métricas desejadas (padrão: todas)
+
+        Returns:
+            List[Dict]: Pontos ordenados por métrica e timestamp
+        """
+        names = set(metric_names) if metric_names is not None else None
+        layer = {MetricResolution.MINUTE: "minutes", MetricResolution.HOUR: "hours"}.get(resolution)
+        files = self._list_files()
+        points: Dict[Tuple[str, datetime], Dict] = {}
+        for day in self._days_between(start, end):
+            day_start = _day_start(day)
+            for view in self._day_views(day, files.get(day, [])):
+                if layer is None:
+                    entries = [(metric_name, day_start, bucket) for metric_name, bucket in view["total"].items()]
+                else:
+                    entries = []
+                    for metric_name, buckets in view[layer].items():
+                        for key, bucket in buckets.items():
+                            offset = timedelta(hours=int(key[:2]), minutes=int(key[2:] or 0))
+                            entries.append((metric_name, day_start + offset, bucket))
+                for metric_name, timestamp, bucket in entries:
+                    if names is not None and metric_name not in names:
+                        continue
+                    if layer is not None and not start <= timestamp <= end:
+                        continue
+                    target = points.get((metric_name, timestamp))
+                    if target is None:
+                        target = points[(metric_name, timestamp)] = new_metric_bucket()
+                    merge_bucket(target, bucket)
+
+        return [
+            {
+                "metric_name": metric_name,
+                "resolution": resolution.value,
+                "timestamp": timestamp.isoformat(),
+                "count": bucket["count"],
+                "sum": bucket["sum"],
+                "min": bucket["min"],
+                "max": bucket["max"]
+            }
+            for (metric_name, timestamp), bucket in sorted(points.items())
+        ]
+
+    def _days_between(self, start: datetime, end: datetime) -> List[str]:
+        """Dias (YYYYMMDD) tocados pelo período"""
+        days = []
+        current = start.date()
+        while current <= end.date():
+            days.append(current.strftime('%Y%m%d'))
+            current += timedelta(days=1)
+        return days
+
+    # ------------------------------------------------------------------
+    # Retenção
+    # ------------------------------------------------------------------
+
+    def compact(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Consolida e reduz a resolução dos dias antigos
+
+        Dias além da retenção de minutos têm os arquivos de todos os
+        escritores consolidados em um só, sem a camada de minutos; além da
+        retenção de horas, resta apenas o total diário; além da retenção
+        diária, o dia é removido.
+
+        Returns:
+            Dict: Número de dias consolidados e removidos
+        """
+        now = now or datetime.utcnow()
+        today = now.date()
+        summary = {"compacted_days": 0, "removed_days": 0}
+        with self._lock:
+            in_memory = set(self._days)
+
+        for day, files in sorted(self._list_files().items()):
+            age = (today - _day_start(day).date()).days
+            if day in in_memory or age <= self.minute_retention_days:
+                continue
+            try:
+                if age > self.day_retention_days:
+                    for _, path in files:
+                        os.remove(path)
+                    summary["removed_days"] += 1
+                    continue
+
+                drop_hours = age > self.hour_retention_days
+                if len(files) == 1 and files[0][0] == MERGED_WRITER:
+                    data = self._read_rollup(files[0][1])
+                    if data is None or (not data["minutes"] and (not drop_hours or not data["hours"])):
+                        continue
+
+                merged = new_day_rollup(day)
+                for _, path in files:
+                    data = self._read_rollup(path)
+                    if data is None:
+                        continue
+                    for metric_name, bucket in data["total"].items():
+                        merge_bucket(merged["total"].setdefault(metric_name, new_metric_bucket()), bucket)
+                    if not drop_hours:
+                        for metric_name, buckets in data["hours"].items():
+                            target = merged["hours"].setdefault(metric_name, {})
+                            for key, bucket in buckets.items():
+                                merge_bucket(target.setdefault(key, new_metric_bucket()), bucket)
+
+                target_path = self._rollup_path(day, MERGED_WRITER)
+                with open(f"{target_path}.tmp", 'w', encoding='utf-8') as f:
+                    json.dump(merged, f, separators=(',', ':'))
+                os.replace(f"{target_path}.tmp", target_path)
+                for writer, path in files:
+                    if writer != MERGED_WRITER:
+                        os.remove(path)
+                summary["compacted_days"] += 1
+            except Exception as e:
+                logging.error(f"Erro ao compactar métricas do dia {day}: {str(e)}")
+        return summary
@@ -6,16 +6,27 @@ Implementa detecção de anomalias, alertas e monitoramento em tempo real
 import json
 import logging
 import os
+import random
 import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import threading
 import queue
-import hashlib
 import ipaddress
 
+from .security_metrics import MetricAggregator, MetricResolution
+from .log_pipeline import configure_logging
+from .security_trackers import SlidingWindowTracker
+from .ip_blacklist import IPBlacklist
+from .security_dashboard import AlertSnapshotStore, TTLCache
+from .security_baselines import ActivityBaselines
+from .traffic_analytics import TrafficAnalytics
+
 class AlertLevel(Enum):
     LOW = "low"
     MEDIUM = "medium"
@@ -46,13 +57,14 @@ class SecurityAlert:
     details: Optional[Dict] = None
 
 @dataclass
-class SecurityMetric:
-    metric_id: str
-    metric_name: str
-    value: float
-    timestamp: datetime
+class RequestRecord:
+    timestamp: float
+    ip_address: str
+    method: str
+    path: str
     user_id: Optional[str] = None
-    context: Optional[Dict] = None
+    user_agent: Optional[str] = None
+    weight: float = 1.0  # requisições representadas (inverso da taxa de amostragem)
 
 class SecurityMonitoring:
     def __init__(self, storage_path: str = "data/security"):
@@ -67,7 +79,15 @@ class SecurityMonitoring:
         self._setup_logging()
         self._setup_alert_queue()
         self._load_configuration()
+        self._setup_metric_aggregator()
+        self._setup_traffic_analytics()
+        self._setup_activity_trackers()
+        self._setup_activity_baselines()
+        self._setup_ip_blacklist()
+        self._setup_dashboard_snapshots()
+        self._start_alert_dispatchers()
         self._start_monitoring_thread()
+        self._start_ingest_workers()
         
     def _setup_storage(self):
         """Configura diretório de armazenamento"""
@@ -80,16 +100,27 @@ class SecurityMonitoring:
     def _setup_logging(self):
         """Configura logging para monitoramento"""
         log_path = os.path.join(self.storage_path, "security_monitoring.log")
-        logging.basicConfig(
+        configure_logging(
             filename=log_path,
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
     def _setup_alert_queue(self):
-        """Configura fila de alertas"""
-        self.alert_queue = queue.Queue()
+        """Configura handlers e janela de deduplicação de alertas"""
         self.alert_handlers = []
+        # Impressão digital -> alerta aberto na janela de deduplicação
+        self._recent_alerts: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._alert_lock = threading.Lock()
+        self.alert_stats = {
+            "created": 0,
+            "coalesced": 0,
+            "dispatched": 0,
+            "dropped": 0,
+            "handler_failures": 0,
+            "handler_timeouts": 0,
+            "handler_retries": 0
+        }
         
     def _load_configuration(self):
         """Carrega configurações de monitoramento"""
@@ -97,10 +128,53 @@ class SecurityMonitoring:
             "login_attempts_threshold": 5,
             "login_attempts_window": 300,  # 5 minutos
             "suspicious_ip_threshold": 10,
+            "suspicious_ip_window": 60,  # segundos
+            "tracker_buckets": 30,  # sub-janelas por janela deslizante
+            "tracker_sample_size": 5,  # eventos recentes guardados por chave
+            "tracker_memory_limit_mb": 128,
+            "blacklist_check_interval_seconds": 1.0,
+            "alert_dedupe_window_seconds": 300,
+            "alert_dedupe_max_entries": 10000,
+            "alert_queue_capacity": 1000,
+            "alert_workers": 2,
+            "alert_handler_pool_size": 4,
+            "alert_handler_timeout_seconds": 5.0,
+            "alert_handler_retries": 2,
+            "alert_handler_retry_backoff_ms": 200,
             "data_access_threshold": 100,
             "financial_threshold": 1000.0,
+            "baseline_ewma_alpha": 0.05,
+            "baseline_max_users": 20000,
+            "baseline_min_transactions": 20,  # histórico mínimo para pontuar valores
+            "baseline_min_hours": 24,  # horas observadas antes de pontuar acessos
+            "amount_anomaly_zscore": 4.0,
+            "amount_anomaly_quantile": 0.99,
+            "unusual_hour_share": 0.02,  # fração mínima esperada da atividade na hora
+            "data_access_anomaly_zscore": 4.0,
+            "data_access_min_burst": 20,  # acessos na hora antes de pontuar
             "alert_retention_days": 90,
-            "metrics_retention_days": 30
+            "dashboard_cache_ttl_seconds": 5,  # defasagem máxima do dashboard
+            "dashboard_cache_max_entries": 32,
+            "dashboard_rescan_interval_seconds": 5,  # verificação de alertas gravados por outros processos
+            "metrics_retention_days": 30,  # retenção da resolução horária
+            "metrics_minute_retention_days": 2,
+            "metrics_day_retention_days": 365,
+            "metrics_flush_seconds": 60,
+            "metrics_compaction_interval_seconds": 3600,
+            "traffic_top_k": 20,  # candidatos por ranking (IPs, caminhos, user agents)
+            "traffic_sketch_width": 1024,
+            "traffic_sketch_depth": 4,
+            "traffic_hll_precision": 12,
+            "traffic_retention_days": 7,
+            "traffic_top_limit": 10,  # itens por ranking no dashboard
+            "async_request_monitoring": True,
+            "ingest_workers": 2,
+            "ingest_queue_capacity": 10000,
+            "ingest_batch_size": 200,
+            "ingest_max_batch_latency_ms": 500,
+            "request_sample_rate": 1.0,
+            "path_sample_rates": {},  # prefixo do caminho -> taxa de amostragem
+            "excluded_paths": ["/health", "/static/", "/favicon.ico"]
         }
         
         # Carrega configuração de arquivo se existir
@@ -112,6 +186,164 @@ class SecurityMonitoring:
             except Exception as e:
                 logging.error(f"Erro ao carregar configuração: {str(e)}")
                 
+        self._compile_ingest_rules()
+        
+    def _compile_ingest_rules(self):
+        """Pré-processa regras de exclusão e amostragem por caminho"""
+        self._excluded_prefixes = tuple(self.config["excluded_paths"])
+        # Prefixo mais específico primeiro
+        self._path_sample_rates = sorted(
+            self.config["path_sample_rates"].items(),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        
+    def _setup_metric_aggregator(self):
+        """Configura agregador de métricas em buckets de tempo"""
+        self.metric_aggregator = MetricAggregator(
+            os.path.join(self.storage_path, "metrics", "rollups"),
+            minute_retention_days=self.config["metrics_minute_retention_days"],
+            hour_retention_days=self.config["metrics_retention_days"],
+            day_retention_days=self.config["metrics_day_retention_days"]
+        )
+        self._last_metrics_flush = time.monotonic()
+        self._last_metrics_compaction = 0.0
+        
+    def _setup_traffic_analytics(self):
+        """Configura sketches de tráfego por hora (rankings e distintos)"""
+        self.traffic_analytics = TrafficAnalytics(
+            os.path.join(self.storage_path, "traffic"),
+            top_k=self.config["traffic_top_k"],
+            sketch_width=self.config["traffic_sketch_width"],
+            sketch_depth=self.config["traffic_sketch_depth"],
+            hll_precision=self.config["traffic_hll_precision"],
+            retention_days=self.config["traffic_retention_days"]
+        )
+        
+    def _setup_activity_trackers(self):
+        """
+        Configura rastreadores de janela deslizante dos detectores
+        
+        O limite de memória é dividido igualmente entre os rastreadores e
+        convertido em número máximo de chaves de cada um.
+        """
+        buckets = self.config["tracker_buckets"]
+        sample_size = self.config["tracker_sample_size"]
+        key_bytes = SlidingWindowTracker.estimate_key_bytes(buckets, sample_size)
+        max_keys = max(1, int(self.config["tracker_memory_limit_mb"] * 1024 * 1024 / key_bytes / 3))
+        
+        self.login_failures_by_user = SlidingWindowTracker(
+            self.config["login_attempts_window"], buckets, max_keys, sample_size
+        )
+        self.login_failures_by_ip = SlidingWindowTracker(
+            self.config["login_attempts_window"], buckets, max_keys, sample_size
+        )
+        self.ip_activity = SlidingWindowTracker(
+            self.config["suspicious_ip_window"], buckets, max_keys, sample_size
+        )
+        
+    def _setup_activity_baselines(self):
+        """Configura baselines estatísticos por usuário (valores e acessos)"""
+        self.activity_baselines = ActivityBaselines(
+            alpha=self.config["baseline_ewma_alpha"],
+            max_users=self.config["baseline_max_users"]
+        )
+        
+    def _setup_ip_blacklist(self):
+        """Carrega blacklist de IPs em memória (recarregada quando o arquivo muda)"""
+        self.ip_blacklist = IPBlacklist(
+            os.path.join(self.storage_path, "blacklist", "ips.json"),
+            check_interval=self.config["blacklist_check_interval_seconds"]
+        )
+        
+    def _setup_dashboard_snapshots(self):
+        """Configura snapshots diários de alertas e cache do dashboard"""
+        self.alert_snapshots = AlertSnapshotStore(
+            os.path.join(self.storage_path, "alerts"),
+            os.path.join(self.storage_path, "dashboard"),
+            rescan_interval=self.config["dashboard_rescan_interval_seconds"]
+        )
+        self.dashboard_cache = TTLCache(
+            self.config["dashboard_cache_ttl_seconds"],
+            self.config["dashboard_cache_max_entries"]
+        )
+        
+    def _start_ingest_workers(self):
+        """Inicia pool de workers de ingestão de requisições"""
+        self.request_queue = queue.Queue(maxsize=self.config["ingest_queue_capacity"])
+        self._ingest_lock = threading.Lock()
+        self.ingest_stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "excluded": 0,
+            "sampled_out": 0,
+            "processed": 0,
+            "batches": 0
+        }
+        
+        self.ingest_active = True
+        self.ingest_workers = []
+        for number in range(max(1, self.config["ingest_workers"])):
+            worker = threading.Thread(target=self._ingest_loop, name=f"security-ingest-{number}")
+            worker.daemon = True
+            worker.start()
+            self.ingest_workers.append(worker)
+            
+    def _ingest_loop(self):
+        """Loop dos workers: agrupa requisições em lotes e as processa"""
+        batch_size = self.config["ingest_batch_size"]
+        max_latency = self.config["ingest_max_batch_latency_ms"] / 1000.0
+        while self.ingest_active or not self.request_queue.empty():
+            try:
+                try:
+                    batch = [self.request_queue.get(timeout=1.0)]
+                except queue.Empty:
+                    continue
+                    
+                # Completa o lote até o tamanho máximo ou a latência máxima do primeiro registro
+                deadline = time.monotonic() + max_latency
+                while len(batch) < batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.request_queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                        
+                self._process_request_batch(batch)
+                
+            except Exception as e:
+                logging.error(f"Erro no worker de ingestão: {str(e)}")
+                time.sleep(1)
+                
+    def _start_alert_dispatchers(self):
+        """Inicia pool de despacho de alertas e executor dos handlers"""
+        self.alert_queue = queue.Queue(maxsize=self.config["alert_queue_capacity"])
+        self._handler_executor = ThreadPoolExecutor(
+            max_workers=self.config["alert_handler_pool_size"],
+            thread_name_prefix="security-alert-handler"
+        )
+        
+        self.alert_dispatch_active = True
+        self.alert_workers = []
+        for number in range(max(1, self.config["alert_workers"])):
+            worker = threading.Thread(target=self._alert_dispatch_loop, name=f"security-alert-{number}")
+            worker.daemon = True
+            worker.start()
+            self.alert_workers.append(worker)
+            
+    def _alert_dispatch_loop(self):
+        """Loop dos workers de despacho de alertas"""
+        while self.alert_dispatch_active or not self.alert_queue.empty():
+            try:
+                alert = self.alert_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            self._process_alert(alert)
+            with self._alert_lock:
+                self.alert_stats["dispatched"] += 1
+                
     def _start_monitoring_thread(self):
         """Inicia thread de monitoramento"""
         self.monitoring_active = True
@@ -123,10 +355,15 @@ class SecurityMonitoring:
         """Loop principal de monitoramento"""
         while self.monitoring_active:
             try:
-                # Processa alertas na fila
-                while not self.alert_queue.empty():
-                    alert = self.alert_queue.get_nowait()
-                    self._process_alert(alert)
+                # Persiste contagens de alertas agrupados e fecha janelas expiradas
+                self._flush_coalesced_alerts()
+                
+                # Grava rollups de métricas
+                if time.monotonic() - self._last_metrics_flush >= self.config["metrics_flush_seconds"]:
+                    self.metric_aggregator.flush()
+                    self.traffic_analytics.flush()
+                    self.alert_snapshots.flush()
+                    self._last_metrics_flush = time.monotonic()
                     
                 # Executa verificações periódicas
                 self._check_system_health()
@@ -156,6 +393,10 @@ class SecurityMonitoring:
             
             # Verifica múltiplas tentativas
             if not success:
+                now = time.time()
+                sample = {"user_id": user_id, "ip_address": ip_address, "timestamp": now}
+                self.login_failures_by_user.add(user_id, timestamp=now, sample=sample)
+                self.login_failures_by_ip.add(ip_address, timestamp=now, sample=sample)
                 self._check_multiple_login_attempts(user_id, ip_address)
                 
             # Verifica IP suspeito
@@ -240,6 +481,10 @@ class SecurityMonitoring:
         """
         Monitora requisição HTTP
         
+        Com `async_request_monitoring` (padrão), apenas enfileira um registro
+        compacto e retorna; métricas e detectores rodam nos workers de
+        ingestão, fora do caminho da requisição.
+        
         Args:
             ip_address: Endereço IP
             user_agent: User agent
@@ -248,49 +493,186 @@ class SecurityMonitoring:
             user_id: ID do usuário (opcional)
             
         Returns:
-            True se monitorado com sucesso
+            True se monitorado com sucesso (ou ignorado pelas regras de
+            exclusão/amostragem); False se descartado ou em erro
         """
         try:
-            # Registra métrica de requisição
-            self._record_metric("http_requests", 1, user_id, {
-                "ip_address": ip_address,
-                "method": method,
-                "path": path,
-                "user_agent": user_agent
-            })
+            if self.config["async_request_monitoring"]:
+                return self.ingest_request(ip_address, user_agent, method, path, user_id)
+                
+            record = self._build_request_record(ip_address, user_agent, method, path, user_id)
+            if record is not None:
+                self._process_request_batch([record])
+            return True
             
-            # Verifica IP suspeito
-            self._check_suspicious_ip(ip_address)
+        except Exception as e:
+            logging.error(f"Erro ao monitorar requisição: {str(e)}")
+            return False
             
-            # Verifica padrões de acesso se houver usuário
-            if user_id:
-                self._check_data_access_patterns(user_id, path, method)
+    def ingest_request(
+        self,
+        ip_address: str,
+        user_agent: str,
+        method: str,
+        path: str,
+        user_id: Optional[str] = None
+    ) -> bool:
+        """
+        Enfileira requisição para monitoramento sem bloquear
+        
+        Args:
+            ip_address: Endereço IP
+            user_agent: User agent
+            method: Método HTTP
+            path: Caminho da requisição
+            user_id: ID do usuário (opcional)
             
+        Returns:
+            bool: False se a fila estiver cheia e o registro for descartado
+        """
+        record = self._build_request_record(ip_address, user_agent, method, path, user_id)
+        if record is None:
             return True
             
-        except Exception as e:
-            logging.error(f"Erro ao monitorar requisição: {str(e)}")
+        try:
+            self.request_queue.put_nowait(record)
+        except queue.Full:
+            with self._ingest_lock:
+                self.ingest_stats["dropped"] += 1
             return False
             
+        with self._ingest_lock:
+            self.ingest_stats["enqueued"] += 1
+        return True
+        
+    def _build_request_record(
+        self,
+        ip_address: str,
+        user_agent: str,
+        method: str,
+        path: str,
+        user_id: Optional[str]
+    ) -> Optional[RequestRecord]:
+        """Aplica exclusão e amostragem por caminho; None se a requisição não for monitorada"""
+        if self._excluded_prefixes and path.startswith(self._excluded_prefixes):
+            with self._ingest_lock:
+                self.ingest_stats["excluded"] += 1
+            return None
+            
+        sample_rate = self.config["request_sample_rate"]
+        for prefix, rate in self._path_sample_rates:
+            if path.startswith(prefix):
+                sample_rate = rate
+                break
+                
+        if sample_rate < 1.0 and (sample_rate <= 0.0 or random.random() >= sample_rate):
+            with self._ingest_lock:
+                self.ingest_stats["sampled_out"] += 1
+            return None
+            
+        return RequestRecord(
+            timestamp=time.time(),
+            ip_address=ip_address,
+            method=method,
+            path=path,
+            user_id=user_id,
+            user_agent=user_agent,
+            weight=1.0 / min(sample_rate, 1.0)
+        )
+        
+    def _process_request_batch(self, records: List[RequestRecord]):
+        """
+        Processa lote de requisições: persiste métricas e avalia detectores
+        
+        As métricas do lote entram no agregador com uma única aquisição de
+        lock. Cada requisição autenticada entra no baseline de acessos do
+        usuário (com seu timestamp e peso); os detectores rodam uma vez por
+        IP e por (usuário, caminho, método) distintos do lote, com o escore
+        mais recente do usuário.
+        """
+        try:
+            ips = set()
+            accesses = set()
+            access_scores = {}
+            for record in records:
+                self.ip_activity.add(
+                    record.ip_address,
+                    weight=record.weight,
+                    timestamp=record.timestamp,
+                    sample={"method": record.method, "path": record.path, "timestamp": record.timestamp}
+                )
+                ips.add(record.ip_address)
+                if record.user_id:
+                    access_scores[record.user_id] = self.activity_baselines.observe_access(
+                        record.user_id, record.timestamp, record.weight
+                    )
+                    accesses.add((record.user_id, record.path, record.method))
+                    
+            self.metric_aggregator.record_many(
+                ("http_requests", record.weight, record.timestamp) for record in records
+            )
+            self.traffic_analytics.record_many(
+                (record.timestamp, record.weight, record.ip_address, record.path, record.user_agent, record.user_id)
+                for record in records
+            )
+            
+            # Verifica IP suspeito
+            for ip_address in ips:
+                self._check_suspicious_ip(ip_address)
+                
+            # Verifica padrões de acesso dos usuários autenticados
+            for user_id, path, method in accesses:
+                self._check_data_access_patterns(user_id, path, method, access_scores[user_id])
+                
+            with self._ingest_lock:
+                self.ingest_stats["processed"] += len(records)
+                self.ingest_stats["batches"] += 1
+                
+        except Exception as e:
+            logging.error(f"Erro ao processar lote de requisições: {str(e)}")
+            
+    def get_ingest_stats(self) -> Dict:
+        """
+        Obtém estatísticas da ingestão de requisições
+        
+        Returns:
+            Dict: Contadores da fila e dos workers
+        """
+        with self._ingest_lock:
+            stats = dict(self.ingest_stats)
+        stats["queue_depth"] = self.request_queue.qsize()
+        stats["queue_capacity"] = self.config["ingest_queue_capacity"]
+        stats["workers"] = len(self.ingest_workers)
+        stats["trackers"] = {
+            "login_failures_by_user": self.login_failures_by_user.stats(),
+            "login_failures_by_ip": self.login_failures_by_ip.stats(),
+            "ip_activity": self.ip_activity.stats()
+        }
+        return stats
+            
     def _check_multiple_login_attempts(self, user_id: str, ip_address: str):
         """Verifica múltiplas tentativas de login"""
         try:
             window_start = datetime.utcnow() - timedelta(seconds=self.config["login_attempts_window"])
             
-            # Conta tentativas recentes
-            attempts = self._get_login_attempts(user_id, ip_address, window_start)
+            # Conta falhas recentes do usuário e do IP
+            attempts_count = max(
+                self.login_failures_by_user.count(user_id),
+                self.login_failures_by_ip.count(ip_address)
+            )
             
-            if len(attempts) >= self.config["login_attempts_threshold"]:
+            if attempts_count >= self.config["login_attempts_threshold"]:
+                attempts = self._get_login_attempts(user_id, ip_address, window_start)
                 alert = SecurityAlert(
-                    alert_id=f"login_attempts_{int(time.time())}",
+                    alert_id=self._new_alert_id("login_attempts"),
                     alert_type=AlertType.MULTIPLE_LOGIN_ATTEMPTS,
                     level=AlertLevel.HIGH,
                     user_id=user_id,
                     ip_address=ip_address,
-                    description=f"Múltiplas tentativas de login detectadas: {len(attempts)} tentativas",
+                    description=f"Múltiplas tentativas de login detectadas: {int(attempts_count)} tentativas",
                     timestamp=datetime.utcnow(),
                     details={
-                        "attempts_count": len(attempts),
+                        "attempts_count": int(attempts_count),
                         "window_seconds": self.config["login_attempts_window"],
                         "attempts": attempts
                     }
@@ -304,27 +686,32 @@ class SecurityMonitoring:
     def _check_suspicious_ip(self, ip_address: str):
         """Verifica IP suspeito"""
         try:
-            # Verifica se IP está na blacklist
-            if self._is_ip_blacklisted(ip_address):
+            # Verifica se IP está na blacklist (endereço ou faixa)
+            blacklist_entry = self.ip_blacklist.match(ip_address)
+            if blacklist_entry:
                 alert = SecurityAlert(
-                    alert_id=f"suspicious_ip_{int(time.time())}",
+                    alert_id=self._new_alert_id("suspicious_ip"),
                     alert_type=AlertType.SUSPICIOUS_IP,
                     level=AlertLevel.CRITICAL,
                     user_id=None,
                     ip_address=ip_address,
                     description=f"Tentativa de acesso de IP na blacklist: {ip_address}",
-                    timestamp=datetime.utcnow()
+                    timestamp=datetime.utcnow(),
+                    details={
+                        "blacklist_entry": blacklist_entry
+                    }
                 )
                 
                 self._create_alert(alert)
                 return
                 
-            # Verifica padrões suspeitos
-            recent_activity = self._get_ip_activity(ip_address)
+            # Verifica volume de requisições do IP na janela
+            activity_count = self.ip_activity.count(ip_address)
             
-            if len(recent_activity) > self.config["suspicious_ip_threshold"]:
+            if activity_count > self.config["suspicious_ip_threshold"]:
+                recent_activity = self._get_ip_activity(ip_address)
                 alert = SecurityAlert(
-                    alert_id=f"suspicious_ip_activity_{int(time.time())}",
+                    alert_id=self._new_alert_id("suspicious_ip_activity"),
                     alert_type=AlertType.SUSPICIOUS_IP,
                     level=AlertLevel.MEDIUM,
                     user_id=None,
@@ -332,7 +719,8 @@ class SecurityMonitoring:
                     description=f"Atividade suspeita detectada do IP: {ip_address}",
                     timestamp=datetime.utcnow(),
                     details={
-                        "activity_count": len(recent_activity),
+                        "activity_count": int(activity_count),
+                        "window_seconds": self.config["suspicious_ip_window"],
                         "recent_activity": recent_activity
                     }
                 )
@@ -342,13 +730,18 @@ class SecurityMonitoring:
         except Exception as e:
             logging.error(f"Erro ao verificar IP suspeito: {str(e)}")
             
-    def _check_data_access_patterns(self, user_id: str, resource: str, action: str):
-        """Verifica padrões suspeitos de acesso a dados"""
+    def _check_data_access_patterns(self, user_id: str, resource: str, action: str, score: Optional[Dict] = None):
+        """
+        Verifica padrões suspeitos de acesso a dados
+        
+        Sem `score`, o acesso é registrado agora no baseline do usuário;
+        a ingestão de requisições passa o escore já calculado no lote.
+        """
         try:
             # Verifica acesso não autorizado
             if not self._is_authorized_access(user_id, resource, action):
                 alert = SecurityAlert(
-                    alert_id=f"unauthorized_access_{int(time.time())}",
+                    alert_id=self._new_alert_id("unauthorized_access"),
                     alert_type=AlertType.UNAUTHORIZED_ACCESS,
                     level=AlertLevel.HIGH,
                     user_id=user_id,
@@ -363,6 +756,29 @@ class SecurityMonitoring:
                 
                 self._create_alert(alert)
                 
+            # Verifica volume atípico para o usuário
+            if score is None:
+                score = self.activity_baselines.observe_access(user_id)
+            if (score["hours_observed"] >= self.config["baseline_min_hours"] and
+                    score["current_count"] >= self.config["data_access_min_burst"] and
+                    score["zscore"] >= self.config["data_access_anomaly_zscore"]):
+                alert = SecurityAlert(
+                    alert_id=self._new_alert_id("data_access_anomaly"),
+                    alert_type=AlertType.DATA_BREACH_ATTEMPT,
+                    level=AlertLevel.MEDIUM,
+                    user_id=user_id,
+                    ip_address=None,
+                    description=f"Volume atípico de acessos a dados: {int(score['current_count'])} na última hora",
+                    timestamp=datetime.utcnow(),
+                    details={
+                        "resource": resource,
+                        "action": action,
+                        "score": score
+                    }
+                )
+                
+                self._create_alert(alert)
+                
         except Exception as e:
             logging.error(f"Erro ao verificar padrões de acesso: {str(e)}")
             
@@ -372,7 +788,7 @@ class SecurityMonitoring:
             # Verifica transações de alto valor
             if amount > self.config["financial_threshold"]:
                 alert = SecurityAlert(
-                    alert_id=f"high_value_transaction_{int(time.time())}",
+                    alert_id=self._new_alert_id("high_value_transaction"),
                     alert_type=AlertType.FINANCIAL_FRAUD,
                     level=AlertLevel.MEDIUM,
                     user_id=user_id,
@@ -387,6 +803,37 @@ class SecurityMonitoring:
                 
                 self._create_alert(alert)
                 
+            # Compara com o histórico do usuário (valor e horário)
+            score = self.activity_baselines.observe_amount(user_id, amount)
+            if score["samples"] < self.config["baseline_min_transactions"]:
+                return
+                
+            atypical_amount = (score["zscore"] >= self.config["amount_anomaly_zscore"] and
+                               score["quantile_rank"] >= self.config["amount_anomaly_quantile"])
+            atypical_hour = score["hour_share"] < self.config["unusual_hour_share"]
+            if atypical_amount or atypical_hour:
+                if atypical_amount:
+                    description = f"Valor atípico para o usuário: R$ {amount:.2f}"
+                else:
+                    description = f"Transação em horário atípico para o usuário: R$ {amount:.2f}"
+                alert = SecurityAlert(
+                    alert_id=self._new_alert_id("financial_anomaly"),
+                    alert_type=AlertType.FINANCIAL_FRAUD,
+                    level=AlertLevel.MEDIUM if atypical_amount else AlertLevel.LOW,
+                    user_id=user_id,
+                    ip_address=None,
+                    description=description,
+                    timestamp=datetime.utcnow(),
+                    details={
+                        "amount": amount,
+                        "transaction_type": transaction_type,
+                        "score": score,
+                        "baseline": self.activity_baselines.describe(user_id)
+                    }
+                )
+                
+                self._create_alert(alert)
+                
         except Exception as e:
             logging.error(f"Erro ao verificar atividade financeira: {str(e)}")
             
@@ -396,7 +843,7 @@ class SecurityMonitoring:
             # Verifica se ação requer consentimento válido
             if not self._has_valid_consent(user_id, child_id, consent_action):
                 alert = SecurityAlert(
-                    alert_id=f"consent_violation_{int(time.time())}",
+                    alert_id=self._new_alert_id("consent_violation"),
                     alert_type=AlertType.CONSENT_VIOLATION,
                     level=AlertLevel.HIGH,
                     user_id=user_id,
@@ -414,14 +861,106 @@ class SecurityMonitoring:
         except Exception as e:
             logging.error(f"Erro ao verificar violações de consentimento: {str(e)}")
             
+    def rebuild_activity_baselines(self, events: Iterable[Dict], use_numpy: Optional[bool] = None) -> Dict:
+        """
+        Reconstrói os baselines de atividade a partir do histórico de auditoria
+        
+        Eventos da categoria financeira com `details.amount` alimentam o
+        baseline de valores; eventos de acesso a dados, o de acessos.
+        Aceita os eventos serializados de `audit_system.export_events`.
+        
+        Args:
+            events: Eventos de auditoria serializados
+            use_numpy: Força ou desativa o modo vetorizado (padrão: NumPy se instalado)
+            
+        Returns:
+            Dict: Resumo da reconstrução
+        """
+        epoch = datetime(1970, 1, 1)
+        
+        def baseline_events():
+            for event in events:
+                user_id = event.get("user_id")
+                if not user_id:
+                    continue
+                try:
+                    timestamp = (datetime.fromisoformat(event["timestamp"]) - epoch).total_seconds()
+                    if event.get("category") == "financial":
+                        amount = (event.get("details") or {}).get("amount")
+                        if isinstance(amount, (int, float)):
+                            yield user_id, timestamp, float(amount)
+                    elif event.get("category") == "data_access":
+                        yield user_id, timestamp, None
+                except (KeyError, TypeError, ValueError):
+                    continue
+                    
+        try:
+            return self.activity_baselines.backfill(baseline_events(), use_numpy)
+        except Exception as e:
+            logging.error(f"Erro ao reconstruir baselines de atividade: {str(e)}")
+            return {}
+            
+    def _new_alert_id(self, prefix: str) -> str:
+        """Gera ID único de alerta (prefixo, segundo e sufixo aleatório)"""
+        return f"{prefix}_{int(time.time())}_{uuid.uuid4().hex[:12]}"
+        
+    def _alert_fingerprint(self, alert: SecurityAlert) -> Tuple:
+        """Impressão digital usada na deduplicação (tipo, IP e usuário)"""
+        return (alert.alert_type, alert.ip_address, alert.user_id)
+        
     def _create_alert(self, alert: SecurityAlert):
-        """Cria e processa alerta"""
+        """
+        Cria alerta e o enfileira para despacho assíncrono
+        
+        Repetições com a mesma impressão digital dentro da janela de
+        deduplicação não geram novo alerta: são somadas ao alerta aberto
+        (`details.occurrences`), cujo arquivo é atualizado periodicamente.
+        Os arquivos (do novo alerta e dos alertas despejados da tabela de
+        deduplicação) são gravados fora do `_alert_lock`.
+        """
         try:
+            now = time.time()
+            fingerprint = self._alert_fingerprint(alert)
+            evicted_entries = []
+            with self._alert_lock:
+                entry = self._recent_alerts.get(fingerprint)
+                if entry is not None and now - entry["first_seen"] < self.config["alert_dedupe_window_seconds"]:
+                    entry["count"] += 1
+                    entry["last_seen"] = now
+                    entry["dirty"] = True
+                    self.alert_stats["coalesced"] += 1
+                    return
+                    
+                alert.details = dict(alert.details or {})
+                alert.details["occurrences"] = 1
+                self._recent_alerts[fingerprint] = {
+                    "alert": alert,
+                    "count": 1,
+                    "first_seen": now,
+                    "last_seen": now,
+                    "dirty": False
+                }
+                self._recent_alerts.move_to_end(fingerprint)
+                while len(self._recent_alerts) > self.config["alert_dedupe_max_entries"]:
+                    _, evicted = self._recent_alerts.popitem(last=False)
+                    if evicted["dirty"]:
+                        evicted_entries.append(evicted)
+                self.alert_stats["created"] += 1
+                
+            # Grava as ocorrências agrupadas dos alertas despejados
+            for evicted in evicted_entries:
+                self._write_alert_occurrences(evicted)
+                
             # Salva alerta
             self._save_alert(alert)
             
-            # Adiciona à fila de processamento
-            self.alert_queue.put(alert)
+            # Adiciona à fila de despacho (o alerta já está salvo se a fila estiver cheia)
+            try:
+                self.alert_queue.put_nowait(alert)
+            except queue.Full:
+                with self._alert_lock:
+                    self.alert_stats["dropped"] += 1
+                logging.error(f"Fila de alertas cheia, despacho descartado: {alert.alert_id}")
             
             # Log do alerta
             logging.warning(f"Alerta de segurança criado: {alert.alert_type.value} - {alert.level.value}")
@@ -429,8 +968,37 @@ class SecurityMonitoring:
         except Exception as e:
             logging.error(f"Erro ao criar alerta: {str(e)}")
             
+    def _flush_coalesced_alerts(self):
+        """Grava contagens de alertas agrupados e encerra janelas expiradas"""
+        try:
+            now = time.time()
+            window = self.config["alert_dedupe_window_seconds"]
+            pending = []
+            with self._alert_lock:
+                for fingerprint, entry in list(self._recent_alerts.items()):
+                    if entry["dirty"]:
+                        entry["dirty"] = False
+                        pending.append(entry)
+                    if now - entry["first_seen"] >= window:
+                        del self._recent_alerts[fingerprint]
+                        
+            for entry in pending:
+                self._write_alert_occurrences(entry)
+                
+        except Exception as e:
+            logging.error(f"Erro ao gravar alertas agrupados: {str(e)}")
+            
+    def _write_alert_occurrences(self, entry: Dict):
+        """Atualiza o arquivo do alerta com o número de ocorrências agrupadas"""
+        alert = entry["alert"]
+        details = dict(alert.details or {})
+        details["occurrences"] = entry["count"]
+        details["last_seen"] = datetime.utcfromtimestamp(entry["last_seen"]).isoformat()
+        alert.details = details
+        self._save_alert(alert)
+        
     def _process_alert(self, alert: SecurityAlert):
-        """Processa alerta"""
+        """Processa alerta (executado pelos workers de despacho)"""
         try:
             # Executa ações baseadas no tipo e nível do alerta
             if alert.level == AlertLevel.CRITICAL:
@@ -444,14 +1012,58 @@ class SecurityMonitoring:
                 
             # Notifica handlers registrados
             for handler in self.alert_handlers:
-                try:
-                    handler(alert)
-                except Exception as e:
-                    logging.error(f"Erro no handler de alerta: {str(e)}")
+                self._run_alert_handler(handler, alert)
                     
         except Exception as e:
             logging.error(f"Erro ao processar alerta: {str(e)}")
             
+    def _run_alert_handler(self, handler, alert: SecurityAlert) -> bool:
+        """
+        Executa handler no executor com timeout e novas tentativas
+        
+        Falhas por exceção são repetidas com backoff exponencial. Um timeout
+        não é repetido: o handler preso continua ocupando uma thread do
+        executor, e repetir apenas acumularia execuções presas.
+        
+        Returns:
+            bool: True se o handler concluiu com sucesso
+        """
+        timeout = self.config["alert_handler_timeout_seconds"]
+        retries = self.config["alert_handler_retries"]
+        backoff = self.config["alert_handler_retry_backoff_ms"] / 1000.0
+        for attempt in range(retries + 1):
+            try:
+                self._handler_executor.submit(handler, alert).result(timeout=timeout)
+                return True
+            except FutureTimeoutError:
+                logging.error(f"Timeout no handler de alerta ({timeout}s): {alert.alert_id}")
+                with self._alert_lock:
+                    self.alert_stats["handler_timeouts"] += 1
+                return False
+            except Exception as e:
+                logging.error(f"Erro no handler de alerta: {str(e)}")
+                with self._alert_lock:
+                    self.alert_stats["handler_failures"] += 1
+                if attempt < retries:
+                    with self._alert_lock:
+                        self.alert_stats["handler_retries"] += 1
+                    time.sleep(backoff * (2 ** attempt))
+        return False
+        
+    def get_alert_stats(self) -> Dict:
+        """
+        Obtém estatísticas do pipeline de alertas
+        
+        Returns:
+            Dict: Contadores de criação, agrupamento e despacho
+        """
+        with self._alert_lock:
+            stats = dict(self.alert_stats)
+            stats["open_fingerprints"] = len(self._recent_alerts)
+        stats["queue_depth"] = self.alert_queue.qsize()
+        stats["queue_capacity"] = self.config["alert_queue_capacity"]
+        return stats
+            
     def _handle_critical_alert(self, alert: SecurityAlert):
         """Processa alerta crítico"""
         # Bloqueia IP se necessário
@@ -484,6 +1096,10 @@ class SecurityMonitoring:
         """
         Obtém dados para dashboard de segurança
         
+        O resultado fica em cache por `dashboard_cache_ttl_seconds`, então
+        consultas repetidas do painel não recalculam nada; o dicionário
+        retornado é compartilhado e não deve ser alterado.
+        
         Args:
             days: Número de dias para buscar
             
@@ -491,55 +1107,61 @@ class SecurityMonitoring:
             Dict: Dados do dashboard
         """
         try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Obtém alertas
-            alerts = self._get_alerts_in_period(start_date, end_date)
-            
-            # Obtém métricas
-            metrics = self._get_metrics_in_period(start_date, end_date)
-            
-            # Calcula estatísticas
-            stats = self._calculate_security_stats(alerts, metrics)
-            
-            return {
-                "alerts": [self._alert_to_dict(alert) for alert in alerts],
-                "metrics": [self._metric_to_dict(metric) for metric in metrics],
-                "statistics": stats,
-                "period": {
-                    "start": start_date.isoformat(),
-                    "end": end_date.isoformat()
-                }
-            }
+            return self.dashboard_cache.get_or_compute(days, lambda: self._build_dashboard_data(days))
             
         except Exception as e:
             logging.error(f"Erro ao obter dados do dashboard: {str(e)}")
             return {}
             
-    def _calculate_security_stats(self, alerts: List[SecurityAlert], metrics: List[SecurityMetric]) -> Dict:
-        """Calcula estatísticas de segurança"""
+    def _build_dashboard_data(self, days: int) -> Dict:
+        """Monta os dados do dashboard a partir dos snapshots de alertas, rollups de métricas e sketches de tráfego"""
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        
+        # Obtém alertas e contadores dos snapshots diários
+        alerts = self.alert_snapshots.alerts_between(start_date, end_date)
+        alert_counts = self.alert_snapshots.counts_between(start_date, end_date)
+        
+        # Obtém métricas agregadas (série horária até 2 dias, diária acima)
+        metric_totals = self.metric_aggregator.totals(start_date, end_date)
+        resolution = MetricResolution.HOUR if days <= 2 else MetricResolution.DAY
+        metrics = self.metric_aggregator.series(start_date, end_date, resolution)
+        
+        # Calcula estatísticas
+        stats = self._calculate_security_stats(alert_counts, metric_totals)
+        
+        # Rankings e distintos do tráfego (resolução de uma hora)
+        traffic = self.traffic_analytics.summary(start_date, end_date, self.config["traffic_top_limit"])
+        
+        return {
+            "alerts": alerts,
+            "metrics": metrics,
+            "statistics": stats,
+            "traffic": traffic,
+            "period": {
+                "start": start_date.isoformat(),
+                "end": end_date.isoformat()
+            }
+        }
+        
+    def _calculate_security_stats(self, alert_counts: Dict[str, int], metric_totals: Dict[str, Dict]) -> Dict:
+        """Calcula estatísticas de segurança a partir dos contadores de alertas e totais de métricas"""
         try:
-            total_alerts = len(alerts)
-            critical_alerts = len([a for a in alerts if a.level == AlertLevel.CRITICAL])
-            high_alerts = len([a for a in alerts if a.level == AlertLevel.HIGH])
-            medium_alerts = len([a for a in alerts if a.level == AlertLevel.MEDIUM])
-            low_alerts = len([a for a in alerts if a.level == AlertLevel.LOW])
-            
-            resolved_alerts = len([a for a in alerts if a.resolved])
+            total_alerts = alert_counts["total"]
+            resolved_alerts = alert_counts["resolved"]
             unresolved_alerts = total_alerts - resolved_alerts
             
             # Calcula métricas de atividade
-            login_attempts = sum([m.value for m in metrics if m.metric_name == "login_attempts"])
-            data_access = sum([m.value for m in metrics if m.metric_name == "data_access"])
-            financial_activity = sum([m.value for m in metrics if m.metric_name == "financial_activity"])
+            login_attempts = metric_totals.get("login_attempts", {}).get("sum", 0)
+            data_access = metric_totals.get("data_access", {}).get("sum", 0)
+            financial_activity = metric_totals.get("financial_activity", {}).get("sum", 0)
             
             return {
                 "total_alerts": total_alerts,
-                "critical_alerts": critical_alerts,
-                "high_alerts": high_alerts,
-                "medium_alerts": medium_alerts,
-                "low_alerts": low_alerts,
+                "critical_alerts": alert_counts[AlertLevel.CRITICAL.value],
+                "high_alerts": alert_counts[AlertLevel.HIGH.value],
+                "medium_alerts": alert_counts[AlertLevel.MEDIUM.value],
+                "low_alerts": alert_counts[AlertLevel.LOW.value],
                 "resolved_alerts": resolved_alerts,
                 "unresolved_alerts": unresolved_alerts,
                 "login_attempts": login_attempts,
@@ -552,50 +1174,105 @@ class SecurityMonitoring:
             logging.error(f"Erro ao calcular estatísticas: {str(e)}")
             return {}
             
+    def get_dashboard_stats(self) -> Dict:
+        """Estatísticas do cache e dos snapshots do dashboard"""
+        stats = self.dashboard_cache.stats()
+        stats["snapshot_rescans"] = self.alert_snapshots.rescans
+        stats["snapshot_files_loaded"] = self.alert_snapshots.files_loaded
+        return stats
+        
+    def resolve_alert(self, alert_id: str, resolved_by: str) -> bool:
+        """
+        Marca alerta como resolvido
+        
+        Args:
+            alert_id: ID do alerta
+            resolved_by: Responsável pela resolução
+            
+        Returns:
+            bool: True se o alerta existia
+        """
+        alert_file = os.path.join(self.storage_path, "alerts", f"{alert_id}.json")
+        if not os.path.exists(alert_file):
+            return False
+            
+        with open(alert_file, 'r', encoding='utf-8') as f:
+            alert = self._dict_to_alert(json.load(f))
+            
+        alert.resolved = True
+        alert.resolved_at = datetime.utcnow()
+        alert.resolved_by = resolved_by
+        self._save_alert(alert)
+        
+        # A resolução deve aparecer no próximo acesso ao painel
+        self.dashboard_cache.clear()
+        return True
+            
     def add_alert_handler(self, handler):
         """Adiciona handler de alerta"""
         self.alert_handlers.append(handler)
         
     def _record_metric(self, metric_name: str, value: float, user_id: Optional[str] = None, context: Optional[Dict] = None):
-        """Registra métrica"""
+        """
+        Registra métrica no agregador
+        
+        Apenas o valor entra nos buckets de tempo; usuário e contexto são
+        usados pelos detectores, não pelas séries de métricas.
+        """
         try:
-            metric = SecurityMetric(
-                metric_id=f"metric_{int(time.time())}_{hashlib.md5(f'{metric_name}{user_id}'.encode()).hexdigest()[:8]}",
-                metric_name=metric_name,
-                value=value,
-                timestamp=datetime.utcnow(),
-                user_id=user_id,
-                context=context
-            )
-            
-            self._save_metric(metric)
+            self.metric_aggregator.record(metric_name, value)
             
         except Exception as e:
             logging.error(f"Erro ao registrar métrica: {str(e)}")
             
+    def get_metric_series(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        metric_name: Optional[str] = None,
+        resolution: MetricResolution = MetricResolution.HOUR
+    ) -> List[Dict]:
+        """
+        Obtém série temporal de métricas
+        
+        Args:
+            start_date: Início do período
+            end_date: Fim do período
+            metric_name: Métrica desejada (padrão: todas)
+            resolution: Resolução dos pontos (minuto, hora ou dia)
+            
+        Returns:
+            List[Dict]: Pontos com contagem, soma, mínimo e máximo
+        """
+        try:
+            return self.metric_aggregator.series(
+                start_date,
+                end_date,
+                resolution,
+                [metric_name] if metric_name else None
+            )
+        except Exception as e:
+            logging.error(f"Erro ao obter série de métricas: {str(e)}")
+            return []
+            
     def _save_alert(self, alert: SecurityAlert):
         """Salva alerta"""
         try:
             filename = f"{alert.alert_id}.json"
             filepath = os.path.join(self.storage_path, "alerts", filename)
+            temp_path = f"{filepath}.{threading.get_ident()}.tmp"
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self._alert_to_dict(alert), f, indent=2, default=str)
-                
-        except Exception as e:
-            logging.error(f"Erro ao salvar alerta: {str(e)}")
-            
-    def _save_metric(self, metric: SecurityMetric):
-        """Salva métrica"""
-        try:
-            filename = f"{metric.metric_id}.json"
-            filepath = os.path.join(self.storage_path, "metrics", filename)
+            # Gravação atômica: o alerta pode ser regravado com novas ocorrências
+            alert_data = self._alert_to_dict(alert)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(alert_data, f, indent=2, default=str)
+            os.replace(temp_path, filepath)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self._metric_to_dict(metric), f, indent=2, default=str)
+            # Atualiza o snapshot do dia do alerta
+            self.alert_snapshots.upsert(json.loads(json.dumps(alert_data, default=str)))
                 
         except Exception as e:
-            logging.error(f"Erro ao salvar métrica: {str(e)}")
+            logging.error(f"Erro ao salvar alerta: {str(e)}")
             
     def _alert_to_dict(self, alert: SecurityAlert) -> Dict:
         """Converte alerta para dicionário"""
@@ -613,39 +1290,37 @@ class SecurityMonitoring:
             "details": alert.details
         }
         
-    def _metric_to_dict(self, metric: SecurityMetric) -> Dict:
-        """Converte métrica para dicionário"""
-        return {
-            "metric_id": metric.metric_id,
-            "metric_name": metric.metric_name,
-            "value": metric.value,
-            "timestamp": metric.timestamp.isoformat(),
-            "user_id": metric.user_id,
-            "context": metric.context
-        }
-        
     # Métodos auxiliares (implementação simplificada)
-    def _get_login_attempts(self, user_id: str, ip_address: str, since: datetime) -> List[Dict]:
-        """Obtém tentativas de login recentes"""
-        # Implementação simplificada - em produção seria uma consulta ao banco
-        return []
+    def _get_login_attempts(self, user_id: str, ip_address: str, since: Optional[datetime] = None) -> List[Dict]:
+        """Obtém amostras das falhas de login recentes do usuário e do IP"""
+        since_ts = (since - datetime(1970, 1, 1)).total_seconds() if since else float('-inf')
+        attempts = {}
+        for sample in self.login_failures_by_user.recent(user_id) + self.login_failures_by_ip.recent(ip_address):
+            if sample["timestamp"] >= since_ts:
+                attempts[(sample["user_id"], sample["ip_address"], sample["timestamp"])] = sample
+        return [
+            {
+                "user_id": sample["user_id"],
+                "ip_address": sample["ip_address"],
+                "timestamp": datetime.utcfromtimestamp(sample["timestamp"]).isoformat()
+            }
+            for _, sample in sorted(attempts.items(), key=lambda item: item[0][2])
+        ]
         
     def _is_ip_blacklisted(self, ip_address: str) -> bool:
-        """Verifica se IP está na blacklist"""
-        blacklist_file = os.path.join(self.storage_path, "blacklist", "ips.json")
-        if os.path.exists(blacklist_file):
-            try:
-                with open(blacklist_file, 'r', encoding='utf-8') as f:
-                    blacklist = json.load(f)
-                    return ip_address in blacklist
-            except Exception:
-                pass
-        return False
+        """Verifica se IP está na blacklist (endereço ou faixa CIDR)"""
+        return self.ip_blacklist.contains(ip_address)
         
     def _get_ip_activity(self, ip_address: str) -> List[Dict]:
-        """Obtém atividade recente do IP"""
-        # Implementação simplificada
-        return []
+        """Obtém amostras das requisições recentes do IP"""
+        return [
+            {
+                "method": sample["method"],
+                "path": sample["path"],
+                "timestamp": datetime.utcfromtimestamp(sample["timestamp"]).isoformat()
+            }
+            for sample in self.ip_activity.recent(ip_address)
+        ]
         
     def _is_authorized_access(self, user_id: str, resource: str, action: str) -> bool:
         """Verifica se acesso é autorizado"""
@@ -658,21 +1333,10 @@ class SecurityMonitoring:
         return True
         
     def _add_to_blacklist(self, ip_address: str):
-        """Adiciona IP à blacklist"""
+        """Adiciona IP (ou faixa CIDR) à blacklist"""
         try:
-            blacklist_file = os.path.join(self.storage_path, "blacklist", "ips.json")
-            blacklist = []
+            self.ip_blacklist.add([ip_address])
             
-            if os.path.exists(blacklist_file):
-                with open(blacklist_file, 'r', encoding='utf-8') as f:
-                    blacklist = json.load(f)
-                    
-            if ip_address not in blacklist:
-                blacklist.append(ip_address)
-                
-                with open(blacklist_file, 'w', encoding='utf-8') as f:
-                    json.dump(blacklist, f, indent=2)
-                    
         except Exception as e:
             logging.error(f"Erro ao adicionar IP à blacklist: {str(e)}")
             
@@ -686,67 +1350,31 @@ class SecurityMonitoring:
         logging.info(f"Alerta registrado para análise: {alert.alert_id}")
         
     def _get_alerts_in_period(self, start_date: datetime, end_date: datetime) -> List[SecurityAlert]:
-        """Obtém alertas em período"""
+        """Obtém alertas em período (a partir dos snapshots diários)"""
         alerts = []
-        alerts_dir = os.path.join(self.storage_path, "alerts")
-        
-        if os.path.exists(alerts_dir):
-            for filename in os.listdir(alerts_dir):
-                if filename.endswith(".json"):
-                    try:
-                        filepath = os.path.join(alerts_dir, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        alert_timestamp = datetime.fromisoformat(data["timestamp"])
-                        if start_date <= alert_timestamp <= end_date:
-                            alert = SecurityAlert(
-                                alert_id=data["alert_id"],
-                                alert_type=AlertType(data["alert_type"]),
-                                level=AlertLevel(data["level"]),
-                                user_id=data.get("user_id"),
-                                ip_address=data.get("ip_address"),
-                                description=data["description"],
-                                timestamp=alert_timestamp,
-                                resolved=data["resolved"],
-                                resolved_at=datetime.fromisoformat(data["resolved_at"]) if data.get("resolved_at") else None,
-                                resolved_by=data.get("resolved_by"),
-                                details=data.get("details")
-                            )
-                            alerts.append(alert)
-                    except Exception as e:
-                        logging.error(f"Erro ao carregar alerta: {str(e)}")
-                        
+        for data in self.alert_snapshots.alerts_between(start_date, end_date):
+            try:
+                alerts.append(self._dict_to_alert(data))
+            except Exception as e:
+                logging.error(f"Erro ao carregar alerta: {str(e)}")
+                
         return alerts
         
-    def _get_metrics_in_period(self, start_date: datetime, end_date: datetime) -> List[SecurityMetric]:
-        """Obtém métricas em período"""
-        metrics = []
-        metrics_dir = os.path.join(self.storage_path, "metrics")
-        
-        if os.path.exists(metrics_dir):
-            for filename in os.listdir(metrics_dir):
-                if filename.endswith(".json"):
-                    try:
-                        filepath = os.path.join(metrics_dir, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        metric_timestamp = datetime.fromisoformat(data["timestamp"])
-                        if start_date <= metric_timestamp <= end_date:
-                            metric = SecurityMetric(
-                                metric_id=data["metric_id"],
-                                metric_name=data["metric_name"],
-                                value=data["value"],
-                                timestamp=metric_timestamp,
-                                user_id=data.get("user_id"),
-                                context=data.get("context")
-                            )
-                            metrics.append(metric)
-                    except Exception as e:
-                        logging.error(f"Erro ao carregar métrica: {str(e)}")
-                        
-        return metrics
+    def _dict_to_alert(self, data: Dict) -> SecurityAlert:
+        """Converte dicionário em alerta"""
+        return SecurityAlert(
+            alert_id=data["alert_id"],
+            alert_type=AlertType(data["alert_type"]),
+            level=AlertLevel(data["level"]),
+            user_id=data.get("user_id"),
+            ip_address=data.get("ip_address"),
+            description=data["description"],
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            resolved=data["resolved"],
+            resolved_at=datetime.fromisoformat(data["resolved_at"]) if data.get("resolved_at") else None,
+            resolved_by=data.get("resolved_by"),
+            details=data.get("details")
+        )
         
     def _check_system_health(self):
         """Verifica saúde do sistema"""
@@ -756,9 +1384,14 @@ class SecurityMonitoring:
     def _cleanup_old_data(self):
         """Remove dados antigos"""
         try:
+            # Reduz a resolução e remove rollups de métricas antigos
+            if time.monotonic() - self._last_metrics_compaction >= self.config["metrics_compaction_interval_seconds"]:
+                self.metric_aggregator.compact()
+                self.traffic_analytics.cleanup()
+                self._last_metrics_compaction = time.monotonic()
+                
             # Remove alertas antigos
             alert_retention = datetime.utcnow() - timedelta(days=self.config["alert_retention_days"])
-            metrics_retention = datetime.utcnow() - timedelta(days=self.config["metrics_retention_days"])
             
             # Implementação simplificada - em produção seria mais robusta
             pass
@@ -767,7 +1400,18 @@ class SecurityMonitoring:
             logging.error(f"Erro ao limpar dados antigos: {str(e)}")
             
     def stop_monitoring(self):
-        """Para o monitoramento"""
+        """Para o monitoramento, processando as requisições já enfileiradas"""
         self.monitoring_active = False
+        self.ingest_active = False
+        for worker in getattr(self, 'ingest_workers', []):
+            worker.join(timeout=5)
+        self.alert_dispatch_active = False
+        for worker in getattr(self, 'alert_workers', []):
+            worker.join(timeout=5)
+        self._handler_executor.shutdown(wait=False)
         if hasattr(self, 'monitoring_thread'):
-            self.monitoring_thread.join(timeout=5) 
\ No newline at end of file
+            self.monitoring_thread.join(timeout=5)
+        self._flush_coalesced_alerts()
+        self.metric_aggregator.flush()
+        self.traffic_analytics.flush()
+        self.alert_snapshots.flush() 
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Rastreadores de Janela Deslizante - TarefaMágica
+Contadores por chave (IP, usuário) em janelas de tempo, com limite de memória
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, List, Optional
+
+class _WindowState:
+    """Estado de uma chave: buckets circulares da janela e amostras recentes"""
+    __slots__ = ("slots", "counts", "recent")
+
+    def __init__(self, buckets: int, sample_size: int):
+        self.slots = [-1] * buckets
+        self.counts = [0.0] * buckets
+        self.recent = deque(maxlen=sample_size) if sample_size else None
+
+class SlidingWindowTracker:
+    def __init__(
+        self,
+        window_seconds: float,
+        buckets: int = 30,
+        max_keys: int = 100000,
+        sample_size: int = 5
+    ):
+        """
+        Contador de eventos por chave em janela deslizante
+
+        A janela é dividida em `buckets` sub-janelas guardadas em um buffer
+        circular de tamanho fixo: registrar um evento é O(1) e a contagem
+        soma no máximo `buckets` posições. A precisão é de uma sub-janela
+        (window_seconds / buckets). Quando o número de chaves passa de
+        `max_keys`, as usadas há mais tempo são descartadas (LRU).
+
+        Args:
+            window_seconds: Duração da janela em segundos
+            buckets: Número de sub-janelas
+            max_keys: Máximo de chaves rastreadas
+            sample_size: Eventos recentes guardados por chave (para detalhes de alertas)
+        """
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_keys = max_keys
+        self.sample_size = sample_size
+        self.key_bytes = self.estimate_key_bytes(buckets, sample_size)
+        self.evictions = 0
+
+        self._states: "OrderedDict[Hashable, _WindowState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_key_bytes(buckets: int, sample_size: int) -> int:
+        """Estimativa de memória por chave rastreada (estado, listas e entrada no dicionário)"""
+        state = _WindowState(buckets, sample_size)
+        size = sys.getsizeof(state) + sys.getsizeof(state.slots) + sys.getsizeof(state.counts)
+        size += buckets * sys.getsizeof(0.0)
+        if state.recent is not None:
+            size += sys.getsizeof(state.recent) + sample_size * 256
+        # Entrada no OrderedDict e a própria chave
+        return size + 200
+
+    def add(
+        self,
+        key: Hashable,
+        weight: float = 1.0,
+        timestamp: Optional[float] = None,
+        sample: Optional[Dict] = None
+    ) -> float:
+        """
+        Registra evento para a chave
+
+        Args:
+            key: Chave rastreada (ex.: IP ou ID do usuário)
+            weight: Peso do evento (ex.: inverso da taxa de amostragem)
+            timestamp: Segundos desde a época (padrão: agora)
+            sample: Dados do evento guardados entre os recentes
+
+        Returns:
+            float: Contagem da chave na janela, incluindo o evento
+        """
+        now = time.time() if timestamp is None else timestamp
+        slot = int(now // self.bucket_seconds)
+        position = slot % self.buckets
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _WindowState(self.buckets, self.sample_size)
+                if len(self._states) > self.max_keys:
+                    self._states.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._states.move_to_end(key)
+
+            if state.slots[position] > slot:
+                # Evento atrasado (ex.: lote de outro worker) já fora da janela
+                return self._sum(state, state.slots[position])
+            if state.slots[position] != slot:
+                # Sub-janela reaproveitada: o conteúdo anterior já saiu da janela
+                state.slots[position] = slot
+                state.counts[position] = 0.0
+            state.counts[position] += weight
+            if sample is not None and state.recent is not None:
+                state.recent.append(sample)
+            return self._sum(state, slot)
+
+    def count(self, key: Hashable, timestamp: Optional[float] = None) -> float:
+        """
+        Contagem da chave na janela
+
+        Args:
+            key: Chave rastreada
+            timestamp: Instante de referência (padrão: agora)
+
+        Returns:
+            float: Eventos (ponderados) na janela
+        """
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return 0.0
+            return self._sum(state, int(now // self.bucket_seconds))
+
+    def recent(self, key: Hashable) -> List[Dict]:
+        """Amostras dos eventos mais recentes da chave"""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None or state.recent is None:
+                return []
+            return list(state.recent)
+
+    def reset(self, key: Hashable):
+        """Remove o histórico da chave"""
+        with self._lock:
+            self._states.pop(key, None)
+
+    def _sum(self, state: _WindowState, current_slot: int) -> float:
+        """Soma as sub-janelas ainda dentro da janela"""
+        oldest = current_slot - self.buckets
+        total = 0.0
+        for slot, count in zip(state.slots, state.counts):
+            if oldest < slot <= current_slot:
+                total += count
+        return total
+
+    def stats(self) -> Dict:
+        """Estatísticas de ocupação do rastreador"""
+        with self._lock:
+            keys = len(self._states)
+        return {
+            "window_seconds": self.window_seconds,
+            "buckets": self.buckets,
+            "keys": keys,
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+            "estimated_bytes": keys * self.key_bytes
+        }
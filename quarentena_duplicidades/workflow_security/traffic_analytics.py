@@ -0,0 +1,468 @@
+"""
+Análise de Tráfego - TarefaMágica
+Top-k (Count-Min + Space-Saving) e cardinalidade (HyperLogLog) por hora, com memória fixa
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+import operator
+import os
+import re
+import threading
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Dimensões com ranking (top-k) e com contagem de distintos
+TOP_DIMENSIONS = ("ip", "path", "user_agent")
+DISTINCT_DIMENSIONS = ("ip", "user")
+
+# Arquivo de bucket: um por hora e por escritor (processo)
+BUCKET_PATTERN = re.compile(r'^(\d{10})\.([A-Za-z0-9-]+)\.json$')
+
+# Chaves muito longas (ex.: user agents) são truncadas
+MAX_KEY_LENGTH = 256
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _hash64(key: str) -> int:
+    """Hash de 64 bits estável entre processos (necessário para combinar sketches)"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8', 'replace'), digest_size=8).digest(), 'little')
+
+class CountMinSketch:
+    """
+    Estimativa de frequência por chave em `width` x `depth` contadores fixos
+
+    A estimativa nunca é menor que a contagem real; o excesso é limitado
+    pelo volume total dividido pela largura. Sketches com as mesmas
+    dimensões são combinados somando os contadores.
+    """
+    __slots__ = ("width", "depth", "counts")
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.counts = array('f', bytes(4 * width * depth))
+
+    def _positions(self, key: str, value: Optional[int] = None) -> List[int]:
+        """Posição da chave em cada linha (hash duplo; `value` é o hash já calculado)"""
+        if value is None:
+            value = _hash64(key)
+        low, high = value & 0xFFFFFFFF, (value >> 32) | 1
+        width = self.width
+        return [row * width + (low + row * high) % width for row in range(self.depth)]
+
+    def add(self, key: str, weight: float = 1.0, value: Optional[int] = None) -> float:
+        """
+        Soma peso à chave
+
+        Returns:
+            float: Estimativa da chave após a soma
+        """
+        counts = self.counts
+        estimate = None
+        for position in self._positions(key, value):
+            counts[position] += weight
+            if estimate is None or counts[position] < estimate:
+                estimate = counts[position]
+        return estimate
+
+    def estimate(self, key: str) -> float:
+        """Estimativa de frequência da chave"""
+        counts = self.counts
+        return min(counts[position] for position in self._positions(key))
+
+    def merge(self, other: 'CountMinSketch'):
+        """Soma outro sketch a este"""
+        self.counts = array('f', map(operator.add, self.counts, other.counts))
+
+    def to_text(self) -> str:
+        """Serializa os contadores (base64)"""
+        return base64.b64encode(self.counts.tobytes()).decode('ascii')
+
+    @classmethod
+    def from_text(cls, text: str, width: int, depth: int) -> 'CountMinSketch':
+        """Reconstrói o sketch serializado"""
+        sketch = cls(width, depth)
+        counts = array('f')
+        counts.frombytes(base64.b64decode(text))
+        if len(counts) != width * depth:
+            raise ValueError("Dimensões do Count-Min Sketch incompatíveis")
+        sketch.counts = counts
+        return sketch
+
+class HeavyHitters:
+    """
+    Top-k aproximado: candidatos Space-Saving ranqueados pelo Count-Min Sketch
+
+    Uma chave fora dos candidatos só entra no lugar do menor deles quando
+    sua estimativa o supera, então a memória é fixa (k candidatos mais o
+    sketch). Ao combinar buckets, os candidatos de todos são reavaliados
+    no sketch combinado.
+    """
+    __slots__ = ("k", "sketch", "candidates")
+
+    def __init__(self, k: int = 20, width: int = 1024, depth: int = 4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates: Dict[str, float] = {}
+
+    def add(self, key: str, weight: float = 1.0, value: Optional[int] = None):
+        """Registra ocorrência da chave"""
+        estimate = self.sketch.add(key, weight, value)
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.k:
+            candidates[key] = estimate
+            return
+        floor_key = min(candidates, key=candidates.get)
+        if estimate > candidates[floor_key]:
+            del candidates[floor_key]
+            candidates[key] = estimate
+
+    def merge(self, other: 'HeavyHitters'):
+        """Combina outro top-k a este"""
+        self.sketch.merge(other.sketch)
+        keys = set(self.candidates) | set(other.candidates)
+        ranked = sorted(((self.sketch.estimate(key), key) for key in keys), reverse=True)
+        self.candidates = {key: estimate for estimate, key in ranked[:self.k]}
+
+    def top(self, limit: int) -> List[Tuple[str, float]]:
+        """Maiores chaves com a frequência estimada"""
+        ranked = sorted(((self.sketch.estimate(key), key) for key in self.candidates), reverse=True)
+        return [(key, estimate) for estimate, key in ranked[:limit]]
+
+class HyperLogLog:
+    """
+    Contagem aproximada de distintos em 2^precision registradores de um byte
+
+    Erro padrão de ~1,04 / sqrt(2^precision) (1,6% com precisão 12).
+    Combinar dois sketches é tomar o máximo de cada registrador.
+    """
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key: str, value: Optional[int] = None):
+        """Registra chave (`value` é o hash já calculado)"""
+        if value is None:
+            value = _hash64(key)
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        """Número estimado de chaves distintas"""
+        m = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Correção para poucos elementos (contagem linear)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: 'HyperLogLog'):
+        """Combina outro sketch a este"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def to_text(self) -> str:
+        """Serializa os registradores (base64)"""
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def from_text(cls, text: str, precision: int) -> 'HyperLogLog':
+        """Reconstrói o sketch serializado"""
+        sketch = cls(precision)
+        registers = bytearray(base64.b64decode(text))
+        if len(registers) != 1 << precision:
+            raise ValueError("Precisão do HyperLogLog incompatível")
+        sketch.registers = registers
+        return sketch
+
+class TrafficBucket:
+    """Sketches de tráfego de uma hora"""
+
+    def __init__(self, bucket: str, top_k: int, width: int, depth: int, precision: int):
+        self.bucket = bucket
+        self.requests = 0.0
+        self.heavy_hitters = {dimension: HeavyHitters(top_k, width, depth) for dimension in TOP_DIMENSIONS}
+        self.distinct = {dimension: HyperLogLog(precision) for dimension in DISTINCT_DIMENSIONS}
+
+    def add(self, weight: float, ip_address: Optional[str], path: Optional[str], user_agent: Optional[str], user_id: Optional[str]):
+        """Registra uma requisição"""
+        self.requests += weight
+        if ip_address:
+            # O mesmo hash do IP alimenta o ranking e a contagem de distintos
+            ip_address = ip_address[:MAX_KEY_LENGTH]
+            value = _hash64(ip_address)
+            self.heavy_hitters["ip"].add(ip_address, weight, value)
+            self.distinct["ip"].add(ip_address, value)
+        for dimension, key in (("path", path), ("user_agent", user_agent)):
+            if key:
+                self.heavy_hitters[dimension].add(key[:MAX_KEY_LENGTH], weight)
+        if user_id:
+            self.distinct["user"].add(str(user_id))
+
+    def merge(self, other: 'TrafficBucket'):
+        """Combina outro bucket a este"""
+        self.requests += other.requests
+        for dimension in TOP_DIMENSIONS:
+            self.heavy_hitters[dimension].merge(other.heavy_hitters[dimension])
+        for dimension in DISTINCT_DIMENSIONS:
+            self.distinct[dimension].merge(other.distinct[dimension])
+
+    def to_dict(self) -> Dict:
+        """Serializa o bucket"""
+        return {
+            "version": 1,
+            "bucket": self.bucket,
+            "requests": self.requests,
+            "heavy_hitters": {
+                dimension: {"cms": hitters.sketch.to_text(), "candidates": sorted(hitters.candidates)}
+                for dimension, hitters in self.heavy_hitters.items()
+            },
+            "distinct": {dimension: sketch.to_text() for dimension, sketch in self.distinct.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, top_k: int, width: int, depth: int, precision: int) -> 'TrafficBucket':
+        """Reconstrói o bucket serializado"""
+        bucket = cls(data["bucket"], top_k, width, depth, precision)
+        bucket.requests = data["requests"]
+        for dimension, payload in data["heavy_hitters"].items():
+            hitters = bucket.heavy_hitters[dimension]
+            hitters.sketch = CountMinSketch.from_text(payload["cms"], width, depth)
+            hitters.candidates = {key: hitters.sketch.estimate(key) for key in payload["candidates"]}
+        for dimension, text in data["distinct"].items():
+            bucket.distinct[dimension] = HyperLogLog.from_text(text, precision)
+        return bucket
+
+class TrafficAnalytics:
+    def __init__(
+        self,
+        buckets_path: str,
+        top_k: int = 20,
+        sketch_width: int = 1024,
+        sketch_depth: int = 4,
+        hll_precision: int = 12,
+        retention_days: int = 7
+    ):
+        """
+        Estatísticas de tráfego por hora com memória fixa por bucket
+
+        Cada hora tem um Count-Min Sketch com candidatos Space-Saving para
+        IPs, caminhos e user agents, e um HyperLogLog para IPs e usuários
+        distintos. Como no agregador de métricas, cada processo grava os
+        próprios buckets (um arquivo por hora e por escritor) e a leitura
+        de um período combina os buckets de todos os escritores.
+
+        Args:
+            buckets_path: Diretório dos arquivos de bucket
+            top_k: Candidatos mantidos por dimensão
+            sketch_width: Largura do Count-Min Sketch
+            sketch_depth: Número de linhas do Count-Min Sketch
+            hll_precision: Precisão do HyperLogLog (2^precision registradores)
+            retention_days: Dias mantidos em disco
+        """
+        self.buckets_path = buckets_path
+        self.top_k = top_k
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        self.hll_precision = hll_precision
+        self.retention_days = retention_days
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        os.makedirs(self.buckets_path, exist_ok=True)
+        self._buckets: Dict[str, TrafficBucket] = {}
+        self._dirty: Set[str] = set()
+        self._bucket_keys: Dict[int, str] = {}
+        self._latest_bucket = None
+        self._lock = threading.Lock()
+
+    def _new_bucket(self, key: str) -> TrafficBucket:
+        """Cria bucket vazio com as dimensões configuradas"""
+        return TrafficBucket(key, self.top_k, self.sketch_width, self.sketch_depth, self.hll_precision)
+
+    def _bucket_key(self, hour: int) -> str:
+        """Chave (YYYYMMDDHH) da hora desde a época"""
+        key = self._bucket_keys.get(hour)
+        if key is None:
+            if len(self._bucket_keys) > 1024:
+                self._bucket_keys.clear()
+            key = self._bucket_keys[hour] = (_EPOCH + timedelta(hours=hour)).strftime('%Y%m%d%H')
+        return key
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def record_many(self, requests: Iterable[Tuple[float, float, Optional[str], Optional[str], Optional[str], Optional[str]]]):
+        """
+        Registra requisições com uma única aquisição do lock
+
+        Args:
+            requests: Tuplas (timestamp, peso, IP, caminho, user agent, usuário)
+        """
+        with self._lock:
+            for timestamp, weight, ip_address, path, user_agent, user_id in requests:
+                key = self._bucket_key(int(timestamp // 3600))
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = self._load_own_bucket(key)
+                if self._latest_bucket is None or key > self._latest_bucket:
+                    self._latest_bucket = key
+                bucket.add(weight, ip_address, path, user_agent, user_id)
+                self._dirty.add(key)
+
+    def flush(self) -> int:
+        """
+        Grava os buckets alterados e libera da memória as horas anteriores
+        à última hora com requisições
+
+        Returns:
+            int: Número de arquivos gravados
+        """
+        with self._lock:
+            pending = [(key, json.dumps(self._buckets[key].to_dict(), separators=(',', ':'))) for key in sorted(self._dirty)]
+            self._dirty.clear()
+
+        written = 0
+        for key, payload in pending:
+            target = self._bucket_path(key, self.writer_id)
+            temp_path = f"{target}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(temp_path, target)
+                written += 1
+            except Exception as e:
+                logging.error(f"Erro ao gravar bucket de tráfego {target}: {str(e)}")
+                with self._lock:
+                    self._dirty.add(key)
+
+        with self._lock:
+            for key in list(self._buckets):
+                if key not in self._dirty and key < self._latest_bucket:
+                    del self._buckets[key]
+        return written
+
+    def _bucket_path(self, key: str, writer: str) -> str:
+        """Caminho do arquivo de um bucket e escritor"""
+        return os.path.join(self.buckets_path, f"{key}.{writer}.json")
+
+    def _load_own_bucket(self, key: str) -> TrafficBucket:
+        """Retoma o bucket já gravado por este escritor (hora liberada da memória)"""
+        bucket = self._read_bucket(self._bucket_path(key, self.writer_id))
+        return bucket if bucket is not None else self._new_bucket(key)
+
+    def _read_bucket(self, path: str) -> Optional[TrafficBucket]:
+        """Lê um arquivo de bucket; None se ausente ou inválido"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return TrafficBucket.from_dict(data, self.top_k, self.sketch_width, self.sketch_depth, self.hll_precision)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Bucket de tráfego inválido {path}: {str(e)}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _list_files(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Arquivos de bucket agrupados por hora: hora -> [(escritor, caminho)]"""
+        files: Dict[str, List[Tuple[str, str]]] = {}
+        for filename in os.listdir(self.buckets_path):
+            match = BUCKET_PATTERN.match(filename)
+            if match:
+                files.setdefault(match.group(1), []).append(
+                    (match.group(2), os.path.join(self.buckets_path, filename))
+                )
+        return files
+
+    def merged(self, start: datetime, end: datetime) -> TrafficBucket:
+        """
+        Combina os buckets (de todos os escritores) das horas do período
+
+        As horas das bordas entram inteiras: a resolução é de uma hora.
+        """
+        first = start.strftime('%Y%m%d%H')
+        last = end.strftime('%Y%m%d%H')
+        result = self._new_bucket(f"{first}-{last}")
+
+        with self._lock:
+            own = {key: TrafficBucket.from_dict(bucket.to_dict(), self.top_k, self.sketch_width, self.sketch_depth, self.hll_precision)
+                   for key, bucket in self._buckets.items() if first <= key <= last}
+
+        for key, bucket in own.items():
+            result.merge(bucket)
+        for key, files in sorted(self._list_files().items()):
+            if not first <= key <= last:
+                continue
+            for writer, path in files:
+                if key in own and writer == self.writer_id:
+                    continue
+                bucket = self._read_bucket(path)
+                if bucket is not None:
+                    result.merge(bucket)
+        return result
+
+    def summary(self, start: datetime, end: datetime, limit: int = 10) -> Dict:
+        """
+        Resumo de tráfego do período
+
+        Args:
+            start: Início do período
+            end: Fim do período
+            limit: Itens por ranking
+
+        Returns:
+            Dict: Total de requisições, rankings (IPs, caminhos, user agents)
+            e contagem de IPs e usuários distintos
+        """
+        bucket = self.merged(start, end)
+        return {
+            "requests": bucket.requests,
+            "top_ips": [{"ip_address": key, "requests": count} for key, count in bucket.heavy_hitters["ip"].top(limit)],
+            "top_paths": [{"path": key, "requests": count} for key, count in bucket.heavy_hitters["path"].top(limit)],
+            "top_user_agents": [
+                {"user_agent": key, "requests": count}
+                for key, count in bucket.heavy_hitters["user_agent"].top(limit)
+            ],
+            "distinct_ips": bucket.distinct["ip"].count(),
+            "distinct_users": bucket.distinct["user"].count()
+        }
+
+    # ------------------------------------------------------------------
+    # Retenção
+    # ------------------------------------------------------------------
+
+    def cleanup(self, now: Optional[datetime] = None) -> int:
+        """
+        Remove buckets além da retenção
+
+        Returns:
+            int: Número de arquivos removidos
+        """
+        now = now or datetime.utcnow()
+        oldest = (now - timedelta(days=self.retention_days)).strftime('%Y%m%d%H')
+        removed = 0
+        for key, files in self._list_files().items():
+            if key >= oldest:
+                continue
+            for _, path in files:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logging.error(f"Erro ao remover bucket de tráfego {path}: {str(e)}")
+        return removed
@@ -16,6 +16,8 @@ import pyotp
 import qrcode
 from cryptography.fernet import Fernet
 
+from .log_pipeline import configure_logging
+
 class TwoFactorAuth:
     def __init__(self, storage_path: str = "data/2fa"):
         """
@@ -37,7 +39,7 @@ class TwoFactorAuth:
     def _setup_logging(self):
         """Configura logging para auditoria"""
         log_path = os.path.join(self.storage_path, "2fa_audit.log")
-        logging.basicConfig(
+        configure_logging(
             filename=log_path,
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
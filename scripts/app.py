@@ -16,6 +16,7 @@ from workflow.security.rate_limiting_middleware import setup_rate_limiting_middl
 from workflow.security.security_headers import security_headers
 from workflow.security.security_monitoring import SecurityMonitoring
 from workflow.security.audit_system import AuditSystem
+from workflow.security.log_pipeline import configure_logging
 
 # Importa blueprints da API
 from workflow.api.security_routes import security_bp
@@ -30,7 +31,7 @@ from workflow.api.two_factor_routes import two_factor_bp
 from workflow.api.mobile_routes import mobile_bp
 
 # Configuração de logging
-logging.basicConfig(
+configure_logging(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
@@ -87,12 +87,12 @@ def test_rate_limiting_reset():
     print("  ⏰ Simulando passagem de 5 minutos...")
     
     # Modifica diretamente o timestamp para simular expiração
-    key = f"{RateLimitType.LOGIN_ATTEMPTS.value}:{identifier}"
-    with rate_limiter.lock:
-        if key in rate_limiter.entries:
-            # Subtrai 6 minutos do first_attempt para simular expiração
-            from datetime import timedelta
-            rate_limiter.entries[key].first_attempt -= timedelta(minutes=6)
+    key = (RateLimitType.LOGIN_ATTEMPTS.value, identifier)
+    stripe = rate_limiter._stripe(key)
+    with stripe.lock:
+        if key in stripe.entries:
+            # Subtrai 6 minutos do first_attempt (segundos monotônicos) para simular expiração
+            stripe.entries[key].first_attempt -= 6 * 60
             print(f"  ✅ Timestamp modificado para simular expiração")
     
     # Tenta novamente - deve permitir
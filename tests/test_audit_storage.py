@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Armazenamento Segmentado de Auditoria
+Log append-only (rotação, vários escritores, cauda incompleta, arquivo
+legado); índices persistidos e atualizados incrementalmente; consulta dos
+mais recentes pelos índices dos segmentos, comparada à ordenação completa
+dos eventos, e leitura sob demanda; rollups horárias comparadas à contagem
+direta dos eventos
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.audit_storage import (
+    AuditSegmentStore, DayRollup, FsyncPolicy, SegmentIndex, fold_record, index_path, index_value, merge_rollup,
+    new_rollup_bucket, rollup_name, segment_name, to_epoch
+)
+
+DAY = datetime(2024, 5, 20)
+USERS = ("u1", "u2", "u3")
+LEVELS = ("info", "warning", "error")
+
+def make_record(number: int, timestamp: datetime, rng: random.Random) -> dict:
+    return {
+        "event_id": f"e{number}",
+        "timestamp": timestamp.isoformat(),
+        "user_id": rng.choice(USERS),
+        "category": rng.choice(("data_access", "authentication")),
+        "action": "data_read",
+        "level": rng.choice(LEVELS),
+        "success": rng.random() < 0.8,
+        "description": f"evento {number}"
+    }
+
+def random_records(seed: str, count: int, shuffled: bool) -> list:
+    """Eventos do dia em ordem de gravação (timestamps fora de ordem se `shuffled`)"""
+    rng = random.Random(seed)
+    timestamps = sorted(DAY + timedelta(seconds=rng.randrange(86400)) for _ in range(count))
+    if shuffled:
+        for position in range(0, count - 1, 3):
+            timestamps[position], timestamps[position + 1] = timestamps[position + 1], timestamps[position]
+    return [make_record(number, timestamp, rng) for number, timestamp in enumerate(timestamps)]
+
+class CountingArray(array):
+    """Lista de postings que conta os acessos por posição"""
+    reads = 0
+
+    def __getitem__(self, position):
+        CountingArray.reads += 1
+        return array.__getitem__(self, position)
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditSegmentStore(str(tmp_path / "events"), max_segment_bytes=16 * 1024, fsync_policy=FsyncPolicy.NEVER)
+    yield store
+    store.close()
+
+class TestSegmentLog:
+    """Eventos gravados em segmentos JSON por linha"""
+
+    def test_round_trip_across_days_and_rotation(self, store):
+        records = random_records("log", 400, False)
+        next_day = [make_record(1000 + number, DAY + timedelta(days=1, minutes=number), random.Random(number))
+                    for number in range(5)]
+
+        assert store.append(records[:150]) == 150
+        store.append(records[150:] + next_day)
+
+        assert store.list_days() == ["20240520", "20240521"]
+        segments = store.list_segments("20240520")
+        assert len(segments) > 2
+        assert all(os.path.getsize(path) <= store.max_segment_bytes for path in segments)
+        assert list(store.iter_day("20240520")) == records
+        assert list(store.iter_day("20240521")) == next_day
+
+    def test_writers_never_share_a_segment(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        first = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        second = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = random_records("writers", 40, False)
+        try:
+            for number, record in enumerate(records):
+                (first if number % 2 else second).append([record])
+        finally:
+            first.close()
+            second.close()
+
+        segments = first.list_segments("20240520")
+        assert [os.path.basename(path) for path in segments] == [segment_name("20240520", 1), segment_name("20240520", 2)]
+        assert sorted(record["event_id"] for record in first.iter_day("20240520")) == \
+            sorted(record["event_id"] for record in records)
+
+    def test_incomplete_tail_ignored_and_repaired(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        store = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = random_records("torn", 10, False)
+        store.append(records)
+        store.close()
+        path = store.list_segments("20240520")[0]
+        size = os.path.getsize(path)
+        with open(path, 'ab') as f:
+            f.write(b'{"event_id":"parcial","timest')
+
+        assert list(store.iter_day("20240520")) == records
+
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+        reopened = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        try:
+            assert os.path.getsize(path) == size
+            reopened.append([make_record(99, DAY + timedelta(hours=23), random.Random(1))])
+            assert [record["event_id"] for record in reopened.iter_day("20240520")][-2:] == ["e9", "e99"]
+        finally:
+            reopened.close()
+
+    def test_legacy_daily_file_is_read(self, store):
+        legacy = random_records("legacy", 3, False)
+        with open(os.path.join(store.events_path, "20240520.json"), 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+        store.append(random_records("after", 2, False))
+
+        events = list(store.iter_day("20240520"))
+
+        assert events[:3] == legacy
+        assert len(events) == 5
+
+class TestSegmentIndex:
+    """Índices persistidos ao selar o segmento e atualizados pelo trecho novo"""
+
+    def rebuilt(self, path: str) -> SegmentIndex:
+        index = SegmentIndex()
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                index.add(offset, json.loads(line))
+                offset += len(line)
+        index.covered = offset
+        return index
+
+    def test_persisted_index_round_trip(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        store = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        store.append(random_records("index", 200, True))
+        store.close()
+        path = store.list_segments("20240520")[0]
+        assert os.path.exists(index_path(path))
+
+        loaded = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER).get_index(path)
+
+        assert loaded.to_dict() == self.rebuilt(path).to_dict()
+
+    def test_index_covers_bytes_written_by_another_writer(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        writer = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        reader = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = random_records("incremental", 60, False)
+        try:
+            writer.append(records[:30])
+            path = writer.list_segments("20240520")[0]
+            assert len(reader.get_index(path).offsets) == 30
+
+            writer.append(records[30:])
+            index = reader.get_index(path)
+
+            assert index.to_dict() == self.rebuilt(path).to_dict()
+            assert [record["event_id"] for record in reader.iter_newest(["20240520"], {"user_id": "u1"})] == \
+                [record["event_id"] for record in reversed(records) if record["user_id"] == "u1"]
+        finally:
+            writer.close()
+            reader.close()
+
+class TestIterNewest:
+    """Mais recentes primeiro, com filtros e limites de tempo"""
+
+    def expected(self, records, filters, start_ts, end_ts):
+        matches = []
+        for position, record in enumerate(records):
+            ts = to_epoch(datetime.fromisoformat(record["timestamp"]))
+            if start_ts is not None and ts < start_ts or end_ts is not None and ts > end_ts:
+                continue
+            if any(index_value(field, record[field]) != index_value(field, value) for field, value in filters.items()):
+                continue
+            matches.append((ts, position, record["event_id"]))
+        return [event_id for _, _, event_id in sorted(matches, reverse=True)]
+
+    @pytest.mark.parametrize("shuffled", [False, True])
+    def test_matches_full_sort(self, store, shuffled):
+        records = random_records(f"newest-{shuffled}", 600, shuffled)
+        store.append(records)
+        assert len(store.list_segments("20240520")) > 1
+        rng = random.Random("queries")
+        day_start = to_epoch(DAY)
+
+        for _ in range(40):
+            filters = {}
+            if rng.random() < 0.5:
+                filters["user_id"] = rng.choice(USERS)
+            if rng.random() < 0.5:
+                filters["level"] = rng.choice(LEVELS)
+            if rng.random() < 0.3:
+                filters["success"] = rng.random() < 0.5
+            start_ts = day_start + rng.randrange(86400) if rng.random() < 0.5 else None
+            end_ts = day_start + rng.randrange(86400) if rng.random() < 0.5 else None
+
+            found = [record["event_id"] for record in store.iter_newest(["20240520"], filters, start_ts, end_ts)]
+
+            assert found == self.expected(records, filters, start_ts, end_ts), (filters, start_ts, end_ts)
+
+    def test_newest_reads_only_what_is_consumed(self):
+        """Os 5 mais recentes de um usuário não percorrem a lista de postings inteira"""
+        index = SegmentIndex()
+        for number, record in enumerate(random_records("lazy", 5000, False)):
+            index.add(number * 100, record)
+        index.postings["user_id"] = {
+            value: CountingArray('I', postings) for value, postings in index.postings["user_id"].items()
+        }
+        CountingArray.reads = 0
+
+        newest = list(itertools.islice(index.newest({"user_id": "u2"}), 5))
+
+        assert len(newest) == 5
+        assert newest == sorted(newest, reverse=True)
+        assert CountingArray.reads < 50
+
+    def test_out_of_order_index_sorted_once(self, monkeypatch):
+        index = SegmentIndex()
+        for number, record in enumerate(random_records("order", 300, True)):
+            index.add(number * 100, record)
+        assert not index.in_order
+
+        first = list(index.newest({}))
+        monkeypatch.setattr(index, "timestamps", None)
+
+        assert list(index.newest({})) == first
+        assert [index._time_order[1][position] for position in range(299, -1, -1)] == first
+
+    def test_in_order_flag_survives_persistence(self):
+        for shuffled in (False, True):
+            index = SegmentIndex()
+            for number, record in enumerate(random_records("persist", 50, shuffled)):
+                index.add(number * 100, record)
+            assert SegmentIndex.from_dict(index.to_dict()).in_order == index.in_order == (not shuffled)
+
+class TestRollups:
+    """Contadores horários acumulados incrementalmente e persistidos"""
+
+    def records(self, seed: str, count: int) -> list:
+        rng = random.Random(seed)
+        records = random_records(seed, count, False)
+        for record in records:
+            record["ip_address"] = f"10.0.0.{rng.randrange(4)}"
+            record["duration_ms"] = rng.choice((5, 80, 700, 20000))
+        return records
+
+    def folded(self, records, first_hour: int = 0, last_hour: int = 23) -> dict:
+        bucket = new_rollup_bucket()
+        for record in records:
+            if first_hour <= int(record["timestamp"][11:13]) <= last_hour:
+                fold_record(bucket, record)
+        return bucket
+
+    def test_buckets_match_direct_counts(self, store):
+        records = self.records("rollup", 500)
+        store.append(records)
+
+        bucket = store.rollup_buckets("20240520", 8, 12)
+
+        in_range = [record for record in records if 8 <= int(record["timestamp"][11:13]) <= 12]
+        assert bucket["total"] == len(in_range)
+        assert bucket["failed"] == sum(not record["success"] for record in in_range)
+        assert bucket["levels"] == dict(Counter(record["level"] for record in in_range))
+        assert bucket["users"]["u1"]["total"] == sum(record["user_id"] == "u1" for record in in_range)
+        assert bucket == self.folded(records, 8, 12)
+
+    def test_incremental_across_writers(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        writer = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        reader = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = self.records("incremental-rollup", 200)
+        try:
+            writer.append(records[:120])
+            assert reader.rollup_buckets("20240520")["total"] == 120
+
+            writer.append(records[120:])
+
+            assert reader.rollup_buckets("20240520") == self.folded(records)
+        finally:
+            writer.close()
+            reader.close()
+
+    def test_persisted_rollup_round_trip(self, tmp_path, monkeypatch):
+        events_path = str(tmp_path / "events")
+        store = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = self.records("persisted-rollup", 300)
+        store.append(records)
+        expected = store.rollup_buckets("20240520")
+        assert store.save_rollups() == 1
+        assert store.save_rollups() == 0
+        store.close()
+
+        reopened = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        # Rollup persistida cobre todos os bytes: nenhum segmento é relido
+        monkeypatch.setattr(reopened, "_scan_lines", lambda path, start: iter(()))
+        try:
+            assert reopened.rollup_buckets("20240520") == expected
+        finally:
+            reopened.close()
+
+        with open(os.path.join(events_path, rollup_name("20240520")), encoding='utf-8') as f:
+            rollup = DayRollup.from_dict(json.load(f))
+        assert rollup.to_dict() == DayRollup.from_dict(rollup.to_dict()).to_dict()
+        assert sum(rollup.segments.values()) == sum(os.path.getsize(path) for path in store.list_segments("20240520"))
+
+    def test_invalid_persisted_rollup_rebuilt(self, tmp_path):
+        events_path = str(tmp_path / "events")
+        store = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        records = self.records("invalid-rollup", 50)
+        store.append(records)
+        store.close()
+        with open(os.path.join(events_path, rollup_name("20240520")), 'w', encoding='utf-8') as f:
+            f.write("{")
+
+        reopened = AuditSegmentStore(events_path, fsync_policy=FsyncPolicy.NEVER)
+        try:
+            assert reopened.rollup_buckets("20240520") == self.folded(records)
+        finally:
+            reopened.close()
+
+    def test_merge_equals_single_fold(self):
+        records = self.records("merge", 300)
+        merged = new_rollup_bucket()
+        for part in range(3):
+            merge_rollup(merged, self.folded(records[part::3]))
+
+        expected = self.folded(records)
+
+        assert merged["total"] == expected["total"]
+        assert merged["categories"] == expected["categories"]
+        assert merged["duration_ms"] == expected["duration_ms"]
+        for user_id, stats in expected["users"].items():
+            assert merged["users"][user_id]["last_activity"] == stats["last_activity"]
+            assert sorted(merged["users"][user_id]["ip_addresses"]) == sorted(stats["ip_addresses"])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Sistema de Auditoria
+Exportação em streaming: erro de leitura não pode parecer exportação completa;
+fila de ingestão limitada: ordem de chegada e descarte do evento de menor nível;
+consulta paginada dos mais recentes pelos índices
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.audit_storage import decode_cursor
+from quarentena_duplicidades.workflow_security.audit_system import (
+    AuditAction, AuditCategory, AuditEvent, AuditEventQueue, AuditLevel, AuditQuery, AuditSystem,
+    OverflowPolicy
+)
+
+def make_event(description: str, level: AuditLevel = AuditLevel.INFO) -> AuditEvent:
+    return AuditEvent(
+        event_id=description, timestamp=datetime.utcnow(), user_id="u1", session_id=None, ip_address=None,
+        user_agent=None, category=AuditCategory.DATA_ACCESS, action=AuditAction.DATA_READ, level=level,
+        description=description
+    )
+
+class TestAuditEventQueue:
+    """Fila limitada com uma fila FIFO por nível"""
+
+    def test_batches_keep_arrival_order_across_levels(self):
+        events_queue = AuditEventQueue(capacity=10, batch_size=3)
+        levels = [AuditLevel.INFO, AuditLevel.CRITICAL, AuditLevel.DEBUG, AuditLevel.INFO, AuditLevel.ERROR]
+        for index, level in enumerate(levels):
+            assert events_queue.put(make_event(f"e{index}", level))
+
+        first = events_queue.get_batch(max_latency=10, timeout=1)
+
+        assert [event.description for event in first] == ["e0", "e1", "e2"]
+        assert [event.description for event in events_queue.drain()] == ["e3", "e4"]
+        assert len(events_queue) == 0
+
+    def test_full_queue_drops_oldest_of_lowest_level(self):
+        events_queue = AuditEventQueue(capacity=4, batch_size=4, overflow_policy=OverflowPolicy.DROP_LOWEST_LEVEL)
+        for description, level in (("info-1", AuditLevel.INFO), ("debug-1", AuditLevel.DEBUG),
+                                   ("info-2", AuditLevel.INFO), ("debug-2", AuditLevel.DEBUG)):
+            events_queue.put(make_event(description, level))
+
+        assert events_queue.put(make_event("error", AuditLevel.ERROR))
+        assert events_queue.put(make_event("warning", AuditLevel.WARNING))
+        assert events_queue.put(make_event("critical", AuditLevel.CRITICAL))
+
+        assert events_queue.dropped == 3
+        assert [event.description for event in events_queue.drain()] == ["info-2", "error", "warning", "critical"]
+
+    def test_event_not_above_queued_levels_is_dropped(self):
+        events_queue = AuditEventQueue(capacity=2, batch_size=2, overflow_policy=OverflowPolicy.DROP_LOWEST_LEVEL)
+        events_queue.put(make_event("a", AuditLevel.WARNING))
+        events_queue.put(make_event("b", AuditLevel.ERROR))
+
+        assert not events_queue.put(make_event("c", AuditLevel.WARNING))
+        assert events_queue.dropped == 1
+        assert [event.description for event in events_queue.drain()] == ["a", "b"]
+
+    def test_block_policy_times_out(self):
+        events_queue = AuditEventQueue(capacity=1, batch_size=1, block_timeout_ms=20)
+        events_queue.put(make_event("a"))
+
+        started = time.monotonic()
+        assert not events_queue.put(make_event("b"))
+
+        assert time.monotonic() - started >= 0.02
+        assert events_queue.blocked_puts == 1
+        assert events_queue.dropped == 1
+
+    def test_partial_batch_released_after_max_latency(self):
+        events_queue = AuditEventQueue(capacity=10, batch_size=5)
+        events_queue.put(make_event("a"))
+
+        started = time.monotonic()
+        batch = events_queue.get_batch(max_latency=0.05, timeout=5)
+
+        assert [event.description for event in batch] == ["a"]
+        assert time.monotonic() - started < 1
+
+    def test_closed_queue_refuses_puts(self):
+        events_queue = AuditEventQueue(capacity=2, batch_size=2)
+        events_queue.close()
+
+        assert not events_queue.put(make_event("a"))
+        assert events_queue.get_batch(max_latency=1, timeout=1) == []
+
+class TestQueryEvents:
+    """Página dos eventos mais recentes que satisfazem a consulta"""
+
+    def setup_method(self):
+        self.audit = None
+
+    def teardown_method(self):
+        if self.audit is not None:
+            self.audit.stop_processor()
+
+    def test_newest_first_with_offset_and_limit(self, tmp_path):
+        self.audit = AuditSystem(str(tmp_path / "audit"))
+        for index in range(30):
+            self.audit.log_event(
+                f"user-{index % 3}", AuditCategory.DATA_ACCESS, AuditAction.DATA_READ, f"evento {index}",
+                level=AuditLevel.WARNING if index % 5 == 0 else AuditLevel.INFO
+            )
+        self.audit.stop_processor()
+
+        page = self.audit.query_events(AuditQuery(user_id="user-0", offset=2, limit=3))
+        warnings = self.audit.query_events(AuditQuery(level=AuditLevel.WARNING))
+
+        assert [event.description for event in page] == ["evento 21", "evento 18", "evento 15"]
+        assert [event.description for event in warnings] == [f"evento {index}" for index in (25, 20, 15, 10, 5, 0)]
+
+class TestExportEvents:
+    """Exportação de eventos pelo cursor"""
+
+    def setup_method(self):
+        self.audit = None
+
+    def teardown_method(self):
+        if self.audit is not None:
+            self.audit.stop_processor()
+
+    def make_audit(self, tmp_path, events: int) -> AuditSystem:
+        self.audit = AuditSystem(str(tmp_path / "audit"))
+        for index in range(events):
+            self.audit.log_event(f"user-{index}", AuditCategory.DATA_ACCESS, AuditAction.DATA_READ, f"evento {index}")
+        # Grava a fila nos segmentos antes de exportar
+        self.audit.stop_processor()
+        return self.audit
+
+    def test_export_yields_all_events(self, tmp_path):
+        audit = self.make_audit(tmp_path, 5)
+
+        rows = list(audit.export_events(AuditQuery()))
+
+        assert [event["description"] for _, event in rows] == [f"evento {index}" for index in range(5)]
+
+    def test_read_error_is_raised_after_delivered_events(self, tmp_path, monkeypatch):
+        """O erro chega ao consumidor; os eventos já entregues trazem o cursor de retomada"""
+        audit = self.make_audit(tmp_path, 5)
+        iter_export = audit.event_store.iter_export
+
+        def failing_iter_export(*args, **kwargs):
+            for count, item in enumerate(iter_export(*args, **kwargs)):
+                if count == 3:
+                    raise OSError("segmento ilegível")
+                yield item
+
+        monkeypatch.setattr(audit.event_store, "iter_export", failing_iter_export)
+        delivered = []
+        with pytest.raises(OSError):
+            for cursor, event in audit.export_events(AuditQuery()):
+                delivered.append(cursor)
+
+        assert len(delivered) == 3
+        monkeypatch.undo()
+        resumed = list(audit.export_events(AuditQuery(), cursor=delivered[-1]))
+        assert [event["description"] for _, event in resumed] == ["evento 3", "evento 4"]
+        assert decode_cursor(delivered[-1]) is not None
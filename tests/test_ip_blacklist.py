@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Blacklist de IPs
+Trie de prefixos IPv4/IPv6 comparada à verificação direta das redes,
+importação de listas externas, inclusão/remoção atômicas e recarga quando
+o arquivo muda
+"""
+
+import ipaddress
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.ip_blacklist import IPBlacklist
+
+def random_networks(rng: random.Random, count: int) -> list:
+    """Endereços e faixas aleatórias, com prefixos aninhados e sobrepostos"""
+    networks = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            length = rng.choice((8, 12, 16, 20, 24, 28, 32))
+            address = ipaddress.IPv4Address(rng.choice((0x0A000000, 0xC0A80000, 0xC6336400)) | rng.getrandbits(16))
+        else:
+            length = rng.choice((32, 48, 56, 64, 128))
+            address = ipaddress.IPv6Address((0x20010DB8 << 96) | rng.getrandbits(72))
+        networks.append(ipaddress.ip_network(f"{address}/{length}", strict=False))
+    return networks
+
+def random_address(rng: random.Random) -> str:
+    if rng.random() < 0.7:
+        return str(ipaddress.IPv4Address(rng.choice((0x0A000000, 0xC0A80000, 0xC6336400)) | rng.getrandbits(16)))
+    return str(ipaddress.IPv6Address((0x20010DB8 << 96) | rng.getrandbits(72)))
+
+@pytest.fixture
+def blacklist_file(tmp_path):
+    return str(tmp_path / "blacklist" / "ips.json")
+
+def write_entries(path: str, entries: list, mtime_ns: int):
+    """Grava o arquivo como outro processo, com mtime explícito"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+class TestPrefixMatching:
+    """Buscas na trie contra a verificação rede a rede"""
+
+    def test_matches_direct_membership(self, blacklist_file):
+        rng = random.Random("trie")
+        networks = random_networks(rng, 400)
+        blacklist = IPBlacklist(blacklist_file)
+        blacklist.add(str(network) for network in networks)
+
+        for _ in range(5000):
+            address = ipaddress.ip_address(random_address(rng))
+            containing = [network for network in networks if address in network]
+
+            entry = blacklist.match(str(address))
+
+            if not containing:
+                assert entry is None, address
+                continue
+            # A entrada informada é a faixa mais ampla que contém o IP
+            assert ipaddress.ip_network(entry).prefixlen == min(network.prefixlen for network in containing), address
+            assert address in ipaddress.ip_network(entry)
+
+    def test_address_forms(self, blacklist_file):
+        blacklist = IPBlacklist(blacklist_file)
+        blacklist.add(["192.0.2.0/24", "203.0.113.7", "2001:db8::/32"])
+
+        assert blacklist.match("192.0.2.200") == "192.0.2.0/24"
+        assert blacklist.match("203.0.113.7") == "203.0.113.7"
+        assert not blacklist.contains("203.0.113.8")
+        assert blacklist.match("::ffff:192.0.2.1") == "192.0.2.0/24"
+        assert blacklist.match("2001:db8:1::5") == "2001:db8::/32"
+        assert not blacklist.contains("2001:db9::1")
+        assert not blacklist.contains("não-é-ip")
+
+class TestUpdates:
+    """Inclusões, remoções e importação"""
+
+    def test_add_and_remove_persist(self, blacklist_file):
+        blacklist = IPBlacklist(blacklist_file)
+
+        result = blacklist.add(["10.1.0.0/16", "10.1.2.3", "10.1.0.0/16", "inválido"])
+
+        assert result == {"added": 2, "existing": 1, "invalid": 1}
+        with open(blacklist_file, encoding='utf-8') as f:
+            assert json.load(f) == ["10.1.0.0/16", "10.1.2.3"]
+        assert blacklist.remove("10.1.0.0/16")
+        assert not blacklist.remove("10.1.0.0/16")
+        assert blacklist.match("10.1.2.3") == "10.1.2.3"
+        assert not blacklist.contains("10.1.9.9")
+        assert IPBlacklist(blacklist_file).list_entries() == ["10.1.2.3"]
+
+    def test_bulk_import(self, blacklist_file, tmp_path):
+        rng = random.Random("import")
+        networks = [ipaddress.IPv4Network((rng.getrandbits(24) << 8, 24)) for _ in range(20000)]
+        lines = ["# lista externa", ""]
+        lines += [f"{network} ; SBL{number:06d}" for number, network in enumerate(networks)]
+        list_path = tmp_path / "drop.txt"
+        list_path.write_text("\n".join(lines), encoding='utf-8')
+        blacklist = IPBlacklist(blacklist_file)
+
+        result = blacklist.import_file(str(list_path))
+
+        assert result["added"] == len(set(networks))
+        assert result["invalid"] == 0
+        assert blacklist.stats()["ipv4_prefixes"] == len(set(networks))
+        for network in rng.sample(networks, 200):
+            assert blacklist.match(str(network.network_address + rng.randrange(256))) == str(network)
+
+class TestHotReload:
+    """Arquivo relido apenas quando muda"""
+
+    def test_reloads_only_on_change(self, blacklist_file):
+        write_entries(blacklist_file, ["10.0.0.0/8"], 1_700_000_000_000_000_000)
+        blacklist = IPBlacklist(blacklist_file, check_interval=0)
+        for _ in range(100):
+            assert blacklist.contains("10.2.3.4")
+        assert blacklist.reloads == 1
+
+        # Alteração feita por outro processo
+        write_entries(blacklist_file, ["172.16.0.0/12"], 1_700_000_001_000_000_000)
+
+        assert not blacklist.contains("10.2.3.4")
+        assert blacklist.contains("172.16.5.5")
+        assert blacklist.reloads == 2
+
+    def test_check_interval_throttles_stat(self, blacklist_file):
+        write_entries(blacklist_file, ["10.0.0.0/8"], 1_700_000_000_000_000_000)
+        blacklist = IPBlacklist(blacklist_file, check_interval=3600)
+        write_entries(blacklist_file, [], 1_700_000_001_000_000_000)
+
+        assert blacklist.contains("10.2.3.4")
+        assert blacklist.list_entries() == []
+        assert not blacklist.contains("10.2.3.4")
+
+    def test_invalid_file_keeps_previous_entries(self, blacklist_file):
+        write_entries(blacklist_file, ["10.0.0.0/8", "não-é-ip"], 1_700_000_000_000_000_000)
+        blacklist = IPBlacklist(blacklist_file, check_interval=0)
+        assert blacklist.list_entries() == ["10.0.0.0/8"]
+
+        with open(blacklist_file, 'w', encoding='utf-8') as f:
+            f.write("[")
+        os.utime(blacklist_file, ns=(1_700_000_001_000_000_000, 1_700_000_001_000_000_000))
+
+        assert blacklist.contains("10.2.3.4")
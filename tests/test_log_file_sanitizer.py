@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Sanitização de Arquivos de Log
+Jobs da API: limite de processos e saídas recusadas (existente, log ativo, em uso)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security import log_file_sanitizer
+from quarentena_duplicidades.workflow_security.log_file_sanitizer import LogFileSanitizationJobs
+from quarentena_duplicidades.workflow_security.log_pipeline import LogPipeline
+
+class TestLogFileSanitizationJobs:
+    """Validação dos jobs antes de agendar"""
+
+    def setup_method(self):
+        self.handlers = []
+        self.pipeline = None
+        self.release = threading.Event()
+        self.calls = []
+
+    def teardown_method(self):
+        self.release.set()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        for logger, handler in self.handlers:
+            logger.removeHandler(handler)
+            handler.close()
+
+    @pytest.fixture
+    def jobs(self, tmp_path, monkeypatch):
+        """Jobs sobre tmp_path, com a sanitização substituída por um registro das chamadas"""
+        def fake_sanitize(source, target, workers=None, progress=None):
+            self.calls.append((source, target, workers))
+            self.release.wait(5)
+            return {"success": True}
+
+        monkeypatch.setattr(log_file_sanitizer, "sanitize_log_file", fake_sanitize)
+        (tmp_path / "app.log").write_text("cpf 123.456.789-09\n")
+        return LogFileSanitizationJobs(str(tmp_path))
+
+    def wait_idle(self, jobs):
+        """Libera e aguarda a conclusão de todos os jobs"""
+        self.release.set()
+        deadline = time.monotonic() + 5
+        while any(job["status"] in ("queued", "running") for job in jobs.list()):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_workers_clamped_to_cpu_count(self, jobs):
+        jobs.submit("app.log", "a.out", workers=10_000)
+        jobs.submit("app.log", "b.out", workers=-5)
+        self.wait_idle(jobs)
+
+        assert [call[2] for call in self.calls] == [os.cpu_count() or 1, 1]
+
+    def test_existing_output_requires_overwrite(self, jobs, tmp_path):
+        (tmp_path / "app.sanitized.log").write_text("anterior\n")
+
+        with pytest.raises(ValueError):
+            jobs.submit("app.log")
+        job = jobs.submit("app.log", overwrite=True)
+
+        assert job["output_path"] == "app.sanitized.log"
+
+    def test_output_cannot_be_input(self, jobs):
+        with pytest.raises(ValueError):
+            jobs.submit("app.log", "app.log", overwrite=True)
+
+    def test_active_log_file_refused(self, jobs, tmp_path):
+        """Arquivo aberto por um FileHandler de logger, mesmo com overwrite"""
+        logger = logging.getLogger(f"test_jobs_{uuid.uuid4().hex}")
+        handler = logging.FileHandler(tmp_path / "current.log")
+        logger.addHandler(handler)
+        self.handlers.append((logger, handler))
+
+        with pytest.raises(ValueError):
+            jobs.submit("app.log", "current.log", overwrite=True)
+
+    def test_pipeline_log_file_refused(self, jobs, tmp_path):
+        """Arquivo gravado por um pipeline em execução"""
+        self.pipeline = LogPipeline([logging.FileHandler(tmp_path / "pipeline.log")], sanitizer=None)
+        self.pipeline.start()
+
+        with pytest.raises(ValueError):
+            jobs.submit("app.log", "pipeline.log", overwrite=True)
+
+        self.pipeline.stop()
+        jobs.submit("app.log", "pipeline.log", overwrite=True)
+
+    def test_output_of_pending_job_refused(self, jobs):
+        jobs.submit("app.log", "shared.out")
+
+        with pytest.raises(ValueError):
+            jobs.submit("app.log", "shared.out", overwrite=True)
+
+        self.wait_idle(jobs)
+        jobs.submit("app.log", "shared.out", overwrite=True)
+
+    def test_path_outside_root_refused(self, jobs):
+        with pytest.raises(ValueError):
+            jobs.submit("app.log", "../escape.log")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Pipeline Assíncrono de Logs
+Sanitização dos loggers criados com create_sanitized_logger com o pipeline ativo
+"""
+
+import logging
+import os
+import sys
+import uuid
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.log_pipeline import LogPipeline
+from quarentena_duplicidades.workflow_security.log_sanitization import LogSanitizer
+
+SENSITIVE_MESSAGE = "cpf 123.456.789-09 email joao@ex.com"
+
+class TestSanitizedLoggerWithPipeline:
+    """Loggers sanitizados continuam sanitizando com o pipeline ativo"""
+
+    def setup_method(self):
+        self.sanitizer = LogSanitizer()
+        self.parent_name = f"test_pipeline_{uuid.uuid4().hex}"
+        self.parent = logging.getLogger(self.parent_name)
+        self.parent.propagate = False
+        self.pipeline = None
+
+    def teardown_method(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        for logger in (self.parent, logging.getLogger(f"{self.parent_name}.app")):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+
+    def start_pipeline(self, path):
+        self.pipeline = LogPipeline([logging.FileHandler(path)], sanitizer=self.sanitizer)
+        self.pipeline.start()
+        # Só o pipeline (sem os handlers de captura do pytest)
+        self.parent.handlers = [self.pipeline.handler]
+
+    def test_own_handler_receives_sanitized_record(self, tmp_path):
+        """Handler próprio do logger não recebe o registro cru"""
+        self.start_pipeline(tmp_path / "pipeline.log")
+        logger = self.sanitizer.create_sanitized_logger(f"{self.parent_name}.app")
+        logger.addHandler(logging.FileHandler(tmp_path / "own.log"))
+
+        assert not self.sanitizer.is_deferred_for(logger)
+        logger.info(SENSITIVE_MESSAGE)
+        self.pipeline.flush()
+
+        for name in ("own.log", "pipeline.log"):
+            content = (tmp_path / name).read_text()
+            assert "123.456.789-09" not in content
+            assert "joao@ex.com" not in content
+            assert "[CPF_REDACTED]" in content
+
+    def test_pipeline_only_logger_is_sanitized_once(self, tmp_path):
+        """Só com handlers do pipeline a sanitização fica para a thread de escrita"""
+        self.start_pipeline(tmp_path / "pipeline.log")
+        logger = self.sanitizer.create_sanitized_logger(f"{self.parent_name}.app")
+
+        assert self.sanitizer.is_deferred_for(logger)
+        logger.info(SENSITIVE_MESSAGE)
+        self.pipeline.flush()
+
+        lines = (tmp_path / "pipeline.log").read_text().splitlines()
+        assert len(lines) == 1
+        assert "123.456.789-09" not in lines[0]
+        assert lines[0].count("[SANITIZED:") == 1
+
+    def test_stopped_pipeline_no_longer_defers(self, tmp_path):
+        """Depois de `stop` o filtro volta a sanitizar na thread do produtor"""
+        self.start_pipeline(tmp_path / "pipeline.log")
+        logger = self.sanitizer.create_sanitized_logger(f"{self.parent_name}.app")
+        self.pipeline.stop()
+
+        assert not self.sanitizer.is_deferred_for(logger)
+
+    def test_logger_without_handlers_is_not_deferred(self):
+        """Sem handlers o registro iria para o lastResort, sem sanitização"""
+        self.sanitizer.deferred_handlers.add(object())
+        logger = self.sanitizer.create_sanitized_logger(f"{self.parent_name}.app")
+
+        assert not self.sanitizer.is_deferred_for(logger)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Sanitização de Logs
+Padrões compilados comparados à cadeia original de re.sub, um padrão por vez,
+pré-filtro de gatilhos (textos limpos saem intactos) e payloads JSON comparados
+à recursão original (campo a campo, com `any(termo in campo)`)
+"""
+
+import json
+import os
+import random
+import re
+import sys
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.log_sanitization import LogSanitizer
+
+# Trechos sensíveis (e quase sensíveis) usados para montar textos aleatórios
+FRAGMENTS = (
+    "123.456.789-09", "12345678909", "123456789-09", "12.345.678/0001-90", "12345678000190",
+    "joao.silva@exemplo.com.br", "a@b.co", "user+tag@mail", "@", "(11) 98765-4321", "11987654321",
+    "9876-5432", "550e8400-e29b-41d4-a716-446655440000", "-abcd-", 'password="x"', "password=segredo",
+    '"senha": "123"', "senha = abc", '"pass":"p"', '"token": "abc.def"', '"access_token":"t"',
+    "Bearer eyJhbGciOi.x-y_z", "Beare", '"api_key": "k"', "api_key=K123", '"apikey":"z"', '"key": "v"',
+    "4111 1111 1111 1111", "4111111111111111", "10.0.0.1", "172.16.5.4", "172.32.0.1", "192.168.0.10",
+    "Maria Souza Lima", "Ana Paula", "01/02/1990", "1/2/1990", "Rua das Flores, 123", "Av. Brasil,45",
+    "Praça XV, 7", "0001", "2024", "42"
+)
+NOISE = "abcXYZ019 .,-/()@=:\"_&\n"
+
+def random_text(rng: random.Random) -> str:
+    """Texto aleatório de trechos (às vezes cortados) e ruído"""
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        choice = rng.random()
+        if choice < 0.45:
+            fragment = rng.choice(FRAGMENTS)
+            if rng.random() < 0.2:
+                start = rng.randrange(len(fragment))
+                fragment = fragment[start:rng.randint(start, len(fragment))]
+            parts.append(fragment)
+        elif choice < 0.8:
+            parts.append("".join(rng.choice(NOISE) for _ in range(rng.randint(1, 6))))
+        else:
+            parts.append(str(rng.randrange(10 ** rng.randint(1, 12))))
+    return "".join(parts)
+
+def sequential_sanitize(sanitizer: LogSanitizer, text: str) -> str:
+    """sanitize_string original: um re.sub por padrão, em ordem"""
+    if not text:
+        return text
+    for pattern in sanitizer.sensitive_patterns:
+        text = re.sub(pattern.pattern, pattern.replacement, text)
+    return text
+
+def baseline_sanitize_json(sanitizer: LogSanitizer, obj):
+    """_sanitize_json_object original: chave sanitizada e testada termo a termo"""
+    if isinstance(obj, dict):
+        sanitized_obj = {}
+        for key, value in obj.items():
+            sanitized_key = sequential_sanitize(sanitizer, str(key))
+            field_lower = sanitized_key.lower()
+            if any(field in field_lower for field in sanitizer.sensitive_json_fields):
+                sanitized_obj[sanitized_key] = "[SENSITIVE_DATA_REDACTED]"
+            else:
+                sanitized_obj[sanitized_key] = baseline_sanitize_json(sanitizer, value)
+        return sanitized_obj
+    if isinstance(obj, list):
+        return [baseline_sanitize_json(sanitizer, item) for item in obj]
+    if isinstance(obj, str):
+        return sequential_sanitize(sanitizer, obj)
+    return obj
+
+# Chaves dos payloads aleatórios (sensíveis pelo vocabulário, pelo conteúdo ou não)
+KEYS = (
+    "id", "user_id", "Password", "senha_atual", "PASS", "Email", "nome", "details", "amount", "status",
+    "access_token", "CPF_responsavel", "telefone", "descricao", "Cartao", "keyboard", "monkey", "items",
+    "joao@ex.com", "123.456.789-09", "Bearer abc", "tarefa", "pixKey", "pix_key", 42, 7
+)
+
+def random_payload(rng: random.Random, depth: int = 0):
+    """Payload JSON aleatório com chaves repetidas entre registros"""
+    kind = rng.random()
+    if depth < 3 and kind < 0.3:
+        return {rng.choice(KEYS): random_payload(rng, depth + 1) for _ in range(rng.randint(0, 6))}
+    if depth < 3 and kind < 0.4:
+        return [random_payload(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    if kind < 0.8:
+        return random_text(rng)
+    return rng.choice((None, True, 0, 12.5, 123456789))
+
+class TestCompiledPatterns:
+    """Padrões compilados uma vez, mesmo resultado da cadeia de re.sub"""
+
+    def setup_method(self):
+        self.sanitizer = LogSanitizer()
+
+    def assert_equivalent(self, seed: str, count: int = 3000):
+        rng = random.Random(seed)
+        for _ in range(count):
+            text = random_text(rng)
+            assert self.sanitizer.sanitize_string(text) == sequential_sanitize(self.sanitizer, text), text
+
+    def test_matches_sequential_substitution(self):
+        self.assert_equivalent("default")
+
+    def test_fragments_are_redacted(self):
+        for fragment in ("123.456.789-09", "joao.silva@exemplo.com.br", "Bearer abc", "192.168.0.10"):
+            sanitized = self.sanitizer.sanitize_string(f"valor {fragment} fim")
+            assert fragment not in sanitized
+            assert sanitized == sequential_sanitize(self.sanitizer, f"valor {fragment} fim")
+
+    def test_rebuilt_after_add_custom_pattern(self):
+        compiled = self.sanitizer._compiled
+        self.sanitizer.add_custom_pattern("matricula", r'MAT-\d{6}', "[MAT_REDACTED]", "Matrícula", triggers=["MAT-"])
+
+        assert self.sanitizer._compiled is not compiled
+        assert self.sanitizer.sanitize_string("aluno MAT-123456") == "aluno [MAT_REDACTED]"
+        self.assert_equivalent("custom", 1000)
+
+    def test_rebuilt_after_remove_pattern(self):
+        assert self.sanitizer.remove_pattern("phone")
+
+        assert "[PHONE_REDACTED]" not in self.sanitizer.sanitize_string("ligue 9876-5432")
+        self.assert_equivalent("removed", 1000)
+
+    def test_invalid_custom_pattern_keeps_compiled_set(self):
+        compiled = self.sanitizer._compiled
+        self.sanitizer.add_custom_pattern("broken", r'(', "[X]", "Inválido")
+
+        assert self.sanitizer._compiled is compiled
+        assert all(pattern.name != "broken" for pattern in self.sanitizer.sensitive_patterns)
+
+class TestPrefilter:
+    """Textos sem gatilho de nenhum padrão não passam pelas regex"""
+
+    def setup_method(self):
+        self.sanitizer = LogSanitizer()
+
+    def test_clean_lines_returned_untouched(self):
+        lines = ["GET /api/tasks status=ok", "Notificação enviada: tarefa concluída", "worker iniciado em 12 ms"]
+
+        for line in lines:
+            assert self.sanitizer.sanitize_string(line) is line
+
+        prefilter = self.sanitizer.get_sanitization_stats()["prefilter"]
+        assert prefilter["strings_checked"] == len(lines)
+        assert prefilter["strings_skipped"] == len(lines)
+        assert prefilter["skip_ratio"] == 1.0
+
+    def test_hit_ratios_per_pattern(self):
+        self.sanitizer.sanitize_string("contato joao@ex.com")
+
+        patterns = self.sanitizer.get_sanitization_stats()["prefilter"]["patterns"]
+        assert patterns["email"]["trigger_hits"] == 1
+        assert patterns["email"]["matches"] == 1
+        assert patterns["cpf"]["trigger_misses"] == 1
+        assert patterns["cpf"]["trigger_hit_ratio"] == 0.0
+
+    @pytest.mark.parametrize("seed", ["digits", "literals"])
+    def test_trigger_thresholds_match_sequential(self, seed):
+        """Sequências de dígitos e literais no limite dos gatilhos"""
+        rng = random.Random(seed)
+        pieces = ("1", "12", "123", "1234", "12345", ".", "-", "/", " ", "(", ")", "@", "0001",
+                  "passwor", "password", "Beare", "Bearer ", "token\"", "api_key", "10.", "172.", "192.168.",
+                  "Ab ", "Cd ", "E", "/12/2024", ", 1", "Rua ")
+        for _ in range(5000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 10)))
+            assert self.sanitizer.sanitize_string(text) == sequential_sanitize(self.sanitizer, text), text
+
+    def test_substitution_can_trigger_later_pattern(self):
+        """Gatilhos são conferidos no texto já substituído pelos padrões anteriores"""
+        self.sanitizer.add_custom_pattern("first", r'AAA', "BBB", "Primeiro", triggers=["AAA"])
+        self.sanitizer.add_custom_pattern("second", r'BBB', "[B]", "Segundo", triggers=["BBB"])
+
+        assert self.sanitizer.sanitize_string("x AAA y") == "x [B] y"
+        assert sequential_sanitize(self.sanitizer, "x AAA y") == "x [B] y"
+
+    def test_pattern_without_trigger_disables_skipping(self):
+        self.sanitizer.add_custom_pattern("ticket", r'tk_[a-z]{4}', "[TICKET]", "Ticket")
+
+        assert self.sanitizer.sanitize_string("abrir tk_abcd") == "abrir [TICKET]"
+        assert self.sanitizer.get_sanitization_stats()["prefilter"]["strings_skipped"] == 0
+
+class TestJsonPayloads:
+    """Decisões por campo em cache e planos de esquema, mesmo resultado da recursão original"""
+
+    def setup_method(self):
+        self.sanitizer = LogSanitizer()
+
+    def assert_equivalent(self, seed: str, count: int = 1500, schema=None):
+        rng = random.Random(seed)
+        for _ in range(count):
+            payload = {"event": random_payload(rng), "details": random_payload(rng)}
+            expected = baseline_sanitize_json(self.sanitizer, payload)
+            assert self.sanitizer.sanitize_json(payload, schema=schema) == expected, payload
+
+    def test_dict_payloads_match_original(self):
+        self.assert_equivalent("json")
+        stats = self.sanitizer.get_sanitization_stats()["field_cache"]
+        assert stats["hits"] > stats["misses"]
+
+    def test_json_strings_match_original(self):
+        rng = random.Random("json-string")
+        for _ in range(500):
+            payload = random_payload(rng)
+            expected = json.dumps(baseline_sanitize_json(self.sanitizer, payload), ensure_ascii=False)
+            assert self.sanitizer.sanitize_json(json.dumps(payload)) == expected
+
+    def test_small_cache_evicts_without_changing_results(self):
+        self.sanitizer._field_cache_size = 4
+        self.assert_equivalent("json-evict", 500)
+        assert len(self.sanitizer._field_cache) <= 4
+
+    def test_registered_schema_matches_original(self):
+        """Plano compilado para um formato; payloads fora do formato seguem o caminho genérico"""
+        self.sanitizer.register_schema("audit", {
+            "event": {"user_id": "", "Email": "", "details": {"amount": 0, "Cartao": ""}, "items": [{"id": 0}]},
+            "details": [{"senha_atual": "", "descricao": ""}]
+        })
+        self.assert_equivalent("json-schema", schema="audit")
+
+    def test_decisions_follow_vocabulary_and_pattern_changes(self):
+        self.sanitizer.register_schema("audit", {"event": {"tarefa": "", "status": ""}})
+        self.assert_equivalent("json-before", 300, schema="audit")
+
+        self.sanitizer.set_sensitive_fields(self.sanitizer.sensitive_json_fields + ["tarefa"])
+        assert self.sanitizer.sanitize_json({"event": {"tarefa": "x"}}, schema="audit") == \
+            {"event": {"tarefa": "[SENSITIVE_DATA_REDACTED]"}}
+        self.sanitizer.add_custom_pattern("status", r'status', "[STATUS]", "Status", triggers=["status"])
+        self.assert_equivalent("json-after", 300, schema="audit")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Backends de Estado do Rate Limiting
+Tabela em memória mapeada (parte cheia: despejo e falha fechada) e
+equivalência dos backends: memória, memória mapeada e Redis (scripts Lua
+executados de fato pelo LocalRedisStandIn)
+"""
+
+import os
+import random
+import sys
+import types
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security import rate_limit_backends
+from quarentena_duplicidades.workflow_security.rate_limit_backends import (
+    LocalRedisStandIn, RedisBackend, SharedMemoryBackend
+)
+from quarentena_duplicidades.workflow_security.rate_limiting import RateLimitType, RateLimiter
+
+class FakeClock:
+    """Relógio controlado pelo teste"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio falso para os backends"""
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit_backends, "time", types.SimpleNamespace(time=fake, sleep=lambda _: None))
+    return fake
+
+class TestSharedMemoryFullStripe:
+    """Parte da tabela cheia de chaves vivas"""
+
+    def setup_method(self):
+        self.backend = None
+        self.limiter = None
+
+    def teardown_method(self):
+        if self.limiter is not None:
+            self.limiter._cleanup_active = False
+        if self.backend is not None:
+            self.backend.close()
+
+    def make_limiter(self, tmp_path, slots: int) -> RateLimiter:
+        self.backend = SharedMemoryBackend(str(tmp_path / "rate_limits"), slots=slots, stripes=1)
+        self.limiter = RateLimiter(backend=self.backend)
+        return self.limiter
+
+    def test_new_key_evicts_earliest_expiry(self, tmp_path, clock):
+        """Chave nova ocupa o slot da chave que expira primeiro, sem falhar aberta"""
+        limiter = self.make_limiter(tmp_path, slots=8)
+        for index in range(8):
+            limiter.consume(f"client-{index}", RateLimitType.LOGIN_ATTEMPTS)
+            clock.advance(1)
+
+        for _ in range(5):
+            assert limiter.consume("rotating", RateLimitType.LOGIN_ATTEMPTS).allowed
+        decision = limiter.consume("rotating", RateLimitType.LOGIN_ATTEMPTS)
+
+        assert not decision.allowed
+        assert self.backend.stats()["evictions"] == 1
+        config = limiter.limits[RateLimitType.LOGIN_ATTEMPTS]
+        assert self.backend.get(RateLimitType.LOGIN_ATTEMPTS.value, "client-0", config) is None
+        assert self.backend.get(RateLimitType.LOGIN_ATTEMPTS.value, "client-7", config) is not None
+
+    def test_blocked_client_survives_key_rotation(self, tmp_path, clock):
+        """Um cliente bloqueado continua bloqueado enquanto outro gira identificadores"""
+        limiter = self.make_limiter(tmp_path, slots=64)
+        for _ in range(6):
+            limiter.consume("attacker", RateLimitType.LOGIN_ATTEMPTS)
+        clock.advance(1)
+
+        for index in range(200):
+            limiter.consume(f"rotating-{index}", RateLimitType.LOGIN_ATTEMPTS)
+
+        assert not limiter.consume("attacker", RateLimitType.LOGIN_ATTEMPTS).allowed
+
+    def test_full_stripe_of_blocked_keys_fails_closed(self, tmp_path, clock):
+        """Sem slot despejável, uma chave nova de login é recusada, não liberada"""
+        limiter = self.make_limiter(tmp_path, slots=8)
+        for index in range(8):
+            for _ in range(6):
+                limiter.consume(f"blocked-{index}", RateLimitType.LOGIN_ATTEMPTS)
+
+        decision = limiter.consume("new", RateLimitType.LOGIN_ATTEMPTS)
+
+        assert not decision.allowed
+        assert decision.retry_after > 0
+        assert self.backend.stats()["rejected"] == 1
+        assert self.backend.stats()["evictions"] == 0
+
+class TestSharedMemoryExpiryBoundary:
+    """No último instante da janela fixa o estado ainda vale"""
+
+    def test_cleanup_keeps_window_until_strictly_expired(self, tmp_path, clock):
+        backend = SharedMemoryBackend(str(tmp_path / "rate_limits"), slots=64, stripes=1)
+        limiter = RateLimiter(backend=backend)
+        try:
+            config = limiter.limits[RateLimitType.LOGIN_ATTEMPTS]
+            for _ in range(config.max_attempts):
+                assert limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS).allowed
+
+            # now - first == window: a verificação ainda não recomeça a janela
+            clock.advance(config.window_seconds)
+            assert backend.cleanup() == 0
+            assert not limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS).allowed
+        finally:
+            limiter._cleanup_active = False
+            backend.close()
+
+class TestBackendEquivalence:
+    """A mesma sequência de operações decide igual nos três backends"""
+
+    def setup_method(self):
+        self.limiters = []
+        self.standin = None
+
+    def teardown_method(self):
+        for limiter in self.limiters:
+            limiter._cleanup_active = False
+            if limiter.backend is not None:
+                limiter.backend.close()
+        if self.standin is not None:
+            self.standin.close()
+
+    def make_limiters(self, tmp_path, clock):
+        memory = RateLimiter()
+        memory._clock = clock
+        shared = RateLimiter(backend=SharedMemoryBackend(str(tmp_path / "rate_limits"), slots=1024, stripes=4))
+        self.standin = LocalRedisStandIn()
+        redis = RateLimiter(backend=RedisBackend(port=self.standin.port, flush_interval=3600))
+        self.limiters = [memory, shared, redis]
+        return self.limiters
+
+    def apply(self, limiter, operation, identifier, limit_type, cost):
+        if operation == "consume":
+            return limiter.consume(identifier, limit_type, cost)
+        if operation == "check":
+            return limiter.check_rate_limit(identifier, limit_type)
+        limiter.record_attempt(identifier, limit_type, success=operation == "success")
+        if limiter.backend is not None:
+            limiter.backend.flush()
+        return None
+
+    def assert_same(self, results, step):
+        expected = results[0]
+        for result in results[1:]:
+            if not hasattr(expected, "allowed"):
+                # record_attempt (None) ou check_rate_limit (permitido, mensagem)
+                assert result == expected, step
+                continue
+            assert result.allowed == expected.allowed, step
+            assert result.remaining == expected.remaining, step
+            assert result.retry_after == pytest.approx(expected.retry_after, abs=1e-3), step
+            assert result.reset_after == pytest.approx(expected.reset_after, abs=1e-3), step
+
+    @pytest.mark.parametrize("limit_type", [
+        RateLimitType.LOGIN_ATTEMPTS,       # janela fixa, bloqueio
+        RateLimitType.FINANCIAL_TRANSACTIONS,
+        RateLimitType.API_REQUESTS          # GCRA
+    ])
+    def test_random_sequence(self, tmp_path, clock, limit_type):
+        limiters = self.make_limiters(tmp_path, clock)
+        config = limiters[0].limits[limit_type]
+        rng = random.Random(f"equivalence-{limit_type.value}")
+        step_max = config.window_seconds / config.max_attempts * 2
+
+        for step in range(600):
+            operation = rng.choice(("consume", "consume", "consume", "check", "success", "failure"))
+            identifier = f"client-{rng.randrange(3)}"
+            cost = rng.choice((1, 1, 1, 2))
+            results = [self.apply(limiter, operation, identifier, limit_type, cost) for limiter in limiters]
+            self.assert_same(results, (step, operation, identifier, cost))
+            clock.advance(rng.uniform(0, step_max) if rng.random() < 0.9 else config.window_seconds)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Políticas de Rate Limiting por Rota
+Recarga a quente: arquivos inválidos são rejeitados na carga, mantendo a tabela atual
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.rate_limit_policies import (
+    CompiledPolicies, RateLimitPolicies, RateLimitPolicy, parse_policy
+)
+from quarentena_duplicidades.workflow_security.rate_limiting import RateLimiter, RateLimitType
+
+VALID_POLICIES = [
+    {"name": "login", "methods": ["POST"], "path": "/api/auth/login", "limit_type": "login_attempts"},
+    {"name": "admin", "pattern": "/api/admin/[a-z]+", "limit_type": "financial_transactions"},
+    {"name": "api", "path": "/api/", "limit_type": "api_requests"}
+]
+
+class TestPolicyReload:
+    """Recarga do arquivo de políticas"""
+
+    def setup_method(self):
+        self.limiter = RateLimiter()
+
+    def teardown_method(self):
+        self.limiter._cleanup_active = False
+
+    def write(self, path, policies):
+        path.write_text(json.dumps({"policies": policies}))
+
+    def load(self, tmp_path, policies):
+        config_file = tmp_path / "policies.json"
+        self.write(config_file, policies)
+        return config_file, RateLimitPolicies(str(config_file), self.limiter, check_interval=0)
+
+    def test_valid_file_is_loaded(self, tmp_path):
+        _, policies = self.load(tmp_path, VALID_POLICIES)
+
+        assert policies.resolve("POST", "/api/auth/login").name == "login"
+        assert policies.resolve("GET", "/api/admin/users").name == "admin"
+        assert policies.resolve("GET", "/api/tasks").name == "api"
+        assert policies.resolve("GET", "/health") is None
+
+    @pytest.mark.parametrize("bad_policies", [
+        # Flags globais no meio da alternância
+        [{"name": "admin", "pattern": "(?i)/api/admin", "limit_type": "api_requests"}],
+        # Mesmo grupo nomeado em duas políticas
+        [
+            {"name": "a", "pattern": "/api/(?P<id>a)", "limit_type": "api_requests"},
+            {"name": "b", "pattern": "/api/(?P<id>b)", "limit_type": "api_requests"}
+        ],
+        # Regex inválida
+        [{"name": "broken", "pattern": "/api/(", "limit_type": "api_requests"}]
+    ])
+    def test_uncombinable_file_keeps_current_table(self, tmp_path, bad_policies):
+        config_file, policies = self.load(tmp_path, VALID_POLICIES)
+        errors = policies.errors
+
+        self.write(config_file, VALID_POLICIES[:1] + bad_policies)
+        decision = policies.resolve("GET", "/api/tasks")
+
+        assert policies.errors == errors + 1
+        assert decision is not None and decision.name == "api"
+        assert len(policies.policies) == len(VALID_POLICIES)
+
+    def test_combinable_named_group_is_accepted(self, tmp_path):
+        _, policies = self.load(tmp_path, [
+            {"name": "task", "pattern": "/api/tasks/(?P<task_id>[0-9]+)", "limit_type": "api_requests"}
+        ])
+
+        assert policies.errors == 0
+        assert policies.resolve("DELETE", "/api/tasks/42").name == "task"
+
+class TestCompiledPolicies:
+    """Tabela compilada"""
+
+    def test_all_tables_compiled_up_front(self):
+        compiled = CompiledPolicies([
+            RateLimitPolicy("bp", RateLimitType.API_REQUESTS, None, "/x", blueprint="admin"),
+            RateLimitPolicy("api", RateLimitType.API_REQUESTS, None, "/")
+        ])
+        tables = compiled.table_count()
+
+        assert compiled.match("GET", "/x", "admin").name == "bp"
+        assert compiled.match("GET", "/x", "other").name == "api"
+        assert compiled.match("BREW", "/x").name == "api"
+        assert compiled.table_count() == tables
+
+    def test_global_flags_rejected_by_parse_policy(self):
+        with pytest.raises(ValueError):
+            parse_policy({"name": "admin", "pattern": "(?i)/api/admin", "limit_type": "api_requests"}, 0)
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Rate Limiting
+Decisões do RateLimiter (janela fixa e GCRA) em memória e nos backends
+compartilhados, comparadas à implementação original e a um GCRA de referência;
+valores da decisão de consume (permitida e recusada); limpeza das entradas
+vencidas pelo heap de expiração
+"""
+
+import os
+import random
+import sys
+import types
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security import rate_limit_backends
+from quarentena_duplicidades.workflow_security.rate_limit_backends import (
+    LocalRedisStandIn, RedisBackend, SharedMemoryBackend
+)
+from quarentena_duplicidades.workflow_security.rate_limiting import (
+    _EXPIRY_BATCH, RateLimitAlgorithm, RateLimiter, RateLimitType
+)
+
+class FakeClock:
+    """Relógio controlado pelo teste"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio falso para o RateLimiter em memória e para os backends"""
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit_backends, "time", types.SimpleNamespace(time=fake, sleep=lambda _: None))
+    return fake
+
+@pytest.fixture(params=["memory", "shared_memory", "redis"])
+def limiter(request, clock, tmp_path):
+    """RateLimiter em cada backend, com o relógio falso"""
+    standin = None
+    if request.param == "memory":
+        backend = None
+    elif request.param == "shared_memory":
+        backend = SharedMemoryBackend(str(tmp_path / "rate_limits"), slots=1024, stripes=4)
+    else:
+        standin = LocalRedisStandIn()
+        backend = RedisBackend(port=standin.port, flush_interval=3600)
+    limiter = RateLimiter(backend=backend)
+    if backend is None:
+        limiter._clock = clock
+    yield limiter
+    # Sem join: a thread de limpeza (daemon) dorme 60 s entre passadas
+    limiter._cleanup_active = False
+    if backend is not None:
+        backend.close()
+    if standin is not None:
+        standin.close()
+
+class TestGcraSustainedOverLimit:
+    """Cliente acima do limite no GCRA continua atendido na vazão configurada"""
+
+    def test_client_over_limit_is_not_locked_out(self, limiter, clock):
+        """2 req/s contra 100/60s: após a rajada, ~1 a cada 0,6 s continua passando"""
+        config = limiter.limits[RateLimitType.API_REQUESTS]
+        assert config.algorithm is RateLimitAlgorithm.GCRA
+        interval = config.window_seconds / config.max_attempts
+
+        allowed_per_minute = []
+        max_retry_after = 0.0
+        for _ in range(15):
+            allowed = 0
+            for _ in range(120):
+                decision = limiter.consume("client", RateLimitType.API_REQUESTS)
+                if decision.allowed:
+                    allowed += 1
+                else:
+                    max_retry_after = max(max_retry_after, decision.retry_after)
+                clock.advance(0.5)
+            allowed_per_minute.append(allowed)
+
+        # Em regime, o limite (100/min) é atendido, não zero
+        assert all(98 <= allowed <= 102 for allowed in allowed_per_minute[-5:])
+        # A espera anunciada nunca passa de um intervalo
+        assert max_retry_after <= interval + 1e-3
+
+    def test_refusal_does_not_move_tat(self, limiter, clock):
+        """Recusas não alteram o estado nem a espera anunciada"""
+        for _ in range(100):
+            assert limiter.consume("client", RateLimitType.API_REQUESTS).allowed
+
+        first = limiter.consume("client", RateLimitType.API_REQUESTS)
+        for _ in range(50):
+            refused = limiter.consume("client", RateLimitType.API_REQUESTS)
+        assert not first.allowed and not refused.allowed
+        assert refused.retry_after == pytest.approx(first.retry_after, abs=1e-3)
+
+        clock.advance(first.retry_after + 1e-3)
+        assert limiter.consume("client", RateLimitType.API_REQUESTS).allowed
+
+    def test_failed_attempts_fill_at_most_one_burst(self, limiter, clock):
+        """record_attempt(success=False) esgota a rajada, mas não além dela"""
+        for _ in range(500):
+            limiter.record_attempt("client", RateLimitType.API_REQUESTS, success=False)
+        if limiter.backend is not None:
+            limiter.backend.flush()
+
+        config = limiter.limits[RateLimitType.API_REQUESTS]
+        clock.advance(config.window_seconds / config.max_attempts + 1e-3)
+        assert limiter.consume("client", RateLimitType.API_REQUESTS).allowed
+
+class TestGcraWeightedRetry:
+    """Retry-After de uma requisição com custo > 1"""
+
+    def test_retry_after_covers_request_cost(self, limiter, clock):
+        """Após a espera anunciada a mesma requisição (custo 5) é aceita, e não antes"""
+        for _ in range(98):
+            assert limiter.consume("client", RateLimitType.API_REQUESTS).allowed
+
+        refused = limiter.consume("client", RateLimitType.API_REQUESTS, cost=5)
+        assert not refused.allowed
+        config = limiter.limits[RateLimitType.API_REQUESTS]
+        assert refused.retry_after == pytest.approx(3 * config.window_seconds / config.max_attempts, abs=1e-3)
+
+        clock.advance(refused.retry_after - 0.01)
+        assert not limiter.consume("client", RateLimitType.API_REQUESTS, cost=5).allowed
+        clock.advance(0.02)
+        assert limiter.consume("client", RateLimitType.API_REQUESTS, cost=5).allowed
+
+class BaselineFixedWindow:
+    """check_rate_limit original (lock global, datetime), com o tempo em float"""
+
+    def __init__(self, config):
+        self.config = config
+        self.entries = {}
+
+    def check(self, identifier: str, now: float):
+        config = self.config
+        entry = self.entries.get(identifier)
+        if entry is None:
+            self.entries[identifier] = {"attempts": 1, "first": now, "blocked_until": None}
+            return True, None
+        if now - entry["first"] > config.window_seconds:
+            entry.update(attempts=1, first=now, blocked_until=None)
+            return True, None
+        if entry["blocked_until"] and now < entry["blocked_until"]:
+            return False, f"Bloqueado por {int(entry['blocked_until'] - now)} segundos"
+        if entry["attempts"] >= config.max_attempts:
+            entry["blocked_until"] = now + config.block_duration_seconds
+            return False, f"Limite excedido. Bloqueado por {config.block_duration_seconds} segundos"
+        entry["attempts"] += 1
+        if entry["attempts"] >= int(config.max_attempts * config.warning_threshold):
+            return True, f"Atenção: {config.max_attempts - entry['attempts']} tentativas restantes"
+        return True, None
+
+class ReferenceGcra:
+    """GCRA de referência: TAT por cliente, recusas não alteram o estado"""
+
+    def __init__(self, config):
+        self.window = config.window_seconds
+        self.interval = config.window_seconds / config.max_attempts
+        self.tats = {}
+
+    def consume(self, identifier: str, now: float, cost: int):
+        tat = max(self.tats.get(identifier, now), now)
+        new_tat = tat + self.interval * cost
+        allowed = new_tat - now <= self.window + 1e-6
+        if allowed:
+            self.tats[identifier] = tat = new_tat
+        remaining = max(0, int((now + self.window - tat) / self.interval + 1e-6))
+        retry_after = 0.0 if allowed else new_tat - self.window - now
+        return allowed, remaining, retry_after, tat - now
+
+class TestBaselineEquivalence:
+    """Decisões iguais às da implementação de referência, em todos os backends"""
+
+    @pytest.mark.parametrize("limit_type", [
+        RateLimitType.LOGIN_ATTEMPTS,
+        RateLimitType.PASSWORD_RESET,
+        RateLimitType.TWO_FACTOR_ATTEMPTS,
+        RateLimitType.FINANCIAL_TRANSACTIONS,
+        RateLimitType.CONSENT_REQUESTS
+    ])
+    def test_fixed_window_matches_original(self, limiter, clock, limit_type):
+        """check_rate_limit decide e responde como o RateLimiter original"""
+        config = limiter.limits[limit_type]
+        assert config.algorithm is RateLimitAlgorithm.FIXED_WINDOW
+        baseline = BaselineFixedWindow(config)
+        rng = random.Random(f"fixed-{limit_type.value}")
+        # Passos em meios segundos: o relógio falso fica exato em float
+        steps = [0, 0, 0.5, 1, 2, config.window_seconds / 4, config.window_seconds, config.block_duration_seconds]
+
+        for step in range(800):
+            identifier = f"client-{rng.randrange(3)}"
+            expected = baseline.check(identifier, clock.now)
+            assert limiter.check_rate_limit(identifier, limit_type) == expected, (step, identifier)
+            clock.advance(rng.choice(steps))
+
+    def test_gcra_remaining_and_retry_match_reference(self, limiter, clock):
+        """consume no GCRA: decisão, restantes, espera e reset iguais aos da referência"""
+        limit_type = RateLimitType.API_REQUESTS
+        config = limiter.limits[limit_type]
+        assert config.algorithm is RateLimitAlgorithm.GCRA
+        reference = ReferenceGcra(config)
+        rng = random.Random("gcra")
+        refused = set()
+
+        for step in range(3000):
+            identifier = f"client-{rng.randrange(3)}"
+            cost = rng.choice((1, 1, 1, 2, 5))
+            allowed, remaining, retry_after, reset_after = reference.consume(identifier, clock.now, cost)
+            decision = limiter.consume(identifier, limit_type, cost)
+            context = (step, identifier, cost)
+            assert decision.allowed == allowed, context
+            assert decision.remaining == remaining, context
+            assert decision.retry_after == pytest.approx(retry_after, abs=1e-3), context
+            assert decision.reset_after == pytest.approx(reset_after, abs=1e-3), context
+            if not allowed:
+                refused.add(cost)
+            clock.advance(rng.choice((0, 0.0625, 0.125, 0.25, 0.5, 1)))
+
+        # A sequência passa do limite com todos os pesos
+        assert refused == {1, 2, 5}
+
+class TestConsumeDecision:
+    """Valores devolvidos por consume, usados nos headers X-RateLimit-* e Retry-After"""
+
+    def test_fixed_window_decisions(self, limiter, clock):
+        """5 tentativas em 300 s, bloqueio de 1800 s, aviso a partir da 4ª"""
+        decisions = [limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS) for _ in range(5)]
+
+        assert [decision.allowed for decision in decisions] == [True] * 5
+        assert [decision.remaining for decision in decisions] == [4, 3, 2, 1, 0]
+        assert {decision.limit for decision in decisions} == {5}
+        assert {decision.retry_after for decision in decisions} == {0.0}
+        assert decisions[0].reset_after == pytest.approx(300)
+        assert decisions[0].message is None
+        assert decisions[3].message == "Atenção: 1 tentativas restantes"
+
+        clock.advance(10)
+        refused = limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS)
+
+        assert not refused.allowed
+        assert refused.remaining == 0
+        assert refused.reset_after == pytest.approx(290)
+        # O fim da janela encerra o bloqueio antes dos 1800 s
+        assert refused.retry_after == pytest.approx(290)
+        assert refused.message == "Limite excedido. Bloqueado por 1800 segundos"
+
+        clock.advance(refused.retry_after + 1)
+        decision = limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS)
+        assert (decision.allowed, decision.remaining) == (True, 4)
+        assert decision.reset_after == pytest.approx(300)
+
+    def test_gcra_decisions(self, limiter, clock):
+        """100 requisições por 60 s: intervalo de 0,6 s"""
+        first = limiter.consume("client", RateLimitType.API_REQUESTS)
+
+        assert (first.allowed, first.limit, first.remaining, first.retry_after) == (True, 100, 99, 0.0)
+        assert first.reset_after == pytest.approx(0.6)
+        for _ in range(99):
+            last = limiter.consume("client", RateLimitType.API_REQUESTS)
+        assert (last.allowed, last.remaining) == (True, 0)
+        assert last.reset_after == pytest.approx(60)
+
+        refused = limiter.consume("client", RateLimitType.API_REQUESTS)
+
+        assert (refused.allowed, refused.remaining) == (False, 0)
+        assert refused.retry_after == pytest.approx(0.6)
+        assert refused.reset_after == pytest.approx(60)
+        assert refused.message == "Limite excedido. Tente novamente em 1 segundos"
+
+@pytest.fixture
+def memory_limiter(clock):
+    """RateLimiter em memória com uma única parte (um só heap de expiração)"""
+    limiter = RateLimiter(stripes=1)
+    limiter._clock = clock
+    yield limiter
+    limiter._cleanup_active = False
+
+class TestExpiryHeap:
+    """Limpeza proporcional às chaves vencidas"""
+
+    def keys(self, limiter: RateLimiter) -> set:
+        return set(limiter._stripes[0].entries)
+
+    def deadlines(self, limiter: RateLimiter) -> dict:
+        return {key: deadline for deadline, key in limiter._stripes[0].expiry}
+
+    def test_drops_only_due_keys(self, memory_limiter, clock):
+        start = clock.now
+        memory_limiter.consume("old", RateLimitType.LOGIN_ATTEMPTS)
+        memory_limiter.consume("old", RateLimitType.API_REQUESTS)
+        clock.advance(200)
+        memory_limiter.consume("new", RateLimitType.LOGIN_ATTEMPTS)
+        clock.advance(90)
+        # Rajada inteira: TAT 60 s à frente
+        for _ in range(100):
+            memory_limiter.consume("new", RateLimitType.API_REQUESTS)
+        clock.advance(11)
+
+        memory_limiter._cleanup_expired_entries()
+
+        assert self.keys(memory_limiter) == {("login_attempts", "new"), ("api_requests", "new")}
+        assert self.deadlines(memory_limiter) == {
+            ("login_attempts", "new"): start + 200 + 300,
+            # Prazo inicial (primeiro TAT) vencido, mas o TAT avançou: item reinserido
+            ("api_requests", "new"): pytest.approx(start + 290 + 60)
+        }
+
+    def test_moved_deadline_is_pushed_again(self, memory_limiter, clock):
+        start = clock.now
+        memory_limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS)
+        clock.advance(301)
+        # Nova janela: o item do heap ainda tem o prazo da primeira
+        memory_limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS)
+        assert self.deadlines(memory_limiter) == {("login_attempts", "client"): start + 300}
+
+        memory_limiter._cleanup_expired_entries()
+
+        assert self.keys(memory_limiter) == {("login_attempts", "client")}
+        assert self.deadlines(memory_limiter) == {("login_attempts", "client"): start + 301 + 300}
+        clock.advance(301)
+        memory_limiter._cleanup_expired_entries()
+        assert self.keys(memory_limiter) == set()
+        assert memory_limiter._stripes[0].expiry == []
+
+    def test_gcra_tat_moved_forward(self, memory_limiter, clock):
+        for _ in range(50):
+            memory_limiter.consume("client", RateLimitType.API_REQUESTS)
+        tat = memory_limiter._stripes[0].entries[("api_requests", "client")]
+        assert len(memory_limiter._stripes[0].expiry) == 1
+        clock.advance(1)
+
+        memory_limiter._cleanup_expired_entries()
+
+        assert self.deadlines(memory_limiter) == {("api_requests", "client"): tat}
+        clock.advance(tat - clock.now + 1e-3)
+        memory_limiter._cleanup_expired_entries()
+        assert self.keys(memory_limiter) == set()
+
+    def test_stale_items_discarded(self, memory_limiter, clock):
+        memory_limiter.consume("client", RateLimitType.LOGIN_ATTEMPTS)
+        memory_limiter.reset_limits("client")
+        clock.advance(301)
+
+        memory_limiter._cleanup_expired_entries()
+
+        assert memory_limiter._stripes[0].expiry == []
+
+    def test_more_than_one_batch(self, memory_limiter, clock):
+        for number in range(_EXPIRY_BATCH * 2 + 10):
+            memory_limiter.consume(f"client-{number}", RateLimitType.LOGIN_ATTEMPTS)
+        memory_limiter.consume("late", RateLimitType.LOGIN_ATTEMPTS)
+        clock.advance(301)
+        memory_limiter.consume("fresh", RateLimitType.LOGIN_ATTEMPTS)
+
+        memory_limiter._cleanup_expired_entries()
+
+        assert self.keys(memory_limiter) == {("login_attempts", "fresh")}
+        assert len(memory_limiter._stripes[0].expiry) == 1
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Middleware de Rate Limiting
+Headers X-RateLimit-* em respostas permitidas e Retry-After nas recusadas
+(429), pelo decorator e pelo middleware global, sem alterar o corpo da
+resposta da rota
+"""
+
+import math
+import os
+import sys
+import time
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security import rate_limiting_middleware
+from quarentena_duplicidades.workflow_security.rate_limit_policies import RateLimitPolicies
+from quarentena_duplicidades.workflow_security.rate_limiting import RateLimiter
+
+class FakeClock:
+    """Relógio controlado pelo teste"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """RateLimiter em memória, com relógio parado, usado pelo middleware"""
+    limiter = RateLimiter()
+    limiter._clock = FakeClock()
+    monkeypatch.setattr(rate_limiting_middleware, "rate_limiter", limiter)
+    yield limiter
+    limiter._cleanup_active = False
+
+@pytest.fixture
+def app(limiter, tmp_path):
+    app = flask.Flask(__name__)
+
+    # Fora de /api/: só o decorator aplica o limite
+    @app.route("/login", methods=["POST"])
+    @rate_limiting_middleware.login_rate_limit
+    def login():
+        return flask.jsonify({"ok": True})
+
+    @app.route("/api/tasks")
+    def tasks():
+        return flask.jsonify([1, 2, 3])
+
+    @app.route("/health")
+    def health():
+        return "ok"
+
+    # Sem arquivo de políticas: DEFAULT_POLICIES (/api/ -> API_REQUESTS)
+    policies = RateLimitPolicies(str(tmp_path / "policies.json"), limiter)
+    rate_limiting_middleware.setup_rate_limiting_middleware(app, policies)
+    return app
+
+def assert_reset_header(response, seconds: float):
+    reset = int(response.headers["X-RateLimit-Reset"])
+    assert math.ceil(time.time() + seconds) - 1 <= reset <= math.ceil(time.time() + seconds)
+
+class TestDecoratorHeaders:
+    """Rota com login_rate_limit (5 tentativas em 300 s)"""
+
+    def test_allowed_responses(self, app):
+        client = app.test_client()
+
+        responses = [client.post("/login") for _ in range(5)]
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert [response.headers["X-RateLimit-Remaining"] for response in responses] == ["4", "3", "2", "1", "0"]
+        assert {response.headers["X-RateLimit-Limit"] for response in responses} == {"5"}
+        assert all("Retry-After" not in response.headers for response in responses)
+        assert responses[0].get_json() == {"ok": True}
+        assert_reset_header(responses[0], 300)
+
+    def test_refused_response(self, app):
+        client = app.test_client()
+        for _ in range(5):
+            client.post("/login")
+
+        response = client.post("/login")
+
+        assert response.status_code == 429
+        assert response.headers["X-RateLimit-Limit"] == "5"
+        assert response.headers["X-RateLimit-Remaining"] == "0"
+        assert response.headers["Retry-After"] == "300"
+        assert_reset_header(response, 300)
+        body = response.get_json()
+        assert body["retry_after"] == 300
+        assert body["message"] == "Limite excedido. Bloqueado por 1800 segundos"
+
+class TestGlobalMiddlewareHeaders:
+    """Rotas cobertas pelas políticas padrão (100 requisições por 60 s, GCRA)"""
+
+    def test_allowed_and_refused(self, app):
+        client = app.test_client()
+
+        allowed = [client.get("/api/tasks") for _ in range(100)]
+        refused = client.get("/api/tasks")
+
+        assert {response.status_code for response in allowed} == {200}
+        assert allowed[0].headers["X-RateLimit-Limit"] == "100"
+        assert allowed[0].headers["X-RateLimit-Remaining"] == "99"
+        assert allowed[-1].headers["X-RateLimit-Remaining"] == "0"
+        assert "Retry-After" not in allowed[-1].headers
+        assert allowed[-1].get_json() == [1, 2, 3]
+        assert_reset_header(allowed[-1], 60)
+
+        assert refused.status_code == 429
+        assert refused.headers["X-RateLimit-Remaining"] == "0"
+        assert refused.headers["Retry-After"] == "1"
+        assert refused.get_json()["retry_after"] == 1
+
+    def test_route_without_policy_has_no_headers(self, app):
+        response = app.test_client().get("/health")
+
+        assert response.status_code == 200
+        assert "X-RateLimit-Limit" not in response.headers
+        assert "Retry-After" not in response.headers
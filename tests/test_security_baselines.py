@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Baselines de Atividade
+Reconstrução a partir do histórico (pura e vetorizada) comparada à
+atualização em streaming, inclusive com usuários inativos por mais de
+MAX_IDLE_HOURS horas
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.security_baselines import (
+    MAX_IDLE_HOURS, ActivityBaselines, np
+)
+
+START = 1_700_000_000.0
+
+def gapped_history(seed: str, users: int = 4):
+    """Eventos (usuário, timestamp, valor) com rajadas separadas por lacunas curtas e longas"""
+    rng = random.Random(seed)
+    events = []
+    for index in range(users):
+        now = START + rng.uniform(0, 3600)
+        for _ in range(rng.randint(5, 15)):
+            for _ in range(rng.randint(1, 30)):
+                now += rng.uniform(0, 900)
+                amount = round(rng.lognormvariate(4, 1.5), 2) if rng.random() < 0.3 else None
+                events.append((f"user-{index}", now, amount))
+            # Lacunas menores e maiores que MAX_IDLE_HOURS
+            now += 3600 * rng.choice((0, 1, 5, 30, MAX_IDLE_HOURS - 1, MAX_IDLE_HOURS + 1, 400, 2000))
+    events.sort(key=lambda event: event[1])
+    return events
+
+def streamed(events) -> ActivityBaselines:
+    baselines = ActivityBaselines()
+    for key, timestamp, amount in events:
+        if amount is None:
+            baselines.observe_access(key, timestamp)
+        else:
+            baselines.observe_amount(key, amount, timestamp)
+    return baselines
+
+def assert_same_state(expected: ActivityBaselines, actual: ActivityBaselines):
+    assert set(actual._users) == set(expected._users)
+    for key, baseline in expected._users.items():
+        other = actual._users[key]
+        assert other.access_slot == baseline.access_slot, key
+        assert other.access_current == baseline.access_current, key
+        assert other.access_hours_observed == baseline.access_hours_observed, key
+        assert other.access_mean == pytest.approx(baseline.access_mean, rel=1e-9, abs=1e-12), key
+        assert other.access_var == pytest.approx(baseline.access_var, rel=1e-9, abs=1e-12), key
+        assert list(other.access_hours.counts) == pytest.approx(list(baseline.access_hours.counts)), key
+        assert other.amount_samples == baseline.amount_samples, key
+        if baseline.amount_samples:
+            assert other.amount_mean == pytest.approx(baseline.amount_mean, rel=1e-9), key
+            assert other.amount_var == pytest.approx(baseline.amount_var, rel=1e-9, abs=1e-12), key
+            assert list(other.amount_sketch.counts) == list(baseline.amount_sketch.counts), key
+            assert other.amount_sketch.total == baseline.amount_sketch.total, key
+            assert list(other.payment_hours.counts) == pytest.approx(list(baseline.payment_hours.counts)), key
+
+class TestBackfillMatchesStreaming:
+    """Backfill e streaming chegam ao mesmo estado"""
+
+    @pytest.mark.parametrize("use_numpy", [
+        False,
+        pytest.param(True, marks=pytest.mark.skipif(np is None, reason="NumPy não instalado"))
+    ])
+    @pytest.mark.parametrize("seed", ["gaps-1", "gaps-2", "gaps-3"])
+    def test_gapped_history(self, seed, use_numpy):
+        events = gapped_history(seed)
+        backfilled = ActivityBaselines()
+
+        result = backfilled.backfill(events, use_numpy=use_numpy)
+
+        assert result["vectorized"] == use_numpy
+        assert_same_state(streamed(events), backfilled)
+
+    @pytest.mark.parametrize("use_numpy", [
+        False,
+        pytest.param(True, marks=pytest.mark.skipif(np is None, reason="NumPy não instalado"))
+    ])
+    def test_idle_gap_is_capped(self, use_numpy):
+        """Uma lacuna de 1000 horas conta como MAX_IDLE_HOURS horas vazias"""
+        events = [("u1", START, None), ("u1", START + 3600 * 1000, None)]
+        backfilled = ActivityBaselines()
+
+        backfilled.backfill(events, use_numpy=use_numpy)
+
+        assert backfilled._users["u1"].access_hours_observed == 1 + MAX_IDLE_HOURS
+        assert_same_state(streamed(events), backfilled)
+
+    def test_continues_streaming_after_backfill(self):
+        events = gapped_history("continue", users=2)
+        history, recent = events[:len(events) // 2], events[len(events) // 2:]
+        backfilled = ActivityBaselines()
+        backfilled.backfill(history, use_numpy=False)
+
+        for key, timestamp, amount in recent:
+            if amount is None:
+                backfilled.observe_access(key, timestamp)
+            else:
+                backfilled.observe_amount(key, amount, timestamp)
+
+        assert_same_state(streamed(events), backfilled)
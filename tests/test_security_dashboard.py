@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Snapshots do Dashboard de Segurança
+Alertas gravados por outro processo entram nos snapshots de forma incremental:
+só os arquivos novos ou alterados são lidos, sem varredura completa
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.security_dashboard import AlertSnapshotStore
+
+DAY_START = datetime(2024, 3, 10)
+DAY_END = datetime(2024, 3, 10, 23, 59, 59)
+
+class AlertWriter:
+    """Grava arquivos de alerta como outro processo, com mtimes distintos a cada gravação"""
+
+    def __init__(self, alerts_path: str):
+        self.alerts_path = alerts_path
+        self.mtime_ns = 1_700_000_000_000_000_000
+        os.makedirs(alerts_path, exist_ok=True)
+
+    def _touch(self, path: str):
+        self.mtime_ns += 1_000_000
+        os.utime(path, ns=(self.mtime_ns, self.mtime_ns))
+        os.utime(self.alerts_path, ns=(self.mtime_ns, self.mtime_ns))
+
+    def write(self, alert_id: str, level: str = "high", resolved: bool = False,
+              timestamp: str = "2024-03-10T12:00:00") -> dict:
+        alert = {"alert_id": alert_id, "level": level, "resolved": resolved, "timestamp": timestamp}
+        path = os.path.join(self.alerts_path, f"{alert_id}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(alert, f)
+        self._touch(path)
+        return alert
+
+    def delete(self, alert_id: str):
+        os.remove(os.path.join(self.alerts_path, f"{alert_id}.json"))
+        self.mtime_ns += 1_000_000
+        os.utime(self.alerts_path, ns=(self.mtime_ns, self.mtime_ns))
+
+class TestIncrementalRefresh:
+    """Mudanças externas aplicadas arquivo a arquivo"""
+
+    def make_store(self, tmp_path) -> AlertSnapshotStore:
+        return AlertSnapshotStore(str(tmp_path / "alerts"), str(tmp_path / "dashboard"), rescan_interval=0)
+
+    def test_external_alerts_loaded_without_rescan(self, tmp_path):
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        for index in range(20):
+            writer.write(f"a{index}")
+        store = self.make_store(tmp_path)
+        assert store.counts_between(DAY_START, DAY_END)["total"] == 20
+        assert store.rescans == 1
+        loaded = store.files_loaded
+
+        writer.write("new", level="critical")
+        counts = store.counts_between(DAY_START, DAY_END)
+
+        assert counts["total"] == 21
+        assert counts["critical"] == 1
+        assert store.rescans == 1
+        assert store.files_loaded == loaded + 1
+
+    def test_rewritten_and_removed_alerts(self, tmp_path):
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        writer.write("a1")
+        writer.write("a2", level="low")
+        store = self.make_store(tmp_path)
+        store.counts_between(DAY_START, DAY_END)
+
+        writer.write("a1", resolved=True)
+        writer.delete("a2")
+        writer.write("a3", timestamp="2024-03-11T08:00:00")
+        counts = store.counts_between(DAY_START, DAY_END)
+
+        assert counts["total"] == 1
+        assert counts["resolved"] == 1
+        assert counts["low"] == 0
+        assert [alert["alert_id"] for alert in store.alerts_between(DAY_START, datetime(2024, 3, 12))] == ["a1", "a3"]
+        assert store.rescans == 1
+
+    def test_alert_moved_to_another_day(self, tmp_path):
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        writer.write("a1")
+        store = self.make_store(tmp_path)
+        store.counts_between(DAY_START, DAY_END)
+
+        writer.write("a1", timestamp="2024-03-11T08:00:00")
+
+        assert store.counts_between(DAY_START, DAY_END)["total"] == 0
+        assert store.counts_between(datetime(2024, 3, 11), datetime(2024, 3, 11, 23, 59, 59))["total"] == 1
+
+    def test_own_upsert_is_not_read_again(self, tmp_path):
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        store = self.make_store(tmp_path)
+        store.counts_between(DAY_START, DAY_END)
+        loaded = store.files_loaded
+
+        store.upsert(writer.write("own"))
+
+        assert store.counts_between(DAY_START, DAY_END)["total"] == 1
+        assert store.files_loaded == loaded
+
+    def test_persisted_snapshots_catch_up_incrementally(self, tmp_path):
+        """Outro worker parte dos snapshots persistidos e lê só o que veio depois"""
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        for index in range(10):
+            writer.write(f"a{index}")
+        first = self.make_store(tmp_path)
+        first.counts_between(DAY_START, DAY_END)
+        first.flush()
+
+        writer.write("late", level="medium")
+        writer.delete("a0")
+        second = self.make_store(tmp_path)
+        counts = second.counts_between(DAY_START, DAY_END)
+
+        assert counts["total"] == 10
+        assert counts["medium"] == 1
+        assert second.rescans == 0
+        assert second.files_loaded == 1
+
+    def test_invalid_persisted_snapshots_rebuilt(self, tmp_path):
+        writer = AlertWriter(str(tmp_path / "alerts"))
+        writer.write("a1")
+        first = self.make_store(tmp_path)
+        first.counts_between(DAY_START, DAY_END)
+        first.flush()
+        with open(tmp_path / "dashboard" / "20240310.json", 'w', encoding='utf-8') as f:
+            f.write("{")
+
+        second = self.make_store(tmp_path)
+
+        assert second.counts_between(DAY_START, DAY_END)["total"] == 1
+        assert second.rescans == 1
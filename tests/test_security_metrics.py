@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Agregador de Métricas de Segurança
+Totais e séries por minuto, hora e dia comparados à soma direta das
+amostras; rollups de vários escritores combinados na leitura; compactação
+conforme a retenção de cada camada
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.security_metrics import (
+    MERGED_WRITER, MetricAggregator, MetricResolution
+)
+
+START = datetime(2024, 2, 10)
+
+def epoch(timestamp: datetime) -> float:
+    return (timestamp - datetime(1970, 1, 1)).total_seconds()
+
+def random_samples(seed: str, count: int, days: int = 3) -> list:
+    """Amostras (métrica, valor, timestamp) espalhadas por alguns dias"""
+    rng = random.Random(seed)
+    return [
+        (rng.choice(("http_requests", "login_failures")), float(rng.choice((1, 3, 40, 700, 20000))),
+         epoch(START) + rng.uniform(0, days * 86400))
+        for _ in range(count)
+    ]
+
+def expected_totals(samples, start: datetime, end: datetime) -> dict:
+    """Soma direta das amostras cujo minuto começa no período"""
+    totals = {}
+    for metric_name, value, timestamp in samples:
+        minute = datetime(1970, 1, 1) + timedelta(minutes=timestamp // 60)
+        if start <= minute <= end:
+            total = totals.setdefault(metric_name, {"count": 0, "sum": 0.0, "min": value, "max": value})
+            total["count"] += 1
+            total["sum"] += value
+            total["min"] = min(total["min"], value)
+            total["max"] = max(total["max"], value)
+    return totals
+
+def summarize(totals: dict) -> dict:
+    return {
+        metric_name: {"count": bucket["count"], "sum": pytest.approx(bucket["sum"]),
+                      "min": bucket["min"], "max": bucket["max"]}
+        for metric_name, bucket in totals.items()
+    }
+
+class TestTotalsAndSeries:
+    """Leitura combinando as camadas"""
+
+    def test_totals_match_direct_sum(self, tmp_path):
+        samples = random_samples("totals", 5000)
+        aggregator = MetricAggregator(str(tmp_path / "rollups"))
+        aggregator.record_many(samples)
+        rng = random.Random("ranges")
+
+        ranges = [
+            (START, START + timedelta(days=3)),
+            (START + timedelta(days=1), START + timedelta(days=2) - timedelta(minutes=1))
+        ]
+        for _ in range(20):
+            start = START + timedelta(minutes=rng.randrange(3 * 1440))
+            ranges.append((start, start + timedelta(minutes=rng.randrange(2 * 1440))))
+
+        for start, end in ranges:
+            assert summarize(aggregator.totals(start, end)) == summarize(expected_totals(samples, start, end)), (start, end)
+
+    @pytest.mark.parametrize("resolution, step", [
+        (MetricResolution.MINUTE, timedelta(minutes=1)),
+        (MetricResolution.HOUR, timedelta(hours=1)),
+        (MetricResolution.DAY, timedelta(days=1))
+    ])
+    def test_series_points(self, tmp_path, resolution, step):
+        samples = random_samples(f"series-{resolution.value}", 2000)
+        aggregator = MetricAggregator(str(tmp_path / "rollups"))
+        aggregator.record_many(samples)
+
+        points = aggregator.series(START, START + timedelta(days=3), resolution, ["http_requests"])
+
+        expected = {}
+        for metric_name, value, timestamp in samples:
+            if metric_name == "http_requests":
+                offset = datetime(1970, 1, 1) + timedelta(seconds=timestamp) - START
+                point = START + step * (offset // step)
+                expected[point.isoformat()] = expected.get(point.isoformat(), 0) + 1
+        assert {point["timestamp"]: point["count"] for point in points} == expected
+        assert [point["timestamp"] for point in points] == sorted(expected)
+
+class TestWriters:
+    """Um arquivo por dia e por escritor, combinados na leitura"""
+
+    def test_flushed_writers_combined(self, tmp_path):
+        rollups_path = str(tmp_path / "rollups")
+        samples = random_samples("writers", 3000)
+        writers = [MetricAggregator(rollups_path) for _ in range(3)]
+        for number, writer in enumerate(writers):
+            writer.record_many(samples[number::3])
+        assert writers[0].flush() == 3
+        assert writers[1].flush() == 3
+
+        reader = writers[2]
+        end = START + timedelta(days=3)
+
+        # O escritor lê os próprios dados ainda não gravados da memória
+        assert summarize(reader.totals(START, end)) == summarize(expected_totals(samples, START, end))
+        assert len(os.listdir(rollups_path)) == 6
+
+    def test_released_day_resumes_from_own_file(self, tmp_path):
+        aggregator = MetricAggregator(str(tmp_path / "rollups"))
+        aggregator.record("http_requests", 1.0, epoch(START) + 60)
+        aggregator.record("http_requests", 1.0, epoch(START + timedelta(days=1)))
+        aggregator.flush()
+        assert "20240210" not in aggregator._days
+
+        aggregator.record("http_requests", 2.0, epoch(START) + 120)
+        aggregator.flush()
+
+        totals = MetricAggregator(str(tmp_path / "rollups")).totals(START, START + timedelta(hours=23, minutes=59))
+        assert totals["http_requests"]["count"] == 2
+        assert totals["http_requests"]["sum"] == 3.0
+
+class TestCompaction:
+    """Camadas mais finas descartadas conforme a idade do dia"""
+
+    def test_retention_tiers(self, tmp_path):
+        rollups_path = str(tmp_path / "rollups")
+        samples = random_samples("compact", 4000, days=4)
+        writers = [MetricAggregator(rollups_path, minute_retention_days=2, hour_retention_days=3,
+                                    day_retention_days=4) for _ in range(2)]
+        for number, writer in enumerate(writers):
+            writer.record_many(samples[number::2])
+            writer.flush()
+            writer._days.clear()
+        now = START + timedelta(days=5, hours=12)
+
+        summary = writers[0].compact(now)
+
+        # 10/02 removido; 11/02 só com o total diário; 12/02 sem minutos; 13/02 intocado
+        assert summary == {"compacted_days": 2, "removed_days": 1}
+        files = sorted(os.listdir(rollups_path))
+        assert [name for name in files if name.startswith("20240210")] == []
+        assert [name for name in files if name.startswith(("20240211", "20240212"))] == [
+            f"20240211.{MERGED_WRITER}.json", f"20240212.{MERGED_WRITER}.json"
+        ]
+        assert len([name for name in files if name.startswith("20240213")]) == 2
+        assert writers[0].compact(now) == {"compacted_days": 0, "removed_days": 0}
+
+        reader = MetricAggregator(rollups_path)
+        for day in (1, 2, 3):
+            start, end = START + timedelta(days=day), START + timedelta(days=day + 1) - timedelta(minutes=1)
+            assert summarize(reader.totals(start, end)) == summarize(expected_totals(samples, start, end)), day
+        day_two = START + timedelta(days=2)
+        assert reader.series(day_two, day_two + timedelta(hours=1), MetricResolution.MINUTE) == []
+        assert reader.series(START + timedelta(days=1), day_two - timedelta(minutes=1), MetricResolution.HOUR) == []
+        assert len(reader.series(day_two, day_two + timedelta(hours=23), MetricResolution.HOUR)) == 48
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Monitoramento de Segurança
+Ingestão de requisições fora do caminho da requisição (exclusão,
+amostragem, fila cheia e lotes); cada requisição autenticada entra no
+baseline de acessos do usuário, independentemente do tamanho do lote;
+alertas agrupados gravados fora do lock de deduplicação, despacho
+assíncrono e handlers com timeout e novas tentativas
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.security_monitoring import (
+    AlertLevel, AlertType, RequestRecord, SecurityAlert, SecurityMonitoring
+)
+
+@pytest.fixture
+def monitoring(tmp_path, monkeypatch):
+    """Monitoramento sem o loop periódico (que dorme 10 s entre verificações)"""
+    monkeypatch.setattr(SecurityMonitoring, "_start_monitoring_thread", lambda self: None)
+    monitor = SecurityMonitoring(str(tmp_path / "security"))
+    yield monitor
+    monitor.stop_monitoring()
+
+@pytest.fixture
+def idle_monitoring(tmp_path, monkeypatch):
+    """Monitoramento cujos workers de ingestão não consomem a fila"""
+    storage_path = tmp_path / "security"
+    storage_path.mkdir()
+    with open(storage_path / "monitoring_config.json", 'w', encoding='utf-8') as f:
+        json.dump({"ingest_queue_capacity": 500, "ingest_batch_size": 200}, f)
+    run_ingest_loop = SecurityMonitoring._ingest_loop
+    monkeypatch.setattr(SecurityMonitoring, "_start_monitoring_thread", lambda self: None)
+    monkeypatch.setattr(SecurityMonitoring, "_ingest_loop", lambda self: None)
+    monitor = SecurityMonitoring(str(storage_path))
+    monitor.run_ingest_loop = lambda: run_ingest_loop(monitor)
+    yield monitor
+    monitor.stop_monitoring()
+
+class TestRequestIngest:
+    """Enfileiramento sem bloquear a requisição"""
+
+    def test_excluded_paths_are_not_enqueued(self, idle_monitoring):
+        assert idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/health")
+        assert idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/static/app.js")
+        assert idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/api/tasks")
+
+        stats = idle_monitoring.get_ingest_stats()
+        assert stats["excluded"] == 2
+        assert stats["enqueued"] == 1
+        assert stats["queue_depth"] == 1
+
+    def test_sampled_requests_carry_weight(self, idle_monitoring, monkeypatch):
+        idle_monitoring.config["path_sample_rates"] = {"/api/": 0.25, "/api/bulk": 0.0}
+        idle_monitoring._compile_ingest_rules()
+        monkeypatch.setattr(
+            "quarentena_duplicidades.workflow_security.security_monitoring.random.random", lambda: 0.1
+        )
+
+        idle_monitoring.monitor_request("10.0.0.1", "pytest", "POST", "/api/bulk/import")
+        idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/api/tasks")
+        idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/login")
+
+        assert idle_monitoring.get_ingest_stats()["sampled_out"] == 1
+        records = [idle_monitoring.request_queue.get_nowait() for _ in range(2)]
+        assert [(record.path, record.weight) for record in records] == [("/api/tasks", 4.0), ("/login", 1.0)]
+
+    def test_full_queue_drops_without_blocking(self, idle_monitoring):
+        results = [idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/api/tasks") for _ in range(503)]
+
+        assert results.count(False) == 3
+        stats = idle_monitoring.get_ingest_stats()
+        assert stats["enqueued"] == 500
+        assert stats["dropped"] == 3
+        assert stats["queue_depth"] == 500
+
+    def test_worker_processes_in_batches(self, idle_monitoring):
+        for number in range(450):
+            idle_monitoring.monitor_request(f"10.0.0.{number % 7}", "pytest", "GET", "/api/tasks", "u1")
+        idle_monitoring.ingest_active = False
+
+        idle_monitoring.run_ingest_loop()
+
+        stats = idle_monitoring.get_ingest_stats()
+        assert stats["processed"] == 450
+        assert stats["batches"] == 3
+        assert stats["queue_depth"] == 0
+        assert idle_monitoring.ip_activity.count("10.0.0.0") == 65
+
+    def test_synchronous_mode_processes_inline(self, idle_monitoring):
+        idle_monitoring.config["async_request_monitoring"] = False
+
+        assert idle_monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/api/tasks", "u1")
+
+        stats = idle_monitoring.get_ingest_stats()
+        assert stats["processed"] == 1
+        assert stats["queue_depth"] == 0
+
+class TestRequestBatchAccessBaseline:
+    """Acessos por requisição, com timestamp e peso de cada registro"""
+
+    def access_count(self, monitor: SecurityMonitoring, user_id: str) -> float:
+        return monitor.activity_baselines._users[user_id].access_current
+
+    def test_batch_counts_every_request(self, monitoring):
+        now = time.time()
+        records = [
+            RequestRecord(timestamp=now, ip_address="10.0.0.1", method="GET", path="/api/tasks", user_id="u1")
+            for _ in range(300)
+        ]
+
+        monitoring._process_request_batch(records)
+
+        assert self.access_count(monitoring, "u1") == 300
+
+    def test_batch_uses_record_weight_and_timestamp(self, monitoring):
+        hour = (int(time.time()) // 3600 - 2) * 3600
+        records = [
+            RequestRecord(timestamp=hour + 10, ip_address="10.0.0.1", method="GET", path="/api/a", user_id="u1"),
+            RequestRecord(timestamp=hour + 20, ip_address="10.0.0.1", method="POST", path="/api/b", user_id="u1",
+                          weight=4.0),
+            RequestRecord(timestamp=hour + 3600 + 5, ip_address="10.0.0.2", method="GET", path="/api/a",
+                          user_id="u1", weight=2.0)
+        ]
+
+        monitoring._process_request_batch(records)
+
+        baseline = monitoring.activity_baselines._users["u1"]
+        assert baseline.access_slot == hour // 3600 + 1
+        assert baseline.access_current == 2.0
+        assert baseline.access_hours_observed == 1
+        assert baseline.access_mean == 5.0
+
+    def test_queued_requests_all_counted(self, monitoring):
+        for _ in range(250):
+            assert monitoring.monitor_request("10.0.0.1", "pytest", "GET", "/api/tasks", "u1")
+
+        monitoring.stop_monitoring()
+
+        assert monitoring.get_ingest_stats()["processed"] == 250
+        assert self.access_count(monitoring, "u1") == 250
+
+class TestAlertDedupeEviction:
+    """Alertas despejados da tabela de deduplicação"""
+
+    def make_alert(self, monitor: SecurityMonitoring, user_id: str) -> SecurityAlert:
+        return SecurityAlert(
+            alert_id=monitor._new_alert_id("test"), alert_type=AlertType.SYSTEM_ANOMALY, level=AlertLevel.LOW,
+            user_id=user_id, ip_address=None, description="teste", timestamp=datetime.utcnow()
+        )
+
+    def test_evicted_occurrences_written_outside_lock(self, monitoring, monkeypatch):
+        monitoring.config["alert_dedupe_max_entries"] = 1
+        save_alert = monitoring._save_alert
+        lock_free_saves = []
+
+        def recording_save(alert):
+            # Com o lock mantido pela própria thread, a aquisição esgota o tempo
+            acquired = monitoring._alert_lock.acquire(timeout=1)
+            if acquired:
+                monitoring._alert_lock.release()
+            lock_free_saves.append(acquired)
+            save_alert(alert)
+
+        monkeypatch.setattr(monitoring, "_save_alert", recording_save)
+        first = self.make_alert(monitoring, "u1")
+        monitoring._create_alert(first)
+        monitoring._create_alert(self.make_alert(monitoring, "u1"))
+        monitoring._create_alert(self.make_alert(monitoring, "u2"))
+
+        assert lock_free_saves == [True, True, True]
+        with open(os.path.join(monitoring.storage_path, "alerts", f"{first.alert_id}.json"), encoding='utf-8') as f:
+            assert json.load(f)["details"]["occurrences"] == 2
+        stats = monitoring.get_alert_stats()
+        assert stats["created"] == 2
+        assert stats["coalesced"] == 1
+        assert stats["open_fingerprints"] == 1
+
+class TestAlertPipeline:
+    """Agrupamento de repetições e execução dos handlers"""
+
+    def make_alert(self, monitor: SecurityMonitoring, user_id: str = "u1") -> SecurityAlert:
+        return SecurityAlert(
+            alert_id=monitor._new_alert_id("test"), alert_type=AlertType.SYSTEM_ANOMALY, level=AlertLevel.LOW,
+            user_id=user_id, ip_address="10.0.0.1", description="teste", timestamp=datetime.utcnow()
+        )
+
+    def read_alert(self, monitor: SecurityMonitoring, alert: SecurityAlert) -> dict:
+        with open(os.path.join(monitor.storage_path, "alerts", f"{alert.alert_id}.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_coalesced_occurrences_flushed(self, monitoring):
+        first = self.make_alert(monitoring)
+        monitoring._create_alert(first)
+        for _ in range(3):
+            monitoring._create_alert(self.make_alert(monitoring))
+        assert self.read_alert(monitoring, first)["details"]["occurrences"] == 1
+
+        monitoring._flush_coalesced_alerts()
+
+        details = self.read_alert(monitoring, first)["details"]
+        assert details["occurrences"] == 4
+        assert "last_seen" in details
+        stats = monitoring.get_alert_stats()
+        assert stats["created"] == 1
+        assert stats["coalesced"] == 3
+
+    def test_expired_window_opens_new_alert(self, monitoring):
+        monitoring.config["alert_dedupe_window_seconds"] = 0
+        monitoring._create_alert(self.make_alert(monitoring))
+
+        monitoring._flush_coalesced_alerts()
+        monitoring._create_alert(self.make_alert(monitoring))
+
+        stats = monitoring.get_alert_stats()
+        assert stats["created"] == 2
+        assert stats["coalesced"] == 0
+
+    def test_handlers_run_asynchronously(self, monitoring):
+        received = []
+        monitoring.add_alert_handler(lambda alert: received.append(alert.alert_id))
+        alert = self.make_alert(monitoring)
+
+        monitoring._create_alert(alert)
+        monitoring.stop_monitoring()
+
+        assert received == [alert.alert_id]
+        assert monitoring.get_alert_stats()["dispatched"] == 1
+
+    def test_failing_handler_retried(self, monitoring):
+        monitoring.config["alert_handler_retry_backoff_ms"] = 0
+        calls = []
+
+        def flaky(alert):
+            calls.append(alert.alert_id)
+            if len(calls) < 3:
+                raise RuntimeError("indisponível")
+
+        assert monitoring._run_alert_handler(flaky, self.make_alert(monitoring))
+        assert len(calls) == 3
+        assert not monitoring._run_alert_handler(lambda alert: 1 / 0, self.make_alert(monitoring))
+
+        stats = monitoring.get_alert_stats()
+        assert stats["handler_failures"] == 2 + 3
+        assert stats["handler_retries"] == 2 + 2
+
+    def test_timed_out_handler_not_retried(self, monitoring):
+        monitoring.config["alert_handler_timeout_seconds"] = 0.1
+        calls = []
+
+        def stuck(alert):
+            calls.append(alert.alert_id)
+            time.sleep(0.5)
+
+        started = time.monotonic()
+        assert not monitoring._run_alert_handler(stuck, self.make_alert(monitoring))
+
+        assert time.monotonic() - started < 0.4
+        assert len(calls) == 1
+        stats = monitoring.get_alert_stats()
+        assert stats["handler_timeouts"] == 1
+        assert stats["handler_retries"] == 0
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Rastreadores de Janela Deslizante
+Contagens comparadas à soma direta das sub-janelas, expiração, eventos
+atrasados, descarte LRU sob o limite de chaves e amostras recentes; os
+detectores de login e de IP disparam a partir dos rastreadores
+"""
+
+import os
+import random
+import sys
+import time
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.security_monitoring import (
+    AlertType, RequestRecord, SecurityMonitoring
+)
+from quarentena_duplicidades.workflow_security.security_trackers import SlidingWindowTracker
+
+START = 1_700_000_000.0
+
+class TestSlidingWindowTracker:
+    """Contagem por sub-janelas em buffer circular"""
+
+    def expected(self, events, tracker: SlidingWindowTracker, now: float) -> float:
+        current = int(now // tracker.bucket_seconds)
+        return sum(
+            weight for timestamp, weight in events
+            if current - tracker.buckets < int(timestamp // tracker.bucket_seconds) <= current
+        )
+
+    def test_count_matches_sub_window_sum(self):
+        rng = random.Random("window")
+        tracker = SlidingWindowTracker(window_seconds=60, buckets=12)
+        events = []
+        now = START
+        for _ in range(3000):
+            now += rng.expovariate(2.0) if rng.random() < 0.95 else rng.uniform(10, 90)
+            weight = rng.choice((1.0, 1.0, 4.0))
+            events.append((now, weight))
+
+            count = tracker.add("10.0.0.1", weight=weight, timestamp=now)
+
+            assert count == pytest.approx(self.expected(events, tracker, now))
+            later = now + rng.uniform(0, 70)
+            assert tracker.count("10.0.0.1", timestamp=later) == pytest.approx(self.expected(events, tracker, later))
+
+    def test_window_expires(self):
+        tracker = SlidingWindowTracker(window_seconds=60, buckets=6)
+        for second in range(10):
+            tracker.add("u1", timestamp=START + second)
+
+        assert tracker.count("u1", timestamp=START + 30) == 10
+        assert tracker.count("u1", timestamp=START + 120) == 0
+        # Sub-janela reaproveitada uma volta depois começa do zero
+        assert tracker.add("u1", timestamp=START + 60 * 10) == 1
+
+    def test_late_event_outside_window_ignored(self):
+        tracker = SlidingWindowTracker(window_seconds=60, buckets=6)
+        tracker.add("u1", timestamp=START + 65)
+
+        assert tracker.add("u1", timestamp=START + 1) == 1
+        assert tracker.count("u1", timestamp=START + 65) == 1
+
+    def test_lru_eviction_bounds_keys(self):
+        tracker = SlidingWindowTracker(window_seconds=60, max_keys=3)
+        for key in ("a", "b", "c"):
+            tracker.add(key, timestamp=START)
+        tracker.add("a", timestamp=START + 1)
+
+        tracker.add("d", timestamp=START + 2)
+
+        assert tracker.count("b", timestamp=START + 2) == 0
+        assert [tracker.count(key, timestamp=START + 2) for key in ("a", "c", "d")] == [2, 1, 1]
+        stats = tracker.stats()
+        assert stats["keys"] == 3
+        assert stats["evictions"] == 1
+        assert stats["estimated_bytes"] == 3 * tracker.key_bytes
+
+    def test_recent_samples_bounded(self):
+        tracker = SlidingWindowTracker(window_seconds=60, sample_size=3)
+        for number in range(5):
+            tracker.add("u1", timestamp=START + number, sample={"number": number})
+        tracker.add("u1", timestamp=START + 5)
+
+        assert tracker.recent("u1") == [{"number": 2}, {"number": 3}, {"number": 4}]
+        tracker.reset("u1")
+        assert tracker.recent("u1") == []
+        assert tracker.count("u1", timestamp=START + 5) == 0
+
+class TestDetectors:
+    """Detectores avaliados a partir dos rastreadores"""
+
+    @pytest.fixture
+    def monitoring(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(SecurityMonitoring, "_start_monitoring_thread", lambda self: None)
+        monitor = SecurityMonitoring(str(tmp_path / "security"))
+        monitor.created_alerts = []
+        monkeypatch.setattr(monitor, "_create_alert", monitor.created_alerts.append)
+        yield monitor
+        monitor.stop_monitoring()
+
+    def test_multiple_login_failures_alert(self, monitoring):
+        for _ in range(monitoring.config["login_attempts_threshold"] - 1):
+            monitoring.monitor_login_attempt("u1", "10.0.0.1", success=False)
+        monitoring.monitor_login_attempt("u1", "10.0.0.1", success=True)
+        assert monitoring.created_alerts == []
+
+        monitoring.monitor_login_attempt("u1", "10.0.0.2", success=False)
+
+        alert = monitoring.created_alerts[-1]
+        assert alert.alert_type == AlertType.MULTIPLE_LOGIN_ATTEMPTS
+        assert alert.details["attempts_count"] == monitoring.config["login_attempts_threshold"]
+        assert {attempt["ip_address"] for attempt in alert.details["attempts"]} == {"10.0.0.1", "10.0.0.2"}
+
+    def test_ip_activity_alert(self, monitoring):
+        now = time.time()
+        threshold = monitoring.config["suspicious_ip_threshold"]
+        records = [
+            RequestRecord(timestamp=now, ip_address="10.0.0.9", method="GET", path=f"/api/tasks/{number}")
+            for number in range(threshold + 1)
+        ]
+
+        monitoring._process_request_batch(records[:threshold])
+        assert monitoring.created_alerts == []
+        monitoring._process_request_batch(records[threshold:])
+
+        alert = monitoring.created_alerts[-1]
+        assert alert.alert_type == AlertType.SUSPICIOUS_IP
+        assert alert.ip_address == "10.0.0.9"
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Testes - Análise de Tráfego
+Count-Min Sketch (nunca subestima, erro limitado, merge), top-k Space-Saving
+comparado às contagens exatas e erro do HyperLogLog dentro dos limites
+"""
+
+import math
+import os
+import random
+import sys
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from quarentena_duplicidades.workflow_security.traffic_analytics import (
+    CountMinSketch, HeavyHitters, HyperLogLog, TrafficAnalytics
+)
+
+def zipf_stream(seed: str, size: int, keys: int = 5000, exponent: float = 1.1) -> list:
+    """Chaves com frequência de Zipf (poucas muito frequentes, cauda longa)"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** exponent) for rank in range(1, keys + 1)]
+    return [f"10.0.{rank // 256}.{rank % 256}" for rank in rng.choices(range(keys), weights=weights, k=size)]
+
+class TestCountMinSketch:
+    """Estimativas de frequência"""
+
+    def test_never_underestimates_and_error_is_bounded(self):
+        stream = zipf_stream("cms", 50000)
+        exact = Counter(stream)
+        sketch = CountMinSketch(width=1024, depth=4)
+        for key in stream:
+            sketch.add(key)
+
+        bound = math.e * len(stream) / sketch.width
+        errors = [sketch.estimate(key) - count for key, count in exact.items()]
+
+        assert min(errors) >= 0
+        # Garantia do sketch: erro <= e*N/largura com probabilidade 1 - e^-profundidade
+        assert sum(error <= bound for error in errors) / len(errors) >= 1 - math.exp(-sketch.depth)
+
+    def test_merge_equals_sketch_of_both_streams(self):
+        first, second = zipf_stream("cms-a", 5000), zipf_stream("cms-b", 5000)
+        left, right, combined = CountMinSketch(256, 4), CountMinSketch(256, 4), CountMinSketch(256, 4)
+        for key in first:
+            left.add(key)
+            combined.add(key)
+        for key in second:
+            right.add(key, weight=2.0)
+            combined.add(key, weight=2.0)
+
+        left.merge(right)
+
+        assert list(left.counts) == list(combined.counts)
+
+    def test_text_round_trip(self):
+        sketch = CountMinSketch(64, 3)
+        sketch.add("a", 3.0)
+        restored = CountMinSketch.from_text(sketch.to_text(), 64, 3)
+
+        assert restored.estimate("a") == 3.0
+        with pytest.raises(ValueError):
+            CountMinSketch.from_text(sketch.to_text(), 128, 3)
+
+class TestHeavyHitters:
+    """Top-k aproximado contra contagens exatas"""
+
+    def recall(self, top, exact: Counter, k: int) -> float:
+        expected = {key for key, _ in exact.most_common(k)}
+        return len(expected & {key for key, _ in top}) / k
+
+    def test_top_k_recall(self):
+        stream = zipf_stream("top", 50000)
+        exact = Counter(stream)
+        hitters = HeavyHitters(k=20)
+        for key in stream:
+            hitters.add(key)
+
+        top = hitters.top(10)
+
+        assert self.recall(top, exact, 10) >= 0.9
+        for key, estimate in top:
+            assert estimate >= exact[key]
+
+    def test_merged_top_k_recall(self):
+        """Top-k de buckets combinados (ex.: várias horas ou escritores)"""
+        streams = [zipf_stream(f"top-{part}", 20000) for part in range(3)]
+        exact = Counter(key for stream in streams for key in stream)
+        merged = HeavyHitters(k=20)
+        for stream in streams:
+            hitters = HeavyHitters(k=20)
+            for key in stream:
+                hitters.add(key)
+            merged.merge(hitters)
+
+        assert self.recall(merged.top(10), exact, 10) >= 0.9
+        assert len(merged.candidates) <= 20
+
+    def test_memory_is_fixed(self):
+        hitters = HeavyHitters(k=5)
+        for number in range(1000):
+            hitters.add(f"key-{number}")
+
+        assert len(hitters.candidates) == 5
+
+class TestHyperLogLog:
+    """Contagem de distintos"""
+
+    @pytest.mark.parametrize("cardinality", [10, 100, 1000, 10000, 100000])
+    def test_error_within_bounds(self, cardinality):
+        sketch = HyperLogLog(precision=12)
+        for number in range(cardinality):
+            sketch.add(f"user-{number}")
+            if number % 3 == 0:
+                sketch.add(f"user-{number}")  # repetições não contam
+
+        standard_error = 1.04 / math.sqrt(1 << 12)
+        assert abs(sketch.count() - cardinality) <= max(2, 4 * standard_error * cardinality)
+
+    def test_merge_counts_union(self):
+        left, right = HyperLogLog(), HyperLogLog()
+        for number in range(30000):
+            left.add(f"ip-{number}")
+        for number in range(20000, 50000):
+            right.add(f"ip-{number}")
+
+        left.merge(right)
+        count = left.count()
+        left.merge(right)
+
+        assert abs(count - 50000) <= 4 * 1.04 / math.sqrt(1 << 12) * 50000
+        assert left.count() == count
+
+    def test_text_round_trip(self):
+        sketch = HyperLogLog(precision=10)
+        for number in range(500):
+            sketch.add(str(number))
+
+        assert HyperLogLog.from_text(sketch.to_text(), 10).count() == sketch.count()
+        with pytest.raises(ValueError):
+            HyperLogLog.from_text(sketch.to_text(), 12)
+
+class TestTrafficAnalytics:
+    """Buckets por hora e por escritor combinados na leitura"""
+
+    def test_summary_merges_writers(self, tmp_path):
+        hour = (datetime(2024, 6, 1, 10) - datetime(1970, 1, 1)).total_seconds()
+        writers = [TrafficAnalytics(str(tmp_path / "traffic")) for _ in range(2)]
+        for number, writer in enumerate(writers):
+            writer.record_many(
+                (hour + index, 1.0, "10.0.0.1" if index % 2 else f"10.1.{number}.{index % 50}", "/api/tasks",
+                 "pytest", f"user-{index % 40}")
+                for index in range(1000)
+            )
+        assert writers[0].flush() == 1
+
+        summary = writers[1].summary(datetime(2024, 6, 1, 10), datetime(2024, 6, 1, 10, 59))
+
+        assert summary["requests"] == 2000
+        assert summary["top_ips"][0] == {"ip_address": "10.0.0.1", "requests": 1000}
+        assert summary["top_paths"][0]["path"] == "/api/tasks"
+        assert abs(summary["distinct_ips"] - 51) <= 2
+        assert abs(summary["distinct_users"] - 40) <= 2
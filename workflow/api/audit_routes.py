@@ -2,9 +2,12 @@
 Rotas da API para Sistema de Auditoria - TarefaMágica
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
 import logging
 
 from ..security.audit_system import (
@@ -17,6 +20,84 @@ audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
 # Instância do sistema de auditoria
 audit_system = AuditSystem()
 
+# Colunas da exportação CSV (o cursor permite retomar após a linha)
+EXPORT_CSV_COLUMNS = (
+    'event_id', 'timestamp', 'user_id', 'session_id', 'ip_address', 'user_agent',
+    'category', 'action', 'level', 'description', 'details', 'resource_id',
+    'resource_type', 'success', 'duration_ms', 'error_message', 'cursor'
+)
+
+# Tamanho aproximado de cada chunk enviado ao cliente
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def _parse_audit_query(limit: int = 1000, offset: int = 0) -> Tuple[Optional[AuditQuery], Optional[str]]:
+    """
+    Monta a consulta de auditoria a partir dos query params da requisição
+    
+    Returns:
+        Tuple[Optional[AuditQuery], Optional[str]]: (consulta, mensagem de erro)
+        
+    Raises:
+        ValueError: Se uma data for inválida
+    """
+    # Parâmetros de data
+    start_date = None
+    end_date = None
+    
+    if request.args.get('start_date'):
+        start_date = datetime.fromisoformat(request.args.get('start_date'))
+    if request.args.get('end_date'):
+        end_date = datetime.fromisoformat(request.args.get('end_date'))
+        
+    # Parâmetros de filtro
+    user_id = request.args.get('user_id')
+    category_str = request.args.get('category')
+    action_str = request.args.get('action')
+    level_str = request.args.get('level')
+    success_str = request.args.get('success')
+    resource_id = request.args.get('resource_id')
+    ip_address = request.args.get('ip_address')
+    
+    # Converte strings para enums
+    category = None
+    if category_str:
+        try:
+            category = AuditCategory(category_str)
+        except ValueError:
+            return None, f'Categoria inválida: {category_str}'
+            
+    action = None
+    if action_str:
+        try:
+            action = AuditAction(action_str)
+        except ValueError:
+            return None, f'Ação inválida: {action_str}'
+            
+    level = None
+    if level_str:
+        try:
+            level = AuditLevel(level_str)
+        except ValueError:
+            return None, f'Nível inválido: {level_str}'
+            
+    success = None
+    if success_str:
+        success = success_str.lower() == 'true'
+        
+    return AuditQuery(
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        category=category,
+        action=action,
+        level=level,
+        success=success,
+        resource_id=resource_id,
+        ip_address=ip_address,
+        limit=limit,
+        offset=offset
+    ), None
+
 @audit_bp.route('/events', methods=['GET'])
 def get_audit_events():
     """
@@ -36,78 +117,17 @@ def get_audit_events():
         offset: int (padrão: 0)
     """
     try:
-        # Parâmetros de data
-        start_date = None
-        end_date = None
-        
-        if request.args.get('start_date'):
-            start_date = datetime.fromisoformat(request.args.get('start_date'))
-        if request.args.get('end_date'):
-            end_date = datetime.fromisoformat(request.args.get('end_date'))
-            
-        # Parâmetros de filtro
-        user_id = request.args.get('user_id')
-        category_str = request.args.get('category')
-        action_str = request.args.get('action')
-        level_str = request.args.get('level')
-        success_str = request.args.get('success')
-        resource_id = request.args.get('resource_id')
-        ip_address = request.args.get('ip_address')
-        
         # Parâmetros de paginação
         limit = int(request.args.get('limit', 1000))
         offset = int(request.args.get('offset', 0))
         
-        # Converte strings para enums
-        category = None
-        if category_str:
-            try:
-                category = AuditCategory(category_str)
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': f'Categoria inválida: {category_str}'
-                }), 400
-                
-        action = None
-        if action_str:
-            try:
-                action = AuditAction(action_str)
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': f'Ação inválida: {action_str}'
-                }), 400
-                
-        level = None
-        if level_str:
-            try:
-                level = AuditLevel(level_str)
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nível inválido: {level_str}'
-                }), 400
-                
-        success = None
-        if success_str:
-            success = success_str.lower() == 'true'
+        query, error = _parse_audit_query(limit=limit, offset=offset)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
             
-        # Cria query
-        query = AuditQuery(
-            start_date=start_date,
-            end_date=end_date,
-            user_id=user_id,
-            category=category,
-            action=action,
-            level=level,
-            success=success,
-            resource_id=resource_id,
-            ip_address=ip_address,
-            limit=limit,
-            offset=offset
-        )
-        
         # Executa consulta
         events = audit_system.query_events(query)
         
@@ -149,6 +169,152 @@ def get_audit_events():
             'error': 'Erro interno do servidor'
         }), 500
 
+@audit_bp.route('/events/export', methods=['GET'])
+def export_audit_events():
+    """
+    Exporta eventos de auditoria em streaming (NDJSON ou CSV)
+    
+    A resposta é gerada à medida que os eventos são lidos do disco, em
+    chunks, sem montar o resultado em memória. Cada evento traz o campo
+    `cursor`; para retomar uma exportação interrompida, basta repetir a
+    requisição com o cursor do último evento recebido.
+    
+    A exportação sempre termina com um registro de status: no NDJSON,
+    {"export_status": "complete" | "error", "exported": n, "cursor": ...};
+    no CSV, uma linha com event_id "#complete" ou "#error" e o cursor.
+    Sem esse registro, a resposta foi cortada; com "error", a leitura
+    falhou e a exportação deve ser retomada a partir do cursor informado.
+    
+    Query params:
+        Os mesmos filtros de /events (exceto limit/offset), e:
+        format: str (ndjson ou csv, padrão: ndjson)
+        cursor: str (opcional, retoma após o evento indicado)
+        limit: int (opcional, número máximo de eventos)
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({
+                'success': False,
+                'error': f'Formato inválido: {export_format}'
+            }), 400
+            
+        limit = None
+        if request.args.get('limit'):
+            limit = int(request.args.get('limit'))
+            
+        query, error = _parse_audit_query()
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+            
+        # Valida o cursor antes de iniciar o streaming
+        try:
+            cursor = request.args.get('cursor')
+            rows = audit_system.export_events(query, cursor=cursor, limit=limit)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+            
+        if export_format == 'csv':
+            generator = _export_csv_chunks(rows, cursor)
+            mimetype = 'text/csv'
+        else:
+            generator = _export_ndjson_chunks(rows, cursor)
+            mimetype = 'application/x-ndjson'
+            
+        filename = f"audit_events_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        return Response(
+            stream_with_context(generator),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'Cache-Control': 'no-store'
+            }
+        )
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Parâmetro inválido: {str(e)}'
+        }), 400
+    except Exception as e:
+        logging.error(f"Erro ao exportar eventos: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+def _export_with_status(rows: Iterator[Tuple[str, Dict]], cursor: Optional[str]) -> Iterator[Tuple[str, Dict, Optional[Dict]]]:
+    """
+    Eventos exportados seguidos de um registro de status final
+    
+    Produz (cursor, evento, None) para cada evento e, por último,
+    (cursor, None, status): "complete", ou "error" se a leitura falhou,
+    sempre com o cursor do último evento entregue (de onde retomar).
+    """
+    exported = 0
+    try:
+        for cursor, event_data in rows:
+            yield cursor, event_data, None
+            exported += 1
+        status = {'export_status': 'complete', 'exported': exported, 'cursor': cursor}
+    except Exception:
+        # Já registrado por export_events; o cliente recebe o ponto de retomada
+        status = {
+            'export_status': 'error',
+            'error': 'Exportação interrompida; retome a partir do cursor',
+            'exported': exported,
+            'cursor': cursor
+        }
+    yield cursor, None, status
+
+def _export_ndjson_chunks(rows: Iterator[Tuple[str, Dict]], cursor: Optional[str] = None) -> Iterator[str]:
+    """Agrupa os eventos exportados em chunks NDJSON (com o registro de status ao final)"""
+    buffer = []
+    size = 0
+    for cursor, event_data, status in _export_with_status(rows, cursor):
+        if status is not None:
+            buffer.append(json.dumps(status, ensure_ascii=False) + "\n")
+            break
+        line = json.dumps(dict(event_data, cursor=cursor), ensure_ascii=False, default=str) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    yield "".join(buffer)
+
+def _export_csv_chunks(rows: Iterator[Tuple[str, Dict]], cursor: Optional[str] = None) -> Iterator[str]:
+    """Agrupa os eventos exportados em chunks CSV (com cabeçalho e linha de status ao final)"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    for cursor, event_data, status in _export_with_status(rows, cursor):
+        if status is not None:
+            row = {
+                'event_id': f"#{status['export_status']}",
+                'description': status.get('error'),
+                'details': json.dumps({'exported': status['exported']}),
+                'cursor': cursor
+            }
+        else:
+            row = dict(event_data, cursor=cursor)
+            if row.get('details') is not None:
+                row['details'] = json.dumps(row['details'], ensure_ascii=False, default=str)
+        writer.writerow([row.get(column) for column in EXPORT_CSV_COLUMNS])
+        if output.tell() >= EXPORT_CHUNK_BYTES:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+    if output.tell():
+        yield output.getvalue()
+
 @audit_bp.route('/reports', methods=['POST'])
 def generate_audit_report():
     """
@@ -335,47 +501,16 @@ def get_user_activity(user_id: str):
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Cria query para usuário específico
-        query = AuditQuery(
-            start_date=start_date,
-            end_date=end_date,
-            user_id=user_id,
-            limit=10000
-        )
-        
-        events = audit_system.query_events(query)
-        
-        # Agrupa por categoria e ação
-        activity_summary = {}
-        for event in events:
-            category = event.category.value
-            action = event.action.value
-            
-            if category not in activity_summary:
-                activity_summary[category] = {}
-                
-            if action not in activity_summary[category]:
-                activity_summary[category][action] = {
-                    'count': 0,
-                    'successful': 0,
-                    'failed': 0,
-                    'last_occurrence': None
-                }
-                
-            activity_summary[category][action]['count'] += 1
-            if event.success:
-                activity_summary[category][action]['successful'] += 1
-            else:
-                activity_summary[category][action]['failed'] += 1
-                
-            if not activity_summary[category][action]['last_occurrence'] or event.timestamp > activity_summary[category][action]['last_occurrence']:
-                activity_summary[category][action]['last_occurrence'] = event.timestamp.isoformat()
+        # Contadores do usuário vêm das rollups, sem ler eventos brutos
+        statistics = audit_system.get_rollup_statistics(start_date, end_date)
+        user_stats = statistics['users'].get(user_id, {'total': 0, 'activity': {}})
+        activity_summary = user_stats['activity']
                 
         return jsonify({
             'success': True,
             'user_id': user_id,
             'activity_summary': activity_summary,
-            'total_events': len(events),
+            'total_events': user_stats['total'],
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
@@ -416,6 +551,27 @@ def cleanup_old_events():
             'error': 'Erro interno do servidor'
         }), 500
 
+@audit_bp.route('/archive', methods=['POST'])
+def archive_old_events():
+    """
+    Compacta dias antigos no arquivo frio
+    """
+    try:
+        summary = audit_system.archive_old_events()
+        
+        return jsonify({
+            'success': True,
+            'message': f"{summary['archived_days']} dias arquivados",
+            'archive': summary
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Erro ao arquivar eventos: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
 @audit_bp.route('/status', methods=['GET'])
 def get_audit_status():
     """
@@ -426,18 +582,18 @@ def get_audit_status():
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=1)
         
-        query = AuditQuery(start_date=start_date, end_date=end_date, limit=10000)
-        recent_events = audit_system.query_events(query)
+        statistics = audit_system.get_rollup_statistics(start_date, end_date)
         
         # Calcula estatísticas
-        total_events = len(recent_events)
-        error_events = len([e for e in recent_events if e.level in [AuditLevel.ERROR, AuditLevel.CRITICAL]])
-        security_events = len([e for e in recent_events if e.category == AuditCategory.SECURITY])
+        total_events = statistics['total']
+        error_events = statistics['levels'].get(AuditLevel.ERROR.value, 0) + statistics['levels'].get(AuditLevel.CRITICAL.value, 0)
+        security_events = statistics['categories'].get(AuditCategory.SECURITY.value, {}).get('total', 0)
         
         return jsonify({
             'success': True,
             'status': {
                 'processor_active': audit_system.processor_active,
+                'ingest': audit_system.get_ingest_stats(),
                 'last_24h': {
                     'total_events': total_events,
                     'error_events': error_events,
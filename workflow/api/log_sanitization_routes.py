@@ -2,17 +2,42 @@
 Rotas da API para Sanitização de Logs - TarefaMágica
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from datetime import datetime
 from typing import Dict, List
 import logging
 
 from ..security.log_sanitization import log_sanitizer
+from ..security.log_file_sanitizer import log_file_jobs
 from ..security.input_validation import InputValidation
+from ..security.access_control import AccessControl, Permission
 
 # Configuração do blueprint
 log_sanitization_bp = Blueprint('log_sanitization', __name__, url_prefix='/api/log-sanitization')
 
+# Controle de acesso das rotas de arquivos (leem e gravam no diretório de logs)
+access_control = AccessControl()
+
+def _check_access(permission: Permission):
+    """
+    Exige usuário autenticado (g.user_id) com a permissão
+    
+    Returns:
+        Resposta de erro (401/403), ou None se autorizado
+    """
+    user_id = g.get('user_id')
+    if user_id is None:
+        return jsonify({
+            'success': False,
+            'error': 'Autenticação obrigatória'
+        }), 401
+    if not access_control.check_permission(user_id, permission):
+        return jsonify({
+            'success': False,
+            'error': 'Permissão negada'
+        }), 403
+    return None
+
 @log_sanitization_bp.route('/sanitize', methods=['POST'])
 def sanitize_data():
     """
@@ -209,6 +234,9 @@ def add_pattern():
         replacement: str - Texto de substituição
         description: str - Descrição do padrão
         risk_level: str (opcional) - Nível de risco
+        triggers: list (opcional) - Literais dos quais ao menos um aparece em todo texto que casa
+        digit_run: int (opcional) - Menor sequência de dígitos presente em todo texto que casa
+        trigger_pattern: str (opcional) - Regex barata que casa em todo texto que casa
     """
     try:
         data = request.get_json()
@@ -228,6 +256,9 @@ def add_pattern():
         replacement = InputValidation.sanitize_string(data['replacement'], max_length=200)
         description = InputValidation.sanitize_string(data['description'], max_length=500)
         risk_level = InputValidation.sanitize_string(data.get('risk_level', 'MEDIUM'), max_length=20)
+        triggers = [str(trigger) for trigger in data.get('triggers', [])]
+        digit_run = int(data.get('digit_run', 0))
+        trigger_pattern = data.get('trigger_pattern')
         
         # Validação do nível de risco
         allowed_risk_levels = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
@@ -243,7 +274,10 @@ def add_pattern():
             pattern=pattern,
             replacement=replacement,
             description=description,
-            risk_level=risk_level.upper()
+            risk_level=risk_level.upper(),
+            triggers=triggers,
+            digit_run=digit_run,
+            trigger_pattern=trigger_pattern
         )
         
         return jsonify({
@@ -390,6 +424,122 @@ def get_sanitization_stats():
         
     except Exception as e:
         logging.error(f"Erro ao obter estatísticas: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+@log_sanitization_bp.route('/files/sanitize', methods=['POST'])
+def sanitize_log_file():
+    """
+    Agenda a sanitização de um arquivo de log
+    
+    Body:
+        input_path: str - Arquivo relativo ao diretório de logs
+        output_path: str (opcional) - Arquivo sanitizado (padrão: <nome>.sanitized<ext>)
+        workers: int (opcional) - Processos em paralelo (limitado ao número de CPUs)
+        overwrite: bool (opcional) - Substitui a saída se ela já existir (padrão: false)
+    """
+    try:
+        denied = _check_access(Permission.MANAGE_SYSTEM)
+        if denied:
+            return denied
+        
+        data = request.get_json()
+        
+        if not data or 'input_path' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Campo obrigatório ausente: input_path'
+            }), 400
+        
+        # Caminhos são validados contra o diretório de logs pelo próprio job
+        workers = data.get('workers')
+        overwrite = data.get('overwrite', False)
+        if not isinstance(overwrite, bool):
+            return jsonify({
+                'success': False,
+                'error': 'Campo overwrite deve ser booleano'
+            }), 400
+        job = log_file_jobs.submit(
+            str(data['input_path']),
+            output_path=str(data['output_path']) if data.get('output_path') else None,
+            workers=int(workers) if workers is not None else None,
+            overwrite=overwrite
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': 'Sanitização do arquivo agendada',
+            'job': job
+        }), 202
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logging.error(f"Erro ao agendar sanitização de arquivo: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+@log_sanitization_bp.route('/files/jobs', methods=['GET'])
+def list_file_jobs():
+    """
+    Lista os jobs de sanitização de arquivos
+    """
+    try:
+        denied = _check_access(Permission.VIEW_LOGS)
+        if denied:
+            return denied
+        
+        jobs = log_file_jobs.list()
+        
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'total_jobs': len(jobs)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Erro ao listar jobs de sanitização: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+@log_sanitization_bp.route('/files/jobs/<job_id>', methods=['GET'])
+def get_file_job(job_id: str):
+    """
+    Obtém a situação de um job de sanitização de arquivo
+    
+    Args:
+        job_id: ID do job
+    """
+    try:
+        denied = _check_access(Permission.VIEW_LOGS)
+        if denied:
+            return denied
+        
+        job = log_file_jobs.get(job_id)
+        
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Job {job_id} não encontrado'
+            }), 404
+        
+        # Relatório (MB/s, ocorrências por padrão) disponível ao final
+        return jsonify({
+            'success': True,
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Erro ao obter job de sanitização: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Erro interno do servidor'
@@ -4,14 +4,10 @@ Rotas da API para Monitoramento de Segurança - TarefaMágica
 
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from typing import Dict, List
 import logging
-import os
-import json
 
-from ..security.security_monitoring import (
-    SecurityMonitoring, SecurityAlert, AlertLevel, AlertType
-)
+from ..security.security_monitoring import SecurityMonitoring
+from ..security.security_metrics import MetricResolution
 from ..security.rate_limiting import rate_limiter, RateLimitType
 from ..security.security_headers import security_headers
 from ..security.ssl_validation import ssl_validator
@@ -240,27 +236,12 @@ def resolve_alert(alert_id: str):
         data = request.get_json()
         resolved_by = data.get('resolved_by', 'system') if data else 'system'
         
-        # Busca alerta
-        alerts_dir = security_monitoring.storage_path + "/alerts"
-        alert_file = f"{alerts_dir}/{alert_id}.json"
-        
-        if not os.path.exists(alert_file):
+        if not security_monitoring.resolve_alert(alert_id, resolved_by):
             return jsonify({
                 'success': False,
                 'error': 'Alerta não encontrado'
             }), 404
             
-        # Atualiza alerta
-        with open(alert_file, 'r', encoding='utf-8') as f:
-            alert_data = json.load(f)
-            
-        alert_data['resolved'] = True
-        alert_data['resolved_at'] = datetime.utcnow().isoformat()
-        alert_data['resolved_by'] = resolved_by
-        
-        with open(alert_file, 'w', encoding='utf-8') as f:
-            json.dump(alert_data, f, indent=2)
-            
         return jsonify({
             'success': True,
             'message': f'Alerta {alert_id} marcado como resolvido'
@@ -276,20 +257,13 @@ def resolve_alert(alert_id: str):
 @security_bp.route('/blacklist', methods=['GET'])
 def get_blacklist():
     """
-    Obtém lista de IPs na blacklist
+    Obtém lista de IPs e faixas CIDR na blacklist
     """
     try:
-        blacklist_file = security_monitoring.storage_path + "/blacklist/ips.json"
-        
-        if os.path.exists(blacklist_file):
-            with open(blacklist_file, 'r', encoding='utf-8') as f:
-                blacklist = json.load(f)
-        else:
-            blacklist = []
-            
         return jsonify({
             'success': True,
-            'blacklist': blacklist
+            'blacklist': security_monitoring.ip_blacklist.list_entries(),
+            'statistics': security_monitoring.ip_blacklist.stats()
         }), 200
         
     except Exception as e:
@@ -302,10 +276,10 @@ def get_blacklist():
 @security_bp.route('/blacklist', methods=['POST'])
 def add_to_blacklist():
     """
-    Adiciona IP à blacklist
+    Adiciona IP ou faixa CIDR à blacklist
     
     Body:
-        ip_address: str
+        ip_address: str (endereço ou faixa CIDR, ex.: 203.0.113.0/24)
     """
     try:
         data = request.get_json()
@@ -319,7 +293,12 @@ def add_to_blacklist():
         ip_address = data['ip_address']
         
         # Adiciona à blacklist
-        security_monitoring._add_to_blacklist(ip_address)
+        result = security_monitoring.ip_blacklist.add([ip_address])
+        if result['invalid']:
+            return jsonify({
+                'success': False,
+                'error': f'Endereço ou faixa inválida: {ip_address}'
+            }), 400
         
         return jsonify({
             'success': True,
@@ -333,38 +312,57 @@ def add_to_blacklist():
             'error': 'Erro interno do servidor'
         }), 500
 
-@security_bp.route('/blacklist/<ip_address>', methods=['DELETE'])
-def remove_from_blacklist(ip_address: str):
+@security_bp.route('/blacklist/import', methods=['POST'])
+def import_blacklist():
     """
-    Remove IP da blacklist
+    Importa lista de bloqueio externa
+    
+    Body:
+        entries: List[str] (JSON), ou texto com uma entrada por linha
+        (comentários com '#' ou ';' são ignorados)
     """
     try:
-        blacklist_file = security_monitoring.storage_path + "/blacklist/ips.json"
-        
-        if os.path.exists(blacklist_file):
-            with open(blacklist_file, 'r', encoding='utf-8') as f:
-                blacklist = json.load(f)
-                
-            if ip_address in blacklist:
-                blacklist.remove(ip_address)
-                
-                with open(blacklist_file, 'w', encoding='utf-8') as f:
-                    json.dump(blacklist, f, indent=2)
-                    
-                return jsonify({
-                    'success': True,
-                    'message': f'IP {ip_address} removido da blacklist'
-                }), 200
-            else:
+        data = request.get_json(silent=True)
+        if data is not None:
+            if not isinstance(data.get('entries'), list):
                 return jsonify({
                     'success': False,
-                    'error': 'IP não encontrado na blacklist'
-                }), 404
+                    'error': 'entries deve ser uma lista'
+                }), 400
+            result = security_monitoring.ip_blacklist.add(str(entry) for entry in data['entries'])
         else:
+            result = security_monitoring.ip_blacklist.import_lines(
+                request.get_data(as_text=True).splitlines()
+            )
+            
+        return jsonify({
+            'success': True,
+            'result': result
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Erro ao importar blacklist: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+
+@security_bp.route('/blacklist/<path:ip_address>', methods=['DELETE'])
+def remove_from_blacklist(ip_address: str):
+    """
+    Remove IP ou faixa CIDR da blacklist
+    """
+    try:
+        if security_monitoring.ip_blacklist.remove(ip_address):
             return jsonify({
-                'success': False,
-                'error': 'Blacklist não encontrada'
-            }), 404
+                'success': True,
+                'message': f'IP {ip_address} removido da blacklist'
+            }), 200
+            
+        return jsonify({
+            'success': False,
+            'error': 'IP não encontrado na blacklist'
+        }), 404
             
     except Exception as e:
         logging.error(f"Erro ao remover IP da blacklist: {str(e)}")
@@ -376,38 +374,34 @@ def remove_from_blacklist(ip_address: str):
 @security_bp.route('/metrics', methods=['GET'])
 def get_metrics():
     """
-    Obtém métricas de segurança
+    Obtém métricas de segurança agregadas
     
     Query params:
         metric_name: str (opcional)
         days: int (padrão: 7)
+        resolution: str (minute, hour, day; padrão: hour até 2 dias, day acima)
     """
     try:
         metric_name = request.args.get('metric_name')
         days = int(request.args.get('days', 7))
         
+        resolution_str = request.args.get('resolution', 'hour' if days <= 2 else 'day')
+        try:
+            resolution = MetricResolution(resolution_str)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': f'Resolução inválida: {resolution_str}'
+            }), 400
+        
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        metrics = security_monitoring._get_metrics_in_period(start_date, end_date)
-        
-        # Filtra por nome da métrica se especificado
-        if metric_name:
-            metrics = [m for m in metrics if m.metric_name == metric_name]
+        metrics = security_monitoring.get_metric_series(start_date, end_date, metric_name, resolution)
             
         return jsonify({
             'success': True,
-            'metrics': [
-                {
-                    'metric_id': metric.metric_id,
-                    'metric_name': metric.metric_name,
-                    'value': metric.value,
-                    'timestamp': metric.timestamp.isoformat(),
-                    'user_id': metric.user_id,
-                    'context': metric.context
-                }
-                for metric in metrics
-            ]
+            'metrics': metrics
         }), 200
         
     except ValueError:
@@ -448,7 +442,10 @@ def get_security_status():
                 'overall': status,
                 'monitoring_active': security_monitoring.monitoring_active,
                 'last_check': datetime.utcnow().isoformat(),
-                'statistics': stats
+                'statistics': stats,
+                'ingest': security_monitoring.get_ingest_stats(),
+                'alerts': security_monitoring.get_alert_stats(),
+                'dashboard': security_monitoring.get_dashboard_stats()
             }
         }), 200
         